@@ -0,0 +1,26 @@
+"""Add Document Content Hash
+
+Revision ID: 3a7802814195
+Revises: 15326fcec57e
+Create Date: 2026-10-17 10:12:43.512790
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "3a7802814195"
+down_revision = "15326fcec57e"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "document",
+        sa.Column("content_hash", sa.String(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("document", "content_hash")
@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Generic
+from typing import TypeVar
+
+from payserai.utils.logger import setup_logger
+from payserai.utils.metrics import DEFAULT_LATENCY_BUCKETS
+from payserai.utils.metrics import Histogram
+
+logger = setup_logger()
+
+InputT = TypeVar("InputT")
+OutputT = TypeVar("OutputT")
+
+_BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+@dataclass
+class _PendingRequest(Generic[InputT, OutputT]):
+    items: list[InputT]
+    enqueued_at: float = field(default_factory=time.monotonic)
+    future: Future[list[OutputT]] = field(default_factory=Future)
+
+
+class MicroBatcher(Generic[InputT, OutputT]):
+    """Coalesces concurrent requests into a single call of `process_batch`.
+
+    A worker thread takes the oldest pending request, then keeps adding requests to the batch
+    until it holds `max_batch_size` items or `max_wait_seconds` have passed since the oldest
+    request was received. `process_batch` is run once for the combined items and its outputs
+    are split back out to the requests in order. A single request with more items than
+    `max_batch_size` is processed on its own and is never split up."""
+
+    def __init__(
+        self,
+        name: str,
+        process_batch: Callable[[list[InputT]], list[OutputT]],
+        max_batch_size: int,
+        max_wait_seconds: float,
+    ) -> None:
+        self.name = name
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_seconds = max(0.0, max_wait_seconds)
+
+        self._pending: deque[_PendingRequest[InputT, OutputT]] = deque()
+        self._condition = threading.Condition()
+        self._worker: threading.Thread | None = None
+
+        self.batch_size_histogram = Histogram(
+            name=f"{name}_batch_size", buckets=_BATCH_SIZE_BUCKETS
+        )
+        self.requests_per_batch_histogram = Histogram(
+            name=f"{name}_requests_per_batch", buckets=_BATCH_SIZE_BUCKETS
+        )
+        self.queue_wait_histogram = Histogram(
+            name=f"{name}_queue_wait_seconds", buckets=DEFAULT_LATENCY_BUCKETS
+        )
+
+    def _ensure_worker(self) -> None:
+        # Called with the condition held
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(
+                target=self._run, name=f"{self.name}-batcher", daemon=True
+            )
+            self._worker.start()
+
+    def submit(self, items: list[InputT]) -> list[OutputT]:
+        """Blocks until the batch containing these items has been processed"""
+        if not items:
+            return []
+
+        request: _PendingRequest[InputT, OutputT] = _PendingRequest(items=items)
+        with self._condition:
+            self._ensure_worker()
+            self._pending.append(request)
+            self._condition.notify()
+        return request.future.result()
+
+    def _collect_batch(self) -> list[_PendingRequest[InputT, OutputT]]:
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+
+            batch = [self._pending.popleft()]
+            num_items = len(batch[0].items)
+            deadline = batch[0].enqueued_at + self.max_wait_seconds
+            while num_items < self.max_batch_size:
+                if self._pending:
+                    if num_items + len(self._pending[0].items) > self.max_batch_size:
+                        break
+                    request = self._pending.popleft()
+                    batch.append(request)
+                    num_items += len(request.items)
+                    continue
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(timeout=remaining)
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect_batch()
+
+            batch_start = time.monotonic()
+            all_items: list[InputT] = []
+            for request in batch:
+                self.queue_wait_histogram.observe(batch_start - request.enqueued_at)
+                all_items.extend(request.items)
+            self.batch_size_histogram.observe(len(all_items))
+            self.requests_per_batch_histogram.observe(len(batch))
+
+            try:
+                outputs = self.process_batch(all_items)
+                if len(outputs) != len(all_items):
+                    raise RuntimeError(
+                        f"Batch of {len(all_items)} items produced {len(outputs)} outputs"
+                    )
+            except Exception as e:
+                logger.exception(f"Failed to process {self.name} batch")
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            offset = 0
+            for request in batch:
+                request.future.set_result(outputs[offset : offset + len(request.items)])
+                offset += len(request.items)
+
+    def get_metrics(self) -> dict[str, Any]:
+        with self._condition:
+            queued_requests = len(self._pending)
+        return {
+            "name": self.name,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_seconds": self.max_wait_seconds,
+            "queued_requests": queued_requests,
+            "batch_size": self.batch_size_histogram.to_dict(),
+            "requests_per_batch": self.requests_per_batch_histogram.to_dict(),
+            "queue_wait_seconds": self.queue_wait_histogram.to_dict(),
+        }
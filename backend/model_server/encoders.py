@@ -1,6 +1,13 @@
+from typing import Any
+
 from fastapi import APIRouter
+from fastapi import Header
 from fastapi import HTTPException
+from fastapi import Response
 
+from model_server.batching import MicroBatcher
+from payserai.configs.app_configs import MODEL_SERVER_MAX_BATCH_SIZE
+from payserai.configs.app_configs import MODEL_SERVER_MAX_BATCH_WAIT_MS
 from payserai.configs.model_configs import CROSS_ENCODER_MODEL_ENSEMBLE
 from payserai.configs.model_configs import DOCUMENT_ENCODER_MODEL
 from payserai.configs.model_configs import NORMALIZE_EMBEDDINGS
@@ -8,6 +15,8 @@ from payserai.search.search_nlp_models import get_local_embedding_model
 from payserai.search.search_nlp_models import get_local_reranking_model_ensemble
 from payserai.utils.logger import setup_logger
 from payserai.utils.timing import log_function_time
+from shared_models.float_matrix import encode_float32_matrix
+from shared_models.float_matrix import FLOAT32_MATRIX_MEDIA_TYPE
 from shared_models.model_server_models import EmbedRequest
 from shared_models.model_server_models import EmbedResponse
 from shared_models.model_server_models import RerankRequest
@@ -34,38 +43,85 @@ def embed_text(
     return embeddings
 
 
-@log_function_time()
-def calc_sim_scores(query: str, docs: list[str]) -> list[list[float]]:
+def _calc_pair_scores(query_doc_pairs: list[tuple[str, str]]) -> list[list[float]]:
+    """Scores each (query, document) pair with every cross encoder in the ensemble, the
+    result is indexed by pair first and then by encoder"""
     cross_encoders = get_local_reranking_model_ensemble()
-    sim_scores = [
-        encoder.predict([(query, doc) for doc in docs]).tolist()  # type: ignore
+    encoder_scores = [
+        encoder.predict(query_doc_pairs).tolist()  # type: ignore
         for encoder in cross_encoders
     ]
-    return sim_scores
+    return [list(pair_scores) for pair_scores in zip(*encoder_scores)]
+
+
+_embed_batcher: MicroBatcher[str, list[float]] = MicroBatcher(
+    name="bi_encoder",
+    process_batch=lambda texts: embed_text(texts=texts),
+    max_batch_size=MODEL_SERVER_MAX_BATCH_SIZE,
+    max_wait_seconds=MODEL_SERVER_MAX_BATCH_WAIT_MS / 1000,
+)
+_rerank_batcher: MicroBatcher[tuple[str, str], list[float]] = MicroBatcher(
+    name="cross_encoder",
+    process_batch=_calc_pair_scores,
+    max_batch_size=MODEL_SERVER_MAX_BATCH_SIZE,
+    max_wait_seconds=MODEL_SERVER_MAX_BATCH_WAIT_MS / 1000,
+)
+
 
+def _accepts_float32_matrix(accept: str | None) -> bool:
+    return accept is not None and FLOAT32_MATRIX_MEDIA_TYPE in accept
 
-@router.post("/bi-encoder-embed")
+
+def _float32_matrix_response(rows: list[list[float]]) -> Response:
+    return Response(
+        content=encode_float32_matrix(rows), media_type=FLOAT32_MATRIX_MEDIA_TYPE
+    )
+
+
+@router.post("/bi-encoder-embed", response_model=None)
 def process_embed_request(
     embed_request: EmbedRequest,
-) -> EmbedResponse:
+    accept: str | None = Header(None),
+) -> EmbedResponse | Response:
     try:
-        embeddings = embed_text(texts=embed_request.texts)
+        embeddings = _embed_batcher.submit(embed_request.texts)
+        if _accepts_float32_matrix(accept):
+            return _float32_matrix_response(embeddings)
         return EmbedResponse(embeddings=embeddings)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/cross-encoder-scores")
-def process_rerank_request(embed_request: RerankRequest) -> RerankResponse:
+@router.post("/cross-encoder-scores", response_model=None)
+def process_rerank_request(
+    embed_request: RerankRequest,
+    accept: str | None = Header(None),
+) -> RerankResponse | Response:
     try:
-        sim_scores = calc_sim_scores(
-            query=embed_request.query, docs=embed_request.documents
-        )
+        if not embed_request.documents:
+            sim_scores: list[list[float]] = [
+                [] for _ in get_local_reranking_model_ensemble()
+            ]
+        else:
+            pair_scores = _rerank_batcher.submit(
+                [(embed_request.query, doc) for doc in embed_request.documents]
+            )
+            # Back to one list of scores per cross encoder
+            sim_scores = [list(scores) for scores in zip(*pair_scores)]
+
+        if _accepts_float32_matrix(accept):
+            return _float32_matrix_response(sim_scores)
         return RerankResponse(scores=sim_scores)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/batching-metrics")
+def get_batching_metrics() -> list[dict[str, Any]]:
+    """Batch size and queue wait histograms of the request coalescing"""
+    return [_embed_batcher.get_metrics(), _rerank_batcher.get_metrics()]
+
+
 def warm_up_bi_encoder() -> None:
     logger.info(f"Warming up Bi-Encoders: {DOCUMENT_ENCODER_MODEL}")
     get_local_embedding_model().encode(WARM_UP_STRING)
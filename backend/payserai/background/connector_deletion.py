@@ -15,6 +15,7 @@ import time
 from sqlalchemy.orm import Session
 
 from payserai.access.access import get_access_for_documents
+from payserai.db.connector import bump_connector_generation
 from payserai.db.connector import fetch_connector_by_id
 from payserai.db.connector_credential_pair import (
     delete_connector_credential_pair__no_commit,
@@ -167,6 +168,10 @@ def delete_connector_credential_pair(
             document_index=document_index,
         )
         num_docs_deleted += len(documents)
+        logger.info(
+            f"Deleted or updated {num_docs_deleted} documents so far for connector_id: "
+            f"'{connector_id}' and credential_id: '{credential_id}'"
+        )
 
     # Clean up document sets / access information from Postgres
     # and sync these updates to Vespa
@@ -193,6 +198,7 @@ def delete_connector_credential_pair(
         logger.debug("Found no credentials left for connector, deleting connector")
         db_session.delete(connector)
     db_session.commit()
+    bump_connector_generation()
 
     logger.info(
         "Successfully deleted connector_credential_pair with connector_id:"
@@ -1,4 +1,5 @@
 import time
+from collections.abc import Iterator
 from datetime import datetime
 from datetime import timezone
 
@@ -6,10 +7,12 @@ import torch
 from sqlalchemy.orm import Session
 
 from payserai.background.indexing.checkpointing import get_time_windows_for_index_attempt
+from payserai.configs.app_configs import INDEXING_PIPELINE_PARALLEL
 from payserai.connectors.factory import instantiate_connector
 from payserai.connectors.interfaces import GenerateDocumentsOutput
 from payserai.connectors.interfaces import LoadConnector
 from payserai.connectors.interfaces import PollConnector
+from payserai.connectors.models import Document
 from payserai.connectors.models import IndexAttemptMetadata
 from payserai.connectors.models import InputType
 from payserai.db.connector import disable_connector
@@ -22,9 +25,11 @@ from payserai.db.index_attempt import mark_attempt_failed
 from payserai.db.index_attempt import mark_attempt_in_progress
 from payserai.db.index_attempt import mark_attempt_succeeded
 from payserai.db.index_attempt import update_docs_indexed
+from payserai.db.models import Connector
 from payserai.db.models import IndexAttempt
 from payserai.db.models import IndexingStatus
 from payserai.indexing.indexing_pipeline import build_indexing_pipeline
+from payserai.indexing.indexing_pipeline import build_pipelined_indexing_pipeline
 from payserai.utils.logger import IndexAttemptSingleton
 from payserai.utils.logger import setup_logger
 
@@ -80,6 +85,24 @@ def _get_document_generator(
     return doc_batch_generator
 
 
+def _checked_doc_batches(
+    doc_batch_generator: GenerateDocumentsOutput,
+    db_session: Session,
+    db_connector: Connector,
+) -> Iterator[list[Document]]:
+    for doc_batch in doc_batch_generator:
+        # check if connector is disabled mid run and stop if so
+        db_session.refresh(db_connector)
+        if db_connector.disabled:
+            # let the `except` block handle this
+            raise RuntimeError("Connector was disabled mid run")
+
+        logger.debug(
+            f"Indexing batch of documents: {[doc.to_short_descriptor() for doc in doc_batch]}"
+        )
+        yield doc_batch
+
+
 def _run_indexing(
     db_session: Session,
     index_attempt: IndexAttempt,
@@ -128,25 +151,39 @@ def _run_indexing(
             end_time=window_end,
         )
 
-        try:
-            for doc_batch in doc_batch_generator:
-                # check if connector is disabled mid run and stop if so
-                db_session.refresh(db_connector)
-                if db_connector.disabled:
-                    # let the `except` block handle this
-                    raise RuntimeError("Connector was disabled mid run")
-
-                logger.debug(
-                    f"Indexing batch of documents: {[doc.to_short_descriptor() for doc in doc_batch]}"
-                )
+        index_attempt_metadata = IndexAttemptMetadata(
+            connector_id=db_connector.id,
+            credential_id=db_credential.id,
+        )
 
-                new_docs, total_batch_chunks = indexing_pipeline(
-                    documents=doc_batch,
-                    index_attempt_metadata=IndexAttemptMetadata(
-                        connector_id=db_connector.id,
-                        credential_id=db_credential.id,
+        try:
+            batch_results: Iterator[tuple[list[Document], int, int]]
+            if INDEXING_PIPELINE_PARALLEL:
+                batch_results = build_pipelined_indexing_pipeline()(
+                    document_batches=_checked_doc_batches(
+                        doc_batch_generator=doc_batch_generator,
+                        db_session=db_session,
+                        db_connector=db_connector,
                     ),
+                    index_attempt_metadata=index_attempt_metadata,
                 )
+            else:
+                batch_results = (
+                    (
+                        doc_batch,
+                        *indexing_pipeline(
+                            documents=doc_batch,
+                            index_attempt_metadata=index_attempt_metadata,
+                        ),
+                    )
+                    for doc_batch in _checked_doc_batches(
+                        doc_batch_generator=doc_batch_generator,
+                        db_session=db_session,
+                        db_connector=db_connector,
+                    )
+                )
+
+            for doc_batch, new_docs, total_batch_chunks in batch_results:
                 net_doc_change += new_docs
                 chunk_count += total_batch_chunks
                 document_count += len(doc_batch)
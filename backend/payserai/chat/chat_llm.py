@@ -47,6 +47,7 @@ from payserai.server.models import RetrievalDocs
 from payserai.utils.logger import setup_logger
 from payserai.utils.text_processing import extract_embedded_json
 from payserai.utils.text_processing import has_unescaped_quote
+from payserai.utils.text_processing import StreamedSubstringFinder
 
 logger = setup_logger()
 
@@ -54,42 +55,49 @@ logger = setup_logger()
 LLM_CHAT_FAILURE_MSG = "The large-language-model failed to generate a valid response."
 
 
+_FINAL_ANSWER_ACTION = '"action":"finalanswer",'
+_ACTION_INPUT_START = '"actioninput":"'
+
+
 def _parse_embedded_json_streamed_response(
     tokens: Iterator[str],
 ) -> Iterator[payseraiAnswerPiece | payseraiChatModelOut]:
-    final_answer = False
-    just_start_stream = False
-    model_output = ""
-    hold = ""
-    finding_end = 0
+    final_answer_finder = StreamedSubstringFinder(
+        pattern=_FINAL_ANSWER_ACTION, normalize=lambda t: t.lower().replace(" ", "")
+    )
+    # The action input may come before the action so it is looked for from the start
+    action_input_finder = StreamedSubstringFinder(
+        pattern=_ACTION_INPUT_START,
+        normalize=lambda t: t.lower().replace(" ", "").replace("_", ""),
+    )
+    model_output_tokens: list[str] = []
+    streaming = False
+    finished_streaming = False
     for token in tokens:
-        model_output += token
-        hold += token
-
-        if (
-            final_answer is False
-            and '"action":"finalanswer",' in model_output.lower().replace(" ", "")
-        ):
-            final_answer = True
+        model_output_tokens.append(token)
+        if finished_streaming:
+            continue
 
-        if final_answer and '"actioninput":"' in model_output.lower().replace(
-            " ", ""
-        ).replace("_", ""):
-            if not just_start_stream:
-                just_start_stream = True
-                hold = ""
+        final_answer = final_answer_finder.feed(token)
+        found_action_input = action_input_finder.feed(token)
+        if not final_answer or not found_action_input:
+            continue
 
-            if has_unescaped_quote(hold):
-                finding_end += 1
-                hold = hold[: hold.find('"')]
+        if not streaming:
+            # Nothing of the token that completes the action input key is streamed
+            streaming = True
+            yield payseraiAnswerPiece(answer_piece="")
+            continue
 
-            if finding_end <= 1:
-                if finding_end == 1:
-                    finding_end += 1
+        if has_unescaped_quote(token):
+            # Closing quote of the action input, the answer is complete
+            finished_streaming = True
+            yield payseraiAnswerPiece(answer_piece=token[: token.find('"')])
+            continue
 
-                yield payseraiAnswerPiece(answer_piece=hold)
-                hold = ""
+        yield payseraiAnswerPiece(answer_piece=token)
 
+    model_output = "".join(model_output_tokens)
     model_final = extract_embedded_json(model_output)
     if "action" not in model_final or "action_input" not in model_final:
         raise ValueError("Model did not provide all required action values")
@@ -193,6 +201,21 @@ def _drop_messages_history_overflow(
     return prompt
 
 
+_CITATION_PAT = re.compile(r"\[(\d+)\]")  # [1], [2] etc
+
+
+def _find_open_citation(
+    text: str, text_offset: int, open_citation_ind: int | None
+) -> int | None:
+    """Index of the "[" which is only followed by digits until the end of the text (a possible
+    citation like "[" or "[1"), given the same for everything before the text. Only the chars
+    after the last non digit of the text need to be looked at."""
+    for ind in range(len(text) - 1, -1, -1):
+        if not text[ind].isdecimal():
+            return text_offset + ind if text[ind] == "[" else None
+    return open_citation_ind
+
+
 def extract_citations_from_stream(
     tokens: Iterator[str], links: list[str | None]
 ) -> Iterator[str]:
@@ -203,19 +226,37 @@ def extract_citations_from_stream(
     max_citation_num = len(links) + 1  # LLM is prompted to 1 index these
     curr_segment = ""
     prepend_bracket = False
+    # Start of the possible citation at the end of the current segment, also tracked for the
+    # segment without its last char since "$" matches before a trailing newline as well
+    open_citation_ind: int | None = None
+    open_citation_ind_before_last_char: int | None = None
     for token in tokens:
         # Special case of [1][ where ][ is a single token
         if prepend_bracket:
-            curr_segment += "[" + curr_segment
+            curr_segment = "["
+            open_citation_ind = 0
+            open_citation_ind_before_last_char = None
             prepend_bracket = False
 
+        # The segment held back so far contains no citation, a new one has to start at its
+        # open bracket or within the new token
+        search_start = (
+            open_citation_ind if open_citation_ind is not None else len(curr_segment)
+        )
+        if token:
+            open_citation_ind_before_last_char = _find_open_citation(
+                token[:-1], len(curr_segment), open_citation_ind
+            )
+            open_citation_ind = _find_open_citation(
+                token, len(curr_segment), open_citation_ind
+            )
         curr_segment += token
 
-        possible_citation_pattern = r"(\[\d*$)"  # [1, [, etc
-        possible_citation_found = re.search(possible_citation_pattern, curr_segment)
-
-        citation_pattern = r"\[(\d+)\]"  # [1], [2] etc
-        citation_found = re.search(citation_pattern, curr_segment)
+        possible_citation_found = open_citation_ind is not None or (
+            curr_segment.endswith("\n")
+            and open_citation_ind_before_last_char is not None
+        )
+        citation_found = _CITATION_PAT.search(curr_segment, search_start)
 
         if citation_found:
             numerical_value = int(citation_found.group(1))
@@ -226,7 +267,7 @@ def extract_citations_from_stream(
                     curr_segment = re.sub("]", f"]]({link})", curr_segment, count=1)
 
                 # In case there's another open bracket like [1][, don't want to match this
-            possible_citation_found = None
+            possible_citation_found = False
 
         # if we see "[", but haven't seen the right side, hold back - this may be a
         # citation that needs to be replaced with a link
@@ -240,6 +281,8 @@ def extract_citations_from_stream(
 
         yield curr_segment
         curr_segment = ""
+        open_citation_ind = None
+        open_citation_ind_before_last_char = None
 
     if curr_segment:
         if prepend_bracket:
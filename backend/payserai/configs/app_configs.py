@@ -170,6 +170,13 @@ ENABLE_MINI_CHUNK = os.environ.get("ENABLE_MINI_CHUNK", "").lower() == "true"
 # Slightly larger since the sentence aware split is a max cutoff so most minichunks will be under MINI_CHUNK_SIZE
 # tokens. But we need it to be at least as big as 1/4th chunk size to avoid having a tiny mini-chunk at the end
 MINI_CHUNK_SIZE = 150
+# Run the indexing stages (DB upsert, chunking, embedding, writing to the document index)
+# concurrently across consecutive document batches instead of one after another
+INDEXING_PIPELINE_PARALLEL = (
+    os.environ.get("INDEXING_PIPELINE_PARALLEL", "").lower() == "true"
+)
+# Max number of document batches waiting in front of each stage of the parallel pipeline
+INDEXING_PIPELINE_QUEUE_SIZE = int(os.environ.get("INDEXING_PIPELINE_QUEUE_SIZE") or 2)
 
 
 #####
@@ -202,9 +209,47 @@ FAVOR_RECENT_DECAY_MULTIPLIER = 2
 DISABLE_LLM_FILTER_EXTRACTION = (
     os.environ.get("DISABLE_LLM_FILTER_EXTRACTION", "").lower() == "true"
 )
+# Time and source filters are extracted from a single LLM call by default, set this to go
+# back to one call per filter
+DISABLE_COMBINED_QUERY_ANALYSIS = (
+    os.environ.get("DISABLE_COMBINED_QUERY_ANALYSIS", "").lower() == "true"
+)
+# Queries with no or only simple time expressions ("last week", "since March") get their time
+# filter from local rules, set this to always ask the LLM
+DISABLE_RULE_BASED_TIME_FILTER = (
+    os.environ.get("DISABLE_RULE_BASED_TIME_FILTER", "").lower() == "true"
+)
+# Queries that name their sources explicitly ("in Slack") or don't reference any source get
+# their source filter without an LLM, set this to always ask the LLM
+DISABLE_RULE_BASED_SOURCE_FILTER = (
+    os.environ.get("DISABLE_RULE_BASED_SOURCE_FILTER", "").lower() == "true"
+)
+# The streaming QA flow retrieves and scores candidates while the time and source filters are
+# still being extracted, then applies the filters to the candidates locally. Set this to wait
+# for the filters before retrieving
+DISABLE_SPECULATIVE_RETRIEVAL = (
+    os.environ.get("DISABLE_SPECULATIVE_RETRIEVAL", "").lower() == "true"
+)
+# Vespa is queried again with the filters if fewer candidates survive them. The candidates that
+# are reranked or judged by the LLM are always required
+SPECULATIVE_RETRIEVAL_MIN_CANDIDATES = int(
+    os.environ.get("SPECULATIVE_RETRIEVAL_MIN_CANDIDATES") or 20
+)
 DISABLE_LLM_CHUNK_FILTER = (
     os.environ.get("DISABLE_LLM_CHUNK_FILTER", "").lower() == "true"
 )
+# The LLM chunk filter judges groups of chunks in a single prompt, set this to go back to
+# one LLM call per chunk
+DISABLE_BATCHED_LLM_CHUNK_FILTER = (
+    os.environ.get("DISABLE_BATCHED_LLM_CHUNK_FILTER", "").lower() == "true"
+)
+# Limits per batched chunk filter prompt, a group is closed when either is reached
+LLM_CHUNK_FILTER_BATCH_MAX_TOKENS = int(
+    os.environ.get("LLM_CHUNK_FILTER_BATCH_MAX_TOKENS") or 2500
+)
+LLM_CHUNK_FILTER_BATCH_MAX_CHUNKS = int(
+    os.environ.get("LLM_CHUNK_FILTER_BATCH_MAX_CHUNKS") or 8
+)
 # 1 edit per 20 characters, currently unused due to fuzzy match being too slow
 QUOTE_ALLOWED_ERROR_PERCENT = 0.05
 QA_TIMEOUT = int(os.environ.get("QA_TIMEOUT") or "60")  # 60 seconds
@@ -222,6 +267,51 @@ HYBRID_ALPHA = max(0, min(1, float(os.environ.get("HYBRID_ALPHA") or 0.6)))
 # A list of languages passed to the LLM to rephase the query
 # For example "English,French,Spanish", be sure to use the "," separator
 MULTILINGUAL_QUERY_EXPANSION = os.environ.get("MULTILINGUAL_QUERY_EXPANSION") or None
+# How the results of the expanded queries are merged: "max" keeps each chunk's best score,
+# "rrf" uses reciprocal rank fusion and "weighted" a weighted sum of the scores.
+# "max" returns every retrieved chunk, the others only as many as a single retrieval returns
+MULTI_QUERY_FUSION_MODE = os.environ.get("MULTI_QUERY_FUSION_MODE") or "max"
+# Weight of the rephrasings relative to the original query, for "rrf" and "weighted" fusion
+MULTI_QUERY_REPHRASE_WEIGHT = float(
+    os.environ.get("MULTI_QUERY_REPHRASE_WEIGHT") or 1.0
+)
+# Popular queries are embedded once and reused, set the size to 0 to disable the cache
+QUERY_EMBEDDING_CACHE_SIZE = int(os.environ.get("QUERY_EMBEDDING_CACHE_SIZE") or 2048)
+QUERY_EMBEDDING_CACHE_TTL_SECONDS = int(
+    os.environ.get("QUERY_EMBEDDING_CACHE_TTL_SECONDS") or 60 * 60  # 1 hour
+)
+# Caches retrieval + rerank results for identical searches by users with the same access.
+# Entries are invalidated on any write to the document index, the TTL is only a backstop.
+# Set the size to 0 to disable the cache
+SEARCH_RESULT_CACHE_SIZE = int(os.environ.get("SEARCH_RESULT_CACHE_SIZE") or 512)
+SEARCH_RESULT_CACHE_TTL_SECONDS = int(
+    os.environ.get("SEARCH_RESULT_CACHE_TTL_SECONDS") or 10 * 60  # 10 minutes
+)
+# LLM verdicts on whether a chunk is useful for a query, shared across users since the verdict
+# only depends on the query and the chunk content. Set the size to 0 to disable the cache
+LLM_CHUNK_FILTER_CACHE_SIZE = int(os.environ.get("LLM_CHUNK_FILTER_CACHE_SIZE") or 8192)
+LLM_CHUNK_FILTER_CACHE_TTL_SECONDS = int(
+    os.environ.get("LLM_CHUNK_FILTER_CACHE_TTL_SECONDS") or 24 * 60 * 60  # 1 day
+)
+# Sources of the connectors, used for source filter extraction. Invalidated on any change to the
+# connectors, the TTL is only a backstop
+SOURCE_VOCABULARY_CACHE_TTL_SECONDS = int(
+    os.environ.get("SOURCE_VOCABULARY_CACHE_TTL_SECONDS") or 5 * 60  # 5 minutes
+)
+# LLM token counts of retrieved chunks, used to fit as many chunks as possible into the prompt
+CHUNK_TOKEN_COUNT_CACHE_SIZE = int(
+    os.environ.get("CHUNK_TOKEN_COUNT_CACHE_SIZE") or 16384
+)
+# Sizes of the process-wide thread pools used to parallelize work within a request.
+# These bound the total concurrency across all in-flight requests of an api server process
+SEARCH_THREAD_POOL_SIZE = int(os.environ.get("SEARCH_THREAD_POOL_SIZE") or 32)
+LLM_THREAD_POOL_SIZE = int(os.environ.get("LLM_THREAD_POOL_SIZE") or 64)
+IO_THREAD_POOL_SIZE = int(os.environ.get("IO_THREAD_POOL_SIZE") or 32)
+# The streaming QA endpoint runs on the event loop and only takes a pool worker for blocking
+# steps, set to true to go back to running the whole request in a worker thread
+DISABLE_ASYNC_QA_STREAM = (
+    os.environ.get("DISABLE_ASYNC_QA_STREAM", "").lower() == "true"
+)
 
 #####
 # Model Server Configs
@@ -231,6 +321,42 @@ MULTILINGUAL_QUERY_EXPANSION = os.environ.get("MULTILINGUAL_QUERY_EXPANSION") or
 MODEL_SERVER_HOST = os.environ.get("MODEL_SERVER_HOST") or None
 MODEL_SERVER_ALLOWED_HOST = os.environ.get("MODEL_SERVER_HOST") or "0.0.0.0"
 MODEL_SERVER_PORT = int(os.environ.get("MODEL_SERVER_PORT") or "9000")
+# The model server combines concurrent requests into a single forward pass. A batch is run
+# once it holds this many texts (or query/document pairs for reranking)...
+MODEL_SERVER_MAX_BATCH_SIZE = int(os.environ.get("MODEL_SERVER_MAX_BATCH_SIZE") or 64)
+# ...or once its oldest request has waited this long for other requests to join
+MODEL_SERVER_MAX_BATCH_WAIT_MS = float(
+    os.environ.get("MODEL_SERVER_MAX_BATCH_WAIT_MS") or 5
+)
+# Ask the model server for embeddings and rerank scores as raw float32 instead of JSON lists,
+# servers that predate the binary format keep answering with JSON
+DISABLE_MODEL_SERVER_BINARY_TRANSPORT = (
+    os.environ.get("DISABLE_MODEL_SERVER_BINARY_TRANSPORT", "").lower() == "true"
+)
+# Calls to the model server share a pool of keep-alive connections per host
+MODEL_SERVER_CONNECTION_POOL_SIZE = int(
+    os.environ.get("MODEL_SERVER_CONNECTION_POOL_SIZE") or 32
+)
+MODEL_SERVER_CONNECT_TIMEOUT_SECONDS = float(
+    os.environ.get("MODEL_SERVER_CONNECT_TIMEOUT_SECONDS") or 5
+)
+# Embedding large indexing batches on CPU can take a while
+MODEL_SERVER_READ_TIMEOUT_SECONDS = float(
+    os.environ.get("MODEL_SERVER_READ_TIMEOUT_SECONDS") or 120
+)
+# Connection errors, timeouts and 502/503/504 responses are retried with jittered backoff
+MODEL_SERVER_MAX_RETRIES = int(os.environ.get("MODEL_SERVER_MAX_RETRIES") or 2)
+MODEL_SERVER_RETRY_BACKOFF_SECONDS = float(
+    os.environ.get("MODEL_SERVER_RETRY_BACKOFF_SECONDS") or 0.5
+)
+# After this many consecutive failed calls to a host, further calls fail immediately until
+# the cooldown has passed, after which a single trial call decides whether to close it again
+MODEL_SERVER_CIRCUIT_BREAKER_THRESHOLD = int(
+    os.environ.get("MODEL_SERVER_CIRCUIT_BREAKER_THRESHOLD") or 5
+)
+MODEL_SERVER_CIRCUIT_BREAKER_COOLDOWN_SECONDS = float(
+    os.environ.get("MODEL_SERVER_CIRCUIT_BREAKER_COOLDOWN_SECONDS") or 30
+)
 
 EMBEDDING_MODEL_SERVER_HOST = (
     os.environ.get("EMBEDDING_MODEL_SERVER_HOST") or MODEL_SERVER_HOST
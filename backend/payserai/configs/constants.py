@@ -22,6 +22,10 @@ MATCH_HIGHLIGHTS = "match_highlights"
 # are still useful as a search result but not for QA.
 IGNORE_FOR_QA = "ignore_for_qa"
 GEN_AI_API_KEY_STORAGE_KEY = "genai_api_key"
+# Bumped on every write to the document index, used to invalidate search caches
+DOCUMENT_INDEX_GENERATION_KEY = "document_index_generation"
+# Bumped on every write to the connector table, used to invalidate the cached source list
+CONNECTOR_GENERATION_KEY = "connector_generation"
 PUBLIC_DOC_PAT = "PUBLIC"
 PUBLIC_DOCUMENT_SET = "__PUBLIC"
 QUOTE = "quote"
@@ -31,6 +35,7 @@ PRIMARY_OWNERS = "primary_owners"
 SECONDARY_OWNERS = "secondary_owners"
 RECENCY_BIAS = "recency_bias"
 HIDDEN = "hidden"
+CONTENT_HASH = "content_hash"
 SCORE = "score"
 ID_SEPARATOR = ":;:"
 DEFAULT_BOOST = 0
@@ -1,3 +1,5 @@
+import hashlib
+import json
 from datetime import datetime
 from enum import Enum
 from typing import Any
@@ -58,6 +60,15 @@ class Document(DocumentBase):
         """Used when logging the identity of a document"""
         return f"ID: '{self.id}'; Semantic ID: '{self.semantic_identifier}'"
 
+    def get_content_hash(self) -> str:
+        """Hash of everything about the document that is indexed. The updated time is left out
+        since some connectors report the time the document was fetched rather than edited
+        """
+        content = json.dumps(
+            self.dict(exclude={"doc_updated_at"}), sort_keys=True, default=str
+        )
+        return hashlib.sha256(content.encode()).hexdigest()
+
     @classmethod
     def from_base(cls, base: DocumentBase) -> "Document":
         return cls(
@@ -1,3 +1,4 @@
+import time
 from typing import cast
 
 from fastapi import HTTPException
@@ -7,17 +8,50 @@ from sqlalchemy import select
 from sqlalchemy.orm import aliased
 from sqlalchemy.orm import Session
 
+from payserai.configs.app_configs import SOURCE_VOCABULARY_CACHE_TTL_SECONDS
+from payserai.configs.constants import CONNECTOR_GENERATION_KEY
 from payserai.configs.constants import DocumentSource
 from payserai.connectors.models import InputType
 from payserai.db.models import Connector
 from payserai.db.models import IndexAttempt
+from payserai.dynamic_configs import get_dynamic_config_store
+from payserai.dynamic_configs.interface import ConfigNotFoundError
 from payserai.server.models import ConnectorBase
 from payserai.server.models import ObjectCreationIdResponse
 from payserai.server.models import StatusResponse
+from payserai.utils.cache import LRUTTLCache
 from payserai.utils.logger import setup_logger
 
 logger = setup_logger()
 
+# Keyed by the connector generation, so only ever holds the latest value
+_UNIQUE_SOURCES_CACHE: LRUTTLCache[int, list[DocumentSource]] = LRUTTLCache(
+    max_size=1, ttl_seconds=SOURCE_VOCABULARY_CACHE_TTL_SECONDS
+)
+
+
+def get_connector_generation() -> int:
+    """Stored in the dynamic config store so that changes from the background processes
+    (such as connector deletion) are visible to the api server"""
+    try:
+        return cast(int, get_dynamic_config_store().load(CONNECTOR_GENERATION_KEY))
+    except ConfigNotFoundError:
+        return 0
+
+
+def bump_connector_generation() -> None:
+    """Must be called after any change to the connectors, see bump_document_index_generation
+    for why the current time is used as a floor"""
+    _UNIQUE_SOURCES_CACHE.clear()
+    try:
+        get_dynamic_config_store().store(
+            CONNECTOR_GENERATION_KEY,
+            max(get_connector_generation() + 1, time.time_ns()),
+        )
+    except Exception as e:
+        # Only affects the freshness of the cached sources, the TTL still applies
+        logger.error(f"Failed to bump connector generation: {e}")
+
 
 def fetch_connectors(
     db_session: Session,
@@ -82,6 +116,7 @@ def create_connector(
     )
     db_session.add(connector)
     db_session.commit()
+    bump_connector_generation()
 
     return ObjectCreationIdResponse(id=connector.id)
 
@@ -110,6 +145,7 @@ def update_connector(
     connector.disabled = connector_data.disabled
 
     db_session.commit()
+    bump_connector_generation()
     return connector
 
 
@@ -123,6 +159,7 @@ def disable_connector(
 
     connector.disabled = True
     db_session.commit()
+    bump_connector_generation()
     return StatusResponse(
         success=True, message="Connector deleted successfully", data=connector_id
     )
@@ -140,6 +177,7 @@ def delete_connector(
             success=True, message="Connector was already deleted", data=connector_id
         )
 
+    # The caller commits, bump_connector_generation must be called after that
     db_session.delete(connector)
     return StatusResponse(
         success=True, message="Connector deleted successfully", data=connector_id
@@ -225,6 +263,16 @@ def fetch_unique_document_sources(db_session: Session) -> list[DocumentSource]:
     return sources
 
 
+def fetch_unique_document_sources_cached(db_session: Session) -> list[DocumentSource]:
+    """Same as fetch_unique_document_sources but skips the query unless the connectors
+    changed, used on the question hot path"""
+    sources = _UNIQUE_SOURCES_CACHE.get_or_compute(
+        get_connector_generation(), lambda: fetch_unique_document_sources(db_session)
+    )
+    # Callers must not be able to modify the cached value
+    return list(sources)
+
+
 def create_initial_default_connector(db_session: Session) -> None:
     default_connector_id = 0
     default_connector = fetch_connector_by_id(default_connector_id, db_session)
@@ -252,3 +300,4 @@ def create_initial_default_connector(db_session: Session) -> None:
     )
     db_session.add(connector)
     db_session.commit()
+    bump_connector_generation()
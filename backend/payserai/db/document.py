@@ -40,6 +40,20 @@ def get_documents_for_connector_credential_pair(
     return db_session.scalars(stmt).all()
 
 
+def get_document_ids_for_connector_credential_pair(
+    db_session: Session, document_ids: list[str], connector_id: int, credential_id: int
+) -> set[str]:
+    """Returns which of the documents are already linked to the connector / credential pair"""
+    stmt = select(DocumentByConnectorCredentialPair.id).where(
+        and_(
+            DocumentByConnectorCredentialPair.id.in_(document_ids),
+            DocumentByConnectorCredentialPair.connector_id == connector_id,
+            DocumentByConnectorCredentialPair.credential_id == credential_id,
+        )
+    )
+    return set(db_session.scalars(stmt).all())
+
+
 def get_documents_by_ids(
     document_ids: list[str],
     db_session: Session,
@@ -230,6 +244,21 @@ def update_docs_updated_at(
     db_session.commit()
 
 
+def update_docs_content_hash(
+    ids_to_content_hash: dict[str, str],
+    db_session: Session,
+) -> None:
+    doc_ids = list(ids_to_content_hash.keys())
+    documents_to_update = (
+        db_session.query(DbDocument).filter(DbDocument.id.in_(doc_ids)).all()
+    )
+
+    for document in documents_to_update:
+        document.content_hash = ids_to_content_hash[document.id]
+
+    db_session.commit()
+
+
 def upsert_documents_complete(
     db_session: Session,
     document_metadata_batch: list[DocumentMetadata],
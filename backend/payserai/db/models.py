@@ -414,6 +414,9 @@ class Document(Base):
     doc_updated_at: Mapped[datetime.datetime | None] = mapped_column(
         DateTime(timezone=True), nullable=True
     )
+    # Hash of the content of the last successfully indexed version of the doc, used to
+    # skip reindexing docs whose content did not change even if their updated time did
+    content_hash: Mapped[str | None] = mapped_column(String, nullable=True)
     # The following are not attached to User because the account/email may not be known
     # within payserai
     # Something like the document creator
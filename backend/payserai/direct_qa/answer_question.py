@@ -1,3 +1,5 @@
+import asyncio
+from collections.abc import AsyncIterator
 from collections.abc import Callable
 from collections.abc import Iterator
 from functools import partial
@@ -6,6 +8,7 @@ from typing import cast
 from sqlalchemy.orm import Session
 
 from payserai.configs.app_configs import DISABLE_GENERATIVE_AI
+from payserai.configs.app_configs import DISABLE_SPECULATIVE_RETRIEVAL
 from payserai.configs.app_configs import QA_TIMEOUT
 from payserai.configs.constants import QUERY_EVENT_ID
 from payserai.db.feedback import update_query_event_llm_answer
@@ -17,16 +20,23 @@ from payserai.direct_qa.models import LLMMetricsContainer
 from payserai.direct_qa.qa_utils import get_chunks_for_qa
 from payserai.document_index.factory import get_default_document_index
 from payserai.indexing.models import InferenceChunk
+from payserai.search.access_filters import build_access_filters_for_user
+from payserai.search.payserai_helper import async_query_intent
 from payserai.search.payserai_helper import query_intent
 from payserai.search.models import QueryFlow
 from payserai.search.models import RerankMetricsContainer
 from payserai.search.models import RetrievalMetricsContainer
+from payserai.search.search_runner import async_payserai_search_generator
+from payserai.search.search_runner import async_prefetch_query_embedding
+from payserai.search.search_runner import async_retrieve_speculative_candidates
 from payserai.search.search_runner import chunks_to_search_docs
 from payserai.search.search_runner import payserai_search
 from payserai.search.search_runner import payserai_search_generator
+from payserai.search.search_runner import prefetch_query_embedding
+from payserai.search.search_runner import retrieve_speculative_candidates
+from payserai.search.speculative_retrieval import SpeculativeRetrieval
 from payserai.secondary_llm_flows.answer_validation import get_answer_validity
-from payserai.secondary_llm_flows.source_filter import extract_question_source_filters
-from payserai.secondary_llm_flows.time_filter import extract_question_time_filters
+from payserai.secondary_llm_flows.query_analysis import extract_question_filters
 from payserai.server.models import LLMRelevanceFilterResponse
 from payserai.server.models import QADocsResponse
 from payserai.server.models import QAResponse
@@ -34,7 +44,11 @@ from payserai.server.models import QuestionRequest
 from payserai.server.utils import get_json_line
 from payserai.utils.logger import setup_logger
 from payserai.utils.threadpool_concurrency import FunctionCall
+from payserai.utils.threadpool_concurrency import get_thread_pool
 from payserai.utils.threadpool_concurrency import run_functions_in_parallel
+from payserai.utils.threadpool_concurrency import run_in_pool_async
+from payserai.utils.threadpool_concurrency import ThreadPoolName
+from payserai.utils.timing import log_async_generator_function_time
 from payserai.utils.timing import log_function_time
 from payserai.utils.timing import log_generator_function_time
 
@@ -59,22 +73,18 @@ def answer_qa_query(
     offset_count = question.offset if question.offset is not None else 0
     logger.info(f"Received QA query: {query}")
 
-    run_time_filters = FunctionCall(extract_question_time_filters, (question,), {})
-    run_source_filters = FunctionCall(
-        extract_question_source_filters, (question, db_session), {}
-    )
+    run_filters = FunctionCall(extract_question_filters, (question, db_session), {})
     run_query_intent = FunctionCall(query_intent, (query,), {})
 
     parallel_results = run_functions_in_parallel(
         [
-            run_time_filters,
-            run_source_filters,
+            run_filters,
             run_query_intent,
-        ]
+        ],
+        pool=ThreadPoolName.LLM,
     )
 
-    time_cutoff, favor_recent = parallel_results[run_time_filters.result_id]
-    source_filters = parallel_results[run_source_filters.result_id]
+    time_cutoff, favor_recent, source_filters = parallel_results[run_filters.result_id]
     predicted_search, predicted_flow = parallel_results[run_query_intent.result_id]
 
     # Set flow as search so frontend doesn't ask the user if they want to run QA over more docs
@@ -178,6 +188,7 @@ def answer_qa_query_stream(
     user: User | None,
     db_session: Session,
     disable_generative_answer: bool = DISABLE_GENERATIVE_AI,
+    disable_speculative_retrieval: bool = DISABLE_SPECULATIVE_RETRIEVAL,
 ) -> Iterator[str]:
     logger.debug(
         f"Received QA query ({question.search_type.value} search): {question.query}"
@@ -188,22 +199,35 @@ def answer_qa_query_stream(
     query = question.query
     offset_count = question.offset if question.offset is not None else 0
 
-    run_time_filters = FunctionCall(extract_question_time_filters, (question,), {})
-    run_source_filters = FunctionCall(
-        extract_question_source_filters, (question, db_session), {}
-    )
+    document_index = get_default_document_index()
+    run_filters = FunctionCall(extract_question_filters, (question, db_session), {})
     run_query_intent = FunctionCall(query_intent, (query,), {})
 
-    parallel_results = run_functions_in_parallel(
-        [
-            run_time_filters,
-            run_source_filters,
-            run_query_intent,
-        ]
-    )
+    # Candidates are retrieved with the filters the question came with while the rest of the
+    # filters are extracted, the search then only filters them locally. The session is not
+    # shared with the filter extraction thread, so the ACL is fetched first. The retrieval
+    # runs on the IO pool apart from the LLM calls, on an LLM worker its query rephrasings
+    # would run one after the other
+    io_pool = get_thread_pool(ThreadPoolName.IO)
+    if not disable_speculative_retrieval:
+        user_acl_filters = build_access_filters_for_user(user, db_session)
+        retrieval_future = io_pool.submit(
+            retrieve_speculative_candidates, question, user_acl_filters, document_index
+        )
+    else:
+        # The speculative retrieval embeds the query, otherwise it is embedded up front
+        retrieval_future = io_pool.submit(prefetch_query_embedding, question)
+
+    try:
+        parallel_results = run_functions_in_parallel(
+            [run_filters, run_query_intent], pool=ThreadPoolName.LLM
+        )
+        # The embedding prefetch returns None as well
+        speculative_retrieval: SpeculativeRetrieval | None = retrieval_future.result()
+    finally:
+        retrieval_future.cancel()
 
-    time_cutoff, favor_recent = parallel_results[run_time_filters.result_id]
-    source_filters = parallel_results[run_source_filters.result_id]
+    time_cutoff, favor_recent, source_filters = parallel_results[run_filters.result_id]
     predicted_search, predicted_flow = parallel_results[run_query_intent.result_id]
 
     # Modifies the question object but nothing upstream uses it
@@ -215,7 +239,8 @@ def answer_qa_query_stream(
         question=question,
         user=user,
         db_session=db_session,
-        document_index=get_default_document_index(),
+        document_index=document_index,
+        speculative_retrieval=speculative_retrieval,
     )
 
     # first fetch and return to the UI the top chunks so the user can
@@ -301,3 +326,167 @@ def answer_qa_query_stream(
     )
 
     yield get_json_line({QUERY_EVENT_ID: query_event_id})
+
+
+@log_async_generator_function_time()
+async def async_answer_qa_query_stream(
+    question: QuestionRequest,
+    user: User | None,
+    db_session: Session,
+    disable_generative_answer: bool = DISABLE_GENERATIVE_AI,
+    disable_speculative_retrieval: bool = DISABLE_SPECULATIVE_RETRIEVAL,
+) -> AsyncIterator[str]:
+    """Asyncio version of `answer_qa_query_stream`, streams the same packets. A pool worker
+    is only taken for the blocking steps, waiting on Vespa, the model server and the answer
+    tokens does not hold a thread."""
+    logger.debug(
+        f"Received QA query ({question.search_type.value} search): {question.query}"
+    )
+    logger.debug(f"Query filters: {question.filters}")
+
+    answer_so_far: str = ""
+    query = question.query
+    offset_count = question.offset if question.offset is not None else 0
+
+    document_index = get_default_document_index()
+    # See answer_qa_query_stream for the speculative retrieval and embedding prefetch
+    speculative_retrieval_task: asyncio.Task[SpeculativeRetrieval | None] | None = None
+    prefetch_embedding_task: asyncio.Task[None] | None = None
+    if not disable_speculative_retrieval:
+        user_acl_filters = await run_in_pool_async(
+            build_access_filters_for_user, user, db_session
+        )
+        speculative_retrieval_task = asyncio.create_task(
+            async_retrieve_speculative_candidates(
+                question, user_acl_filters, document_index
+            )
+        )
+    else:
+        prefetch_embedding_task = asyncio.create_task(
+            async_prefetch_query_embedding(question)
+        )
+
+    # The filter extraction fans out on the IO pool internally, it is run from the LLM pool
+    # like in the sync flow so that its calls are not run inline one after the other
+    try:
+        (time_cutoff, favor_recent, source_filters), (
+            predicted_search,
+            predicted_flow,
+        ) = await asyncio.gather(
+            run_in_pool_async(
+                extract_question_filters, question, db_session, pool=ThreadPoolName.LLM
+            ),
+            async_query_intent(query),
+        )
+        speculative_retrieval = (
+            await speculative_retrieval_task
+            if speculative_retrieval_task is not None
+            else None
+        )
+        if prefetch_embedding_task is not None:
+            await prefetch_embedding_task
+    finally:
+        if speculative_retrieval_task is not None:
+            speculative_retrieval_task.cancel()
+        if prefetch_embedding_task is not None:
+            prefetch_embedding_task.cancel()
+
+    # Modifies the question object but nothing upstream uses it
+    question.filters.time_cutoff = time_cutoff
+    question.favor_recent = favor_recent
+    question.filters.source_type = source_filters
+
+    search_generator = async_payserai_search_generator(
+        question=question,
+        user=user,
+        db_session=db_session,
+        document_index=document_index,
+        speculative_retrieval=speculative_retrieval,
+    )
+
+    # first fetch and return to the UI the top chunks so the user can
+    # immediately see some results
+    top_chunks = cast(list[InferenceChunk], await anext(search_generator))
+    top_docs = chunks_to_search_docs(top_chunks)
+    initial_response = QADocsResponse(
+        top_documents=top_docs,
+        # if generative AI is disabled, set flow as search so frontend
+        # doesn't ask the user if they want to run QA over more documents
+        predicted_flow=QueryFlow.SEARCH
+        if disable_generative_answer
+        else predicted_flow,
+        predicted_search=predicted_search,
+        time_cutoff=time_cutoff,
+        favor_recent=favor_recent,
+    ).dict()
+    yield get_json_line(initial_response)
+
+    if not top_chunks:
+        logger.debug("No Documents Found")
+        await search_generator.aclose()
+        return
+
+    # next apply the LLM filtering
+    llm_chunk_selection = cast(list[bool], await anext(search_generator))
+    llm_chunks_indices = get_chunks_for_qa(
+        chunks=top_chunks,
+        llm_chunk_selection=llm_chunk_selection,
+        batch_offset=offset_count,
+    )
+    llm_relevance_filtering_response = LLMRelevanceFilterResponse(
+        relevant_chunk_indices=[
+            index for index, value in enumerate(llm_chunk_selection) if value
+        ]
+    ).dict()
+    yield get_json_line(llm_relevance_filtering_response)
+
+    # finally get the query ID from the search generator for updating the
+    # row in Postgres
+    query_event_id = cast(int, await anext(search_generator))
+
+    if disable_generative_answer:
+        logger.debug("Skipping QA because generative AI is disabled")
+        return
+
+    try:
+        qa_model = get_default_qa_model()
+    except Exception as e:
+        logger.exception("Unable to get QA model")
+        error = StreamingError(error=str(e))
+        yield get_json_line(error.dict())
+        return
+
+    llm_chunks = [top_chunks[i] for i in llm_chunks_indices]
+    logger.debug(
+        f"Chunks fed to LLM: {[chunk.semantic_identifier for chunk in llm_chunks]}"
+    )
+
+    try:
+        async for response_packet in qa_model.answer_question_astream(
+            query, llm_chunks
+        ):
+            if response_packet is None:
+                continue
+            if (
+                isinstance(response_packet, payseraiAnswerPiece)
+                and response_packet.answer_piece
+            ):
+                answer_so_far = answer_so_far + response_packet.answer_piece
+            logger.debug(f"Sending packet: {response_packet}")
+            yield get_json_line(response_packet.dict())
+    except Exception:
+        # exception is logged in the answer_question method, no need to re-log
+        logger.exception("Failed to run QA")
+        error = StreamingError(error="The LLM failed to produce a useable response")
+        yield get_json_line(error.dict())
+
+    # update query event created by the search with the LLM answer
+    await run_in_pool_async(
+        update_query_event_llm_answer,
+        db_session=db_session,
+        llm_answer=answer_so_far,
+        query_id=query_event_id,
+        user_id=None if user is None else user.id,
+    )
+
+    yield get_json_line({QUERY_EVENT_ID: query_event_id})
@@ -1,4 +1,5 @@
 import abc
+from collections.abc import AsyncIterator
 from collections.abc import Callable
 from collections.abc import Iterator
 
@@ -6,6 +7,8 @@ from pydantic import BaseModel
 
 from payserai.direct_qa.models import LLMMetricsContainer
 from payserai.indexing.models import InferenceChunk
+from payserai.utils.threadpool_concurrency import iterate_in_pool_async
+from payserai.utils.threadpool_concurrency import ThreadPoolName
 
 
 class StreamingError(BaseModel):
@@ -45,6 +48,7 @@ class payseraiQuotes(BaseModel):
 # Final int is for number of output tokens
 AnswerQuestionReturn = tuple[payseraiAnswer, payseraiQuotes]
 AnswerQuestionStreamReturn = Iterator[payseraiAnswerPiece | payseraiQuotes]
+AnswerQuestionAsyncStreamReturn = AsyncIterator[payseraiAnswerPiece | payseraiQuotes]
 
 
 class QAModel:
@@ -74,3 +78,14 @@ class QAModel:
         context_docs: list[InferenceChunk],
     ) -> AnswerQuestionStreamReturn:
         raise NotImplementedError
+
+    async def answer_question_astream(
+        self,
+        query: str,
+        context_docs: list[InferenceChunk],
+    ) -> AnswerQuestionAsyncStreamReturn:
+        """Models without an asyncio client are streamed from the LLM thread pool"""
+        async for item in iterate_in_pool_async(
+            self.answer_question_stream(query, context_docs), pool=ThreadPoolName.LLM
+        ):
+            yield item
@@ -1,5 +1,6 @@
 import abc
 import re
+from collections.abc import AsyncIterator
 from collections.abc import Callable
 from collections.abc import Iterator
 
@@ -7,12 +8,14 @@ from langchain.schema.messages import BaseMessage
 from langchain.schema.messages import HumanMessage
 
 from payserai.configs.app_configs import MULTILINGUAL_QUERY_EXPANSION
+from payserai.direct_qa.interfaces import AnswerQuestionAsyncStreamReturn
 from payserai.direct_qa.interfaces import AnswerQuestionReturn
 from payserai.direct_qa.interfaces import AnswerQuestionStreamReturn
 from payserai.direct_qa.interfaces import payseraiAnswer
 from payserai.direct_qa.interfaces import payseraiQuotes
 from payserai.direct_qa.interfaces import QAModel
 from payserai.direct_qa.models import LLMMetricsContainer
+from payserai.direct_qa.qa_utils import async_process_model_tokens
 from payserai.direct_qa.qa_utils import process_answer
 from payserai.direct_qa.qa_utils import process_model_tokens
 from payserai.indexing.models import InferenceChunk
@@ -64,6 +67,16 @@ class QAHandler(abc.ABC):
             is_json_prompt=self.is_json_output,
         )
 
+    async def async_process_llm_token_stream(
+        self, tokens: AsyncIterator[str], context_chunks: list[InferenceChunk]
+    ) -> AnswerQuestionAsyncStreamReturn:
+        async for item in async_process_model_tokens(
+            tokens=tokens,
+            context_docs=context_chunks,
+            is_json_prompt=self.is_json_output,
+        ):
+            yield item
+
 
 # Maps connector enum string to a more natural language representation for the LLM
 # If not on the list, uses the original but slightly cleaned up, see below
@@ -189,6 +202,15 @@ class SingleMessageScratchpadHandler(QAHandler):
             "This Scratchpad approach is not suitable for real time uses like streaming"
         )
 
+    async def async_process_llm_token_stream(
+        self, tokens: AsyncIterator[str], context_chunks: list[InferenceChunk]
+    ) -> AnswerQuestionAsyncStreamReturn:
+        raise ValueError(
+            "This Scratchpad approach is not suitable for real time uses like streaming"
+        )
+        # Unreachable, makes this an async generator like the base implementation
+        yield
+
 
 class QABlock(QAModel):
     def __init__(self, llm: LLM, qa_handler: QAHandler) -> None:
@@ -249,3 +271,16 @@ class QABlock(QAModel):
         yield from self._qa_handler.process_llm_token_stream(
             tokens, trimmed_context_docs
         )
+
+    async def answer_question_astream(
+        self,
+        query: str,
+        context_docs: list[InferenceChunk],
+    ) -> AnswerQuestionAsyncStreamReturn:
+        trimmed_context_docs = tokenizer_trim_chunks(context_docs)
+        prompt = self._qa_handler.build_prompt(query, trimmed_context_docs)
+        tokens = self._llm.astream(prompt)
+        async for item in self._qa_handler.async_process_llm_token_stream(
+            tokens, trimmed_context_docs
+        ):
+            yield item
@@ -1,7 +1,12 @@
+import bisect
 import math
 import re
+from collections.abc import AsyncGenerator
+from collections.abc import AsyncIterator
 from collections.abc import Generator
 from collections.abc import Iterator
+from enum import Enum
+from itertools import accumulate
 from json.decoder import JSONDecodeError
 from typing import Optional
 from typing import Tuple
@@ -16,7 +21,7 @@ from payserai.direct_qa.interfaces import payseraiAnswerPiece
 from payserai.direct_qa.interfaces import payseraiQuote
 from payserai.direct_qa.interfaces import payseraiQuotes
 from payserai.indexing.models import InferenceChunk
-from payserai.llm.utils import check_number_of_tokens
+from payserai.llm.utils import get_chunk_token_counts
 from payserai.prompts.constants import ANSWER_PAT
 from payserai.prompts.constants import QUOTE_PAT
 from payserai.prompts.constants import UNCERTAINTY_PAT
@@ -25,6 +30,9 @@ from payserai.utils.text_processing import clean_model_quote
 from payserai.utils.text_processing import clean_up_code_blocks
 from payserai.utils.text_processing import extract_embedded_json
 from payserai.utils.text_processing import shared_precompare_cleanup
+from payserai.utils.text_processing import StreamedSubstringFinder
+from payserai.utils.threadpool_concurrency import run_in_pool_async
+from payserai.utils.threadpool_concurrency import ThreadPoolName
 
 logger = setup_logger()
 
@@ -98,63 +106,169 @@ def separate_answer_quotes(
     return _extract_answer_quotes_freeform(clean_up_code_blocks(answer_raw))
 
 
-def match_quotes_to_docs(
-    quotes: list[str],
-    chunks: list[InferenceChunk],
-    max_error_percent: float = QUOTE_ALLOWED_ERROR_PERCENT,
-    fuzzy_search: bool = False,
-    prefix_only_length: int = 100,
-) -> payseraiQuotes:
-    payserai_quotes: list[payseraiQuote] = []
-    for quote in quotes:
-        max_edits = math.ceil(float(len(quote)) * max_error_percent)
+# Upper bound on the time spent fuzzy matching a single quote against a single chunk
+_FUZZY_QUOTE_MATCH_TIMEOUT_SECONDS = 0.05
+# Past this many candidate positions in a chunk, the whole chunk is fuzzy searched instead
+_MAX_FUZZY_QUOTE_MATCH_WINDOWS = 32
+# Cleaned chunk texts never contain whitespace, so quotes can't match across chunks
+_CHUNK_SEPARATOR = "\n"
 
-        for chunk in chunks:
-            if not chunk.source_links:
-                continue
 
-            quote_clean = shared_precompare_cleanup(
-                clean_model_quote(quote, trim_length=prefix_only_length)
-            )
-            chunk_clean = shared_precompare_cleanup(chunk.content)
+class QuoteMatcher:
+    """Finds the chunk, and the link within it, that each quote of an answer came from.
+
+    The chunk contents are cleaned up once when the matcher is built and concatenated into one
+    text so that every quote is looked up exactly with a single substring search. Only quotes
+    without an exact match go on to the fuzzy search (if enabled), which only looks at the
+    parts of chunks around exact occurrences of pieces of the quote.
+    """
 
-            # Finding the offset of the quote in the plain text
-            if fuzzy_search:
-                re_search_str = (
-                    r"(" + re.escape(quote_clean) + r"){e<=" + str(max_edits) + r"}"
+    def __init__(
+        self,
+        chunks: list[InferenceChunk],
+        max_error_percent: float = QUOTE_ALLOWED_ERROR_PERCENT,
+        fuzzy_search: bool = False,
+        prefix_only_length: int = 100,
+    ) -> None:
+        self.max_error_percent = max_error_percent
+        self.fuzzy_search = fuzzy_search
+        self.prefix_only_length = prefix_only_length
+
+        # Chunks without links can't be cited
+        self._chunks = [chunk for chunk in chunks if chunk.source_links]
+        self._chunk_texts = [
+            shared_precompare_cleanup(chunk.content) for chunk in self._chunks
+        ]
+        self._chunk_starts: list[int] = []
+        text_start = 0
+        for chunk_text in self._chunk_texts:
+            self._chunk_starts.append(text_start)
+            text_start += len(chunk_text) + len(_CHUNK_SEPARATOR)
+        self._all_chunks_text = _CHUNK_SEPARATOR.join(self._chunk_texts)
+
+    def _find_exact(self, quote_clean: str) -> tuple[int, int] | None:
+        found_at = self._all_chunks_text.find(quote_clean)
+        if found_at == -1:
+            return None
+        chunk_ind = bisect.bisect_right(self._chunk_starts, found_at) - 1
+        return chunk_ind, found_at - self._chunk_starts[chunk_ind]
+
+    @staticmethod
+    def _get_fuzzy_match_windows(
+        quote_clean: str, chunk_text: str, max_edits: int
+    ) -> list[tuple[int, int]] | None:
+        """With at most max_edits edits, at least one of max_edits + 1 pieces of the quote is
+        found unchanged in the chunk, and the match can only start within max_edits of where
+        that piece places the quote. Returns the (start, end) windows of the chunk that could
+        contain a match, or None if there are too many to be worth it."""
+        piece_len = len(quote_clean) // (max_edits + 1)
+        if not piece_len:
+            return None
+
+        windows: list[tuple[int, int]] = []
+        for piece_ind in range(max_edits + 1):
+            piece_start = piece_ind * piece_len
+            piece = quote_clean[piece_start : piece_start + piece_len]
+            found_at = chunk_text.find(piece)
+            while found_at != -1:
+                if len(windows) >= _MAX_FUZZY_QUOTE_MATCH_WINDOWS:
+                    return None
+                quote_start = found_at - piece_start
+                windows.append(
+                    (
+                        max(0, quote_start - max_edits),
+                        quote_start + len(quote_clean) + max_edits,
+                    )
                 )
-                found = regex.search(re_search_str, chunk_clean)
-                if not found:
+                found_at = chunk_text.find(piece, found_at + 1)
+        return windows
+
+    def _find_fuzzy(self, quote_clean: str, max_edits: int) -> tuple[int, int] | None:
+        fuzzy_pattern = regex.compile(
+            r"(" + re.escape(quote_clean) + r"){e<=" + str(max_edits) + r"}"
+        )
+
+        for chunk_ind, chunk_text in enumerate(self._chunk_texts):
+            windows = self._get_fuzzy_match_windows(quote_clean, chunk_text, max_edits)
+            if windows is None:
+                windows = [(0, len(chunk_text))]
+
+            match_starts = []
+            for window_start, window_end in windows:
+                try:
+                    found = fuzzy_pattern.search(
+                        chunk_text,
+                        window_start,
+                        window_end,
+                        timeout=_FUZZY_QUOTE_MATCH_TIMEOUT_SECONDS,
+                    )
+                except TimeoutError:
+                    logger.debug(f"Fuzzy quote match timed out for: {quote_clean}")
                     continue
-                offset = found.span()[0]
+                if found:
+                    match_starts.append(found.span()[0])
+
+            if match_starts:
+                return chunk_ind, min(match_starts)
+        return None
+
+    def match_quote(self, quote: str) -> payseraiQuote | None:
+        if not self._chunks:
+            return None
+
+        quote_clean = shared_precompare_cleanup(
+            clean_model_quote(quote, trim_length=self.prefix_only_length)
+        )
+        match = self._find_exact(quote_clean)
+        if match is None and self.fuzzy_search:
+            max_edits = math.ceil(float(len(quote)) * self.max_error_percent)
+            match = self._find_fuzzy(quote_clean, max_edits)
+        if match is None:
+            return None
+
+        # Link offsets are in terms of the cleaned up chunk content, same as the match
+        chunk_ind, offset = match
+        chunk = self._chunks[chunk_ind]
+
+        # Extracting the link from the offset
+        curr_link = None
+        for link_offset, link in chunk.source_links.items():  # type: ignore
+            # Should always find one because offset is at least 0 and there
+            # must be a 0 link_offset
+            if int(link_offset) <= offset:
+                curr_link = link
             else:
-                if quote_clean not in chunk_clean:
-                    continue
-                offset = chunk_clean.index(quote_clean)
-
-            # Extracting the link from the offset
-            curr_link = None
-            for link_offset, link in chunk.source_links.items():
-                # Should always find one because offset is at least 0 and there
-                # must be a 0 link_offset
-                if int(link_offset) <= offset:
-                    curr_link = link
-                else:
-                    break
-
-            payserai_quotes.append(
-                payseraiQuote(
-                    quote=quote,
-                    document_id=chunk.document_id,
-                    link=curr_link,
-                    source_type=chunk.source_type,
-                    semantic_identifier=chunk.semantic_identifier,
-                    blurb=chunk.blurb,
-                )
-            )
-            break
+                break
+
+        return payseraiQuote(
+            quote=quote,
+            document_id=chunk.document_id,
+            link=curr_link,
+            source_type=chunk.source_type,
+            semantic_identifier=chunk.semantic_identifier,
+            blurb=chunk.blurb,
+        )
 
-    return payseraiQuotes(quotes=payserai_quotes)
+    def match_quotes(self, quotes: list[str]) -> payseraiQuotes:
+        payserai_quotes = [self.match_quote(quote) for quote in quotes]
+        return payseraiQuotes(
+            quotes=[quote for quote in payserai_quotes if quote is not None]
+        )
+
+
+def match_quotes_to_docs(
+    quotes: list[str],
+    chunks: list[InferenceChunk],
+    max_error_percent: float = QUOTE_ALLOWED_ERROR_PERCENT,
+    fuzzy_search: bool = False,
+    prefix_only_length: int = 100,
+) -> payseraiQuotes:
+    return QuoteMatcher(
+        chunks=chunks,
+        max_error_percent=max_error_percent,
+        fuzzy_search=fuzzy_search,
+        prefix_only_length=prefix_only_length,
+    ).match_quotes(quotes)
 
 
 def process_answer(
@@ -207,6 +321,90 @@ def _extract_quotes_from_completed_token_stream(
     return quotes
 
 
+_WHITESPACE_PAT = re.compile(r"\s")
+_JSON_ANSWER_START = '{"answer":"'
+
+
+class _AnswerStreamState(Enum):
+    SEEKING_ANSWER_START = "seeking_answer_start"
+    IN_ANSWER = "in_answer"
+    ANSWER_FINISHED = "answer_finished"
+
+
+class _ModelTokenStreamParser:
+    """Consumes the streamed model output one token at a time and decides which answer piece,
+    if any, to stream for each token. Every token is only looked at once, the full output is
+    only assembled at the end for the quote extraction."""
+
+    def __init__(self, is_json_prompt: bool) -> None:
+        self.is_json_prompt = is_json_prompt
+        self.state = (
+            _AnswerStreamState.SEEKING_ANSWER_START
+            if is_json_prompt
+            else _AnswerStreamState.IN_ANSWER
+        )
+        self._tokens: list[str] = []
+        self._output_len = 0
+        self._last_char = ""
+        self._answer_start_finder = StreamedSubstringFinder(
+            pattern=_JSON_ANSWER_START,
+            normalize=lambda text: _WHITESPACE_PAT.sub("", text),
+        )
+        self._hold_quote = ""
+
+        quote_pat = f"\n{QUOTE_PAT}"
+        self._quote_pat = quote_pat
+        # Sometimes worse model outputs new line instead of :
+        self._quote_loose = f"\n{quote_pat[:-1]}\n"
+        # Sometime model outputs two newlines before quote section
+        self._quote_pat_full = f"\n{quote_pat}"
+
+    @property
+    def model_output(self) -> str:
+        return "".join(self._tokens)
+
+    def _process_answer_token(self, token: str) -> payseraiAnswerPiece | None:
+        if self.is_json_prompt:
+            if _stream_json_answer_end(self._last_char, token):
+                self.state = _AnswerStreamState.ANSWER_FINISHED
+                return payseraiAnswerPiece(answer_piece=None)
+        else:
+            held_token = self._hold_quote + token
+            if self._quote_pat in held_token or self._quote_loose in held_token:
+                self.state = _AnswerStreamState.ANSWER_FINISHED
+                return payseraiAnswerPiece(answer_piece=None)
+            if held_token in self._quote_pat_full:
+                self._hold_quote = held_token
+                return None
+
+        answer_piece = payseraiAnswerPiece(answer_piece=self._hold_quote + token)
+        self._hold_quote = ""
+        return answer_piece
+
+    def process_token(self, token: str) -> payseraiAnswerPiece | None:
+        self._tokens.append(token)
+        self._output_len += len(token)
+
+        answer_piece = None
+        if self.state == _AnswerStreamState.SEEKING_ANSWER_START:
+            if self._answer_start_finder.feed(token):
+                # Note, if the token that completes the pattern has additional text, for example if the token is "?
+                # Then the chars after " will not be streamed, but this is ok as it prevents streaming the ? in the
+                # event that the model outputs the UNCERTAINTY_PAT
+                self.state = _AnswerStreamState.IN_ANSWER
+
+                # Prevent heavy cases of hallucinations where model is not even providing a json until later
+                if self._output_len > 40:
+                    logger.warning("LLM did not produce json as prompted")
+                    self.state = _AnswerStreamState.ANSWER_FINISHED
+        elif self.state == _AnswerStreamState.IN_ANSWER:
+            answer_piece = self._process_answer_token(token)
+
+        if token:
+            self._last_char = token[-1]
+        return answer_piece
+
+
 def process_model_tokens(
     tokens: Iterator[str],
     context_docs: list[InferenceChunk],
@@ -218,53 +416,42 @@ def process_model_tokens(
     Yields Answer tokens back out in a dict for streaming to frontend
     When Answer section ends, yields dict with answer_finished key
     Collects all the tokens at the end to form the complete model output"""
-    quote_pat = f"\n{QUOTE_PAT}"
-    # Sometimes worse model outputs new line instead of :
-    quote_loose = f"\n{quote_pat[:-1]}\n"
-    # Sometime model outputs two newlines before quote section
-    quote_pat_full = f"\n{quote_pat}"
-    model_output: str = ""
-    found_answer_start = False if is_json_prompt else True
-    found_answer_end = False
-    hold_quote = ""
+    parser = _ModelTokenStreamParser(is_json_prompt=is_json_prompt)
     for token in tokens:
-        model_previous = model_output
-        model_output += token
-
-        if not found_answer_start and '{"answer":"' in re.sub(r"\s", "", model_output):
-            # Note, if the token that completes the pattern has additional text, for example if the token is "?
-            # Then the chars after " will not be streamed, but this is ok as it prevents streaming the ? in the
-            # event that the model outputs the UNCERTAINTY_PAT
-            found_answer_start = True
-
-            # Prevent heavy cases of hallucinations where model is not even providing a json until later
-            if is_json_prompt and len(model_output) > 40:
-                logger.warning("LLM did not produce json as prompted")
-                found_answer_end = True
-
-            continue
-
-        if found_answer_start and not found_answer_end:
-            if is_json_prompt and _stream_json_answer_end(model_previous, token):
-                found_answer_end = True
-                yield payseraiAnswerPiece(answer_piece=None)
-                continue
-            elif not is_json_prompt:
-                if quote_pat in hold_quote + token or quote_loose in hold_quote + token:
-                    found_answer_end = True
-                    yield payseraiAnswerPiece(answer_piece=None)
-                    continue
-                if hold_quote + token in quote_pat_full:
-                    hold_quote += token
-                    continue
-            yield payseraiAnswerPiece(answer_piece=hold_quote + token)
-            hold_quote = ""
+        answer_piece = parser.process_token(token)
+        if answer_piece is not None:
+            yield answer_piece
 
+    model_output = parser.model_output
     logger.debug(f"Raw Model QnA Output: {model_output}")
 
     yield _extract_quotes_from_completed_token_stream(model_output, context_docs)
 
 
+async def async_process_model_tokens(
+    tokens: AsyncIterator[str],
+    context_docs: list[InferenceChunk],
+    is_json_prompt: bool = True,
+) -> AsyncGenerator[payseraiAnswerPiece | payseraiQuotes, None]:
+    """Asyncio version of `process_model_tokens`, the quote matching at the end is CPU bound
+    so it is run on the search pool"""
+    parser = _ModelTokenStreamParser(is_json_prompt=is_json_prompt)
+    async for token in tokens:
+        answer_piece = parser.process_token(token)
+        if answer_piece is not None:
+            yield answer_piece
+
+    model_output = parser.model_output
+    logger.debug(f"Raw Model QnA Output: {model_output}")
+
+    yield await run_in_pool_async(
+        _extract_quotes_from_completed_token_stream,
+        model_output,
+        context_docs,
+        pool=ThreadPoolName.SEARCH,
+    )
+
+
 def simulate_streaming_response(model_out: str) -> Generator[str, None, None]:
     """Mock streaming by generating the passed in model output, character by character"""
     for token in model_out:
@@ -274,15 +461,10 @@ def simulate_streaming_response(model_out: str) -> Generator[str, None, None]:
 def _get_usable_chunks(
     chunks: list[InferenceChunk], token_limit: int
 ) -> list[InferenceChunk]:
-    total_token_count = 0
-    usable_chunks = []
-    for chunk in chunks:
-        chunk_token_count = check_number_of_tokens(chunk.content)
-        if total_token_count + chunk_token_count > token_limit:
-            break
-
-        total_token_count += chunk_token_count
-        usable_chunks.append(chunk)
+    # Token counts can't be negative so the running totals are sorted and the number of
+    # chunks that fit is found by bisecting them
+    token_count_prefix_sums = list(accumulate(get_chunk_token_counts(chunks)))
+    usable_chunks = chunks[: bisect.bisect_right(token_count_prefix_sums, token_limit)]
 
     # try and return at least one chunk if possible. This chunk will
     # get truncated later on in the pipeline. This would only occur if
@@ -330,11 +512,13 @@ def get_chunks_for_qa(
 
     Note, the batch_offset calculation has to count the batches from the beginning each time as
     there's no way to know which chunks were included in the prior batches without recounting atm,
-    this is somewhat slow as it requires tokenizing all the chunks again
+    the chunk token counts are cached so this only costs integer math
     """
     batch_index = 0
     latest_batch_indices: list[int] = []
     token_count = 0
+    # We calculate it live in case the user uses a different LLM + tokenizer
+    chunk_token_counts = get_chunk_token_counts(chunks)
 
     # First iterate the LLM selected chunks, then iterate the rest if tokens remaining
     for selection_target in [True, False]:
@@ -344,8 +528,7 @@ def get_chunks_for_qa(
             ):
                 continue
 
-            # We calculate it live in case the user uses a different LLM + tokenizer
-            chunk_token = check_number_of_tokens(chunk.content)
+            chunk_token = chunk_token_counts[ind]
             # 50 for an approximate/slight overestimate for # tokens for metadata for the chunk
             token_count += chunk_token + 50
 
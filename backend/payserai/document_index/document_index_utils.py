@@ -1,11 +1,24 @@
 import math
+import time
 import uuid
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from typing import cast
 
+from payserai.configs.constants import DOCUMENT_INDEX_GENERATION_KEY
+from payserai.dynamic_configs import get_dynamic_config_store
+from payserai.dynamic_configs.interface import ConfigNotFoundError
 from payserai.indexing.models import IndexChunk
 from payserai.indexing.models import InferenceChunk
+from payserai.utils.logger import setup_logger
+
+logger = setup_logger()
 
 
 DEFAULT_BATCH_SIZE = 30
+# Slightly over 3 Months, approximately 1 fiscal quarter
+UNTIMED_DOC_CUTOFF = timedelta(days=92)
 
 
 def translate_boost_count_to_multiplier(boost: int) -> float:
@@ -21,6 +34,15 @@ def translate_boost_count_to_multiplier(boost: int) -> float:
     return 2 / (1 + math.exp(-1 * boost / 3))
 
 
+def include_untimed_documents(
+    time_cutoff: datetime, untimed_doc_cutoff: timedelta = UNTIMED_DOC_CUTOFF
+) -> bool:
+    """Documents that don't have an updated at time are filtered out for queries asking for
+    very recent documents (3 months by default), they are assigned 3 months for the time decay
+    value"""
+    return datetime.now(timezone.utc) - untimed_doc_cutoff > time_cutoff
+
+
 def get_uuid_from_chunk(
     chunk: IndexChunk | InferenceChunk, mini_chunk_ind: int = 0
 ) -> uuid.UUID:
@@ -36,3 +58,26 @@ def get_uuid_from_chunk(
         [doc_str, str(chunk.chunk_id), str(mini_chunk_ind)]
     )
     return uuid.uuid5(uuid.NAMESPACE_X500, unique_identifier_string)
+
+
+def get_document_index_generation() -> int:
+    """The generation is stored in the dynamic config store so that writes from the
+    background indexing processes are visible to the api server"""
+    try:
+        return cast(int, get_dynamic_config_store().load(DOCUMENT_INDEX_GENERATION_KEY))
+    except ConfigNotFoundError:
+        return 0
+
+
+def bump_document_index_generation() -> int:
+    """Moves the generation forward, must be called after any write to the document index.
+    Using the current time as a floor keeps the value unique even if two processes bump
+    concurrently from the same previous generation."""
+    try:
+        new_generation = max(get_document_index_generation() + 1, time.time_ns())
+        get_dynamic_config_store().store(DOCUMENT_INDEX_GENERATION_KEY, new_generation)
+        return new_generation
+    except Exception as e:
+        # Failing to bump only affects cache freshness, it should never fail the index write
+        logger.error(f"Failed to bump document index generation: {e}")
+        return get_document_index_generation()
@@ -7,6 +7,9 @@ from payserai.access.models import DocumentAccess
 from payserai.indexing.models import DocMetadataAwareIndexChunk
 from payserai.indexing.models import InferenceChunk
 from payserai.search.models import IndexFilters
+from payserai.search.query_preprocessing import QueryAnalysis
+from payserai.utils.threadpool_concurrency import run_in_pool_async
+from payserai.utils.threadpool_concurrency import ThreadPoolName
 
 
 @dataclass(frozen=True)
@@ -85,11 +88,35 @@ class KeywordCapable(abc.ABC):
         filters: IndexFilters,
         favor_recent: bool,
         num_to_retrieve: int,
+        *,
+        query_analysis: QueryAnalysis | None = None,
     ) -> list[InferenceChunk]:
         raise NotImplementedError
 
+    async def async_keyword_retrieval(
+        self,
+        query: str,
+        filters: IndexFilters,
+        favor_recent: bool,
+        num_to_retrieve: int,
+        *,
+        query_analysis: QueryAnalysis | None = None,
+    ) -> list[InferenceChunk]:
+        """Indices without an asyncio client run the blocking retrieval on the search pool"""
+        return await run_in_pool_async(
+            self.keyword_retrieval,
+            query=query,
+            filters=filters,
+            favor_recent=favor_recent,
+            num_to_retrieve=num_to_retrieve,
+            query_analysis=query_analysis,
+            pool=ThreadPoolName.SEARCH,
+        )
+
 
 class VectorCapable(abc.ABC):
+    """A precomputed `query_embedding` of the query is used instead of embedding it again"""
+
     @abc.abstractmethod
     def semantic_retrieval(
         self,
@@ -97,11 +124,38 @@ class VectorCapable(abc.ABC):
         filters: IndexFilters,
         favor_recent: bool,
         num_to_retrieve: int,
+        *,
+        query_analysis: QueryAnalysis | None = None,
+        query_embedding: list[float] | None = None,
     ) -> list[InferenceChunk]:
         raise NotImplementedError
 
+    async def async_semantic_retrieval(
+        self,
+        query: str,
+        filters: IndexFilters,
+        favor_recent: bool,
+        num_to_retrieve: int,
+        *,
+        query_analysis: QueryAnalysis | None = None,
+        query_embedding: list[float] | None = None,
+    ) -> list[InferenceChunk]:
+        """Indices without an asyncio client run the blocking retrieval on the search pool"""
+        return await run_in_pool_async(
+            self.semantic_retrieval,
+            query=query,
+            filters=filters,
+            favor_recent=favor_recent,
+            num_to_retrieve=num_to_retrieve,
+            query_analysis=query_analysis,
+            query_embedding=query_embedding,
+            pool=ThreadPoolName.SEARCH,
+        )
+
 
 class HybridCapable(abc.ABC):
+    """A precomputed `query_embedding` of the query is used instead of embedding it again"""
+
     @abc.abstractmethod
     def hybrid_retrieval(
         self,
@@ -110,9 +164,36 @@ class HybridCapable(abc.ABC):
         favor_recent: bool,
         num_to_retrieve: int,
         hybrid_alpha: float | None = None,
+        *,
+        query_analysis: QueryAnalysis | None = None,
+        query_embedding: list[float] | None = None,
     ) -> list[InferenceChunk]:
         raise NotImplementedError
 
+    async def async_hybrid_retrieval(
+        self,
+        query: str,
+        filters: IndexFilters,
+        favor_recent: bool,
+        num_to_retrieve: int,
+        hybrid_alpha: float | None = None,
+        *,
+        query_analysis: QueryAnalysis | None = None,
+        query_embedding: list[float] | None = None,
+    ) -> list[InferenceChunk]:
+        """Indices without an asyncio client run the blocking retrieval on the search pool"""
+        return await run_in_pool_async(
+            self.hybrid_retrieval,
+            query=query,
+            filters=filters,
+            favor_recent=favor_recent,
+            num_to_retrieve=num_to_retrieve,
+            hybrid_alpha=hybrid_alpha,
+            query_analysis=query_analysis,
+            query_embedding=query_embedding,
+            pool=ThreadPoolName.SEARCH,
+        )
+
 
 class AdminCapable(abc.ABC):
     @abc.abstractmethod
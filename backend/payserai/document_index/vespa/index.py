@@ -1,7 +1,10 @@
+import asyncio
 import concurrent.futures
+import hashlib
 import json
 import string
 import time
+from collections import Counter
 from collections.abc import Mapping
 from dataclasses import dataclass
 from datetime import datetime
@@ -10,6 +13,7 @@ from datetime import timezone
 from typing import Any
 from typing import cast
 
+import httpx
 import requests
 from requests import HTTPError
 from requests import Response
@@ -31,6 +35,7 @@ from payserai.configs.constants import BLURB
 from payserai.configs.constants import BOOST
 from payserai.configs.constants import CHUNK_ID
 from payserai.configs.constants import CONTENT
+from payserai.configs.constants import CONTENT_HASH
 from payserai.configs.constants import DEFAULT_BOOST
 from payserai.configs.constants import DOC_UPDATED_AT
 from payserai.configs.constants import DOCUMENT_ID
@@ -47,7 +52,12 @@ from payserai.configs.constants import SOURCE_LINKS
 from payserai.configs.constants import SOURCE_TYPE
 from payserai.configs.constants import TITLE
 from payserai.configs.model_configs import SEARCH_DISTANCE_CUTOFF
+from payserai.document_index.document_index_utils import (
+    bump_document_index_generation,
+)
 from payserai.document_index.document_index_utils import get_uuid_from_chunk
+from payserai.document_index.document_index_utils import include_untimed_documents
+from payserai.document_index.document_index_utils import UNTIMED_DOC_CUTOFF
 from payserai.document_index.interfaces import DocumentIndex
 from payserai.document_index.interfaces import DocumentInsertionRecord
 from payserai.document_index.interfaces import UpdateRequest
@@ -55,9 +65,10 @@ from payserai.document_index.vespa.utils import remove_invalid_unicode_chars
 from payserai.indexing.models import DocMetadataAwareIndexChunk
 from payserai.indexing.models import InferenceChunk
 from payserai.search.models import IndexFilters
+from payserai.search.query_preprocessing import analyze_query_text
+from payserai.search.query_preprocessing import QueryAnalysis
+from payserai.search.search_runner import async_embed_query
 from payserai.search.search_runner import embed_query
-from payserai.search.search_runner import query_processing
-from payserai.search.search_runner import remove_stop_words
 from payserai.utils.batching import batch_generator
 from payserai.utils.logger import setup_logger
 
@@ -68,11 +79,18 @@ VESPA_CONFIG_SERVER_URL = f"http://{VESPA_HOST}:{VESPA_TENANT_PORT}"
 VESPA_APP_CONTAINER_URL = f"http://{VESPA_HOST}:{VESPA_PORT}"
 VESPA_APPLICATION_ENDPOINT = f"{VESPA_CONFIG_SERVER_URL}/application/v2"
 # payserai_chunk below is defined in vespa/app_configs/schemas/payserai_chunk.sd
+VESPA_DOCUMENT_TYPE = "payserai_chunk"
 DOCUMENT_ID_ENDPOINT = (
-    f"{VESPA_APP_CONTAINER_URL}/document/v1/default/payserai_chunk/docid"
+    f"{VESPA_APP_CONTAINER_URL}/document/v1/default/{VESPA_DOCUMENT_TYPE}/docid"
 )
 SEARCH_ENDPOINT = f"{VESPA_APP_CONTAINER_URL}/search/"
 _BATCH_SIZE = 100  # Specific to Vespa
+# Vespa's default limit on the number of hits returned by a single query
+_MAX_HITS_PER_QUERY = 400
+# Number of documents whose chunks are removed by a single selection based delete
+_DELETION_SELECTION_BATCH_SIZE = 50
+# Each selection based delete has Vespa visit all of its documents, so only run a few at a time
+_NUM_DELETION_THREADS = 4
 _NUM_THREADS = (
     16  # since Vespa doesn't allow batching of inserts / updates, we use threads
 )
@@ -91,25 +109,6 @@ class _VespaUpdateRequest:
     update_request: dict[str, dict]
 
 
-@retry(tries=3, delay=1, backoff=2)
-def _does_document_exist(
-    doc_chunk_id: str,
-) -> bool:
-    """Returns whether the document already exists and the users/group whitelists
-    Specifically in this case, document refers to a vespa document which is equivalent to a payserai
-    chunk. This checks for whether the chunk exists already in the index"""
-    doc_fetch_response = requests.get(f"{DOCUMENT_ID_ENDPOINT}/{doc_chunk_id}")
-    if doc_fetch_response.status_code == 404:
-        return False
-
-    if doc_fetch_response.status_code != 200:
-        raise RuntimeError(
-            f"Unexpected fetch document by ID value from Vespa "
-            f"with error {doc_fetch_response.status_code}"
-        )
-    return True
-
-
 def _vespa_get_updated_at_attribute(t: datetime | None) -> int | None:
     if not t:
         return None
@@ -145,78 +144,247 @@ def _get_vespa_chunk_ids_by_document_id(
     return doc_chunk_ids
 
 
-@retry(tries=3, delay=1, backoff=2)
-def _delete_vespa_doc_chunks(document_id: str) -> None:
-    doc_chunk_ids = _get_vespa_chunk_ids_by_document_id(document_id)
+def _get_vespa_chunk_hashes_by_document_id(
+    document_id: str, hits_per_page: int = _BATCH_SIZE
+) -> dict[str, str | None]:
+    """Maps the Vespa IDs of all the chunks of the document to their content hash, chunks
+    indexed before the content hash was introduced map to None"""
+    offset = 0
+    chunk_id_to_hash: dict[str, str | None] = {}
+    params: dict[str, int | str] = {
+        "yql": f"select documentid, {CONTENT_HASH} from {DOCUMENT_INDEX_NAME} "
+        f"where document_id contains '{document_id}'",
+        "timeout": "10s",
+        "offset": offset,
+        "hits": hits_per_page,
+    }
+    while True:
+        response = requests.get(SEARCH_ENDPOINT, params=params)
+        response.raise_for_status()
+        hits = response.json()["root"].get("children", [])
 
-    for chunk_id in doc_chunk_ids:
-        res = requests.delete(f"{DOCUMENT_ID_ENDPOINT}/{chunk_id}")
-        res.raise_for_status()
+        for hit in hits:
+            chunk_id = hit["fields"]["documentid"].split("::", 1)[-1]
+            chunk_id_to_hash[chunk_id] = hit["fields"].get(CONTENT_HASH)
+        params["offset"] += hits_per_page  # type: ignore
 
+        if len(hits) < hits_per_page:
+            break
+    return chunk_id_to_hash
 
-def _delete_vespa_docs(
-    document_ids: list[str],
-    executor: concurrent.futures.ThreadPoolExecutor | None = None,
-) -> None:
-    external_executor = True
 
-    if not executor:
-        external_executor = False
-        executor = concurrent.futures.ThreadPoolExecutor(max_workers=_NUM_THREADS)
+def _escape_vespa_string(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
 
-    try:
-        doc_deletion_future = {
-            executor.submit(_delete_vespa_doc_chunks, doc_id): doc_id
-            for doc_id in document_ids
-        }
-        for future in concurrent.futures.as_completed(doc_deletion_future):
-            # Will raise exception if the deletion raised an exception
-            future.result()
 
-    finally:
-        if not external_executor:
-            executor.shutdown(wait=True)
+def _build_document_ids_clause(document_ids: list[str]) -> str:
+    return (
+        "("
+        + " or ".join(
+            f'{DOCUMENT_ID} contains "{_escape_vespa_string(document_id)}"'
+            for document_id in document_ids
+        )
+        + ")"
+    )
 
 
-def _get_existing_documents_from_chunks(
-    chunks: list[DocMetadataAwareIndexChunk],
-    executor: concurrent.futures.ThreadPoolExecutor | None = None,
-) -> set[str]:
-    external_executor = True
+@retry(tries=3, delay=1, backoff=2)
+def _get_document_chunk_counts(document_ids: list[str]) -> dict[str, int]:
+    """Finds which of the documents already exist in the index and with how many chunks,
+    using a single grouping query. Documents which don't exist are not in the result."""
+    if not document_ids:
+        return {}
+
+    yql = (
+        f"select documentid from {DOCUMENT_INDEX_NAME} "
+        f"where {_build_document_ids_clause(document_ids)} limit 0 "
+        f"| all(group({DOCUMENT_ID}) max({len(document_ids)}) each(output(count())))"
+    )
+    response = requests.get(
+        SEARCH_ENDPOINT, params={"yql": yql, "hits": 0, "timeout": "10s"}
+    )
+    response.raise_for_status()
 
-    if not executor:
-        external_executor = False
-        executor = concurrent.futures.ThreadPoolExecutor(max_workers=_NUM_THREADS)
+    chunk_counts: dict[str, int] = {}
+    # root -> group:root -> grouplist:document_id -> one group per document id
+    for root_group in response.json()["root"].get("children", []):
+        for group_list in root_group.get("children", []):
+            for group in group_list.get("children", []):
+                chunk_counts[group["value"]] = group["fields"]["count()"]
+    return chunk_counts
 
-    document_ids: set[str] = set()
-    try:
-        chunk_existence_future = {
+
+@retry(tries=3, delay=1, backoff=2)
+def _get_vespa_chunk_hashes_by_document_ids(
+    document_ids: list[str], num_chunks: int
+) -> dict[str, str | None]:
+    """Fetches the content hash of every chunk of the documents in one query, `num_chunks` must
+    be the total number of chunks of these documents and at most _MAX_HITS_PER_QUERY"""
+    response = requests.get(
+        SEARCH_ENDPOINT,
+        params={
+            "yql": f"select documentid, {CONTENT_HASH} from {DOCUMENT_INDEX_NAME} "
+            f"where {_build_document_ids_clause(document_ids)}",
+            "hits": num_chunks,
+            "timeout": "10s",
+        },
+    )
+    response.raise_for_status()
+
+    return {
+        hit["fields"]["documentid"].split("::", 1)[-1]: hit["fields"].get(CONTENT_HASH)
+        for hit in response.json()["root"].get("children", [])
+    }
+
+
+def _get_existing_chunk_hashes(
+    document_chunk_counts: dict[str, int],
+    executor: concurrent.futures.ThreadPoolExecutor,
+) -> dict[str, str | None]:
+    """Maps the Vespa IDs of all the chunks of the given existing documents to their content
+    hash. Documents are grouped so that each query returns at most _MAX_HITS_PER_QUERY hits,
+    documents with more chunks than that are paged through on their own."""
+    chunk_hashes_futures: list[concurrent.futures.Future] = []
+
+    doc_id_batch: list[str] = []
+    batch_chunk_count = 0
+    for document_id, chunk_count in document_chunk_counts.items():
+        if chunk_count > _MAX_HITS_PER_QUERY:
+            chunk_hashes_futures.append(
+                executor.submit(_get_vespa_chunk_hashes_by_document_id, document_id)
+            )
+            continue
+
+        if batch_chunk_count + chunk_count > _MAX_HITS_PER_QUERY:
+            chunk_hashes_futures.append(
+                executor.submit(
+                    _get_vespa_chunk_hashes_by_document_ids,
+                    doc_id_batch,
+                    batch_chunk_count,
+                )
+            )
+            doc_id_batch = []
+            batch_chunk_count = 0
+
+        doc_id_batch.append(document_id)
+        batch_chunk_count += chunk_count
+
+    if doc_id_batch:
+        chunk_hashes_futures.append(
             executor.submit(
-                _does_document_exist, str(get_uuid_from_chunk(chunk))
-            ): chunk
-            for chunk in chunks
-        }
-        for future in concurrent.futures.as_completed(chunk_existence_future):
-            chunk = chunk_existence_future[future]
-            chunk_already_existed = future.result()
-            if chunk_already_existed:
-                document_ids.add(chunk.source_document.id)
+                _get_vespa_chunk_hashes_by_document_ids, doc_id_batch, batch_chunk_count
+            )
+        )
 
-    finally:
-        if not external_executor:
-            executor.shutdown(wait=True)
+    chunk_id_to_hash: dict[str, str | None] = {}
+    for future in concurrent.futures.as_completed(chunk_hashes_futures):
+        chunk_id_to_hash.update(future.result())
+    return chunk_id_to_hash
 
-    return document_ids
+
+@retry(tries=3, delay=1, backoff=2)
+def _delete_vespa_chunk(chunk_id: str) -> None:
+    res = requests.delete(f"{DOCUMENT_ID_ENDPOINT}/{chunk_id}")
+    res.raise_for_status()
+
+
+def _delete_vespa_chunks(
+    chunk_ids: list[str],
+    executor: concurrent.futures.ThreadPoolExecutor,
+) -> None:
+    chunk_deletion_futures = [
+        executor.submit(_delete_vespa_chunk, chunk_id) for chunk_id in chunk_ids
+    ]
+    for future in concurrent.futures.as_completed(chunk_deletion_futures):
+        # Will raise exception if the deletion raised an exception
+        future.result()
 
 
 @retry(tries=3, delay=1, backoff=2)
-def _index_vespa_chunk(chunk: DocMetadataAwareIndexChunk) -> None:
-    json_header = {
-        "Content-Type": "application/json",
-    }
+def _update_vespa_chunk_updated_at(chunk_id: str, updated_at: int) -> None:
+    res = requests.put(
+        f"{DOCUMENT_ID_ENDPOINT}/{chunk_id}",
+        headers={"Content-Type": "application/json"},
+        json={"fields": {DOC_UPDATED_AT: {"assign": updated_at}}},
+    )
+    res.raise_for_status()
+
+
+def _update_vespa_chunks_updated_at(
+    chunk_updated_ats: list[tuple[str, int]],
+    executor: concurrent.futures.ThreadPoolExecutor,
+) -> None:
+    chunk_update_futures = [
+        executor.submit(_update_vespa_chunk_updated_at, chunk_id, updated_at)
+        for chunk_id, updated_at in chunk_updated_ats
+    ]
+    for future in concurrent.futures.as_completed(chunk_update_futures):
+        # Will raise exception if the update raised an exception
+        future.result()
+
+
+@retry(tries=3, delay=1, backoff=2)
+def _delete_vespa_chunks_by_selection_slice(
+    selection: str, continuation: str | None
+) -> dict[str, Any]:
+    params = {"selection": selection, "cluster": DOCUMENT_INDEX_NAME}
+    if continuation:
+        params["continuation"] = continuation
+    res = requests.delete(DOCUMENT_ID_ENDPOINT, params=params)
+    res.raise_for_status()
+    return res.json()
+
+
+def _delete_vespa_docs_by_selection(document_ids: list[str]) -> int:
+    """Deletes all the chunks of the documents with a single selection based delete.
+    Vespa visits the matching chunks in slices, a continuation token is returned until all
+    of them have been processed. Returns the number of deleted chunks."""
+    selection = " or ".join(
+        f'{VESPA_DOCUMENT_TYPE}.{DOCUMENT_ID}=="{_escape_vespa_string(document_id)}"'
+        for document_id in document_ids
+    )
+
+    num_deleted_chunks = 0
+    continuation: str | None = None
+    while True:
+        response_json = _delete_vespa_chunks_by_selection_slice(
+            selection=selection, continuation=continuation
+        )
+        num_deleted_chunks += response_json.get("documentCount", 0)
+        continuation = response_json.get("continuation")
+        if not continuation:
+            return num_deleted_chunks
+
+
+def _delete_vespa_docs(
+    document_ids: list[str],
+    batch_size: int = _DELETION_SELECTION_BATCH_SIZE,
+    num_threads: int = _NUM_DELETION_THREADS,
+) -> None:
+    """Bulk deletes documents, several documents are covered by each selection and at most
+    `num_threads` selections are processed by Vespa at a time"""
+    if not document_ids:
+        return
+
+    num_docs_deleted = 0
+    num_chunks_deleted = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=num_threads) as executor:
+        doc_deletion_futures = {
+            executor.submit(_delete_vespa_docs_by_selection, doc_id_batch): doc_id_batch
+            for doc_id_batch in batch_generator(document_ids, batch_size)
+        }
+        for future in concurrent.futures.as_completed(doc_deletion_futures):
+            # Will raise exception if the deletion raised an exception
+            num_chunks_deleted += future.result()
+            num_docs_deleted += len(doc_deletion_futures[future])
+            logger.info(
+                f"Deleted {num_docs_deleted}/{len(document_ids)} documents "
+                f"({num_chunks_deleted} chunks) from Vespa"
+            )
+
+
+def _build_vespa_chunk_fields(chunk: DocMetadataAwareIndexChunk) -> dict[str, Any]:
     document = chunk.source_document
-    # No minichunk documents in vespa, minichunk vectors are stored in the chunk itself
-    vespa_chunk_id = str(get_uuid_from_chunk(chunk))
 
     embeddings = chunk.embeddings
     embeddings_name_vector_map = {"full_chunk": embeddings.full_embedding}
@@ -247,6 +415,35 @@ def _index_vespa_chunk(chunk: DocMetadataAwareIndexChunk) -> None:
         ACCESS_CONTROL_LIST: {acl_entry: 1 for acl_entry in chunk.access.to_acl()},
         DOCUMENT_SETS: {document_set: 1 for document_set in chunk.document_sets},
     }
+    vespa_document_fields[CONTENT_HASH] = _get_chunk_content_hash(vespa_document_fields)
+    return vespa_document_fields
+
+
+def _get_chunk_content_hash(vespa_document_fields: dict[str, Any]) -> str:
+    """Embeddings are left out since they are derived from the content and the updated time
+    since some connectors report the time the document was fetched rather than edited"""
+    hashed_fields = {
+        field_name: value
+        for field_name, value in vespa_document_fields.items()
+        if field_name not in (EMBEDDINGS, DOC_UPDATED_AT, CONTENT_HASH)
+    }
+    return hashlib.sha256(
+        json.dumps(hashed_fields, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+@retry(tries=3, delay=1, backoff=2)
+def _index_vespa_chunk(
+    chunk: DocMetadataAwareIndexChunk, vespa_document_fields: dict[str, Any]
+) -> None:
+    json_header = {
+        "Content-Type": "application/json",
+    }
+    document = chunk.source_document
+    # No minichunk documents in vespa, minichunk vectors are stored in the chunk itself
+    vespa_chunk_id = str(get_uuid_from_chunk(chunk))
+    # Copied since the invalid unicode handling below modifies the fields
+    vespa_document_fields = dict(vespa_document_fields)
 
     def _index_chunk(
         url: str,
@@ -302,7 +499,7 @@ def _index_vespa_chunk(chunk: DocMetadataAwareIndexChunk) -> None:
 
 
 def _batch_index_vespa_chunks(
-    chunks: list[DocMetadataAwareIndexChunk],
+    chunks: list[tuple[DocMetadataAwareIndexChunk, dict[str, Any]]],
     executor: concurrent.futures.ThreadPoolExecutor | None = None,
 ) -> None:
     external_executor = True
@@ -313,7 +510,8 @@ def _batch_index_vespa_chunks(
 
     try:
         chunk_index_future = {
-            executor.submit(_index_vespa_chunk, chunk): chunk for chunk in chunks
+            executor.submit(_index_vespa_chunk, chunk, fields): chunk
+            for chunk, fields in chunks
         }
         for future in concurrent.futures.as_completed(chunk_index_future):
             # Will raise exception if any indexing raised an exception
@@ -331,26 +529,79 @@ def _clear_and_index_vespa_chunks(
     with updating the associated permissions. Assumes that a document will not be split into
     multiple chunk batches calling this function multiple times, otherwise only the last set of
     chunks will be kept"""
-    existing_docs: set[str] = set()
+    chunks_with_fields = [(chunk, _build_vespa_chunk_fields(chunk)) for chunk in chunks]
+    all_doc_ids = list({chunk.source_document.id for chunk in chunks})
 
     with concurrent.futures.ThreadPoolExecutor(max_workers=_NUM_THREADS) as executor:
-        # Check for existing documents, existing documents need to have all of their chunks deleted
-        # prior to indexing as the document size (num chunks) may have shrunk
-        first_chunks = [chunk for chunk in chunks if chunk.chunk_id == 0]
-        for chunk_batch in batch_generator(first_chunks, _BATCH_SIZE):
-            existing_docs.update(
-                _get_existing_documents_from_chunks(
-                    chunks=chunk_batch, executor=executor
+        # Check for existing documents, existing documents need to have their outdated chunks
+        # deleted prior to indexing as the document size (num chunks) may have shrunk
+        existing_chunk_counts: dict[str, int] = {}
+        chunk_counts_futures = [
+            executor.submit(_get_document_chunk_counts, doc_id_batch)
+            for doc_id_batch in batch_generator(all_doc_ids, _BATCH_SIZE)
+        ]
+        for future in concurrent.futures.as_completed(chunk_counts_futures):
+            existing_chunk_counts.update(future.result())
+        existing_docs = set(existing_chunk_counts.keys())
+
+        existing_chunk_hashes = _get_existing_chunk_hashes(
+            document_chunk_counts=existing_chunk_counts, executor=executor
+        )
+
+        # Chunks which are already in the index with the same content are not fed again
+        chunks_to_index: list[tuple[DocMetadataAwareIndexChunk, dict[str, Any]]] = []
+        unchanged_chunks: list[tuple[DocMetadataAwareIndexChunk, dict[str, Any]]] = []
+        new_chunk_ids: set[str] = set()
+        for chunk, fields in chunks_with_fields:
+            vespa_chunk_id = str(get_uuid_from_chunk(chunk))
+            new_chunk_ids.add(vespa_chunk_id)
+            if existing_chunk_hashes.get(vespa_chunk_id) != fields[CONTENT_HASH]:
+                chunks_to_index.append((chunk, fields))
+            else:
+                unchanged_chunks.append((chunk, fields))
+
+        # The update time is not part of the hash, once any chunk of a document is rewritten
+        # its unchanged chunks need the new update time too for the time filters and recency
+        edited_doc_ids = {chunk.source_document.id for chunk, _ in chunks_to_index}
+        new_chunk_counts = Counter(chunk.source_document.id for chunk in chunks)
+        edited_doc_ids.update(
+            doc_id
+            for doc_id, chunk_count in existing_chunk_counts.items()
+            if chunk_count != new_chunk_counts[doc_id]
+        )
+        chunk_updated_ats: list[tuple[str, int]] = []
+        for chunk, fields in unchanged_chunks:
+            if chunk.source_document.id not in edited_doc_ids:
+                continue
+            if fields[DOC_UPDATED_AT] is None:
+                # Nothing to assign, the chunk is fed again to clear the old update time
+                chunks_to_index.append((chunk, fields))
+            else:
+                chunk_updated_ats.append(
+                    (str(get_uuid_from_chunk(chunk)), fields[DOC_UPDATED_AT])
                 )
-            )
 
-        for doc_id_batch in batch_generator(existing_docs, _BATCH_SIZE):
-            _delete_vespa_docs(document_ids=doc_id_batch, executor=executor)
+        stale_chunk_ids = [
+            chunk_id
+            for chunk_id in existing_chunk_hashes
+            if chunk_id not in new_chunk_ids
+        ]
+        logger.debug(
+            f"Indexing {len(chunks_to_index)} new or changed chunks, updating the update "
+            f"time of {len(chunk_updated_ats)} unchanged chunks and deleting "
+            f"{len(stale_chunk_ids)} outdated chunks"
+        )
 
-        for chunk_batch in batch_generator(chunks, _BATCH_SIZE):
+        for chunk_id_batch in batch_generator(stale_chunk_ids, _BATCH_SIZE):
+            _delete_vespa_chunks(chunk_ids=chunk_id_batch, executor=executor)
+
+        for chunk_batch in batch_generator(chunks_to_index, _BATCH_SIZE):
             _batch_index_vespa_chunks(chunks=chunk_batch, executor=executor)
 
-    all_doc_ids = {chunk.source_document.id for chunk in chunks}
+        for updated_at_batch in batch_generator(chunk_updated_ats, _BATCH_SIZE):
+            _update_vespa_chunks_updated_at(
+                chunk_updated_ats=updated_at_batch, executor=executor
+            )
 
     return {
         DocumentInsertionRecord(
@@ -376,16 +627,12 @@ def _build_vespa_filters(filters: IndexFilters, include_hidden: bool = False) ->
 
     def _build_time_filter(
         cutoff: datetime | None,
-        # Slightly over 3 Months, approximately 1 fiscal quarter
-        untimed_doc_cutoff: timedelta = timedelta(days=92),
+        untimed_doc_cutoff: timedelta = UNTIMED_DOC_CUTOFF,
     ) -> str:
         if not cutoff:
             return ""
 
-        # For Documents that don't have an updated at, filter them out for queries asking for
-        # very recent documents (3 months) default. Documents that don't have an updated at
-        # time are assigned 3 months for time decay value
-        include_untimed = datetime.now(timezone.utc) - untimed_doc_cutoff > cutoff
+        include_untimed = include_untimed_documents(cutoff, untimed_doc_cutoff)
         cutoff_secs = int(cutoff.timestamp())
 
         if include_untimed:
@@ -499,24 +746,25 @@ def _vespa_hit_to_inference_chunk(hit: dict[str, Any]) -> InferenceChunk:
     )
 
 
-def _query_vespa(query_params: Mapping[str, str | int | float]) -> list[InferenceChunk]:
+def _build_vespa_search_params(
+    query_params: Mapping[str, str | int | float]
+) -> dict[str, str | int | float]:
     if "query" in query_params and not cast(str, query_params["query"]).strip():
         raise ValueError("No/empty query received")
 
-    response = requests.get(
-        SEARCH_ENDPOINT,
-        params=dict(
-            **query_params,
-            **{
-                "presentation.timing": True,
-            }
-            if LOG_VESPA_TIMING_INFORMATION
-            else {},
-        ),
+    return dict(
+        **query_params,
+        **{
+            "presentation.timing": True,
+        }
+        if LOG_VESPA_TIMING_INFORMATION
+        else {},
     )
-    response.raise_for_status()
 
-    response_json: dict[str, Any] = response.json()
+
+def _vespa_search_response_to_chunks(
+    response_json: dict[str, Any]
+) -> list[InferenceChunk]:
     if LOG_VESPA_TIMING_INFORMATION:
         logger.info("Vespa timing info: %s", response_json.get("timing"))
     hits = response_json["root"].get("children", [])
@@ -536,6 +784,39 @@ def _query_vespa(query_params: Mapping[str, str | int | float]) -> list[Inferenc
     return inference_chunks
 
 
+def _query_vespa(query_params: Mapping[str, str | int | float]) -> list[InferenceChunk]:
+    response = requests.get(
+        SEARCH_ENDPOINT, params=_build_vespa_search_params(query_params)
+    )
+    response.raise_for_status()
+    return _vespa_search_response_to_chunks(response.json())
+
+
+_ASYNC_CLIENT: httpx.AsyncClient | None = None
+_ASYNC_CLIENT_LOOP: asyncio.AbstractEventLoop | None = None
+
+
+def _get_async_vespa_client() -> httpx.AsyncClient:
+    # httpx clients are bound to the event loop they were first used in
+    global _ASYNC_CLIENT, _ASYNC_CLIENT_LOOP
+    loop = asyncio.get_running_loop()
+    if _ASYNC_CLIENT is None or _ASYNC_CLIENT_LOOP is not loop:
+        # Like the sync requests, the query timeout is enforced by Vespa
+        _ASYNC_CLIENT = httpx.AsyncClient(timeout=None)
+        _ASYNC_CLIENT_LOOP = loop
+    return _ASYNC_CLIENT
+
+
+async def _async_query_vespa(
+    query_params: Mapping[str, str | int | float]
+) -> list[InferenceChunk]:
+    response = await _get_async_vespa_client().get(
+        SEARCH_ENDPOINT, params=_build_vespa_search_params(query_params)
+    )
+    response.raise_for_status()
+    return _vespa_search_response_to_chunks(response.json())
+
+
 class VespaIndex(DocumentIndex):
     yql_base = (
         f"select "
@@ -581,7 +862,11 @@ class VespaIndex(DocumentIndex):
         self,
         chunks: list[DocMetadataAwareIndexChunk],
     ) -> set[DocumentInsertionRecord]:
-        return _clear_and_index_vespa_chunks(chunks=chunks)
+        try:
+            return _clear_and_index_vespa_chunks(chunks=chunks)
+        finally:
+            # Also bump on failure, some of the chunks may have been written / deleted
+            bump_document_index_generation()
 
     @staticmethod
     def _apply_updates_batched(
@@ -658,23 +943,30 @@ class VespaIndex(DocumentIndex):
                         )
                     )
 
-        self._apply_updates_batched(processed_updates_requests)
+        try:
+            self._apply_updates_batched(processed_updates_requests)
+        finally:
+            bump_document_index_generation()
         logger.info(
             "Finished updating Vespa documents in %s seconds", time.time() - start
         )
 
     def delete(self, doc_ids: list[str]) -> None:
         logger.info(f"Deleting {len(doc_ids)} documents from Vespa")
-        _delete_vespa_docs(doc_ids)
+        try:
+            _delete_vespa_docs(doc_ids)
+        finally:
+            bump_document_index_generation()
 
-    def keyword_retrieval(
-        self,
+    @staticmethod
+    def _build_keyword_retrieval_params(
         query: str,
         filters: IndexFilters,
         favor_recent: bool,
-        num_to_retrieve: int = NUM_RETURNED_HITS,
-        edit_keyword_query: bool = EDIT_KEYWORD_QUERY,
-    ) -> list[InferenceChunk]:
+        num_to_retrieve: int,
+        edit_keyword_query: bool,
+        query_analysis: QueryAnalysis | None,
+    ) -> dict[str, str | int]:
         decay_multiplier = FAVOR_RECENT_DECAY_MULTIPLIER if favor_recent else 1
         vespa_where_clauses = _build_vespa_filters(filters)
         yql = (
@@ -687,9 +979,13 @@ class VespaIndex(DocumentIndex):
             + f'or ({{defaultIndex: "{CONTENT_SUMMARY}"}}userInput(@query)))'
         )
 
-        final_query = query_processing(query) if edit_keyword_query else query
+        final_query = (
+            (query_analysis or analyze_query_text(query)).keyword_query
+            if edit_keyword_query
+            else query
+        )
 
-        params: dict[str, str | int] = {
+        return {
             "yql": yql,
             "query": final_query,
             "input.query(decay_factor)": str(DOC_TIME_DECAY * decay_multiplier),
@@ -699,17 +995,16 @@ class VespaIndex(DocumentIndex):
             "timeout": _VESPA_TIMEOUT,
         }
 
-        return _query_vespa(params)
-
-    def semantic_retrieval(
-        self,
+    @staticmethod
+    def _build_semantic_retrieval_params(
         query: str,
+        query_embedding: list[float],
         filters: IndexFilters,
         favor_recent: bool,
-        num_to_retrieve: int = NUM_RETURNED_HITS,
-        distance_cutoff: float | None = SEARCH_DISTANCE_CUTOFF,
-        edit_keyword_query: bool = EDIT_KEYWORD_QUERY,
-    ) -> list[InferenceChunk]:
+        num_to_retrieve: int,
+        edit_keyword_query: bool,
+        query_analysis: QueryAnalysis | None,
+    ) -> dict[str, str | int]:
         decay_multiplier = FAVOR_RECENT_DECAY_MULTIPLIER if favor_recent else 1
         vespa_where_clauses = _build_vespa_filters(filters)
         yql = (
@@ -722,13 +1017,13 @@ class VespaIndex(DocumentIndex):
             + f'or ({{defaultIndex: "{CONTENT_SUMMARY}"}}userInput(@query)))'
         )
 
-        query_embedding = embed_query(query)
-
         query_keywords = (
-            " ".join(remove_stop_words(query)) if edit_keyword_query else query
+            (query_analysis or analyze_query_text(query)).stop_words_removed_query
+            if edit_keyword_query
+            else query
         )
 
-        params: dict[str, str | int] = {
+        return {
             "yql": yql,
             "query": query_keywords,  # Needed for highlighting
             "input.query(query_embedding)": str(query_embedding),
@@ -739,18 +1034,17 @@ class VespaIndex(DocumentIndex):
             "timeout": _VESPA_TIMEOUT,
         }
 
-        return _query_vespa(params)
-
-    def hybrid_retrieval(
-        self,
+    @staticmethod
+    def _build_hybrid_retrieval_params(
         query: str,
+        query_embedding: list[float],
         filters: IndexFilters,
         favor_recent: bool,
         num_to_retrieve: int,
-        hybrid_alpha: float | None = HYBRID_ALPHA,
-        distance_cutoff: float | None = SEARCH_DISTANCE_CUTOFF,
-        edit_keyword_query: bool = EDIT_KEYWORD_QUERY,
-    ) -> list[InferenceChunk]:
+        hybrid_alpha: float | None,
+        edit_keyword_query: bool,
+        query_analysis: QueryAnalysis | None,
+    ) -> dict[str, str | int | float]:
         decay_multiplier = FAVOR_RECENT_DECAY_MULTIPLIER if favor_recent else 1
         vespa_where_clauses = _build_vespa_filters(filters)
         # Needs to be at least as much as the value set in Vespa schema config
@@ -763,13 +1057,13 @@ class VespaIndex(DocumentIndex):
             + f'or ({{defaultIndex: "{CONTENT_SUMMARY}"}}userInput(@query)))'
         )
 
-        query_embedding = embed_query(query)
-
         query_keywords = (
-            " ".join(remove_stop_words(query)) if edit_keyword_query else query
+            (query_analysis or analyze_query_text(query)).stop_words_removed_query
+            if edit_keyword_query
+            else query
         )
 
-        params: dict[str, str | int | float] = {
+        return {
             "yql": yql,
             "query": query_keywords,
             "input.query(query_embedding)": str(query_embedding),
@@ -783,8 +1077,148 @@ class VespaIndex(DocumentIndex):
             "timeout": _VESPA_TIMEOUT,
         }
 
+    def keyword_retrieval(
+        self,
+        query: str,
+        filters: IndexFilters,
+        favor_recent: bool,
+        num_to_retrieve: int = NUM_RETURNED_HITS,
+        edit_keyword_query: bool = EDIT_KEYWORD_QUERY,
+        *,
+        query_analysis: QueryAnalysis | None = None,
+    ) -> list[InferenceChunk]:
+        params = self._build_keyword_retrieval_params(
+            query=query,
+            filters=filters,
+            favor_recent=favor_recent,
+            num_to_retrieve=num_to_retrieve,
+            edit_keyword_query=edit_keyword_query,
+            query_analysis=query_analysis,
+        )
+        return _query_vespa(params)
+
+    def semantic_retrieval(
+        self,
+        query: str,
+        filters: IndexFilters,
+        favor_recent: bool,
+        num_to_retrieve: int = NUM_RETURNED_HITS,
+        distance_cutoff: float | None = SEARCH_DISTANCE_CUTOFF,
+        edit_keyword_query: bool = EDIT_KEYWORD_QUERY,
+        *,
+        query_analysis: QueryAnalysis | None = None,
+        query_embedding: list[float] | None = None,
+    ) -> list[InferenceChunk]:
+        params = self._build_semantic_retrieval_params(
+            query=query,
+            query_embedding=query_embedding
+            if query_embedding is not None
+            else embed_query(query),
+            filters=filters,
+            favor_recent=favor_recent,
+            num_to_retrieve=num_to_retrieve,
+            edit_keyword_query=edit_keyword_query,
+            query_analysis=query_analysis,
+        )
         return _query_vespa(params)
 
+    def hybrid_retrieval(
+        self,
+        query: str,
+        filters: IndexFilters,
+        favor_recent: bool,
+        num_to_retrieve: int,
+        hybrid_alpha: float | None = HYBRID_ALPHA,
+        distance_cutoff: float | None = SEARCH_DISTANCE_CUTOFF,
+        edit_keyword_query: bool = EDIT_KEYWORD_QUERY,
+        *,
+        query_analysis: QueryAnalysis | None = None,
+        query_embedding: list[float] | None = None,
+    ) -> list[InferenceChunk]:
+        params = self._build_hybrid_retrieval_params(
+            query=query,
+            query_embedding=query_embedding
+            if query_embedding is not None
+            else embed_query(query),
+            filters=filters,
+            favor_recent=favor_recent,
+            num_to_retrieve=num_to_retrieve,
+            hybrid_alpha=hybrid_alpha,
+            edit_keyword_query=edit_keyword_query,
+            query_analysis=query_analysis,
+        )
+        return _query_vespa(params)
+
+    async def async_keyword_retrieval(
+        self,
+        query: str,
+        filters: IndexFilters,
+        favor_recent: bool,
+        num_to_retrieve: int = NUM_RETURNED_HITS,
+        edit_keyword_query: bool = EDIT_KEYWORD_QUERY,
+        *,
+        query_analysis: QueryAnalysis | None = None,
+    ) -> list[InferenceChunk]:
+        params = self._build_keyword_retrieval_params(
+            query=query,
+            filters=filters,
+            favor_recent=favor_recent,
+            num_to_retrieve=num_to_retrieve,
+            edit_keyword_query=edit_keyword_query,
+            query_analysis=query_analysis,
+        )
+        return await _async_query_vespa(params)
+
+    async def async_semantic_retrieval(
+        self,
+        query: str,
+        filters: IndexFilters,
+        favor_recent: bool,
+        num_to_retrieve: int = NUM_RETURNED_HITS,
+        edit_keyword_query: bool = EDIT_KEYWORD_QUERY,
+        *,
+        query_analysis: QueryAnalysis | None = None,
+        query_embedding: list[float] | None = None,
+    ) -> list[InferenceChunk]:
+        params = self._build_semantic_retrieval_params(
+            query=query,
+            query_embedding=query_embedding
+            if query_embedding is not None
+            else await async_embed_query(query),
+            filters=filters,
+            favor_recent=favor_recent,
+            num_to_retrieve=num_to_retrieve,
+            edit_keyword_query=edit_keyword_query,
+            query_analysis=query_analysis,
+        )
+        return await _async_query_vespa(params)
+
+    async def async_hybrid_retrieval(
+        self,
+        query: str,
+        filters: IndexFilters,
+        favor_recent: bool,
+        num_to_retrieve: int,
+        hybrid_alpha: float | None = HYBRID_ALPHA,
+        edit_keyword_query: bool = EDIT_KEYWORD_QUERY,
+        *,
+        query_analysis: QueryAnalysis | None = None,
+        query_embedding: list[float] | None = None,
+    ) -> list[InferenceChunk]:
+        params = self._build_hybrid_retrieval_params(
+            query=query,
+            query_embedding=query_embedding
+            if query_embedding is not None
+            else await async_embed_query(query),
+            filters=filters,
+            favor_recent=favor_recent,
+            num_to_retrieve=num_to_retrieve,
+            hybrid_alpha=hybrid_alpha,
+            edit_keyword_query=edit_keyword_query,
+            query_analysis=query_analysis,
+        )
+        return await _async_query_vespa(params)
+
     def admin_retrieval(
         self,
         query: str,
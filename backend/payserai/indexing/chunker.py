@@ -61,22 +61,49 @@ def chunk_large_section(
     return chunks
 
 
+def count_tokens(texts: list[str], tokenizer: AutoTokenizer) -> list[int]:
+    """Fast (Rust backed) tokenizers encode the whole batch in a single call, others fall back
+    to tokenizing the texts one at a time"""
+    if not texts:
+        return []
+
+    if getattr(tokenizer, "is_fast", False):
+        encodings = tokenizer(
+            texts,
+            add_special_tokens=False,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+            verbose=False,
+        )
+        return [len(input_ids) for input_ids in encodings["input_ids"]]
+
+    return [len(tokenizer.tokenize(text)) for text in texts]
+
+
 def chunk_document(
     document: Document,
     chunk_tok_size: int = CHUNK_SIZE,
     subsection_overlap: int = CHUNK_OVERLAP,
     blurb_size: int = BLURB_SIZE,
 ) -> list[DocAwareChunk]:
+    """Each section is tokenized exactly once and the token length of the chunk being built is
+    kept as a running sum. Since the sections are joined on whitespace, which the encoder
+    tokenizers split on, this sum is the same as the token count of the joined chunk text.
+    """
     tokenizer = get_default_tokenizer()
+    separator_tok_length = len(tokenizer.tokenize(SECTION_SEPARATOR))
+    section_tok_lengths = count_tokens(
+        [section.text for section in document.sections], tokenizer
+    )
 
     chunks: list[DocAwareChunk] = []
     link_offsets: dict[int, str] = {}
     chunk_text = ""
-    for section in document.sections:
+    current_tok_length = 0
+    # Length of the chunk text after cleanup, the separator is only whitespace so it is dropped
+    curr_offset_len = 0
+    for section, section_tok_length in zip(document.sections, section_tok_lengths):
         section_link_text = section.link or ""
-        section_tok_length = len(tokenizer.tokenize(section.text))
-        current_tok_length = len(tokenizer.tokenize(chunk_text))
-        curr_offset_len = len(shared_precompare_cleanup(chunk_text))
 
         # Large sections are considered self-contained/unique therefore they start a new chunk and are not concatenated
         # at the end by other sections
@@ -94,6 +121,8 @@ def chunk_document(
                 )
                 link_offsets = {}
                 chunk_text = ""
+                current_tok_length = 0
+                curr_offset_len = 0
 
             large_section_chunks = chunk_large_section(
                 section=section,
@@ -109,15 +138,17 @@ def chunk_document(
 
         # In the case where the whole section is shorter than a chunk, either adding to chunk or start a new one
         if (
-            current_tok_length
-            + len(tokenizer.tokenize(SECTION_SEPARATOR))
-            + section_tok_length
+            current_tok_length + separator_tok_length + section_tok_length
             <= chunk_tok_size
         ):
-            chunk_text += (
-                SECTION_SEPARATOR + section.text if chunk_text else section.text
-            )
+            if chunk_text:
+                chunk_text += SECTION_SEPARATOR + section.text
+                current_tok_length += separator_tok_length + section_tok_length
+            else:
+                chunk_text = section.text
+                current_tok_length = section_tok_length
             link_offsets[curr_offset_len] = section_link_text
+            curr_offset_len += len(shared_precompare_cleanup(section.text))
         else:
             chunks.append(
                 DocAwareChunk(
@@ -131,6 +162,8 @@ def chunk_document(
             )
             link_offsets = {0: section_link_text}
             chunk_text = section.text
+            current_tok_length = section_tok_length
+            curr_offset_len = len(shared_precompare_cleanup(section.text))
 
     # Once we hit the end, if we're still in the process of building a chunk, add what we have
     if chunk_text:
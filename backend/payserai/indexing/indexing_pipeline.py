@@ -1,14 +1,25 @@
+import threading
+import time
+from collections.abc import Callable
+from collections.abc import Iterable
+from collections.abc import Iterator
+from dataclasses import dataclass
+from dataclasses import field
 from functools import partial
 from itertools import chain
+from queue import Queue
 from typing import Protocol
 
 from sqlalchemy.orm import Session
 
 from payserai.access.access import get_access_for_documents
+from payserai.configs.app_configs import INDEXING_PIPELINE_QUEUE_SIZE
 from payserai.connectors.models import Document
 from payserai.connectors.models import IndexAttemptMetadata
+from payserai.db.document import get_document_ids_for_connector_credential_pair
 from payserai.db.document import get_documents_by_ids
 from payserai.db.document import prepare_to_modify_documents
+from payserai.db.document import update_docs_content_hash
 from payserai.db.document import update_docs_updated_at
 from payserai.db.document import upsert_documents_complete
 from payserai.db.document_set import fetch_document_sets_for_documents
@@ -21,6 +32,7 @@ from payserai.indexing.chunker import DefaultChunker
 from payserai.indexing.embedder import DefaultEmbedder
 from payserai.indexing.models import DocAwareChunk
 from payserai.indexing.models import DocMetadataAwareIndexChunk
+from payserai.indexing.models import IndexChunk
 from payserai.search.models import Embedder
 from payserai.utils.logger import setup_logger
 
@@ -62,6 +74,152 @@ def upsert_documents_in_db(
     )
 
 
+def _get_updatable_documents(
+    documents: list[Document], db_session: Session, linked_doc_ids: set[str]
+) -> list[Document]:
+    """Skip indexing docs that don't have a newer updated at or whose content is unchanged
+    since they were last indexed. Shortcuts the time-consuming flow on connector index
+    retries and on polls of connectors which don't report a real last edited time.
+
+    Docs not yet in `linked_doc_ids` (linked to the connector / credential pair) are never
+    skipped, their access in the document index has to be updated to include the pair.
+    """
+    db_docs = get_documents_by_ids(
+        document_ids=[document.id for document in documents],
+        db_session=db_session,
+    )
+    id_update_time_map = {
+        doc.id: doc.doc_updated_at for doc in db_docs if doc.doc_updated_at
+    }
+    id_content_hash_map = {
+        doc.id: doc.content_hash for doc in db_docs if doc.content_hash
+    }
+
+    updatable_docs: list[Document] = []
+    for doc in documents:
+        if doc.id not in linked_doc_ids:
+            updatable_docs.append(doc)
+            continue
+        if (
+            doc.id in id_update_time_map
+            and doc.doc_updated_at
+            and doc.doc_updated_at <= id_update_time_map[doc.id]
+        ):
+            continue
+        if (
+            doc.id in id_content_hash_map
+            and doc.get_content_hash() == id_content_hash_map[doc.id]
+        ):
+            logger.debug(f"Skipping unchanged document: {doc.to_short_descriptor()}")
+            continue
+        updatable_docs.append(doc)
+    return updatable_docs
+
+
+def _prepare_documents(
+    documents: list[Document],
+    index_attempt_metadata: IndexAttemptMetadata,
+    db_session: Session,
+) -> list[Document]:
+    document_ids = [doc.id for doc in documents]
+
+    # Acquires a lock on the documents so that no other process can modify them
+    prepare_to_modify_documents(db_session=db_session, document_ids=document_ids)
+
+    updatable_docs = _get_updatable_documents(
+        documents=documents,
+        db_session=db_session,
+        linked_doc_ids=get_document_ids_for_connector_credential_pair(
+            db_session=db_session,
+            document_ids=document_ids,
+            connector_id=index_attempt_metadata.connector_id,
+            credential_id=index_attempt_metadata.credential_id,
+        ),
+    )
+
+    # Create records in the source of truth about these documents,
+    # does not include doc_updated_at which is also used to indicate a successful update.
+    # Skipped documents are included, they still need to be linked to this connector /
+    # credential pair for access and deletion
+    upsert_documents_in_db(
+        documents=documents,
+        index_attempt_metadata=index_attempt_metadata,
+        db_session=db_session,
+    )
+    return updatable_docs
+
+
+def _chunk_documents(
+    chunker: Chunker, documents: list[Document]
+) -> list[DocAwareChunk]:
+    return list(chain(*[chunker.chunk(document=document) for document in documents]))
+
+
+def _write_chunks(
+    document_index: DocumentIndex,
+    updatable_docs: list[Document],
+    chunks_with_embeddings: list[IndexChunk],
+    db_session: Session,
+) -> int:
+    """Writes the embedded chunks to the document index and records the successfully indexed
+    versions of the documents in Postgres. Returns the number of newly indexed documents.
+    """
+    updatable_ids = [doc.id for doc in updatable_docs]
+
+    # Attach the latest status from Postgres (source of truth for access) to each
+    # chunk. This access status will be attached to each chunk in the document index
+    # TODO: attach document sets to the chunk based on the status of Postgres as well
+    document_id_to_access_info = get_access_for_documents(
+        document_ids=updatable_ids, db_session=db_session
+    )
+    document_id_to_document_set = {
+        document_id: document_sets
+        for document_id, document_sets in fetch_document_sets_for_documents(
+            document_ids=updatable_ids, db_session=db_session
+        )
+    }
+    access_aware_chunks = [
+        DocMetadataAwareIndexChunk.from_index_chunk(
+            index_chunk=chunk,
+            access=document_id_to_access_info[chunk.source_document.id],
+            document_sets=set(
+                document_id_to_document_set.get(chunk.source_document.id, [])
+            ),
+        )
+        for chunk in chunks_with_embeddings
+    ]
+
+    logger.debug(
+        f"Indexing the following chunks: {[chunk.to_short_descriptor() for chunk in chunks_with_embeddings]}"
+    )
+    # A document will not be spread across different batches, so all the
+    # documents with chunks in this set, are fully represented by the chunks
+    # in this set
+    insertion_records = document_index.index(
+        chunks=access_aware_chunks,
+    )
+
+    successful_doc_ids = [record.document_id for record in insertion_records]
+    successful_docs = [doc for doc in updatable_docs if doc.id in successful_doc_ids]
+
+    # Update the time of latest version of the doc successfully indexed
+    ids_to_new_updated_at = {}
+    for doc in successful_docs:
+        if doc.doc_updated_at is None:
+            continue
+        ids_to_new_updated_at[doc.id] = doc.doc_updated_at
+
+    update_docs_updated_at(
+        ids_to_new_updated_at=ids_to_new_updated_at, db_session=db_session
+    )
+    update_docs_content_hash(
+        ids_to_content_hash={doc.id: doc.get_content_hash() for doc in successful_docs},
+        db_session=db_session,
+    )
+
+    return len([r for r in insertion_records if r.already_existed is False])
+
+
 def _indexing_pipeline(
     *,
     chunker: Chunker,
@@ -74,100 +232,262 @@ def _indexing_pipeline(
     Note that the documents should already be batched at this point so that it does not inflate the
     memory requirements"""
     with Session(get_sqlalchemy_engine()) as db_session:
-        document_ids = [document.id for document in documents]
-
-        # Skip indexing docs that don't have a newer updated at
-        # Shortcuts the time-consuming flow on connector index retries
-        db_docs = get_documents_by_ids(
-            document_ids=document_ids,
+        updatable_docs = _prepare_documents(
+            documents=documents,
+            index_attempt_metadata=index_attempt_metadata,
             db_session=db_session,
         )
-        id_update_time_map = {
-            doc.id: doc.doc_updated_at for doc in db_docs if doc.doc_updated_at
-        }
-
-        updatable_docs: list[Document] = []
-        for doc in documents:
-            if (
-                doc.id in id_update_time_map
-                and doc.doc_updated_at
-                and doc.doc_updated_at <= id_update_time_map[doc.id]
-            ):
-                continue
-            updatable_docs.append(doc)
-        updatable_ids = [doc.id for doc in updatable_docs]
 
-        # Acquires a lock on the documents so that no other process can modify them
-        prepare_to_modify_documents(db_session=db_session, document_ids=updatable_ids)
+        logger.debug("Starting chunking")
+        chunks = _chunk_documents(chunker=chunker, documents=updatable_docs)
 
-        # Create records in the source of truth about these documents,
-        # does not include doc_updated_at which is also used to indicate a successful update
-        upsert_documents_in_db(
-            documents=updatable_docs,
-            index_attempt_metadata=index_attempt_metadata,
+        logger.debug("Starting embedding")
+        chunks_with_embeddings = embedder.embed(chunks=chunks)
+
+        new_docs = _write_chunks(
+            document_index=document_index,
+            updatable_docs=updatable_docs,
+            chunks_with_embeddings=chunks_with_embeddings,
             db_session=db_session,
         )
 
-        logger.debug("Starting chunking")
-        chunks: list[DocAwareChunk] = list(
-            chain(*[chunker.chunk(document=document) for document in updatable_docs])
+    return new_docs, len(chunks)
+
+
+@dataclass
+class _PipelineBatch:
+    documents: list[Document]
+    updatable_docs: list[Document] = field(default_factory=list)
+    chunks: list[DocAwareChunk] = field(default_factory=list)
+    chunks_with_embeddings: list[IndexChunk] = field(default_factory=list)
+    new_docs: int = 0
+
+
+class _PipelineFailure:
+    def __init__(self, stage_name: str, error: Exception) -> None:
+        self.stage_name = stage_name
+        self.error = error
+
+
+_PIPELINE_DONE = object()
+
+
+@dataclass
+class IndexingStageStats:
+    name: str
+    batches: int = 0
+    documents: int = 0
+    chunks: int = 0
+    # Time spent doing work, excludes time waiting on the input queue
+    busy_seconds: float = 0.0
+    # Batches waiting in the stage's input queue, sampled whenever the stage takes a batch
+    queue_samples: int = 0
+    queue_occupancy_total: int = 0
+    max_queue_occupancy: int = 0
+
+    @property
+    def documents_per_second(self) -> float:
+        return self.documents / self.busy_seconds if self.busy_seconds else 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.busy_seconds if self.busy_seconds else 0.0
+
+    @property
+    def avg_queue_occupancy(self) -> float:
+        return (
+            self.queue_occupancy_total / self.queue_samples
+            if self.queue_samples
+            else 0.0
         )
 
-        logger.debug("Starting embedding")
-        chunks_with_embeddings = embedder.embed(chunks=chunks)
+    def to_log_str(self) -> str:
+        return (
+            f"{self.name}: {self.batches} batches, {self.documents} docs, "
+            f"{self.chunks} chunks in {self.busy_seconds:.2f}s busy "
+            f"({self.documents_per_second:.1f} docs/s, {self.chunks_per_second:.1f} chunks/s), "
+            f"queue occupancy avg {self.avg_queue_occupancy:.2f} max {self.max_queue_occupancy}"
+        )
 
-        # Attach the latest status from Postgres (source of truth for access) to each
-        # chunk. This access status will be attached to each chunk in the document index
-        # TODO: attach document sets to the chunk based on the status of Postgres as well
-        document_id_to_access_info = get_access_for_documents(
-            document_ids=updatable_ids, db_session=db_session
+
+class PipelinedIndexingProtocol(Protocol):
+    def __call__(
+        self,
+        document_batches: Iterable[list[Document]],
+        index_attempt_metadata: IndexAttemptMetadata,
+    ) -> Iterator[tuple[list[Document], int, int]]:
+        ...
+
+
+class PipelinedIndexer:
+    """Runs the stages of the indexing pipeline in their own threads, connected by bounded
+    queues, so that e.g. batch N+1 is being chunked while batch N is embedded and batch N-1
+    is written to the document index. Each stage handles one batch at a time and in order.
+
+    The batches are pulled from the `document_batches` iterable and the results are
+    yielded from the calling thread, so the caller can safely use its own DB session both
+    while producing batches and while handling results.
+
+    Each batch goes through the same steps as `_indexing_pipeline`, including taking the
+    document locks before the DB upsert and only recording `doc_updated_at` once the batch
+    has been written to the document index. Since a batch is filtered before the previous
+    ones have been written, a document repeated across consecutive batches may be indexed
+    more than once."""
+
+    def __init__(
+        self,
+        chunker: Chunker,
+        embedder: Embedder,
+        document_index: DocumentIndex,
+        queue_size: int = INDEXING_PIPELINE_QUEUE_SIZE,
+    ) -> None:
+        self.chunker = chunker
+        self.embedder = embedder
+        self.document_index = document_index
+        self.queue_size = max(1, queue_size)
+        self.stage_stats: list[IndexingStageStats] = []
+
+    def _prepare_stage(
+        self, batch: _PipelineBatch, index_attempt_metadata: IndexAttemptMetadata
+    ) -> None:
+        with Session(get_sqlalchemy_engine()) as db_session:
+            batch.updatable_docs = _prepare_documents(
+                documents=batch.documents,
+                index_attempt_metadata=index_attempt_metadata,
+                db_session=db_session,
+            )
+
+    def _chunk_stage(self, batch: _PipelineBatch) -> None:
+        batch.chunks = _chunk_documents(
+            chunker=self.chunker, documents=batch.updatable_docs
         )
-        document_id_to_document_set = {
-            document_id: document_sets
-            for document_id, document_sets in fetch_document_sets_for_documents(
-                document_ids=updatable_ids, db_session=db_session
+
+    def _embed_stage(self, batch: _PipelineBatch) -> None:
+        batch.chunks_with_embeddings = self.embedder.embed(chunks=batch.chunks)
+
+    def _write_stage(self, batch: _PipelineBatch) -> None:
+        with Session(get_sqlalchemy_engine()) as db_session:
+            batch.new_docs = _write_chunks(
+                document_index=self.document_index,
+                updatable_docs=batch.updatable_docs,
+                chunks_with_embeddings=batch.chunks_with_embeddings,
+                db_session=db_session,
             )
-        }
-        access_aware_chunks = [
-            DocMetadataAwareIndexChunk.from_index_chunk(
-                index_chunk=chunk,
-                access=document_id_to_access_info[chunk.source_document.id],
-                document_sets=set(
-                    document_id_to_document_set.get(chunk.source_document.id, [])
+
+    @staticmethod
+    def _run_stage(
+        stage_func: Callable[[_PipelineBatch], None],
+        stats: IndexingStageStats,
+        input_queue: Queue,
+        output_queue: Queue,
+        failed: threading.Event,
+    ) -> None:
+        while True:
+            queue_occupancy = input_queue.qsize()
+            item = input_queue.get()
+            if item is _PIPELINE_DONE or isinstance(item, _PipelineFailure):
+                output_queue.put(item)
+                if item is _PIPELINE_DONE:
+                    return
+                continue
+
+            # Once any stage has failed, keep draining the queue so upstream stages and
+            # the producer never block, but don't do any more work
+            if failed.is_set():
+                continue
+
+            stats.queue_samples += 1
+            stats.queue_occupancy_total += queue_occupancy
+            stats.max_queue_occupancy = max(stats.max_queue_occupancy, queue_occupancy)
+
+            start_time = time.monotonic()
+            try:
+                stage_func(item)
+            except Exception as e:
+                logger.exception(f"Indexing pipeline stage '{stats.name}' failed")
+                failed.set()
+                output_queue.put(_PipelineFailure(stats.name, e))
+                continue
+
+            stats.busy_seconds += time.monotonic() - start_time
+            stats.batches += 1
+            stats.documents += len(item.updatable_docs)
+            stats.chunks += len(item.chunks)
+            output_queue.put(item)
+
+    def __call__(
+        self,
+        document_batches: Iterable[list[Document]],
+        index_attempt_metadata: IndexAttemptMetadata,
+    ) -> Iterator[tuple[list[Document], int, int]]:
+        """Yields the original document batch, the number of new documents and the number of
+        chunks for every batch, in the order the batches were provided. Raises the error of
+        the first failing stage."""
+        stages: list[tuple[str, Callable[[_PipelineBatch], None]]] = [
+            (
+                "prepare",
+                partial(
+                    self._prepare_stage, index_attempt_metadata=index_attempt_metadata
                 ),
-            )
-            for chunk in chunks_with_embeddings
+            ),
+            ("chunk", self._chunk_stage),
+            ("embed", self._embed_stage),
+            ("write", self._write_stage),
         ]
+        self.stage_stats = [IndexingStageStats(name=name) for name, _ in stages]
 
-        logger.debug(
-            f"Indexing the following chunks: {[chunk.to_short_descriptor() for chunk in chunks]}"
-        )
-        # A document will not be spread across different batches, so all the
-        # documents with chunks in this set, are fully represented by the chunks
-        # in this set
-        insertion_records = document_index.index(
-            chunks=access_aware_chunks,
-        )
+        queues: list[Queue] = [Queue(maxsize=self.queue_size) for _ in stages]
+        # Completed batches are consumed by the calling thread, this queue is not bounded
+        # so that the last stage never blocks on it
+        queues.append(Queue())
+        failed = threading.Event()
 
-        successful_doc_ids = [record.document_id for record in insertion_records]
-        successful_docs = [
-            doc for doc in updatable_docs if doc.id in successful_doc_ids
+        threads = [
+            threading.Thread(
+                target=self._run_stage,
+                args=(stage_func, stats, queues[ind], queues[ind + 1], failed),
+                name=f"indexing-pipeline-{stats.name}",
+                daemon=True,
+            )
+            for ind, ((_, stage_func), stats) in enumerate(
+                zip(stages, self.stage_stats)
+            )
         ]
+        for thread in threads:
+            thread.start()
 
-        # Update the time of latest version of the doc successfully indexed
-        ids_to_new_updated_at = {}
-        for doc in successful_docs:
-            if doc.doc_updated_at is None:
-                continue
-            ids_to_new_updated_at[doc.id] = doc.doc_updated_at
+        input_queue = queues[0]
+        output_queue = queues[-1]
 
-        update_docs_updated_at(
-            ids_to_new_updated_at=ids_to_new_updated_at, db_session=db_session
-        )
+        def _handle_output(
+            item: _PipelineBatch | _PipelineFailure,
+        ) -> tuple[list[Document], int, int]:
+            if isinstance(item, _PipelineFailure):
+                raise RuntimeError(
+                    f"Indexing pipeline stage '{item.stage_name}' failed: {item.error}"
+                ) from item.error
+            return item.documents, item.new_docs, len(item.chunks)
 
-    return len([r for r in insertion_records if r.already_existed is False]), len(
-        chunks
-    )
+        try:
+            for documents in document_batches:
+                input_queue.put(_PipelineBatch(documents=documents))
+
+                # Hand back whatever has finished so far without waiting on the rest
+                while not output_queue.empty():
+                    yield _handle_output(output_queue.get())
+
+            input_queue.put(_PIPELINE_DONE)
+            while (item := output_queue.get()) is not _PIPELINE_DONE:
+                yield _handle_output(item)
+        finally:
+            # Unblocks the stage threads if the caller stopped early or an error was raised
+            failed.set()
+            input_queue.put(_PIPELINE_DONE)
+            for thread in threads:
+                thread.join()
+
+            for stats in self.stage_stats:
+                logger.info(f"Indexing pipeline stage {stats.to_log_str()}")
 
 
 def build_indexing_pipeline(
@@ -189,3 +509,20 @@ def build_indexing_pipeline(
         embedder=embedder,
         document_index=document_index,
     )
+
+
+def build_pipelined_indexing_pipeline(
+    *,
+    chunker: Chunker | None = None,
+    embedder: Embedder | None = None,
+    document_index: DocumentIndex | None = None,
+    queue_size: int = INDEXING_PIPELINE_QUEUE_SIZE,
+) -> PipelinedIndexingProtocol:
+    """Builds a pipeline which takes in an iterable of batches of docs and indexes them,
+    overlapping the work on consecutive batches."""
+    return PipelinedIndexer(
+        chunker=chunker or DefaultChunker(),
+        embedder=embedder or DefaultEmbedder(),
+        document_index=document_index or get_default_document_index(),
+        queue_size=queue_size,
+    )
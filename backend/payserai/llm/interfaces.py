@@ -1,9 +1,12 @@
 import abc
+from collections.abc import AsyncIterator
 from collections.abc import Iterator
 
 from langchain.schema.language_model import LanguageModelInput
 
 from payserai.utils.logger import setup_logger
+from payserai.utils.threadpool_concurrency import iterate_in_pool_async
+from payserai.utils.threadpool_concurrency import ThreadPoolName
 
 
 logger = setup_logger()
@@ -33,3 +36,10 @@ class LLM(abc.ABC):
     @abc.abstractmethod
     def stream(self, prompt: LanguageModelInput) -> Iterator[str]:
         raise NotImplementedError
+
+    async def astream(self, prompt: LanguageModelInput) -> AsyncIterator[str]:
+        """Models without an asyncio client are streamed from the LLM thread pool"""
+        async for token in iterate_in_pool_async(
+            self.stream(prompt), pool=ThreadPoolName.LLM
+        ):
+            yield token
@@ -1,3 +1,4 @@
+from collections.abc import AsyncIterator
 from collections.abc import Callable
 from collections.abc import Iterator
 from copy import copy
@@ -16,6 +17,7 @@ from langchain.schema.messages import HumanMessage
 from langchain.schema.messages import SystemMessage
 from tiktoken.core import Encoding
 
+from payserai.configs.app_configs import CHUNK_TOKEN_COUNT_CACHE_SIZE
 from payserai.configs.app_configs import LOG_LEVEL
 from payserai.configs.constants import GEN_AI_API_KEY_STORAGE_KEY
 from payserai.configs.constants import MessageType
@@ -26,12 +28,17 @@ from payserai.dynamic_configs import get_dynamic_config_store
 from payserai.dynamic_configs.interface import ConfigNotFoundError
 from payserai.indexing.models import InferenceChunk
 from payserai.llm.interfaces import LLM
+from payserai.utils.cache import LRUTTLCache
 from payserai.utils.logger import setup_logger
 
 logger = setup_logger()
 
 _LLM_TOKENIZER: Any = None
 _LLM_TOKENIZER_ENCODE: Callable[[str], Any] | None = None
+# Keyed by (chunk unique id, hash of the chunk content) so reindexed chunks are counted again
+_CHUNK_TOKEN_COUNT_CACHE: LRUTTLCache[tuple[str, int], int] = LRUTTLCache(
+    max_size=CHUNK_TOKEN_COUNT_CACHE_SIZE
+)
 
 
 def get_default_llm_tokenizer() -> Any:
@@ -143,6 +150,16 @@ def message_generator_to_string_generator(
         yield message.content
 
 
+async def async_message_generator_to_string_generator(
+    messages: AsyncIterator[BaseMessageChunk],
+) -> AsyncIterator[str]:
+    async for message in messages:
+        if not isinstance(message.content, str):
+            raise RuntimeError("LLM message not in expected format.")
+
+        yield message.content
+
+
 def should_be_verbose() -> bool:
     return LOG_LEVEL == "debug"
 
@@ -156,11 +173,31 @@ def check_number_of_tokens(
     """
 
     if encode_fn is None:
-        encode_fn = tiktoken.get_encoding("cl100k_base").encode
+        encode_fn = get_default_llm_tokenizer().encode
 
     return len(encode_fn(text))
 
 
+def get_chunk_token_counts(chunks: list[InferenceChunk]) -> list[int]:
+    """Number of tokens in the content of each chunk, using the default LLM tokenizer.
+    The same chunks are counted over and over (every search, every offset batch), so the
+    counts are cached and only the chunks not seen before are tokenized, in one batch.
+    """
+    cache_keys = [(chunk.unique_id, hash(chunk.content)) for chunk in chunks]
+    token_counts = [_CHUNK_TOKEN_COUNT_CACHE.get(key) for key in cache_keys]
+
+    uncounted_inds = [ind for ind, count in enumerate(token_counts) if count is None]
+    if uncounted_inds:
+        encoded_chunks = get_default_llm_tokenizer().encode_batch(
+            [chunks[ind].content for ind in uncounted_inds]
+        )
+        for ind, tokens in zip(uncounted_inds, encoded_chunks):
+            token_counts[ind] = len(tokens)
+            _CHUNK_TOKEN_COUNT_CACHE.put(cache_keys[ind], len(tokens))
+
+    return cast(list[int], token_counts)
+
+
 def get_gen_ai_api_key() -> str | None:
     # first check if the key has been provided by the UI
     try:
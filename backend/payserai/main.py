@@ -43,6 +43,7 @@ from payserai.db.engine import get_sqlalchemy_engine
 from payserai.direct_qa.factory import get_default_qa_model
 from payserai.document_index.factory import get_default_document_index
 from payserai.llm.factory import get_default_llm
+from payserai.search.query_preprocessing import preload_nlp_resources
 from payserai.search.search_nlp_models import warm_up_models
 from payserai.server.cc_pair.api import router as cc_pair_router
 from payserai.server.chat_backend import router as chat_router
@@ -175,6 +176,7 @@ def get_application() -> FastAPI:
         nltk.download("stopwords", quiet=True)
         nltk.download("wordnet", quiet=True)
         nltk.download("punkt", quiet=True)
+        preload_nlp_resources()
 
         logger.info("Verifying default connector/credential exist.")
         with Session(get_sqlalchemy_engine(), expire_on_commit=False) as db_session:
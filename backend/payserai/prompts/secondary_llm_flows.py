@@ -2,6 +2,7 @@ from payserai.prompts.constants import ANSWER_PAT
 from payserai.prompts.constants import ANSWERABLE_PAT
 from payserai.prompts.constants import GENERAL_SEP_PAT
 from payserai.prompts.constants import QUESTION_PAT
+from payserai.prompts.constants import REPHRASED_QUERY_KEY
 from payserai.prompts.constants import SOURCES_KEY
 from payserai.prompts.constants import THOUGHT_PAT
 
@@ -132,6 +133,38 @@ Note: The "file" source only applies to when the user refers to uploaded files i
 """.strip()
 
 
+# Combines the time and source filter extraction into a single call, see query_analysis.py
+QUERY_ANALYSIS_PROMPT = f"""
+You are a tool to identify the filters to apply to a user query for a downstream search \
+application. Identify both the time filter and the source filter for the user query.
+
+The downstream application is able to use a recency bias or apply a hard cutoff to remove all \
+documents before the cutoff.
+{{current_day_time_str}}.
+The valid values for "filter_type" are "hard cutoff", "favors recent", or "not time sensitive".
+The valid values for "filter_value" are "day", "week", "month", "quarter", "half", or "year".
+The valid values for "value_multiple" is any number.
+The valid values for "date" is a date in format MM/DD/YYYY, ALWAYS follow this format.
+
+ONLY extract sources when the user is explicitly limiting the scope of where information is \
+coming from. The user may provide invalid source filters, ignore those.
+The valid sources are:
+{{valid_sources}}
+{{web_source_warning}}
+{{file_source_warning}}
+The value for "{SOURCES_KEY}" must be null or a list of valid sources.
+{{rephrase_instructions}}
+ALWAYS answer with ONLY a json which contains the keys "filter_type", "filter_value", \
+"value_multiple", "date" and "{SOURCES_KEY}"{{rephrase_key}}.
+""".strip()
+
+QUERY_ANALYSIS_REPHRASE_INSTRUCTIONS = f"""
+Also rephrase the user query into a standalone query that is best suited for a search engine, \
+keep all proper nouns, technical terms and acronyms. The value for "{REPHRASED_QUERY_KEY}" is \
+the rephrased query.
+""".strip()
+
+
 USEFUL_PAT = "Yes useful"
 NONUSEFUL_PAT = "Not useful"
 CHUNK_FILTER_PROMPT = f"""
@@ -155,6 +188,29 @@ Respond with EXACTLY AND ONLY: "{USEFUL_PAT}" or "{NONUSEFUL_PAT}"
 """.strip()
 
 
+# Same as CHUNK_FILTER_PROMPT but for several sections at once, see chunk_usefulness.py
+BATCH_CHUNK_FILTER_PROMPT = f"""
+Determine for EACH of the numbered reference sections if it is USEFUL for answering the user \
+query.
+It is NOT enough for a section to be related to the query, \
+it must contain information that is USEFUL for answering the query.
+If a section contains ANY useful information, that is good enough, \
+it does not need to fully answer the every part of the user query.
+Judge every section on its own, independent of the other sections.
+
+Reference Sections:
+{{numbered_sections}}
+
+User Query:
+```
+{{user_query}}
+```
+
+Respond with EXACTLY AND ONLY a json which maps the number of EVERY reference section to true \
+if it is useful or false if it is not, for example: {{{{"1": true, "2": false}}}}
+""".strip()
+
+
 LANGUAGE_REPHRASE_PROMPT = """
 Rephrase the query in {target_language}.
 If the query is already in the correct language, \
@@ -0,0 +1,95 @@
+import numpy
+
+from payserai.indexing.models import InferenceChunk
+from payserai.search.models import FusionMode
+
+# Standard constant from the reciprocal rank fusion paper, dampens the weight of the top ranks
+RRF_K = 60
+
+
+def fuse_ranked_ids(
+    ranked_ids: list[numpy.ndarray],
+    ranked_scores: list[numpy.ndarray],
+    mode: FusionMode = FusionMode.MAX_SCORE,
+    weights: list[float] | None = None,
+    rrf_k: int = RRF_K,
+) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """Fuses (unique_id, score) arrays, each sorted from best to worst, into one ranking.
+
+    Returns the unique ids sorted by fused score along with those scores"""
+    if not ranked_ids:
+        return numpy.array([], dtype=object), numpy.array([], dtype=float)
+
+    list_weights = numpy.asarray(
+        weights if weights is not None else [1.0] * len(ranked_ids), dtype=float
+    )
+    all_ids = numpy.concatenate(ranked_ids)
+    all_scores = numpy.concatenate(ranked_scores).astype(float)
+    entry_weights = numpy.repeat(list_weights, [len(ids) for ids in ranked_ids])
+
+    unique_ids, first_inds, unique_inds = numpy.unique(
+        all_ids, return_index=True, return_inverse=True
+    )
+    fused_scores = numpy.zeros(len(unique_ids), dtype=float)
+    if mode == FusionMode.MAX_SCORE:
+        fused_scores.fill(-numpy.inf)
+        numpy.maximum.at(fused_scores, unique_inds, all_scores)
+    elif mode == FusionMode.RECIPROCAL_RANK:
+        ranks = numpy.concatenate([numpy.arange(len(ids)) for ids in ranked_ids])
+        numpy.add.at(fused_scores, unique_inds, entry_weights / (rrf_k + ranks + 1))
+    elif mode == FusionMode.WEIGHTED_SCORE:
+        # Missing from a list counts as a score of 0 for that list
+        numpy.add.at(fused_scores, unique_inds, entry_weights * all_scores)
+        fused_scores /= list_weights.sum()
+    else:
+        raise ValueError(f"Unknown fusion mode: {mode}")
+
+    # Ties keep the order in which the ids were first seen
+    order = numpy.lexsort((first_inds, -fused_scores))
+    return unique_ids[order], fused_scores[order]
+
+
+def fuse_retrieval_results(
+    chunk_sets: list[list[InferenceChunk]],
+    mode: FusionMode = FusionMode.MAX_SCORE,
+    weights: list[float] | None = None,
+    top_k: int | None = None,
+    rrf_k: int = RRF_K,
+) -> list[InferenceChunk]:
+    """Merges the results of several retrievals (e.g. a query and its rephrasings). Fusion only
+    looks at the ids and scores, the chunks of the fused top_k are not copied.
+
+    A chunk retrieved by several queries is returned as the copy with the best score. Except
+    for the max score mode, where it already is that score, the fused score replaces its score.
+    """
+    all_chunks = [chunk for chunk_set in chunk_sets for chunk in chunk_set]
+    if not all_chunks:
+        return []
+
+    ranked_ids = [
+        numpy.array([chunk.unique_id for chunk in chunk_set], dtype=object)
+        for chunk_set in chunk_sets
+    ]
+    ranked_scores = [
+        numpy.array([chunk.score or 0 for chunk in chunk_set], dtype=float)
+        for chunk_set in chunk_sets
+    ]
+    fused_ids, fused_scores = fuse_ranked_ids(
+        ranked_ids, ranked_scores, mode=mode, weights=weights, rrf_k=rrf_k
+    )
+
+    # First entry of each id once sorted by score, ties go to the earlier list
+    all_scores = numpy.concatenate(ranked_scores)
+    entry_order = numpy.argsort(-all_scores, kind="stable")
+    best_ids, first_entries = numpy.unique(
+        numpy.concatenate(ranked_ids)[entry_order], return_index=True
+    )
+    best_entries = dict(zip(best_ids, entry_order[first_entries]))
+
+    fused_chunks: list[InferenceChunk] = []
+    for unique_id, fused_score in zip(fused_ids[:top_k], fused_scores[:top_k]):
+        chunk = all_chunks[best_entries[unique_id]]
+        if mode != FusionMode.MAX_SCORE:
+            chunk.score = float(fused_score)
+        fused_chunks.append(chunk)
+    return fused_chunks
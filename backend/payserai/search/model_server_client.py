@@ -0,0 +1,369 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections.abc import Callable
+from enum import Enum
+from typing import Any
+from urllib.parse import urlparse
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from payserai.configs.app_configs import MODEL_SERVER_CIRCUIT_BREAKER_COOLDOWN_SECONDS
+from payserai.configs.app_configs import MODEL_SERVER_CIRCUIT_BREAKER_THRESHOLD
+from payserai.configs.app_configs import MODEL_SERVER_CONNECT_TIMEOUT_SECONDS
+from payserai.configs.app_configs import MODEL_SERVER_CONNECTION_POOL_SIZE
+from payserai.configs.app_configs import MODEL_SERVER_MAX_RETRIES
+from payserai.configs.app_configs import MODEL_SERVER_READ_TIMEOUT_SECONDS
+from payserai.configs.app_configs import MODEL_SERVER_RETRY_BACKOFF_SECONDS
+from payserai.utils.logger import setup_logger
+from payserai.utils.metrics import DEFAULT_LATENCY_BUCKETS
+from payserai.utils.metrics import Histogram
+
+logger = setup_logger()
+
+# The model server is overloaded or restarting, anything else is not worth retrying
+_RETRYABLE_STATUS_CODES = {502, 503, 504}
+
+
+class ModelServerUnavailableError(requests.ConnectionError):
+    """Raised without contacting the model server while its circuit breaker is open. Subclasses
+    ConnectionError so that existing handling of failed requests also covers it."""
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    # cooldown passed, a single trial call is let through
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int,
+        cooldown_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_seconds = cooldown_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CircuitState.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            return self._state
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._state == CircuitState.CLOSED:
+                return True
+
+            if self._state == CircuitState.OPEN:
+                if self._clock() - self._opened_at < self.cooldown_seconds:
+                    return False
+                self._state = CircuitState.HALF_OPEN
+                self._trial_in_flight = False
+
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = CircuitState.CLOSED
+            self._consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """For calls that ended without an outcome (e.g. cancelled), the next call is let
+        through as the trial instead"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive_failures += 1
+            if (
+                self._state == CircuitState.HALF_OPEN
+                or self._consecutive_failures >= self.failure_threshold
+            ):
+                self._state = CircuitState.OPEN
+                self._opened_at = self._clock()
+                self._trial_in_flight = False
+
+
+class _EndpointMetrics:
+    def __init__(self, endpoint: str) -> None:
+        self.latency_histogram = Histogram(
+            name=f"{endpoint}_latency_seconds", buckets=DEFAULT_LATENCY_BUCKETS
+        )
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.rejected = 0
+
+    def increment(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def to_dict(self) -> dict[str, Any]:
+        with self._lock:
+            counters = {
+                "requests": self.requests,
+                "failures": self.failures,
+                "retries": self.retries,
+                "rejected": self.rejected,
+            }
+        return {**counters, "latency_seconds": self.latency_histogram.to_dict()}
+
+
+class ModelServerClient:
+    """Client for a single model server host. Connections are kept alive and reused across
+    calls and threads, failed calls are retried with jittered exponential backoff and a circuit
+    breaker rejects calls outright while the host keeps failing.
+
+    `apost` is the asyncio equivalent of `post`, it shares the circuit breaker and metrics.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        pool_size: int = MODEL_SERVER_CONNECTION_POOL_SIZE,
+        connect_timeout: float = MODEL_SERVER_CONNECT_TIMEOUT_SECONDS,
+        read_timeout: float = MODEL_SERVER_READ_TIMEOUT_SECONDS,
+        max_retries: int = MODEL_SERVER_MAX_RETRIES,
+        retry_backoff_seconds: float = MODEL_SERVER_RETRY_BACKOFF_SECONDS,
+        circuit_breaker: CircuitBreaker | None = None,
+    ) -> None:
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.circuit_breaker = circuit_breaker or CircuitBreaker(
+            failure_threshold=MODEL_SERVER_CIRCUIT_BREAKER_THRESHOLD,
+            cooldown_seconds=MODEL_SERVER_CIRCUIT_BREAKER_COOLDOWN_SECONDS,
+        )
+
+        self._session = requests.Session()
+        # Retries are handled below so that every attempt goes through the circuit breaker
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+        self._pool_size = pool_size
+        # httpx clients are bound to the event loop they were first used in
+        self._async_client: httpx.AsyncClient | None = None
+        self._async_client_loop: asyncio.AbstractEventLoop | None = None
+
+        self._metrics_lock = threading.Lock()
+        self._endpoint_metrics: dict[str, _EndpointMetrics] = {}
+
+    def _get_endpoint_metrics(self, endpoint: str) -> _EndpointMetrics:
+        with self._metrics_lock:
+            if endpoint not in self._endpoint_metrics:
+                self._endpoint_metrics[endpoint] = _EndpointMetrics(endpoint)
+            return self._endpoint_metrics[endpoint]
+
+    def _backoff_seconds(self, attempt: int) -> float:
+        # "Full jitter" so that callers that failed together don't retry in lockstep
+        return random.uniform(0, self.retry_backoff_seconds * 2**attempt)
+
+    def _start_attempt(self, endpoint: str, metrics: _EndpointMetrics) -> None:
+        if not self.circuit_breaker.allow_request():
+            metrics.increment("rejected")
+            raise ModelServerUnavailableError(
+                f"Model server at {self.base_url} is unavailable, "
+                f"not calling {endpoint}"
+            )
+        metrics.increment("requests")
+
+    def _record_failure(
+        self, endpoint: str, metrics: _EndpointMetrics, attempt: int, reason: str
+    ) -> bool:
+        """Returns whether the call should be attempted again"""
+        metrics.increment("failures")
+        self.circuit_breaker.record_failure()
+        if attempt == self.max_retries:
+            return False
+        logger.warning(
+            f"Call to {endpoint} failed, attempt {attempt + 1} of "
+            f"{self.max_retries + 1}: {reason}"
+        )
+        return True
+
+    def post(
+        self,
+        url: str,
+        json: Any = None,
+        headers: dict[str, str] | None = None,
+    ) -> requests.Response:
+        """Returns the response of the first attempt that reached the server and was not a
+        retryable error status, or the last response if all attempts were. Raises if no attempt
+        could reach the server."""
+        endpoint = urlparse(url).path
+        metrics = self._get_endpoint_metrics(endpoint)
+
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                metrics.increment("retries")
+                time.sleep(self._backoff_seconds(attempt - 1))
+
+            self._start_attempt(endpoint, metrics)
+            start = time.monotonic()
+            try:
+                response = self._session.post(
+                    url, json=json, headers=headers, timeout=self.timeout
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                metrics.latency_histogram.observe(time.monotonic() - start)
+                if not self._record_failure(endpoint, metrics, attempt, str(e)):
+                    raise
+                continue
+            except requests.RequestException:
+                metrics.increment("failures")
+                self.circuit_breaker.record_failure()
+                raise
+            except BaseException:
+                self.circuit_breaker.release_trial()
+                raise
+
+            metrics.latency_histogram.observe(time.monotonic() - start)
+            if response.status_code in _RETRYABLE_STATUS_CODES:
+                if not self._record_failure(
+                    endpoint, metrics, attempt, f"status {response.status_code}"
+                ):
+                    return response
+                continue
+
+            self.circuit_breaker.record_success()
+            return response
+
+        raise RuntimeError("Unreachable, the last attempt always returns or raises")
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            connect_timeout, read_timeout = self.timeout
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self._pool_size,
+                    max_keepalive_connections=self._pool_size,
+                ),
+            )
+            self._async_client_loop = loop
+        return self._async_client
+
+    async def apost(
+        self,
+        url: str,
+        json: Any = None,
+        headers: dict[str, str] | None = None,
+    ) -> httpx.Response:
+        """Same as `post` but does not block the event loop. Connection errors and timeouts
+        are raised as httpx exceptions."""
+        endpoint = urlparse(url).path
+        metrics = self._get_endpoint_metrics(endpoint)
+        client = self._get_async_client()
+
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                metrics.increment("retries")
+                await asyncio.sleep(self._backoff_seconds(attempt - 1))
+
+            self._start_attempt(endpoint, metrics)
+            start = time.monotonic()
+            try:
+                response = await client.post(url, json=json, headers=headers)
+            except (httpx.NetworkError, httpx.TimeoutException) as e:
+                metrics.latency_histogram.observe(time.monotonic() - start)
+                if not self._record_failure(endpoint, metrics, attempt, str(e)):
+                    raise
+                continue
+            except httpx.HTTPError:
+                metrics.increment("failures")
+                self.circuit_breaker.record_failure()
+                raise
+            except BaseException:
+                # Cancelled, e.g. when the client disconnects or a speculative task is dropped
+                self.circuit_breaker.release_trial()
+                raise
+
+            metrics.latency_histogram.observe(time.monotonic() - start)
+            if response.status_code in _RETRYABLE_STATUS_CODES:
+                if not self._record_failure(
+                    endpoint, metrics, attempt, f"status {response.status_code}"
+                ):
+                    return response
+                continue
+
+            self.circuit_breaker.record_success()
+            return response
+
+        raise RuntimeError("Unreachable, the last attempt always returns or raises")
+
+    def get_metrics(self) -> dict[str, Any]:
+        with self._metrics_lock:
+            endpoint_metrics = dict(self._endpoint_metrics)
+        return {
+            "base_url": self.base_url,
+            "circuit_state": self.circuit_breaker.state.value,
+            "endpoints": {
+                endpoint: metrics.to_dict()
+                for endpoint, metrics in endpoint_metrics.items()
+            },
+        }
+
+
+_CLIENTS: dict[str, ModelServerClient] = {}
+_CLIENTS_PID: int | None = None
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_model_server_client(url: str) -> ModelServerClient:
+    """One client per model server host, shared by all callers in the process"""
+    global _CLIENTS_PID
+    parsed_url = urlparse(url)
+    base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
+    with _CLIENTS_LOCK:
+        # Pooled connections must not be shared with forked child processes
+        if _CLIENTS_PID != os.getpid():
+            _CLIENTS.clear()
+            _CLIENTS_PID = os.getpid()
+
+        if base_url not in _CLIENTS:
+            _CLIENTS[base_url] = ModelServerClient(base_url=base_url)
+        return _CLIENTS[base_url]
+
+
+def get_model_server_client_metrics() -> list[dict[str, Any]]:
+    with _CLIENTS_LOCK:
+        clients = list(_CLIENTS.values())
+    return [client.get_metrics() for client in clients]
+
+
+def post_to_model_server(
+    url: str,
+    json: Any = None,
+    headers: dict[str, str] | None = None,
+) -> requests.Response:
+    return get_model_server_client(url).post(url, json=json, headers=headers)
+
+
+async def async_post_to_model_server(
+    url: str,
+    json: Any = None,
+    headers: dict[str, str] | None = None,
+) -> httpx.Response:
+    return await get_model_server_client(url).apost(url, json=json, headers=headers)
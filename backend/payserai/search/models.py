@@ -27,6 +27,12 @@ class QueryFlow(str, Enum):
     QUESTION_ANSWER = "question-answer"
 
 
+class FusionMode(str, Enum):
+    MAX_SCORE = "max"
+    RECIPROCAL_RANK = "rrf"
+    WEIGHTED_SCORE = "weighted"
+
+
 class Embedder:
     def embed(self, chunks: list[DocAwareChunk]) -> list[IndexChunk]:
         raise NotImplementedError
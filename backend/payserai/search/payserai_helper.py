@@ -2,11 +2,13 @@ from transformers import AutoTokenizer  # type:ignore
 
 from payserai.search.models import QueryFlow
 from payserai.search.models import SearchType
+from payserai.search.query_preprocessing import analyze_query_text
+from payserai.search.query_preprocessing import QueryAnalysis
 from payserai.search.search_nlp_models import get_default_tokenizer
 from payserai.search.search_nlp_models import IntentModel
-from payserai.search.search_runner import remove_stop_words
 from payserai.server.models import HelperResponse
 from payserai.utils.logger import setup_logger
+from payserai.utils.timing import log_async_function_time
 from payserai.utils.timing import log_function_time
 
 logger = setup_logger()
@@ -23,10 +25,7 @@ def count_unk_tokens(text: str, tokenizer: AutoTokenizer) -> int:
     return num_unk_tokens
 
 
-@log_function_time()
-def query_intent(query: str) -> tuple[SearchType, QueryFlow]:
-    intent_model = IntentModel()
-    class_probs = intent_model.predict(query)
+def _class_probs_to_intent(class_probs: list[float]) -> tuple[SearchType, QueryFlow]:
     keyword = class_probs[0]
     semantic = class_probs[1]
     qa = class_probs[2]
@@ -57,18 +56,28 @@ def query_intent(query: str) -> tuple[SearchType, QueryFlow]:
     return predicted_search, predicted_flow
 
 
+@log_function_time()
+def query_intent(query: str) -> tuple[SearchType, QueryFlow]:
+    return _class_probs_to_intent(IntentModel().predict(query))
+
+
+@log_async_function_time()
+async def async_query_intent(query: str) -> tuple[SearchType, QueryFlow]:
+    return _class_probs_to_intent(await IntentModel().async_predict(query))
+
+
 def recommend_search_flow(
     query: str,
     keyword: bool = False,
     max_percent_stopwords: float = 0.30,  # ~Every third word max, ie "effects of caffeine" still viable keyword search
+    query_analysis: QueryAnalysis | None = None,
 ) -> HelperResponse:
     heuristic_search_type: SearchType | None = None
     message: str | None = None
 
     # Heuristics based decisions
-    words = query.split()
-    non_stopwords = remove_stop_words(query)
-    non_stopword_percent = len(non_stopwords) / len(words)
+    query_analysis = query_analysis or analyze_query_text(query)
+    non_stopword_percent = query_analysis.non_stop_word_ratio
 
     # UNK tokens -> suggest Keyword (still may be valid QA)
     if count_unk_tokens(query, get_default_tokenizer()) > 0:
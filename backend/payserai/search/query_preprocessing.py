@@ -0,0 +1,85 @@
+import threading
+from dataclasses import dataclass
+
+from nltk.corpus import stopwords  # type:ignore
+from nltk.stem import WordNetLemmatizer  # type:ignore
+from nltk.tokenize import word_tokenize  # type:ignore
+
+_NLP_RESOURCES_LOCK = threading.Lock()
+_STOP_WORDS: None | frozenset[str] = None
+_LEMMATIZER: None | WordNetLemmatizer = None
+
+
+def get_stop_words() -> frozenset[str]:
+    global _STOP_WORDS
+    if _STOP_WORDS is None:
+        with _NLP_RESOURCES_LOCK:
+            if _STOP_WORDS is None:
+                _STOP_WORDS = frozenset(stopwords.words("english"))
+    return _STOP_WORDS
+
+
+def get_lemmatizer() -> WordNetLemmatizer:
+    global _LEMMATIZER
+    if _LEMMATIZER is None:
+        with _NLP_RESOURCES_LOCK:
+            if _LEMMATIZER is None:
+                lemmatizer = WordNetLemmatizer()
+                # WordNet is lazily loaded on first use, which is not thread safe, so it's
+                # loaded before the lemmatizer is shared with the search threads
+                lemmatizer.lemmatize("warmup")
+                _LEMMATIZER = lemmatizer
+    return _LEMMATIZER
+
+
+def preload_nlp_resources() -> None:
+    """Loads the NLTK data used for query preprocessing so the first search does not pay
+    for it. The data must already be downloaded."""
+    get_stop_words()
+    get_lemmatizer()
+    word_tokenize("warmup")
+
+
+@dataclass(frozen=True)
+class QueryAnalysis:
+    """Keyword preprocessing of a query, computed once per query with analyze_query_text and
+    shared by retrieval and the search flow recommendation"""
+
+    query: str
+    tokens: tuple[str, ...]
+    # Falls back to all tokens if the query is only stop words
+    non_stop_tokens: tuple[str, ...]
+    # Lemmas of the non stop word tokens
+    lemmas: tuple[str, ...]
+
+    @property
+    def stop_words_removed_query(self) -> str:
+        return " ".join(self.non_stop_tokens)
+
+    @property
+    def keyword_query(self) -> str:
+        """The query sent for keyword matching when the keyword query is edited"""
+        return " ".join(self.lemmas)
+
+    @property
+    def non_stop_word_ratio(self) -> float:
+        """Relative to the whitespace separated words of the query, like the search flow
+        heuristics have always counted them"""
+        num_words = len(self.query.split())
+        return len(self.non_stop_tokens) / num_words if num_words else 0.0
+
+
+def analyze_query_text(query: str) -> QueryAnalysis:
+    stop_words = get_stop_words()
+    lemmatizer = get_lemmatizer()
+
+    tokens = tuple(word_tokenize(query))
+    non_stop_tokens = (
+        tuple(token for token in tokens if token.casefold() not in stop_words) or tokens
+    )
+    return QueryAnalysis(
+        query=query,
+        tokens=tokens,
+        non_stop_tokens=non_stop_tokens,
+        lemmas=tuple(lemmatizer.lemmatize(token) for token in non_stop_tokens),
+    )
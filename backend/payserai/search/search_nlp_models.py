@@ -1,6 +1,7 @@
 import logging
 import os
 
+import httpx
 import numpy as np
 import requests
 import tensorflow as tf  # type: ignore
@@ -12,6 +13,7 @@ from transformers import TFDistilBertForSequenceClassification  # type: ignore
 from payserai.configs.app_configs import BACKGROUND_JOB_EMBEDDING_MODEL_SERVER_HOST
 from payserai.configs.app_configs import CROSS_ENCODER_MODEL_SERVER_HOST
 from payserai.configs.app_configs import CURRENT_PROCESS_IS_AN_INDEXING_JOB
+from payserai.configs.app_configs import DISABLE_MODEL_SERVER_BINARY_TRANSPORT
 from payserai.configs.app_configs import EMBEDDING_MODEL_SERVER_HOST
 from payserai.configs.app_configs import INTENT_MODEL_SERVER_HOST
 from payserai.configs.app_configs import MODEL_SERVER_PORT
@@ -22,7 +24,13 @@ from payserai.configs.model_configs import DOCUMENT_ENCODER_MODEL
 from payserai.configs.model_configs import INTENT_MODEL_VERSION
 from payserai.configs.model_configs import NORMALIZE_EMBEDDINGS
 from payserai.configs.model_configs import QUERY_MAX_CONTEXT_SIZE
+from payserai.search.model_server_client import async_post_to_model_server
+from payserai.search.model_server_client import post_to_model_server
 from payserai.utils.logger import setup_logger
+from payserai.utils.threadpool_concurrency import run_in_pool_async
+from payserai.utils.threadpool_concurrency import ThreadPoolName
+from shared_models.float_matrix import decode_float32_matrix
+from shared_models.float_matrix import FLOAT32_MATRIX_MEDIA_TYPE
 from shared_models.model_server_models import EmbedRequest
 from shared_models.model_server_models import EmbedResponse
 from shared_models.model_server_models import IntentRequest
@@ -114,6 +122,19 @@ def build_model_server_url(
     return f"http://{model_server_url}"
 
 
+def _float32_matrix_request_headers() -> dict[str, str]:
+    if DISABLE_MODEL_SERVER_BINARY_TRANSPORT:
+        return {}
+    # JSON stays acceptable so that older model servers can still answer
+    return {"Accept": f"{FLOAT32_MATRIX_MEDIA_TYPE}, application/json;q=0.5"}
+
+
+def _is_float32_matrix_response(response: requests.Response | httpx.Response) -> bool:
+    return response.headers.get("Content-Type", "").startswith(
+        FLOAT32_MATRIX_MEDIA_TYPE
+    )
+
+
 class EmbeddingModel:
     def __init__(
         self,
@@ -157,11 +178,15 @@ class EmbeddingModel:
             embed_request = EmbedRequest(texts=texts)
 
             try:
-                response = requests.post(
-                    self.embed_server_endpoint, json=embed_request.dict()
+                response = post_to_model_server(
+                    self.embed_server_endpoint,
+                    json=embed_request.dict(),
+                    headers=_float32_matrix_request_headers(),
                 )
                 response.raise_for_status()
 
+                if _is_float32_matrix_response(response):
+                    return decode_float32_matrix(response.content)
                 return EmbedResponse(**response.json()).embeddings
             except requests.RequestException as e:
                 logger.exception(f"Failed to get Embedding: {e}")
@@ -176,6 +201,31 @@ class EmbeddingModel:
             texts, normalize_embeddings=normalize_embeddings
         ).tolist()
 
+    async def async_encode(
+        self, texts: list[str], normalize_embeddings: bool = NORMALIZE_EMBEDDINGS
+    ) -> list[list[float]]:
+        if not self.embed_server_endpoint:
+            # Local models are CPU bound, run them off the event loop
+            return await run_in_pool_async(
+                self.encode, texts, normalize_embeddings, pool=ThreadPoolName.SEARCH
+            )
+
+        embed_request = EmbedRequest(texts=texts)
+        try:
+            response = await async_post_to_model_server(
+                self.embed_server_endpoint,
+                json=embed_request.dict(),
+                headers=_float32_matrix_request_headers(),
+            )
+            response.raise_for_status()
+        except (requests.RequestException, httpx.HTTPError) as e:
+            logger.exception(f"Failed to get Embedding: {e}")
+            raise
+
+        if _is_float32_matrix_response(response):
+            return decode_float32_matrix(response.content)
+        return EmbedResponse(**response.json()).embeddings
+
 
 class CrossEncoderEnsembleModel:
     def __init__(
@@ -209,11 +259,15 @@ class CrossEncoderEnsembleModel:
             rerank_request = RerankRequest(query=query, documents=passages)
 
             try:
-                response = requests.post(
-                    self.rerank_server_endpoint, json=rerank_request.dict()
+                response = post_to_model_server(
+                    self.rerank_server_endpoint,
+                    json=rerank_request.dict(),
+                    headers=_float32_matrix_request_headers(),
                 )
                 response.raise_for_status()
 
+                if _is_float32_matrix_response(response):
+                    return decode_float32_matrix(response.content)
                 return RerankResponse(**response.json()).scores
             except requests.RequestException as e:
                 logger.exception(f"Failed to get Reranking Scores: {e}")
@@ -231,6 +285,28 @@ class CrossEncoderEnsembleModel:
 
         return scores
 
+    async def async_predict(self, query: str, passages: list[str]) -> list[list[float]]:
+        if not self.rerank_server_endpoint:
+            return await run_in_pool_async(
+                self.predict, query, passages, pool=ThreadPoolName.SEARCH
+            )
+
+        rerank_request = RerankRequest(query=query, documents=passages)
+        try:
+            response = await async_post_to_model_server(
+                self.rerank_server_endpoint,
+                json=rerank_request.dict(),
+                headers=_float32_matrix_request_headers(),
+            )
+            response.raise_for_status()
+        except (requests.RequestException, httpx.HTTPError) as e:
+            logger.exception(f"Failed to get Reranking Scores: {e}")
+            raise
+
+        if _is_float32_matrix_response(response):
+            return decode_float32_matrix(response.content)
+        return RerankResponse(**response.json()).scores
+
 
 class IntentModel:
     def __init__(
@@ -267,7 +343,7 @@ class IntentModel:
             intent_request = IntentRequest(query=query)
 
             try:
-                response = requests.post(
+                response = post_to_model_server(
                     self.intent_server_endpoint, json=intent_request.dict()
                 )
                 response.raise_for_status()
@@ -294,6 +370,27 @@ class IntentModel:
 
         return list(class_percentages.tolist()[0])
 
+    async def async_predict(
+        self,
+        query: str,
+    ) -> list[float]:
+        if not self.intent_server_endpoint:
+            return await run_in_pool_async(
+                self.predict, query, pool=ThreadPoolName.SEARCH
+            )
+
+        intent_request = IntentRequest(query=query)
+        try:
+            response = await async_post_to_model_server(
+                self.intent_server_endpoint, json=intent_request.dict()
+            )
+            response.raise_for_status()
+        except (requests.RequestException, httpx.HTTPError) as e:
+            logger.exception(f"Failed to get Intent: {e}")
+            raise
+
+        return IntentResponse(**response.json()).class_probs
+
 
 def warm_up_models(
     skip_cross_encoders: bool = False,
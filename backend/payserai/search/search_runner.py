@@ -1,56 +1,97 @@
+import asyncio
+from collections.abc import AsyncGenerator
 from collections.abc import Callable
 from collections.abc import Iterator
 from copy import deepcopy
 from typing import cast
 
 import numpy
-from nltk.corpus import stopwords  # type:ignore
-from nltk.stem import WordNetLemmatizer  # type:ignore
 from nltk.tokenize import word_tokenize  # type:ignore
 from sqlalchemy.orm import Session
 
 from payserai.configs.app_configs import DISABLE_LLM_CHUNK_FILTER
 from payserai.configs.app_configs import HYBRID_ALPHA
+from payserai.configs.app_configs import LLM_CHUNK_FILTER_CACHE_SIZE
+from payserai.configs.app_configs import LLM_CHUNK_FILTER_CACHE_TTL_SECONDS
+from payserai.configs.app_configs import MULTI_QUERY_FUSION_MODE
+from payserai.configs.app_configs import MULTI_QUERY_REPHRASE_WEIGHT
 from payserai.configs.app_configs import MULTILINGUAL_QUERY_EXPANSION
 from payserai.configs.app_configs import NUM_RERANKED_RESULTS
+from payserai.configs.app_configs import QUERY_EMBEDDING_CACHE_SIZE
+from payserai.configs.app_configs import QUERY_EMBEDDING_CACHE_TTL_SECONDS
+from payserai.configs.app_configs import SEARCH_RESULT_CACHE_SIZE
+from payserai.configs.app_configs import SEARCH_RESULT_CACHE_TTL_SECONDS
 from payserai.configs.model_configs import ASYM_QUERY_PREFIX
 from payserai.configs.model_configs import CROSS_ENCODER_RANGE_MAX
 from payserai.configs.model_configs import CROSS_ENCODER_RANGE_MIN
 from payserai.configs.model_configs import ENABLE_RERANKING_REAL_TIME_FLOW
+from payserai.configs.model_configs import FAST_GEN_AI_MODEL_VERSION
+from payserai.configs.model_configs import GEN_AI_MODEL_PROVIDER
 from payserai.configs.model_configs import SIM_SCORE_RANGE_HIGH
 from payserai.configs.model_configs import SIM_SCORE_RANGE_LOW
 from payserai.configs.model_configs import SKIP_RERANKING
 from payserai.db.feedback import create_query_event
 from payserai.db.feedback import update_query_event_retrieved_documents
 from payserai.db.models import User
+from payserai.document_index.document_index_utils import (
+    get_document_index_generation,
+)
 from payserai.document_index.document_index_utils import (
     translate_boost_count_to_multiplier,
 )
 from payserai.document_index.interfaces import DocumentIndex
 from payserai.indexing.models import InferenceChunk
+from payserai.llm.utils import get_chunk_token_counts
 from payserai.search.access_filters import build_access_filters_for_user
+from payserai.search.fusion import fuse_retrieval_results
 from payserai.search.models import ChunkMetric
+from payserai.search.models import FusionMode
 from payserai.search.models import IndexFilters
 from payserai.search.models import MAX_METRICS_CONTENT
 from payserai.search.models import RerankMetricsContainer
 from payserai.search.models import RetrievalMetricsContainer
 from payserai.search.models import SearchQuery
 from payserai.search.models import SearchType
+from payserai.search.query_preprocessing import analyze_query_text
+from payserai.search.query_preprocessing import get_lemmatizer
 from payserai.search.search_nlp_models import CrossEncoderEnsembleModel
 from payserai.search.search_nlp_models import EmbeddingModel
-from payserai.secondary_llm_flows.chunk_usefulness import llm_batch_eval_chunks
+from payserai.search.speculative_retrieval import get_speculative_candidates
+from payserai.search.speculative_retrieval import SpeculativeRetrieval
+from payserai.secondary_llm_flows.chunk_usefulness import llm_eval_chunks
 from payserai.secondary_llm_flows.query_expansion import rephrase_query
 from payserai.server.models import QuestionRequest
 from payserai.server.models import SearchDoc
+from payserai.utils.cache import LRUTTLCache
 from payserai.utils.logger import setup_logger
 from payserai.utils.threadpool_concurrency import FunctionCall
 from payserai.utils.threadpool_concurrency import run_functions_in_parallel
 from payserai.utils.threadpool_concurrency import run_functions_tuples_in_parallel
+from payserai.utils.threadpool_concurrency import run_in_pool_async
+from payserai.utils.threadpool_concurrency import ThreadPoolName
+from payserai.utils.timing import log_async_function_time
 from payserai.utils.timing import log_function_time
 
 
 logger = setup_logger()
 
+# Keyed by (model name, query prefix, normalized query)
+_QUERY_EMBEDDING_CACHE: LRUTTLCache[tuple[str, str, str], list[float]] = LRUTTLCache(
+    max_size=QUERY_EMBEDDING_CACHE_SIZE,
+    ttl_seconds=QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+)
+# Holds the retrieved chunks and the reranked chunks (None if reranking was skipped)
+SearchResultCacheValue = tuple[list[InferenceChunk], list[InferenceChunk] | None]
+_SEARCH_RESULT_CACHE: LRUTTLCache[tuple, SearchResultCacheValue] = LRUTTLCache(
+    max_size=SEARCH_RESULT_CACHE_SIZE,
+    ttl_seconds=SEARCH_RESULT_CACHE_TTL_SECONDS,
+)
+# Keyed by (normalized query, chunk unique id, chunk content hash, model)
+_LLM_CHUNK_FILTER_CACHE: LRUTTLCache[tuple[str, str, int, str], bool] = LRUTTLCache(
+    max_size=LLM_CHUNK_FILTER_CACHE_SIZE,
+    ttl_seconds=LLM_CHUNK_FILTER_CACHE_TTL_SECONDS,
+)
+
 
 def _log_top_chunk_links(search_flow: str, chunks: list[InferenceChunk]) -> None:
     top_links = [
@@ -60,32 +101,134 @@ def _log_top_chunk_links(search_flow: str, chunks: list[InferenceChunk]) -> None
 
 
 def lemmatize_text(text: str) -> list[str]:
-    lemmatizer = WordNetLemmatizer()
+    lemmatizer = get_lemmatizer()
     word_tokens = word_tokenize(text)
     return [lemmatizer.lemmatize(word) for word in word_tokens]
 
 
 def remove_stop_words(text: str) -> list[str]:
-    stop_words = set(stopwords.words("english"))
-    word_tokens = word_tokenize(text)
-    text_trimmed = [word for word in word_tokens if word.casefold() not in stop_words]
-    return text_trimmed or word_tokens
+    return list(analyze_query_text(text).non_stop_tokens)
 
 
 def query_processing(
     query: str,
 ) -> str:
-    query = " ".join(remove_stop_words(query))
-    query = " ".join(lemmatize_text(query))
-    return query
+    return analyze_query_text(query).keyword_query
+
+
+def normalize_query_text(query: str) -> str:
+    return " ".join(query.split())
+
+
+def get_query_embedding_cache() -> LRUTTLCache[tuple[str, str, str], list[float]]:
+    return _QUERY_EMBEDDING_CACHE
 
 
 def embed_query(
     query: str,
     prefix: str = ASYM_QUERY_PREFIX,
 ) -> list[float]:
-    prefixed_query = prefix + query
-    return EmbeddingModel().encode([prefixed_query])[0]
+    model = EmbeddingModel()
+    normalized_query = normalize_query_text(query)
+
+    def _embed() -> list[float]:
+        return model.encode([prefix + normalized_query])[0]
+
+    return _QUERY_EMBEDDING_CACHE.get_or_compute(
+        (model.model_name, prefix, normalized_query), _embed
+    )
+
+
+async def async_embed_query(
+    query: str,
+    prefix: str = ASYM_QUERY_PREFIX,
+) -> list[float]:
+    model = EmbeddingModel()
+    normalized_query = normalize_query_text(query)
+    cache_key = (model.model_name, prefix, normalized_query)
+
+    query_embedding = _QUERY_EMBEDDING_CACHE.get(cache_key)
+    if query_embedding is None:
+        query_embedding = (await model.async_encode([prefix + normalized_query]))[0]
+        _QUERY_EMBEDDING_CACHE.put(cache_key, query_embedding)
+    return query_embedding
+
+
+def _get_cached_query_embeddings(
+    model_name: str, queries: list[str], prefix: str
+) -> tuple[
+    list[tuple[str, str, str]], list[list[float] | None], list[tuple[str, str, str]]
+]:
+    """Returns the cache key and cached embedding (or None) of each query, and the keys
+    that are missing from the cache without duplicates"""
+    cache_keys = [
+        (model_name, prefix, normalize_query_text(query)) for query in queries
+    ]
+    embeddings = [_QUERY_EMBEDDING_CACHE.get(key) for key in cache_keys]
+    # dict keeps the order and drops duplicate queries
+    missing_keys = list(
+        dict.fromkeys(
+            key for key, embedding in zip(cache_keys, embeddings) if embedding is None
+        )
+    )
+    return cache_keys, embeddings, missing_keys
+
+
+def _fill_query_embeddings(
+    cache_keys: list[tuple[str, str, str]],
+    cached_embeddings: list[list[float] | None],
+    missing_keys: list[tuple[str, str, str]],
+    missing_embeddings: list[list[float]],
+) -> list[list[float]]:
+    computed_embeddings = dict(zip(missing_keys, missing_embeddings))
+    for key, embedding in computed_embeddings.items():
+        _QUERY_EMBEDDING_CACHE.put(key, embedding)
+    return [
+        embedding if embedding is not None else computed_embeddings[key]
+        for key, embedding in zip(cache_keys, cached_embeddings)
+    ]
+
+
+def embed_queries(
+    queries: list[str],
+    prefix: str = ASYM_QUERY_PREFIX,
+) -> list[list[float]]:
+    """Embeds all the queries (e.g. a query and its rephrasings) with a single model call,
+    queries already in the embedding cache are not sent to the model"""
+    model = EmbeddingModel()
+    cache_keys, embeddings, missing_keys = _get_cached_query_embeddings(
+        model.model_name, queries, prefix
+    )
+    if not missing_keys:
+        return cast(list[list[float]], embeddings)
+
+    missing_embeddings = model.encode([prefix + key[2] for key in missing_keys])
+    return _fill_query_embeddings(
+        cache_keys, embeddings, missing_keys, missing_embeddings
+    )
+
+
+async def async_embed_queries(
+    queries: list[str],
+    prefix: str = ASYM_QUERY_PREFIX,
+) -> list[list[float]]:
+    model = EmbeddingModel()
+    cache_keys, embeddings, missing_keys = _get_cached_query_embeddings(
+        model.model_name, queries, prefix
+    )
+    if not missing_keys:
+        return cast(list[list[float]], embeddings)
+
+    missing_embeddings = await model.async_encode(
+        [prefix + key[2] for key in missing_keys]
+    )
+    return _fill_query_embeddings(
+        cache_keys, embeddings, missing_keys, missing_embeddings
+    )
+
+
+def uses_query_embedding(search_type: SearchType) -> bool:
+    return search_type in (SearchType.SEMANTIC, SearchType.HYBRID)
 
 
 def chunks_to_search_docs(chunks: list[InferenceChunk] | None) -> list[SearchDoc]:
@@ -114,41 +257,43 @@ def chunks_to_search_docs(chunks: list[InferenceChunk] | None) -> list[SearchDoc
 
 
 def combine_retrieval_results(
+    query: SearchQuery,
+    rephrases: list[str],
     chunk_sets: list[list[InferenceChunk]],
+    fusion_mode: FusionMode = FusionMode(MULTI_QUERY_FUSION_MODE),
+    rephrase_weight: float = MULTI_QUERY_REPHRASE_WEIGHT,
 ) -> list[InferenceChunk]:
-    all_chunks = [chunk for chunk_set in chunk_sets for chunk in chunk_set]
-
-    unique_chunks: dict[tuple[str, int], InferenceChunk] = {}
-    for chunk in all_chunks:
-        key = (chunk.document_id, chunk.chunk_id)
-        if key not in unique_chunks:
-            unique_chunks[key] = chunk
-            continue
-
-        stored_chunk_score = unique_chunks[key].score or 0
-        this_chunk_score = chunk.score or 0
-        if stored_chunk_score < this_chunk_score:
-            unique_chunks[key] = chunk
-
-    sorted_chunks = sorted(
-        unique_chunks.values(), key=lambda x: x.score or 0, reverse=True
+    """Fuses the results of the query and its rephrasings. The max score mode returns all of
+    the retrieved chunks, the rank and weighted modes only as many as a single retrieval.
+    """
+    weights = [
+        1.0 if rephrase == query.query else rephrase_weight for rephrase in rephrases
+    ]
+    return fuse_retrieval_results(
+        chunk_sets,
+        mode=fusion_mode,
+        weights=weights,
+        top_k=None if fusion_mode == FusionMode.MAX_SCORE else query.num_hits,
     )
 
-    return sorted_chunks
-
 
 @log_function_time()
 def doc_index_retrieval(
     query: SearchQuery,
     document_index: DocumentIndex,
     hybrid_alpha: float = HYBRID_ALPHA,
+    query_embedding: list[float] | None = None,
 ) -> list[InferenceChunk]:
+    # Keyword preprocessing is done once here instead of in each index call
+    query_analysis = analyze_query_text(query.query)
+
     if query.search_type == SearchType.KEYWORD:
         top_chunks = document_index.keyword_retrieval(
             query=query.query,
             filters=query.filters,
             favor_recent=query.favor_recent,
             num_to_retrieve=query.num_hits,
+            query_analysis=query_analysis,
         )
 
     elif query.search_type == SearchType.SEMANTIC:
@@ -157,6 +302,8 @@ def doc_index_retrieval(
             filters=query.filters,
             favor_recent=query.favor_recent,
             num_to_retrieve=query.num_hits,
+            query_analysis=query_analysis,
+            query_embedding=query_embedding,
         )
 
     elif query.search_type == SearchType.HYBRID:
@@ -166,6 +313,8 @@ def doc_index_retrieval(
             favor_recent=query.favor_recent,
             num_to_retrieve=query.num_hits,
             hybrid_alpha=hybrid_alpha,
+            query_analysis=query_analysis,
+            query_embedding=query_embedding,
         )
 
     else:
@@ -174,23 +323,96 @@ def doc_index_retrieval(
     return top_chunks
 
 
-@log_function_time()
-def semantic_reranking(
-    query: str,
-    chunks: list[InferenceChunk],
-    rerank_metrics_callback: Callable[[RerankMetricsContainer], None] | None = None,
-    model_min: int = CROSS_ENCODER_RANGE_MIN,
-    model_max: int = CROSS_ENCODER_RANGE_MAX,
-) -> tuple[list[InferenceChunk], list[int]]:
-    """Reranks chunks based on cross-encoder models. Additionally provides the original indices
-    of the chunks in their new sorted order.
+@log_async_function_time()
+async def async_doc_index_retrieval(
+    query: SearchQuery,
+    document_index: DocumentIndex,
+    hybrid_alpha: float = HYBRID_ALPHA,
+    query_embedding: list[float] | None = None,
+) -> list[InferenceChunk]:
+    query_analysis = analyze_query_text(query.query)
 
-    Note: this updates the chunks in place, it updates the chunk scores which came from retrieval
-    """
-    cross_encoders = CrossEncoderEnsembleModel()
-    passages = [chunk.content for chunk in chunks]
-    sim_scores_floats = cross_encoders.predict(query=query, passages=passages)
+    if query.search_type == SearchType.KEYWORD:
+        top_chunks = await document_index.async_keyword_retrieval(
+            query=query.query,
+            filters=query.filters,
+            favor_recent=query.favor_recent,
+            num_to_retrieve=query.num_hits,
+            query_analysis=query_analysis,
+        )
+
+    elif query.search_type == SearchType.SEMANTIC:
+        top_chunks = await document_index.async_semantic_retrieval(
+            query=query.query,
+            filters=query.filters,
+            favor_recent=query.favor_recent,
+            num_to_retrieve=query.num_hits,
+            query_analysis=query_analysis,
+            query_embedding=query_embedding,
+        )
+
+    elif query.search_type == SearchType.HYBRID:
+        top_chunks = await document_index.async_hybrid_retrieval(
+            query=query.query,
+            filters=query.filters,
+            favor_recent=query.favor_recent,
+            num_to_retrieve=query.num_hits,
+            hybrid_alpha=hybrid_alpha,
+            query_analysis=query_analysis,
+            query_embedding=query_embedding,
+        )
+
+    else:
+        raise RuntimeError("Invalid Search Flow")
+
+    return top_chunks
+
+
+def _cross_encoder_scores_per_chunk(
+    chunks: list[InferenceChunk], sim_scores_floats: list[list[float]]
+) -> dict[str, list[float]]:
+    return {
+        chunk.unique_id: [model_scores[ind] for model_scores in sim_scores_floats]
+        for ind, chunk in enumerate(chunks)
+    }
+
+
+def _cross_encoder_scores_per_model(
+    chunks: list[InferenceChunk], chunk_scores: dict[str, list[float]]
+) -> list[list[float]]:
+    num_models = len(chunk_scores[chunks[0].unique_id])
+    return [
+        [chunk_scores[chunk.unique_id][model_ind] for chunk in chunks]
+        for model_ind in range(num_models)
+    ]
 
+
+def predict_cross_encoder_scores(
+    query: str, chunks: list[InferenceChunk]
+) -> dict[str, list[float]]:
+    """Returns the score of each cross-encoder of the ensemble, keyed by the chunk unique id"""
+    sim_scores_floats = CrossEncoderEnsembleModel().predict(
+        query=query, passages=[chunk.content for chunk in chunks]
+    )
+    return _cross_encoder_scores_per_chunk(chunks, sim_scores_floats)
+
+
+async def async_predict_cross_encoder_scores(
+    query: str, chunks: list[InferenceChunk]
+) -> dict[str, list[float]]:
+    sim_scores_floats = await CrossEncoderEnsembleModel().async_predict(
+        query=query, passages=[chunk.content for chunk in chunks]
+    )
+    return _cross_encoder_scores_per_chunk(chunks, sim_scores_floats)
+
+
+def _rank_chunks_by_cross_encoder_scores(
+    chunks: list[InferenceChunk],
+    sim_scores_floats: list[list[float]],
+    rerank_metrics_callback: Callable[[RerankMetricsContainer], None] | None,
+    model_min: int,
+    model_max: int,
+) -> tuple[list[InferenceChunk], list[int]]:
     sim_scores = [numpy.array(scores) for scores in sim_scores_floats]
 
     raw_sim_scores = cast(numpy.ndarray, sum(sim_scores) / len(sim_scores))
@@ -244,6 +466,58 @@ def semantic_reranking(
     return list(ranked_chunks), list(ranked_indices)
 
 
+@log_function_time()
+def semantic_reranking(
+    query: str,
+    chunks: list[InferenceChunk],
+    rerank_metrics_callback: Callable[[RerankMetricsContainer], None] | None = None,
+    model_min: int = CROSS_ENCODER_RANGE_MIN,
+    model_max: int = CROSS_ENCODER_RANGE_MAX,
+    cross_encoder_scores: dict[str, list[float]] | None = None,
+) -> tuple[list[InferenceChunk], list[int]]:
+    """Reranks chunks based on cross-encoder models. Additionally provides the original indices
+    of the chunks in their new sorted order. Chunks with precomputed `cross_encoder_scores`
+    are not scored again.
+
+    Note: this updates the chunks in place, it updates the chunk scores which came from retrieval
+    """
+    chunk_scores = dict(cross_encoder_scores or {})
+    unscored_chunks = [chunk for chunk in chunks if chunk.unique_id not in chunk_scores]
+    if unscored_chunks:
+        chunk_scores.update(predict_cross_encoder_scores(query, unscored_chunks))
+    return _rank_chunks_by_cross_encoder_scores(
+        chunks=chunks,
+        sim_scores_floats=_cross_encoder_scores_per_model(chunks, chunk_scores),
+        rerank_metrics_callback=rerank_metrics_callback,
+        model_min=model_min,
+        model_max=model_max,
+    )
+
+
+@log_async_function_time()
+async def async_semantic_reranking(
+    query: str,
+    chunks: list[InferenceChunk],
+    rerank_metrics_callback: Callable[[RerankMetricsContainer], None] | None = None,
+    model_min: int = CROSS_ENCODER_RANGE_MIN,
+    model_max: int = CROSS_ENCODER_RANGE_MAX,
+    cross_encoder_scores: dict[str, list[float]] | None = None,
+) -> tuple[list[InferenceChunk], list[int]]:
+    chunk_scores = dict(cross_encoder_scores or {})
+    unscored_chunks = [chunk for chunk in chunks if chunk.unique_id not in chunk_scores]
+    if unscored_chunks:
+        chunk_scores.update(
+            await async_predict_cross_encoder_scores(query, unscored_chunks)
+        )
+    return _rank_chunks_by_cross_encoder_scores(
+        chunks=chunks,
+        sim_scores_floats=_cross_encoder_scores_per_model(chunks, chunk_scores),
+        rerank_metrics_callback=rerank_metrics_callback,
+        model_min=model_min,
+        model_max=model_max,
+    )
+
+
 def apply_boost_legacy(
     chunks: list[InferenceChunk],
     norm_min: float = SIM_SCORE_RANGE_LOW,
@@ -358,15 +632,84 @@ def retrieve_chunks(
         query_rephrases = rephrase_query(query.query, multilingual_query_expansion)
         # Just to be extra sure, add the original query.
         query_rephrases.append(query.query)
-        for rephrase in set(query_rephrases):
-            q_copy = deepcopy(query)
-            q_copy.query = rephrase
+        unique_rephrases = list(set(query_rephrases))
+        # All the rephrasings are embedded with one model call instead of one per retrieval
+        query_embeddings: list[list[float] | None] = (
+            list(embed_queries(unique_rephrases))
+            if uses_query_embedding(query.search_type)
+            else [None] * len(unique_rephrases)
+        )
+        for rephrase, query_embedding in zip(unique_rephrases, query_embeddings):
+            # Retrieval does not modify the query, the filters can be shared
+            q_copy = query.copy(update={"query": rephrase})
             run_queries.append(
-                (doc_index_retrieval, (q_copy, document_index, hybrid_alpha))
+                (
+                    doc_index_retrieval,
+                    (q_copy, document_index, hybrid_alpha, query_embedding),
+                )
             )
-        parallel_search_results = run_functions_tuples_in_parallel(run_queries)
-        top_chunks = combine_retrieval_results(parallel_search_results)
+        parallel_search_results = run_functions_tuples_in_parallel(
+            run_queries, pool=ThreadPoolName.SEARCH
+        )
+        top_chunks = combine_retrieval_results(
+            query, unique_rephrases, parallel_search_results
+        )
+
+    return _report_retrieved_chunks(query, top_chunks, retrieval_metrics_callback)
+
 
+async def async_retrieve_chunks(
+    query: SearchQuery,
+    document_index: DocumentIndex,
+    hybrid_alpha: float = HYBRID_ALPHA,  # Only applicable to hybrid search
+    multilingual_query_expansion: str | None = MULTILINGUAL_QUERY_EXPANSION,
+    retrieval_metrics_callback: Callable[[RetrievalMetricsContainer], None]
+    | None = None,
+) -> list[InferenceChunk]:
+    """Asyncio version of `retrieve_chunks`"""
+    if not multilingual_query_expansion or "\n" in query.query or "\r" in query.query:
+        top_chunks = await async_doc_index_retrieval(
+            query=query, document_index=document_index, hybrid_alpha=hybrid_alpha
+        )
+    else:
+        # The rephrasing LLM calls are not streamed, they fan out on the LLM pool from an IO
+        # worker since nested calls on the same pool would run one after the other
+        query_rephrases = await run_in_pool_async(
+            rephrase_query,
+            query.query,
+            multilingual_query_expansion,
+            pool=ThreadPoolName.IO,
+        )
+        query_rephrases.append(query.query)
+        unique_rephrases = list(set(query_rephrases))
+        query_embeddings: list[list[float] | None] = (
+            list(await async_embed_queries(unique_rephrases))
+            if uses_query_embedding(query.search_type)
+            else [None] * len(unique_rephrases)
+        )
+        query_copies = [
+            query.copy(update={"query": rephrase}) for rephrase in unique_rephrases
+        ]
+        parallel_search_results = await asyncio.gather(
+            *[
+                async_doc_index_retrieval(
+                    q_copy, document_index, hybrid_alpha, query_embedding
+                )
+                for q_copy, query_embedding in zip(query_copies, query_embeddings)
+            ]
+        )
+        top_chunks = combine_retrieval_results(
+            query, unique_rephrases, list(parallel_search_results)
+        )
+
+    return _report_retrieved_chunks(query, top_chunks, retrieval_metrics_callback)
+
+
+def _report_retrieved_chunks(
+    query: SearchQuery,
+    top_chunks: list[InferenceChunk],
+    retrieval_metrics_callback: Callable[[RetrievalMetricsContainer], None] | None,
+) -> list[InferenceChunk]:
     if not top_chunks:
         logger.info(
             f"{query.search_type.value.capitalize()} search returned no results "
@@ -406,11 +749,33 @@ def rerank_chunks(
     query: SearchQuery,
     chunks_to_rerank: list[InferenceChunk],
     rerank_metrics_callback: Callable[[RerankMetricsContainer], None] | None = None,
+    cross_encoder_scores: dict[str, list[float]] | None = None,
 ) -> list[InferenceChunk]:
     ranked_chunks, _ = semantic_reranking(
         query=query.query,
         chunks=chunks_to_rerank[: query.num_rerank],
         rerank_metrics_callback=rerank_metrics_callback,
+        cross_encoder_scores=cross_encoder_scores,
+    )
+    lower_chunks = chunks_to_rerank[query.num_rerank :]
+    # Scores from rerank cannot be meaningfully combined with scores without rerank
+    for lower_chunk in lower_chunks:
+        lower_chunk.score = None
+    ranked_chunks.extend(lower_chunks)
+    return ranked_chunks
+
+
+async def async_rerank_chunks(
+    query: SearchQuery,
+    chunks_to_rerank: list[InferenceChunk],
+    rerank_metrics_callback: Callable[[RerankMetricsContainer], None] | None = None,
+    cross_encoder_scores: dict[str, list[float]] | None = None,
+) -> list[InferenceChunk]:
+    ranked_chunks, _ = await async_semantic_reranking(
+        query=query.query,
+        chunks=chunks_to_rerank[: query.num_rerank],
+        rerank_metrics_callback=rerank_metrics_callback,
+        cross_encoder_scores=cross_encoder_scores,
     )
     lower_chunks = chunks_to_rerank[query.num_rerank :]
     # Scores from rerank cannot be meaningfully combined with scores without rerank
@@ -420,6 +785,10 @@ def rerank_chunks(
     return ranked_chunks
 
 
+def get_llm_chunk_filter_cache() -> LRUTTLCache[tuple[str, str, int, str], bool]:
+    return _LLM_CHUNK_FILTER_CACHE
+
+
 def filter_chunks(
     query: SearchQuery,
     chunks_to_filter: list[InferenceChunk],
@@ -428,10 +797,35 @@ def filter_chunks(
 
     Returns a list of the unique chunk IDs that were marked as relevant"""
     chunks_to_filter = chunks_to_filter[: query.max_llm_filter_chunks]
-    llm_chunk_selection = llm_batch_eval_chunks(
-        query=query.query,
-        chunk_contents=[chunk.content for chunk in chunks_to_filter],
-    )
+
+    # The content hash keeps verdicts from being reused after a document is updated
+    normalized_query = normalize_query_text(query.query)
+    model = f"{GEN_AI_MODEL_PROVIDER}/{FAST_GEN_AI_MODEL_VERSION}"
+    cache_keys = [
+        (normalized_query, chunk.unique_id, hash(chunk.content), model)
+        for chunk in chunks_to_filter
+    ]
+    llm_chunk_selection = [_LLM_CHUNK_FILTER_CACHE.get(key) for key in cache_keys]
+
+    unjudged_inds = [
+        ind for ind, verdict in enumerate(llm_chunk_selection) if verdict is None
+    ]
+    if unjudged_inds:
+        unjudged_chunks = [chunks_to_filter[ind] for ind in unjudged_inds]
+        llm_verdicts = llm_eval_chunks(
+            query=query.query,
+            chunk_contents=[chunk.content for chunk in unjudged_chunks],
+            chunk_token_counts=get_chunk_token_counts(unjudged_chunks),
+        )
+        for ind, llm_verdict in zip(unjudged_inds, llm_verdicts):
+            # In case of failure/timeout, don't throw out the chunk but also don't cache
+            # it so it's judged again next time
+            if llm_verdict is None:
+                llm_chunk_selection[ind] = True
+                continue
+            llm_chunk_selection[ind] = llm_verdict
+            _LLM_CHUNK_FILTER_CACHE.put(cache_keys[ind], llm_verdict)
+
     return [
         chunk.unique_id
         for ind, chunk in enumerate(chunks_to_filter)
@@ -464,6 +858,59 @@ def full_chunk_search(
     return top_chunks, llm_chunk_selection
 
 
+def get_search_result_cache() -> LRUTTLCache[tuple, SearchResultCacheValue]:
+    return _SEARCH_RESULT_CACHE
+
+
+def _build_search_result_cache_key(
+    query: SearchQuery,
+    hybrid_alpha: float,
+    multilingual_query_expansion: str | None,
+) -> tuple:
+    """The ACL is part of the filters, so results are only shared between users with the same
+    access. The index generation changes on every write to the document index."""
+    filters = query.filters
+    return (
+        get_document_index_generation(),
+        normalize_query_text(query.query),
+        query.search_type,
+        query.favor_recent,
+        query.num_hits,
+        query.skip_rerank,
+        query.num_rerank,
+        query.skip_llm_chunk_filter,
+        query.max_llm_filter_chunks,
+        tuple(sorted(s.value for s in filters.source_type))
+        if filters.source_type is not None
+        else None,
+        tuple(sorted(filters.document_set))
+        if filters.document_set is not None
+        else None,
+        filters.time_cutoff,
+        tuple(sorted(set(filters.access_control_list)))
+        if filters.access_control_list is not None
+        else None,
+        hybrid_alpha,
+        multilingual_query_expansion,
+    )
+
+
+def _get_search_result_cache_key(
+    query: SearchQuery,
+    hybrid_alpha: float,
+    multilingual_query_expansion: str | None,
+    collects_metrics: bool,
+) -> tuple | None:
+    # Flows which collect metrics need the retrieval / rerank to actually run
+    if _SEARCH_RESULT_CACHE.max_size == 0 or collects_metrics:
+        return None
+    return _build_search_result_cache_key(
+        query=query,
+        hybrid_alpha=hybrid_alpha,
+        multilingual_query_expansion=multilingual_query_expansion,
+    )
+
+
 def full_chunk_search_generator(
     query: SearchQuery,
     document_index: DocumentIndex,
@@ -472,19 +919,51 @@ def full_chunk_search_generator(
     retrieval_metrics_callback: Callable[[RetrievalMetricsContainer], None]
     | None = None,
     rerank_metrics_callback: Callable[[RerankMetricsContainer], None] | None = None,
+    speculative_retrieval: SpeculativeRetrieval | None = None,
 ) -> Iterator[list[InferenceChunk] | list[bool]]:
-    """Always yields twice. Once with the selected chunks and once with the LLM relevance filter result."""
+    """Always yields twice. Once with the selected chunks and once with the LLM relevance filter result.
+    Skips the retrieval if the `speculative_retrieval` candidates can be used."""
     chunks_yielded = False
 
-    retrieved_chunks = retrieve_chunks(
+    search_cache_key = _get_search_result_cache_key(
         query=query,
-        document_index=document_index,
         hybrid_alpha=hybrid_alpha,
         multilingual_query_expansion=multilingual_query_expansion,
-        retrieval_metrics_callback=retrieval_metrics_callback,
+        collects_metrics=retrieval_metrics_callback is not None
+        or rerank_metrics_callback is not None,
+    )
+    cached_results = (
+        _SEARCH_RESULT_CACHE.get(search_cache_key)
+        if search_cache_key is not None
+        else None
+    )
+
+    speculative_candidates = (
+        get_speculative_candidates(speculative_retrieval, query)
+        if speculative_retrieval is not None and cached_results is None
+        else None
     )
 
+    # Copies are handed out since the downstream flows modify the chunks (e.g. scores)
+    cached_reranked_chunks: list[InferenceChunk] | None = None
+    cross_encoder_scores: dict[str, list[float]] | None = None
+    if cached_results is not None:
+        retrieved_chunks, cached_reranked_chunks = deepcopy(cached_results)
+    elif speculative_retrieval is not None and speculative_candidates is not None:
+        retrieved_chunks = speculative_candidates
+        cross_encoder_scores = speculative_retrieval.cross_encoder_scores
+    else:
+        retrieved_chunks = retrieve_chunks(
+            query=query,
+            document_index=document_index,
+            hybrid_alpha=hybrid_alpha,
+            multilingual_query_expansion=multilingual_query_expansion,
+            retrieval_metrics_callback=retrieval_metrics_callback,
+        )
+
     if not retrieved_chunks:
+        if search_cache_key is not None and cached_results is None:
+            _SEARCH_RESULT_CACHE.put(search_cache_key, ([], None))
         yield cast(list[InferenceChunk], [])
         yield cast(list[bool], [])
         return
@@ -492,7 +971,11 @@ def full_chunk_search_generator(
     post_processing_tasks: list[FunctionCall] = []
 
     rerank_task_id = None
-    if should_rerank(query):
+    if cached_reranked_chunks:
+        _log_top_chunk_links(query.search_type.value, cached_reranked_chunks)
+        yield cached_reranked_chunks
+        chunks_yielded = True
+    elif should_rerank(query):
         post_processing_tasks.append(
             FunctionCall(
                 rerank_chunks,
@@ -500,12 +983,15 @@ def full_chunk_search_generator(
                     query,
                     retrieved_chunks,
                     rerank_metrics_callback,
+                    cross_encoder_scores,
                 ),
             )
         )
         rerank_task_id = post_processing_tasks[-1].result_id
     else:
         final_chunks = retrieved_chunks
+        if search_cache_key is not None and cached_results is None:
+            _SEARCH_RESULT_CACHE.put(search_cache_key, deepcopy((final_chunks, None)))
         # NOTE: if we don't rerank, we can return the chunks immediately
         # since we know this is the final order
         _log_top_chunk_links(query.search_type.value, final_chunks)
@@ -523,7 +1009,7 @@ def full_chunk_search_generator(
         llm_filter_task_id = post_processing_tasks[-1].result_id
 
     post_processing_results = (
-        run_functions_in_parallel(post_processing_tasks)
+        run_functions_in_parallel(post_processing_tasks, pool=ThreadPoolName.SEARCH)
         if post_processing_tasks
         else {}
     )
@@ -532,6 +1018,12 @@ def full_chunk_search_generator(
         post_processing_results.get(str(rerank_task_id)) if rerank_task_id else None,
     )
     if reranked_chunks:
+        if search_cache_key is not None:
+            # Reranking updates the scores of the retrieved chunks in place, copy them together
+            # so that the cached retrieved chunks reflect the same state as on a cache miss
+            _SEARCH_RESULT_CACHE.put(
+                search_cache_key, deepcopy((retrieved_chunks, reranked_chunks))
+            )
         if chunks_yielded:
             logger.error(
                 "Trying to yield re-ranked chunks, but chunks were already yielded. This should never happen."
@@ -549,7 +1041,247 @@ def full_chunk_search_generator(
     if llm_chunk_selection is not None:
         yield [chunk.unique_id in llm_chunk_selection for chunk in retrieved_chunks]
     else:
-        yield [True for _ in reranked_chunks or retrieved_chunks]
+        yield [
+            True for _ in cached_reranked_chunks or reranked_chunks or retrieved_chunks
+        ]
+
+
+async def async_full_chunk_search_generator(
+    query: SearchQuery,
+    document_index: DocumentIndex,
+    hybrid_alpha: float = HYBRID_ALPHA,  # Only applicable to hybrid search
+    multilingual_query_expansion: str | None = MULTILINGUAL_QUERY_EXPANSION,
+    retrieval_metrics_callback: Callable[[RetrievalMetricsContainer], None]
+    | None = None,
+    rerank_metrics_callback: Callable[[RerankMetricsContainer], None] | None = None,
+    speculative_retrieval: SpeculativeRetrieval | None = None,
+) -> AsyncGenerator[list[InferenceChunk] | list[bool], None]:
+    """Asyncio version of `full_chunk_search_generator`, yields the same two results. The
+    selected chunks are yielded as soon as the reranking is done, without waiting on the LLM
+    relevance filter. The retrieval is skipped if the candidates of a `speculative_retrieval`
+    can be used."""
+    search_cache_key = _get_search_result_cache_key(
+        query=query,
+        hybrid_alpha=hybrid_alpha,
+        multilingual_query_expansion=multilingual_query_expansion,
+        collects_metrics=retrieval_metrics_callback is not None
+        or rerank_metrics_callback is not None,
+    )
+    cached_results = (
+        _SEARCH_RESULT_CACHE.get(search_cache_key)
+        if search_cache_key is not None
+        else None
+    )
+
+    speculative_candidates = (
+        get_speculative_candidates(speculative_retrieval, query)
+        if speculative_retrieval is not None and cached_results is None
+        else None
+    )
+
+    # Copies are handed out since the downstream flows modify the chunks (e.g. scores)
+    cached_reranked_chunks: list[InferenceChunk] | None = None
+    cross_encoder_scores: dict[str, list[float]] | None = None
+    if cached_results is not None:
+        retrieved_chunks, cached_reranked_chunks = deepcopy(cached_results)
+    elif speculative_retrieval is not None and speculative_candidates is not None:
+        retrieved_chunks = speculative_candidates
+        cross_encoder_scores = speculative_retrieval.cross_encoder_scores
+    else:
+        retrieved_chunks = await async_retrieve_chunks(
+            query=query,
+            document_index=document_index,
+            hybrid_alpha=hybrid_alpha,
+            multilingual_query_expansion=multilingual_query_expansion,
+            retrieval_metrics_callback=retrieval_metrics_callback,
+        )
+
+    if not retrieved_chunks:
+        if search_cache_key is not None and cached_results is None:
+            _SEARCH_RESULT_CACHE.put(search_cache_key, ([], None))
+        yield cast(list[InferenceChunk], [])
+        yield cast(list[bool], [])
+        return
+
+    # The LLM relevance filter does not stream, it runs on the search pool alongside the
+    # reranking like in the sync flow
+    llm_filter_task = (
+        asyncio.create_task(
+            run_in_pool_async(
+                filter_chunks,
+                query,
+                retrieved_chunks[: query.max_llm_filter_chunks],
+                pool=ThreadPoolName.SEARCH,
+            )
+        )
+        if should_apply_llm_based_relevance_filter(query)
+        else None
+    )
+
+    try:
+        if cached_reranked_chunks:
+            final_chunks = cached_reranked_chunks
+        elif should_rerank(query):
+            final_chunks = await async_rerank_chunks(
+                query, retrieved_chunks, rerank_metrics_callback, cross_encoder_scores
+            )
+            if search_cache_key is not None:
+                # Reranking updates the scores of the retrieved chunks in place, copy them
+                # together so that the cached retrieved chunks reflect the same state as on
+                # a cache miss
+                _SEARCH_RESULT_CACHE.put(
+                    search_cache_key, deepcopy((retrieved_chunks, final_chunks))
+                )
+        else:
+            final_chunks = retrieved_chunks
+            if search_cache_key is not None and cached_results is None:
+                _SEARCH_RESULT_CACHE.put(
+                    search_cache_key, deepcopy((final_chunks, None))
+                )
+
+        _log_top_chunk_links(query.search_type.value, final_chunks)
+        yield final_chunks
+
+        if llm_filter_task is not None:
+            llm_chunk_selection = await llm_filter_task
+            yield [chunk.unique_id in llm_chunk_selection for chunk in retrieved_chunks]
+        else:
+            yield [True for _ in final_chunks]
+    finally:
+        # The stream may be closed early, e.g. if the client disconnects
+        if llm_filter_task is not None and not llm_filter_task.done():
+            llm_filter_task.cancel()
+
+
+def _build_search_query(
+    question: QuestionRequest,
+    user_acl_filters: list[str] | None,
+    skip_llm_chunk_filter: bool,
+    skip_rerank_realtime: bool,
+    skip_rerank_non_realtime: bool,
+) -> SearchQuery:
+    final_filters = IndexFilters(
+        source_type=question.filters.source_type,
+        document_set=question.filters.document_set,
+        time_cutoff=question.filters.time_cutoff,
+        access_control_list=user_acl_filters,
+    )
+
+    skip_reranking = (
+        skip_rerank_realtime if question.real_time else skip_rerank_non_realtime
+    )
+
+    return SearchQuery(
+        query=question.query,
+        search_type=question.search_type,
+        filters=final_filters,
+        # Still applies time decay but not magnified
+        favor_recent=question.favor_recent
+        if question.favor_recent is not None
+        else False,
+        skip_rerank=skip_reranking,
+        skip_llm_chunk_filter=skip_llm_chunk_filter,
+    )
+
+
+@log_function_time()
+def retrieve_speculative_candidates(
+    question: QuestionRequest,
+    user_acl_filters: list[str] | None,
+    document_index: DocumentIndex,
+    skip_llm_chunk_filter: bool = DISABLE_LLM_CHUNK_FILTER,
+    skip_rerank_realtime: bool = not ENABLE_RERANKING_REAL_TIME_FLOW,
+    skip_rerank_non_realtime: bool = SKIP_RERANKING,
+) -> SpeculativeRetrieval | None:
+    """Retrieves and scores the candidates for the question with only the filters it came
+    with, meant to run while the time and source filters are extracted from the question.
+    The query embedding is cached so a retrieval with the final filters does not redo it.
+
+    Returns None on failure, the search then runs without the speculative candidates."""
+    query = _build_search_query(
+        question=question,
+        user_acl_filters=user_acl_filters,
+        skip_llm_chunk_filter=skip_llm_chunk_filter,
+        skip_rerank_realtime=skip_rerank_realtime,
+        skip_rerank_non_realtime=skip_rerank_non_realtime,
+    )
+    try:
+        retrieved_chunks = retrieve_chunks(query=query, document_index=document_index)
+        cross_encoder_scores = (
+            predict_cross_encoder_scores(
+                query.query, retrieved_chunks[: query.num_rerank]
+            )
+            if retrieved_chunks and should_rerank(query)
+            else {}
+        )
+    except Exception:
+        logger.exception("Speculative retrieval failed")
+        return None
+
+    return SpeculativeRetrieval(
+        query=query,
+        retrieved_chunks=retrieved_chunks,
+        cross_encoder_scores=cross_encoder_scores,
+    )
+
+
+@log_async_function_time()
+async def async_retrieve_speculative_candidates(
+    question: QuestionRequest,
+    user_acl_filters: list[str] | None,
+    document_index: DocumentIndex,
+    skip_llm_chunk_filter: bool = DISABLE_LLM_CHUNK_FILTER,
+    skip_rerank_realtime: bool = not ENABLE_RERANKING_REAL_TIME_FLOW,
+    skip_rerank_non_realtime: bool = SKIP_RERANKING,
+) -> SpeculativeRetrieval | None:
+    """Asyncio version of `retrieve_speculative_candidates`"""
+    query = _build_search_query(
+        question=question,
+        user_acl_filters=user_acl_filters,
+        skip_llm_chunk_filter=skip_llm_chunk_filter,
+        skip_rerank_realtime=skip_rerank_realtime,
+        skip_rerank_non_realtime=skip_rerank_non_realtime,
+    )
+    try:
+        retrieved_chunks = await async_retrieve_chunks(
+            query=query, document_index=document_index
+        )
+        cross_encoder_scores = (
+            await async_predict_cross_encoder_scores(
+                query.query, retrieved_chunks[: query.num_rerank]
+            )
+            if retrieved_chunks and should_rerank(query)
+            else {}
+        )
+    except Exception:
+        logger.exception("Speculative retrieval failed")
+        return None
+
+    return SpeculativeRetrieval(
+        query=query,
+        retrieved_chunks=retrieved_chunks,
+        cross_encoder_scores=cross_encoder_scores,
+    )
+
+
+def prefetch_query_embedding(question: QuestionRequest) -> None:
+    """Embeds the question into the query embedding cache while the filters are extracted,
+    a failure is only logged since the retrieval embeds the query again"""
+    if not uses_query_embedding(question.search_type):
+        return
+    try:
+        embed_queries([question.query])
+    except Exception:
+        logger.exception("Failed to prefetch the query embedding")
+
+
+async def async_prefetch_query_embedding(question: QuestionRequest) -> None:
+    if not uses_query_embedding(question.search_type):
+        return
+    try:
+        await async_embed_queries([question.query])
+    except Exception:
+        logger.exception("Failed to prefetch the query embedding")
 
 
 def payserai_search_generator(
@@ -564,11 +1296,15 @@ def payserai_search_generator(
     retrieval_metrics_callback: Callable[[RetrievalMetricsContainer], None]
     | None = None,
     rerank_metrics_callback: Callable[[RerankMetricsContainer], None] | None = None,
+    speculative_retrieval: SpeculativeRetrieval | None = None,
 ) -> Iterator[list[InferenceChunk] | list[bool] | int]:
     """The main entry point for search. This fetches the relevant documents from Vespa
     based on the provided query (applying permissions / filters), does any specified
     post-processing, and returns the results. It also creates an entry in the query_event table
-    for this search event."""
+    for this search event.
+
+    Candidates from a `speculative_retrieval` started before the filters of the question were
+    extracted are used if they still satisfy the final filters."""
     query_event_id = create_query_event(
         query=question.query,
         search_type=question.search_type,
@@ -580,42 +1316,91 @@ def payserai_search_generator(
     user_acl_filters = (
         None if bypass_acl else build_access_filters_for_user(user, db_session)
     )
-    final_filters = IndexFilters(
-        source_type=question.filters.source_type,
-        document_set=question.filters.document_set,
-        time_cutoff=question.filters.time_cutoff,
-        access_control_list=user_acl_filters,
+    search_query = _build_search_query(
+        question=question,
+        user_acl_filters=user_acl_filters,
+        skip_llm_chunk_filter=skip_llm_chunk_filter,
+        skip_rerank_realtime=skip_rerank_realtime,
+        skip_rerank_non_realtime=skip_rerank_non_realtime,
     )
 
-    skip_reranking = (
-        skip_rerank_realtime if question.real_time else skip_rerank_non_realtime
+    search_generator = full_chunk_search_generator(
+        query=search_query,
+        document_index=document_index,
+        retrieval_metrics_callback=retrieval_metrics_callback,
+        rerank_metrics_callback=rerank_metrics_callback,
+        speculative_retrieval=speculative_retrieval,
     )
+    top_chunks = cast(list[InferenceChunk], next(search_generator))
+    yield top_chunks
+
+    llm_chunk_selection = cast(list[bool], next(search_generator))
+    yield llm_chunk_selection
 
-    search_query = SearchQuery(
+    update_query_event_retrieved_documents(
+        db_session=db_session,
+        retrieved_document_ids=[doc.document_id for doc in top_chunks]
+        if top_chunks
+        else [],
+        query_id=query_event_id,
+        user_id=None if user is None else user.id,
+    )
+    yield query_event_id
+
+
+async def async_payserai_search_generator(
+    question: QuestionRequest,
+    user: User | None,
+    db_session: Session,
+    document_index: DocumentIndex,
+    skip_llm_chunk_filter: bool = DISABLE_LLM_CHUNK_FILTER,
+    skip_rerank_realtime: bool = not ENABLE_RERANKING_REAL_TIME_FLOW,
+    skip_rerank_non_realtime: bool = SKIP_RERANKING,
+    bypass_acl: bool = False,
+    retrieval_metrics_callback: Callable[[RetrievalMetricsContainer], None]
+    | None = None,
+    rerank_metrics_callback: Callable[[RerankMetricsContainer], None] | None = None,
+    speculative_retrieval: SpeculativeRetrieval | None = None,
+) -> AsyncGenerator[list[InferenceChunk] | list[bool] | int, None]:
+    """Asyncio version of `payserai_search_generator`, yields the same three results. The
+    Postgres calls are short and are run on the IO pool."""
+    query_event_id = await run_in_pool_async(
+        create_query_event,
         query=question.query,
         search_type=question.search_type,
-        filters=final_filters,
-        # Still applies time decay but not magnified
-        favor_recent=question.favor_recent
-        if question.favor_recent is not None
-        else False,
-        skip_rerank=skip_reranking,
+        llm_answer=None,
+        user_id=user.id if user is not None else None,
+        db_session=db_session,
+    )
+
+    user_acl_filters = (
+        None
+        if bypass_acl
+        else await run_in_pool_async(build_access_filters_for_user, user, db_session)
+    )
+    search_query = _build_search_query(
+        question=question,
+        user_acl_filters=user_acl_filters,
         skip_llm_chunk_filter=skip_llm_chunk_filter,
+        skip_rerank_realtime=skip_rerank_realtime,
+        skip_rerank_non_realtime=skip_rerank_non_realtime,
     )
 
-    search_generator = full_chunk_search_generator(
+    search_generator = async_full_chunk_search_generator(
         query=search_query,
         document_index=document_index,
         retrieval_metrics_callback=retrieval_metrics_callback,
         rerank_metrics_callback=rerank_metrics_callback,
+        speculative_retrieval=speculative_retrieval,
     )
-    top_chunks = cast(list[InferenceChunk], next(search_generator))
+    top_chunks = cast(list[InferenceChunk], await anext(search_generator))
     yield top_chunks
 
-    llm_chunk_selection = cast(list[bool], next(search_generator))
+    llm_chunk_selection = cast(list[bool], await anext(search_generator))
     yield llm_chunk_selection
 
-    update_query_event_retrieved_documents(
+    await run_in_pool_async(
+        update_query_event_retrieved_documents,
         db_session=db_session,
         retrieved_document_ids=[doc.document_id for doc in top_chunks]
         if top_chunks
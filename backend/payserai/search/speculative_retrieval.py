@@ -0,0 +1,99 @@
+from dataclasses import dataclass
+
+from payserai.configs.app_configs import SPECULATIVE_RETRIEVAL_MIN_CANDIDATES
+from payserai.document_index.document_index_utils import include_untimed_documents
+from payserai.indexing.models import InferenceChunk
+from payserai.search.models import IndexFilters
+from payserai.search.models import SearchQuery
+from payserai.utils.logger import setup_logger
+
+logger = setup_logger()
+
+
+@dataclass
+class SpeculativeRetrieval:
+    """Candidates retrieved for a question before its time and source filters were extracted"""
+
+    query: SearchQuery
+    retrieved_chunks: list[InferenceChunk]
+    # Cross-encoder scores of the candidates that were scored ahead of the reranking, one per
+    # model of the ensemble, keyed by the chunk unique id
+    cross_encoder_scores: dict[str, list[float]]
+
+
+def chunk_passes_filters(chunk: InferenceChunk, filters: IndexFilters) -> bool:
+    """Local equivalent of the source type and time cutoff filters applied by the document
+    index, these are the only filters extracted from the question"""
+    if filters.source_type and chunk.source_type not in {
+        source.value for source in filters.source_type
+    }:
+        return False
+
+    if filters.time_cutoff:
+        if chunk.updated_at is None:
+            return include_untimed_documents(filters.time_cutoff)
+        # The index stores the update time in whole seconds
+        return int(chunk.updated_at.timestamp()) >= int(filters.time_cutoff.timestamp())
+
+    return True
+
+
+def _speculative_query_applies(
+    speculative_query: SearchQuery, query: SearchQuery
+) -> bool:
+    """The final query may only narrow the source type and time cutoff, anything else that
+    changes the retrieval (including the recency bias of the ranking) voids it"""
+    speculative_filters = speculative_query.filters
+    filters = query.filters
+    return (
+        speculative_query.query == query.query
+        and speculative_query.search_type == query.search_type
+        and speculative_query.favor_recent == query.favor_recent
+        and speculative_query.num_hits == query.num_hits
+        and speculative_filters.document_set == filters.document_set
+        and speculative_filters.access_control_list == filters.access_control_list
+        and speculative_filters.source_type in (None, filters.source_type)
+        and speculative_filters.time_cutoff in (None, filters.time_cutoff)
+    )
+
+
+def get_speculative_candidates(
+    speculative_retrieval: SpeculativeRetrieval,
+    query: SearchQuery,
+    min_candidates: int = SPECULATIVE_RETRIEVAL_MIN_CANDIDATES,
+) -> list[InferenceChunk] | None:
+    """Returns the speculatively retrieved chunks which pass the filters of the final query, or
+    None if the document index has to be queried again.
+
+    The surviving chunks are in the same order as a filtered retrieval would return them and
+    are exactly its top results, only the tail past the speculative candidates is missing.
+    """
+    if not _speculative_query_applies(speculative_retrieval.query, query):
+        logger.info("Speculative retrieval does not apply to the final query")
+        return None
+
+    retrieved_chunks = speculative_retrieval.retrieved_chunks
+    candidates = [
+        chunk
+        for chunk in retrieved_chunks
+        if chunk_passes_filters(chunk, query.filters)
+    ]
+
+    # Nothing was filtered out, or the index had no more candidates to return
+    if (
+        len(candidates) == len(retrieved_chunks)
+        or len(retrieved_chunks) < query.num_hits
+    ):
+        return candidates
+
+    required_candidates = max(
+        min_candidates, query.num_rerank or 0, query.max_llm_filter_chunks
+    )
+    if len(candidates) < required_candidates:
+        logger.info(
+            f"Only {len(candidates)} of {len(retrieved_chunks)} speculative candidates "
+            f"passed the filters, {required_candidates} required"
+        )
+        return None
+
+    return candidates
@@ -1,14 +1,28 @@
 from collections.abc import Callable
 
+from payserai.configs.app_configs import DISABLE_BATCHED_LLM_CHUNK_FILTER
+from payserai.configs.app_configs import LLM_CHUNK_FILTER_BATCH_MAX_CHUNKS
+from payserai.configs.app_configs import LLM_CHUNK_FILTER_BATCH_MAX_TOKENS
 from payserai.llm.factory import get_default_llm
+from payserai.llm.utils import check_number_of_tokens
 from payserai.llm.utils import dict_based_prompt_to_langchain_prompt
+from payserai.llm.utils import get_default_llm_tokenizer
+from payserai.prompts.secondary_llm_flows import BATCH_CHUNK_FILTER_PROMPT
 from payserai.prompts.secondary_llm_flows import CHUNK_FILTER_PROMPT
 from payserai.prompts.secondary_llm_flows import NONUSEFUL_PAT
+from payserai.prompts.secondary_llm_flows import USEFUL_PAT
 from payserai.utils.logger import setup_logger
+from payserai.utils.text_processing import extract_embedded_json
 from payserai.utils.threadpool_concurrency import run_functions_tuples_in_parallel
+from payserai.utils.threadpool_concurrency import ThreadPoolName
 
 logger = setup_logger()
 
+# The numbering and code fences around every section in the batched prompt
+_BATCH_SECTION_OVERHEAD_TOKENS = 10
+# A batched call has to read more and write more than a single chunk call
+_BATCH_LLM_TIMEOUT = 10
+
 
 def llm_eval_chunk(query: str, chunk_content: str) -> bool:
     def _get_usefulness_messages() -> list[dict[str, str]]:
@@ -43,25 +57,176 @@ def llm_eval_chunk(query: str, chunk_content: str) -> bool:
     return _extract_usefulness(model_output)
 
 
-def llm_batch_eval_chunks(
-    query: str, chunk_contents: list[str], use_threads: bool = True
-) -> list[bool]:
-    if use_threads:
-        functions_with_args: list[tuple[Callable, tuple]] = [
-            (llm_eval_chunk, (query, chunk_content)) for chunk_content in chunk_contents
+def group_chunks_by_token_budget(
+    chunk_token_counts: list[int],
+    max_tokens: int = LLM_CHUNK_FILTER_BATCH_MAX_TOKENS,
+    max_chunks: int = LLM_CHUNK_FILTER_BATCH_MAX_CHUNKS,
+) -> list[list[int]]:
+    """Splits the chunk indices into consecutive groups that each fit into one batched prompt.
+    Chunks that are too large for the budget by themselves get a group of their own."""
+    groups: list[list[int]] = []
+    current_group: list[int] = []
+    current_tokens = 0
+    for ind, token_count in enumerate(chunk_token_counts):
+        section_tokens = token_count + _BATCH_SECTION_OVERHEAD_TOKENS
+        if current_group and (
+            current_tokens + section_tokens > max_tokens
+            or len(current_group) >= max_chunks
+        ):
+            groups.append(current_group)
+            current_group = []
+            current_tokens = 0
+        current_group.append(ind)
+        current_tokens += section_tokens
+
+    if current_group:
+        groups.append(current_group)
+    return groups
+
+
+def _parse_batch_verdicts(model_output: str, num_sections: int) -> dict[int, bool]:
+    """Maps the 0 based section index to whether it is useful. Sections without a clear verdict
+    are left out so they can be evaluated on their own."""
+    try:
+        model_json = extract_embedded_json(model_output)
+    except ValueError:
+        return {}
+
+    verdicts: dict[int, bool] = {}
+    for key, value in model_json.items():
+        try:
+            section_ind = int(key) - 1
+        except (TypeError, ValueError):
+            continue
+        if not 0 <= section_ind < num_sections:
+            continue
+
+        if isinstance(value, bool):
+            verdicts[section_ind] = value
+        elif isinstance(value, str):
+            normalized_value = value.strip().lower()
+            if normalized_value in ("true", USEFUL_PAT.lower()):
+                verdicts[section_ind] = True
+            elif normalized_value in ("false", NONUSEFUL_PAT.lower()):
+                verdicts[section_ind] = False
+    return verdicts
+
+
+def llm_eval_chunk_group(query: str, chunk_contents: list[str]) -> dict[int, bool]:
+    """Judges several chunks with a single LLM call, returns the verdicts by index into
+    chunk_contents. Chunks the LLM gave no valid verdict for are missing from the result.
+    """
+
+    def _get_usefulness_messages() -> list[dict[str, str]]:
+        numbered_sections = "\n\n".join(
+            f"[{ind + 1}]\n```\n{chunk_content}\n```"
+            for ind, chunk_content in enumerate(chunk_contents)
+        )
+        messages = [
+            {
+                "role": "user",
+                "content": BATCH_CHUNK_FILTER_PROMPT.format(
+                    numbered_sections=numbered_sections, user_query=query
+                ),
+            },
         ]
 
-        logger.debug(
-            "Running LLM usefulness eval in parallel (following logging may be out of order)"
+        return messages
+
+    messages = _get_usefulness_messages()
+    filled_llm_prompt = dict_based_prompt_to_langchain_prompt(messages)
+    model_output = get_default_llm(
+        use_fast_llm=True, timeout=_BATCH_LLM_TIMEOUT
+    ).invoke(filled_llm_prompt)
+    logger.debug(model_output)
+
+    return _parse_batch_verdicts(model_output, len(chunk_contents))
+
+
+def _llm_batch_eval_chunks_grouped(
+    query: str,
+    chunk_contents: list[str],
+    chunk_token_counts: list[int] | None,
+) -> list[bool | None]:
+    if chunk_token_counts is None:
+        chunk_token_counts = [
+            len(tokens)
+            for tokens in get_default_llm_tokenizer().encode_batch(chunk_contents)
+        ]
+    # The query is repeated in every prompt so it takes away from the budget of each group
+    groups = group_chunks_by_token_budget(
+        chunk_token_counts,
+        max_tokens=max(
+            LLM_CHUNK_FILTER_BATCH_MAX_TOKENS - check_number_of_tokens(query), 0
+        ),
+    )
+
+    logger.debug(
+        f"Running LLM usefulness eval for {len(chunk_contents)} chunks "
+        f"in {len(groups)} batched calls"
+    )
+    group_results = run_functions_tuples_in_parallel(
+        [
+            (llm_eval_chunk_group, (query, [chunk_contents[ind] for ind in group]))
+            for group in groups
+        ],
+        allow_failures=True,
+        pool=ThreadPoolName.LLM,
+    )
+
+    verdicts: list[bool | None] = [None] * len(chunk_contents)
+    unparsed_inds: list[int] = []
+    for group, group_verdicts in zip(groups, group_results):
+        if group_verdicts is None:
+            continue
+        for section_ind, chunk_ind in enumerate(group):
+            if section_ind in group_verdicts:
+                verdicts[chunk_ind] = group_verdicts[section_ind]
+            else:
+                unparsed_inds.append(chunk_ind)
+
+    if unparsed_inds:
+        logger.info(
+            f"LLM gave no valid verdict for {len(unparsed_inds)} chunks in a batch, "
+            "evaluating them individually"
         )
-        parallel_results = run_functions_tuples_in_parallel(
-            functions_with_args, allow_failures=True
+        fallback_results = run_functions_tuples_in_parallel(
+            [(llm_eval_chunk, (query, chunk_contents[ind])) for ind in unparsed_inds],
+            allow_failures=True,
+            pool=ThreadPoolName.LLM,
         )
+        for chunk_ind, fallback_verdict in zip(unparsed_inds, fallback_results):
+            verdicts[chunk_ind] = fallback_verdict
 
-        # In case of failure/timeout, don't throw out the chunk
-        return [True if item is None else item for item in parallel_results]
+    return verdicts
 
-    else:
-        return [
-            llm_eval_chunk(query, chunk_content) for chunk_content in chunk_contents
-        ]
+
+def llm_eval_chunks(
+    query: str,
+    chunk_contents: list[str],
+    chunk_token_counts: list[int] | None = None,
+    disable_batching: bool = DISABLE_BATCHED_LLM_CHUNK_FILTER,
+) -> list[bool | None]:
+    """Evaluates the chunks in parallel, None for the chunks whose LLM call failed or timed
+    out. chunk_token_counts are only used to group the chunks for batched calls, if not
+    provided the chunks are tokenized here."""
+    if not chunk_contents:
+        return []
+
+    if not disable_batching:
+        return _llm_batch_eval_chunks_grouped(
+            query=query,
+            chunk_contents=chunk_contents,
+            chunk_token_counts=chunk_token_counts,
+        )
+
+    functions_with_args: list[tuple[Callable, tuple]] = [
+        (llm_eval_chunk, (query, chunk_content)) for chunk_content in chunk_contents
+    ]
+
+    logger.debug(
+        "Running LLM usefulness eval in parallel (following logging may be out of order)"
+    )
+    return run_functions_tuples_in_parallel(
+        functions_with_args, allow_failures=True, pool=ThreadPoolName.LLM
+    )
@@ -0,0 +1,206 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from payserai.configs.app_configs import DISABLE_COMBINED_QUERY_ANALYSIS
+from payserai.configs.app_configs import DISABLE_LLM_FILTER_EXTRACTION
+from payserai.configs.app_configs import DISABLE_RULE_BASED_SOURCE_FILTER
+from payserai.configs.app_configs import DISABLE_RULE_BASED_TIME_FILTER
+from payserai.configs.constants import DocumentSource
+from payserai.db.connector import fetch_unique_document_sources_cached
+from payserai.llm.factory import get_default_llm
+from payserai.llm.utils import dict_based_prompt_to_langchain_prompt
+from payserai.prompts.constants import REPHRASED_QUERY_KEY
+from payserai.prompts.constants import SOURCES_KEY
+from payserai.prompts.prompt_utils import get_current_llm_day_time
+from payserai.prompts.secondary_llm_flows import QUERY_ANALYSIS_PROMPT
+from payserai.prompts.secondary_llm_flows import QUERY_ANALYSIS_REPHRASE_INSTRUCTIONS
+from payserai.secondary_llm_flows.source_filter import extract_question_source_filters
+from payserai.secondary_llm_flows.source_filter import extract_source_filter
+from payserai.secondary_llm_flows.source_filter import get_source_warnings
+from payserai.secondary_llm_flows.source_filter import source_filter_from_llm_json
+from payserai.secondary_llm_flows.source_filter_rules import rule_based_source_filter
+from payserai.secondary_llm_flows.time_filter import extract_question_time_filters
+from payserai.secondary_llm_flows.time_filter import extract_time_filter
+from payserai.secondary_llm_flows.time_filter import time_filter_from_llm_json
+from payserai.secondary_llm_flows.time_filter_rules import rule_based_time_filter
+from payserai.server.models import QuestionRequest
+from payserai.utils.logger import setup_logger
+from payserai.utils.text_processing import extract_embedded_json
+from payserai.utils.threadpool_concurrency import FunctionCall
+from payserai.utils.threadpool_concurrency import run_functions_in_parallel
+from payserai.utils.threadpool_concurrency import ThreadPoolName
+from payserai.utils.timing import log_function_time
+
+logger = setup_logger()
+
+
+@dataclass(frozen=True)
+class QueryAnalysisResult:
+    time_cutoff: datetime | None
+    favor_recent: bool
+    source_filters: list[DocumentSource] | None
+    # Only set if a rephrase was requested and the LLM provided one
+    rephrased_query: str | None = None
+
+
+@log_function_time()
+def analyze_query(
+    query: str,
+    valid_sources: list[DocumentSource],
+    db_session: Session,
+    rephrase: bool = False,
+) -> QueryAnalysisResult:
+    """Extracts the time filter, the source filter and optionally a rephrased query with a
+    single LLM call. Any filter missing from the output falls back to its own LLM flow
+    """
+
+    def _get_query_analysis_messages() -> list[dict[str, str]]:
+        web_warning, file_warning = get_source_warnings(valid_sources)
+        return [
+            {
+                "role": "system",
+                "content": QUERY_ANALYSIS_PROMPT.format(
+                    current_day_time_str=get_current_llm_day_time(),
+                    valid_sources=[s.value for s in valid_sources],
+                    web_source_warning=web_warning,
+                    file_source_warning=file_warning,
+                    rephrase_instructions=QUERY_ANALYSIS_REPHRASE_INSTRUCTIONS
+                    if rephrase
+                    else "",
+                    rephrase_key=f' and "{REPHRASED_QUERY_KEY}"' if rephrase else "",
+                ),
+            },
+            {"role": "user", "content": query},
+        ]
+
+    messages = _get_query_analysis_messages()
+    filled_llm_prompt = dict_based_prompt_to_langchain_prompt(messages)
+    model_output = get_default_llm().invoke(filled_llm_prompt)
+    logger.debug(model_output)
+
+    try:
+        model_json = extract_embedded_json(model_output)
+    except ValueError:
+        logger.warning("LLM failed to provide a valid Query Analysis output")
+        model_json = {}
+
+    fallback_calls: dict[str, FunctionCall] = {}
+    if "filter_type" not in model_json:
+        # The rules were either already tried by the caller or are disabled
+        fallback_calls["time"] = FunctionCall(extract_time_filter, (query, True))
+    if SOURCES_KEY not in model_json:
+        fallback_calls["sources"] = FunctionCall(
+            extract_source_filter, (query, db_session, True)
+        )
+    fallback_results = (
+        run_functions_in_parallel(list(fallback_calls.values()), pool=ThreadPoolName.IO)
+        if fallback_calls
+        else {}
+    )
+
+    if "time" in fallback_calls:
+        logger.info("Query Analysis did not provide a time filter, falling back")
+        time_cutoff, favor_recent = fallback_results[fallback_calls["time"].result_id]
+    else:
+        time_cutoff, favor_recent = time_filter_from_llm_json(model_json)
+
+    if "sources" in fallback_calls:
+        logger.info("Query Analysis did not provide a source filter, falling back")
+        source_filters = fallback_results[fallback_calls["sources"].result_id]
+    else:
+        source_filters = source_filter_from_llm_json(model_json)
+
+    rephrased_query = model_json.get(REPHRASED_QUERY_KEY) if rephrase else None
+    return QueryAnalysisResult(
+        time_cutoff=time_cutoff,
+        favor_recent=favor_recent,
+        source_filters=source_filters,
+        rephrased_query=rephrased_query
+        if isinstance(rephrased_query, str) and rephrased_query.strip()
+        else None,
+    )
+
+
+def extract_question_filters(
+    question: QuestionRequest,
+    db_session: Session,
+    disable_llm_extraction: bool = DISABLE_LLM_FILTER_EXTRACTION,
+    disable_combined_analysis: bool = DISABLE_COMBINED_QUERY_ANALYSIS,
+) -> tuple[datetime | None, bool, list[DocumentSource] | None]:
+    """Returns the time cutoff, favor recent and source filters for the question. Same results
+    as extract_question_time_filters and extract_question_source_filters but with only one LLM
+    call when both filters need to be extracted."""
+    if disable_combined_analysis:
+        run_time_filters = FunctionCall(
+            extract_question_time_filters, (question, disable_llm_extraction)
+        )
+        run_source_filters = FunctionCall(
+            extract_question_source_filters,
+            (question, db_session, disable_llm_extraction),
+        )
+        parallel_results = run_functions_in_parallel(
+            [run_time_filters, run_source_filters], pool=ThreadPoolName.IO
+        )
+        time_cutoff, favor_recent = parallel_results[run_time_filters.result_id]
+        return (
+            time_cutoff,
+            favor_recent,
+            parallel_results[run_source_filters.result_id],
+        )
+
+    time_cutoff = question.filters.time_cutoff
+    favor_recent = question.favor_recent
+    source_filters = question.filters.source_type
+
+    # See extract_question_time_filters for why the frontend can disable this per question
+    auto_detect = question.enable_auto_detect_filters and not disable_llm_extraction
+    llm_cutoff: datetime | None = None
+    llm_favor_recent = False
+
+    if auto_detect:
+        # The source filter is only extracted if there are sources to pick from
+        valid_sources = (
+            fetch_unique_document_sources_cached(db_session)
+            if not source_filters
+            else []
+        )
+        # Time filter extraction is run even if both time values are provided, this matches
+        # extract_question_time_filters
+        time_rule_filter = (
+            rule_based_time_filter(question.query)
+            if not DISABLE_RULE_BASED_TIME_FILTER
+            else None
+        )
+        source_rule_filter = (
+            rule_based_source_filter(question.query, valid_sources)
+            if valid_sources and not DISABLE_RULE_BASED_SOURCE_FILTER
+            else None
+        )
+
+        if valid_sources and time_rule_filter is None and source_rule_filter is None:
+            analysis = analyze_query(question.query, valid_sources, db_session)
+            llm_cutoff, llm_favor_recent = analysis.time_cutoff, analysis.favor_recent
+            source_filters = analysis.source_filters
+        else:
+            # At most one of the filters is left for the LLM
+            llm_cutoff, llm_favor_recent = (
+                time_rule_filter
+                if time_rule_filter is not None
+                else extract_time_filter(question.query, disable_rule_based=True)
+            )
+            if source_rule_filter is not None:
+                source_filters = source_rule_filter.source_filters
+            elif valid_sources:
+                source_filters = extract_source_filter(
+                    question.query, db_session, disable_rule_based=True
+                )
+
+    # For all extractable filters, don't overwrite the provided values if any is provided
+    if time_cutoff is None:
+        time_cutoff = llm_cutoff
+    if favor_recent is None:
+        favor_recent = llm_favor_recent
+
+    return time_cutoff, favor_recent, source_filters or None
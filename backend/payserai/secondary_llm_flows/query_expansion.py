@@ -5,6 +5,7 @@ from payserai.llm.utils import dict_based_prompt_to_langchain_prompt
 from payserai.prompts.secondary_llm_flows import LANGUAGE_REPHRASE_PROMPT
 from payserai.utils.logger import setup_logger
 from payserai.utils.threadpool_concurrency import run_functions_tuples_in_parallel
+from payserai.utils.threadpool_concurrency import ThreadPoolName
 
 logger = setup_logger()
 
@@ -42,7 +43,9 @@ def rephrase_query(
             (llm_rephrase_query, (query, language)) for language in languages
         ]
 
-        return run_functions_tuples_in_parallel(functions_with_args)
+        return run_functions_tuples_in_parallel(
+            functions_with_args, pool=ThreadPoolName.LLM
+        )
 
     else:
         return [llm_rephrase_query(query, language) for language in languages]
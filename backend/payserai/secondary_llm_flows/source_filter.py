@@ -4,8 +4,9 @@ import random
 from sqlalchemy.orm import Session
 
 from payserai.configs.app_configs import DISABLE_LLM_FILTER_EXTRACTION
+from payserai.configs.app_configs import DISABLE_RULE_BASED_SOURCE_FILTER
 from payserai.configs.constants import DocumentSource
-from payserai.db.connector import fetch_unique_document_sources
+from payserai.db.connector import fetch_unique_document_sources_cached
 from payserai.db.engine import get_sqlalchemy_engine
 from payserai.llm.factory import get_default_llm
 from payserai.llm.utils import dict_based_prompt_to_langchain_prompt
@@ -13,6 +14,7 @@ from payserai.prompts.constants import SOURCES_KEY
 from payserai.prompts.secondary_llm_flows import FILE_SOURCE_WARNING
 from payserai.prompts.secondary_llm_flows import SOURCE_FILTER_PROMPT
 from payserai.prompts.secondary_llm_flows import WEB_SOURCE_WARNING
+from payserai.secondary_llm_flows.source_filter_rules import rule_based_source_filter
 from payserai.server.models import QuestionRequest
 from payserai.utils.logger import setup_logger
 from payserai.utils.text_processing import extract_embedded_json
@@ -31,6 +33,16 @@ def strings_to_document_sources(source_strs: list[str]) -> list[DocumentSource]:
     return sources
 
 
+def source_filter_from_llm_json(model_json: dict) -> list[DocumentSource] | None:
+    """Returns the valid sources from the json the LLM was prompted to produce or None if it
+    didn't reference any specific sources"""
+    sources_list = model_json.get(SOURCES_KEY)
+    if not sources_list:
+        return None
+
+    return strings_to_document_sources(sources_list)
+
+
 def _sample_document_sources(
     valid_sources: list[DocumentSource],
     num_sample: int,
@@ -44,9 +56,18 @@ def _sample_document_sources(
         return random.sample(valid_sources, num_sample)
 
 
+def get_source_warnings(valid_sources: list[DocumentSource]) -> tuple[str, str]:
+    """Prompt notes for the sources that LLMs tend to select too eagerly"""
+    web_warning = WEB_SOURCE_WARNING if DocumentSource.WEB in valid_sources else ""
+    file_warning = FILE_SOURCE_WARNING if DocumentSource.FILE in valid_sources else ""
+    return web_warning, file_warning
+
+
 @log_function_time()
 def extract_source_filter(
-    query: str, db_session: Session
+    query: str,
+    db_session: Session,
+    disable_rule_based: bool = DISABLE_RULE_BASED_SOURCE_FILTER,
 ) -> list[DocumentSource] | None:
     """Returns a list of valid sources for search or None if no specific sources were detected"""
 
@@ -65,10 +86,7 @@ def extract_source_filter(
             ]
         }
 
-        web_warning = WEB_SOURCE_WARNING if DocumentSource.WEB in valid_sources else ""
-        file_warning = (
-            FILE_SOURCE_WARNING if DocumentSource.FILE in valid_sources else ""
-        )
+        web_warning, file_warning = get_source_warnings(valid_sources)
 
         msg_1_sources = _sample_document_sources(
             valid_sources=valid_sources, num_sample=2
@@ -139,20 +157,20 @@ def extract_source_filter(
         model_out: str,
     ) -> list[DocumentSource] | None:
         try:
-            sources_dict = extract_embedded_json(model_out)
-            sources_list = sources_dict.get(SOURCES_KEY)
-            if not sources_list:
-                return None
-
-            return strings_to_document_sources(sources_list)
+            return source_filter_from_llm_json(extract_embedded_json(model_out))
         except ValueError:
             logger.warning("LLM failed to provide a valid Source Filter output")
             return None
 
-    valid_sources = fetch_unique_document_sources(db_session)
+    valid_sources = fetch_unique_document_sources_cached(db_session)
     if not valid_sources:
         return None
 
+    if not disable_rule_based:
+        rule_based_filter = rule_based_source_filter(query, valid_sources)
+        if rule_based_filter is not None:
+            return rule_based_filter.source_filters
+
     messages = _get_source_filter_messages(query=query, valid_sources=valid_sources)
     filled_llm_prompt = dict_based_prompt_to_langchain_prompt(messages)
     model_output = get_default_llm().invoke(filled_llm_prompt)
@@ -0,0 +1,160 @@
+import re
+from dataclasses import dataclass
+from typing import Any
+
+from payserai.configs.constants import DocumentSource
+from payserai.utils.metrics import RuleResolutionStats
+
+# How users refer to each source, the enum value with spaces is always included.
+# Like for the LLM prompt, "web" and "file" need a clear reference to websites / uploads.
+_SOURCE_ALIASES: dict[DocumentSource, list[str]] = {
+    DocumentSource.INGESTION_API: [],
+    DocumentSource.WEB: ["website", "websites", "web page", "web pages", "webpage"],
+    DocumentSource.FILE: ["uploaded file", "uploaded files", "uploaded document"],
+    DocumentSource.GOOGLE_DRIVE: ["gdrive", "google docs", "google doc"],
+    DocumentSource.REQUESTTRACKER: ["request tracker"],
+    DocumentSource.DOCUMENT360: ["document 360"],
+}
+
+# Mentioning a source as the topic of a question ("how do I set up the Slack bot") does not
+# limit where the answer should come from, only these phrasings clearly do
+_SCOPE_PREFIX = (
+    r"(?:in|from|on|within|inside|across|through|search|searching|according to) "
+    r"(?:the |our |my |all |company )?"
+)
+_SCOPE_SUFFIX = (
+    r" (?:messages?|threads?|channels?|conversations?|posts?|pages?|spaces?|docs?|"
+    r"documents?|documentation|articles?|notes?|tickets?|issues?|prs?|pull requests?|"
+    r"repos?|repositories|files?|calls?|wiki)"
+)
+
+# Words that point to a kind of source without naming it, "open tickets" could mean Jira,
+# Linear or Zendesk. Queries with these are left to the LLM.
+_IMPLICIT_SOURCE_PAT = re.compile(
+    r"\b(?:tickets?|issues?|prs?|pull requests?|commits?|repos?|repositories|channels?|"
+    r"threads?|dms?|direct messages?|chats?|wiki|wikis|spreadsheets?|slides?|drive|"
+    r"uploads?|uploaded|websites?|webpages?|site|sites|recordings?|transcripts?|"
+    r"support cases?|help center|knowledge base|kb)\b"
+)
+
+# Source names that are also common words ("linear time", "the notion of"), always left to
+# the LLM
+_AMBIGUOUS_NAMES = {"linear", "notion", "slab", "guru", "gong"}
+
+
+@dataclass(frozen=True)
+class SourceFilterRuleResult:
+    source_filters: list[DocumentSource] | None
+    # Name of the rule that resolved the query, for debugging
+    rule: str
+
+
+def _source_names(source: DocumentSource) -> list[str]:
+    if source == DocumentSource.INGESTION_API:
+        return []
+    names = _SOURCE_ALIASES.get(source, [])
+    if source not in (DocumentSource.WEB, DocumentSource.FILE):
+        names = [source.value.replace("_", " ")] + names
+    return names
+
+
+def _names_pattern(names: list[str]) -> str:
+    return "|".join(re.escape(name) for name in sorted(names, key=len, reverse=True))
+
+
+class SourceMatcher:
+    """Built once per set of valid sources, see get_source_matcher"""
+
+    def __init__(self, valid_sources: list[DocumentSource]) -> None:
+        self.valid_sources = list(valid_sources)
+        self._name_to_source: dict[str, DocumentSource] = {}
+        # Names of all sources, not just the valid ones, to notice references to sources that
+        # have no connector which the LLM would just ignore
+        self._all_name_to_source: dict[str, DocumentSource] = {}
+        for source in DocumentSource:
+            for name in _source_names(source):
+                self._all_name_to_source[name] = source
+                if source in self.valid_sources:
+                    self._name_to_source[name] = source
+
+        all_names = _names_pattern(list(self._all_name_to_source))
+        self._mention_pat = re.compile(r"\b(?P<name>" + all_names + r")\b")
+        # "Slack", "Slack and Confluence", "Slack, Jira or Confluence"
+        name_list = (
+            r"(?:"
+            + all_names
+            + r")(?:(?:,| and| or|, and|, or) (?:"
+            + all_names
+            + r"))*"
+        )
+        self._scoped_mentions_pat = re.compile(
+            r"\b(?:"
+            + _SCOPE_PREFIX
+            + r"(?P<prefixed>"
+            + name_list
+            + r")|(?P<suffixed>"
+            + name_list
+            + r")"
+            + _SCOPE_SUFFIX
+            + r")\b"
+        )
+
+    def match(self, query: str) -> SourceFilterRuleResult | None:
+        """Returns None if the LLM is needed to decide on the source filter"""
+        text = " ".join(query.lower().replace("-", " ").split())
+
+        mentioned_names = {m.group("name") for m in self._mention_pat.finditer(text)}
+        if not mentioned_names:
+            if _IMPLICIT_SOURCE_PAT.search(text):
+                return None
+            return SourceFilterRuleResult(source_filters=None, rule="no_source")
+
+        scoped_names: set[str] = set()
+        for scoped_match in self._scoped_mentions_pat.finditer(text):
+            scoped_names.update(
+                m.group("name")
+                for m in self._mention_pat.finditer(
+                    scoped_match.group("prefixed") or scoped_match.group("suffixed")
+                )
+            )
+        # Any mention that is not clearly limiting the scope may be the topic of the question
+        if mentioned_names - scoped_names or mentioned_names & _AMBIGUOUS_NAMES:
+            return None
+
+        scoped_sources: list[DocumentSource] = []
+        for name in sorted(scoped_names):
+            source = self._name_to_source.get(name)
+            # Sources without connectors are ignored like the LLM is instructed to do
+            if source is not None and source not in scoped_sources:
+                scoped_sources.append(source)
+
+        return SourceFilterRuleResult(
+            source_filters=scoped_sources or None, rule="explicit_source"
+        )
+
+
+_SOURCE_MATCHER: SourceMatcher | None = None
+_RULE_STATS = RuleResolutionStats()
+
+
+def get_source_matcher(valid_sources: list[DocumentSource]) -> SourceMatcher:
+    # Valid sources only change with the connectors, so the latest matcher is almost always
+    # the one that's needed
+    global _SOURCE_MATCHER
+    matcher = _SOURCE_MATCHER
+    if matcher is None or matcher.valid_sources != valid_sources:
+        matcher = SourceMatcher(valid_sources)
+        _SOURCE_MATCHER = matcher
+    return matcher
+
+
+def rule_based_source_filter(
+    query: str, valid_sources: list[DocumentSource]
+) -> SourceFilterRuleResult | None:
+    result = get_source_matcher(valid_sources).match(query)
+    _RULE_STATS.record(result.rule if result is not None else None)
+    return result
+
+
+def get_source_filter_rule_stats() -> dict[str, Any]:
+    return _RULE_STATS.to_dict()
@@ -6,10 +6,12 @@ from datetime import timezone
 from dateutil.parser import parse
 
 from payserai.configs.app_configs import DISABLE_LLM_FILTER_EXTRACTION
+from payserai.configs.app_configs import DISABLE_RULE_BASED_TIME_FILTER
 from payserai.llm.factory import get_default_llm
 from payserai.llm.utils import dict_based_prompt_to_langchain_prompt
 from payserai.prompts.prompt_utils import get_current_llm_day_time
 from payserai.prompts.secondary_llm_flows import TIME_FILTER_PROMPT
+from payserai.secondary_llm_flows.time_filter_rules import rule_based_time_filter
 from payserai.server.models import QuestionRequest
 from payserai.utils.logger import setup_logger
 from payserai.utils.timing import log_function_time
@@ -42,11 +44,72 @@ def best_match_time(time_str: str) -> datetime | None:
         return None
 
 
+def time_filter_from_llm_json(model_json: dict) -> tuple[datetime | None, bool]:
+    """Returns a datetime for a hard cutoff and a bool for if more recently updated Documents
+    should be favored, from the json the LLM was prompted to produce"""
+    # If filter type is not present, just assume something has gone wrong
+    # Potentially model has identified a date and just returned that but
+    # better to be conservative and not identify the wrong filter.
+    if "filter_type" not in model_json:
+        return None, False
+
+    if "hard" in model_json["filter_type"] or "recent" in model_json["filter_type"]:
+        favor_recent = "recent" in model_json["filter_type"]
+
+        if "date" in model_json:
+            extracted_time = best_match_time(model_json["date"])
+            if extracted_time is not None:
+                # LLM struggles to understand the concept of not sensitive within a time range
+                # So if a time is extracted, just go with that alone
+                return extracted_time, False
+
+        time_diff = None
+        multiplier = 1.0
+
+        if "value_multiple" in model_json:
+            try:
+                multiplier = float(model_json["value_multiple"])
+            except ValueError:
+                pass
+
+        if "filter_value" in model_json:
+            filter_value = model_json["filter_value"]
+            if "day" in filter_value:
+                time_diff = timedelta(days=multiplier)
+            elif "week" in filter_value:
+                time_diff = timedelta(weeks=multiplier)
+            elif "month" in filter_value:
+                # Have to just use the average here, too complicated to calculate exact day
+                # based on current day etc.
+                time_diff = timedelta(days=multiplier * 30.437)
+            elif "quarter" in filter_value:
+                time_diff = timedelta(days=multiplier * 91.25)
+            elif "year" in filter_value:
+                time_diff = timedelta(days=multiplier * 365)
+
+        if time_diff is not None:
+            current = datetime.now(timezone.utc)
+            # LLM struggles to understand the concept of not sensitive within a time range
+            # So if a time is extracted, just go with that alone
+            return current - time_diff, False
+
+        # If we failed to extract a hard filter, just pass back the value of favor recent
+        return None, favor_recent
+
+    return None, False
+
+
 @log_function_time()
-def extract_time_filter(query: str) -> tuple[datetime | None, bool]:
+def extract_time_filter(
+    query: str, disable_rule_based: bool = DISABLE_RULE_BASED_TIME_FILTER
+) -> tuple[datetime | None, bool]:
     """Returns a datetime if a hard time filter should be applied for the given query
     Additionally returns a bool, True if more recently updated Documents should be
     heavily favored"""
+    if not disable_rule_based:
+        rule_based_filter = rule_based_time_filter(query)
+        if rule_based_filter is not None:
+            return rule_based_filter
 
     def _get_time_filter_messages(query: str) -> list[dict[str, str]]:
         messages = [
@@ -98,56 +161,7 @@ def extract_time_filter(query: str) -> tuple[datetime | None, bool]:
         except json.JSONDecodeError:
             return None, False
 
-        # If filter type is not present, just assume something has gone wrong
-        # Potentially model has identified a date and just returned that but
-        # better to be conservative and not identify the wrong filter.
-        if "filter_type" not in model_json:
-            return None, False
-
-        if "hard" in model_json["filter_type"] or "recent" in model_json["filter_type"]:
-            favor_recent = "recent" in model_json["filter_type"]
-
-            if "date" in model_json:
-                extracted_time = best_match_time(model_json["date"])
-                if extracted_time is not None:
-                    # LLM struggles to understand the concept of not sensitive within a time range
-                    # So if a time is extracted, just go with that alone
-                    return extracted_time, False
-
-            time_diff = None
-            multiplier = 1.0
-
-            if "value_multiple" in model_json:
-                try:
-                    multiplier = float(model_json["value_multiple"])
-                except ValueError:
-                    pass
-
-            if "filter_value" in model_json:
-                filter_value = model_json["filter_value"]
-                if "day" in filter_value:
-                    time_diff = timedelta(days=multiplier)
-                elif "week" in filter_value:
-                    time_diff = timedelta(weeks=multiplier)
-                elif "month" in filter_value:
-                    # Have to just use the average here, too complicated to calculate exact day
-                    # based on current day etc.
-                    time_diff = timedelta(days=multiplier * 30.437)
-                elif "quarter" in filter_value:
-                    time_diff = timedelta(days=multiplier * 91.25)
-                elif "year" in filter_value:
-                    time_diff = timedelta(days=multiplier * 365)
-
-            if time_diff is not None:
-                current = datetime.now(timezone.utc)
-                # LLM struggles to understand the concept of not sensitive within a time range
-                # So if a time is extracted, just go with that alone
-                return current - time_diff, False
-
-            # If we failed to extract a hard filter, just pass back the value of favor recent
-            return None, favor_recent
-
-        return None, False
+        return time_filter_from_llm_json(model_json)
 
     messages = _get_time_filter_messages(query)
     filled_llm_prompt = dict_based_prompt_to_langchain_prompt(messages)
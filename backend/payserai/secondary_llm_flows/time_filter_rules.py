@@ -0,0 +1,296 @@
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from typing import Any
+
+from payserai.utils.metrics import RuleResolutionStats
+
+# Same approximations as used for the LLM extracted filters in time_filter.py
+TIME_UNIT_DAYS: dict[str, float] = {
+    "day": 1,
+    "week": 7,
+    "month": 30.437,
+    "quarter": 91.25,
+    "half": 182.5,
+    "year": 365,
+}
+
+_WORD_NUMBERS: dict[str, int] = {
+    "a": 1,
+    "an": 1,
+    "one": 1,
+    "two": 2,
+    "couple": 2,
+    "couple of": 2,
+    "three": 3,
+    "four": 4,
+    "five": 5,
+    "six": 6,
+    "seven": 7,
+    "eight": 8,
+    "nine": 9,
+    "ten": 10,
+    "eleven": 11,
+    "twelve": 12,
+}
+
+_MONTHS: dict[str, int] = {
+    "january": 1,
+    "jan": 1,
+    "february": 2,
+    "feb": 2,
+    "march": 3,
+    "mar": 3,
+    "april": 4,
+    "apr": 4,
+    "may": 5,
+    "june": 6,
+    "jun": 6,
+    "july": 7,
+    "jul": 7,
+    "august": 8,
+    "aug": 8,
+    "september": 9,
+    "sept": 9,
+    "sep": 9,
+    "october": 10,
+    "oct": 10,
+    "november": 11,
+    "nov": 11,
+    "december": 12,
+    "dec": 12,
+}
+
+_NUMBER = r"(?P<number>\d+|couple of|couple|" + "|".join(_WORD_NUMBERS) + r")"
+_UNIT = r"(?P<unit>day|week|month|quarter|year|half(?: a)? year)s?"
+_MONTH = r"(?P<month>" + "|".join(sorted(_MONTHS, key=len, reverse=True)) + r")\.?"
+_YEAR = r"(?P<year>(?:19|20)\d{2})"
+
+# "last week", "past 3 months", "previous two quarters"
+_WINDOW_PAT = re.compile(
+    r"\b(?:last|past|previous|prior) (?:" + _NUMBER + r" )?" + _UNIT + r"\b"
+)
+# "2 weeks ago", "a month ago"
+_AGO_PAT = re.compile(r"\b" + _NUMBER + r" " + _UNIT + r" ago\b")
+# "this week", "this year"
+_THIS_PERIOD_PAT = re.compile(r"\bthis (?P<period>week|month|quarter|year)\b")
+_TODAY_PAT = re.compile(
+    r"\b(?P<day>today|tonight|this morning|this afternoon|this evening|yesterday)\b"
+)
+# Preceding words that keep the date as a lower bound for the documents
+_DATE_PREFIX = r"(?:(?:since|after|starting(?: from)?|from|on) )?"
+_ISO_DATE_PAT = re.compile(
+    r"\b"
+    + _DATE_PREFIX
+    + r"(?P<iso_year>(?:19|20)\d{2})[-/](?P<iso_month>\d{1,2})[-/](?P<iso_day>\d{1,2})\b"
+)
+# MM/DD/YYYY, the format the LLM is prompted for as well
+_US_DATE_PAT = re.compile(
+    r"\b"
+    + _DATE_PREFIX
+    + r"(?P<us_month>\d{1,2})/(?P<us_day>\d{1,2})/(?P<us_year>(?:19|20)\d{2})\b"
+)
+# "since March", "since March 5th, 2023", "after 2022"
+_SINCE_PAT = re.compile(
+    r"\b(?P<since_word>since|after|starting(?: from)?|from) (?:"
+    + _MONTH
+    + r"(?: (?P<day>\d{1,2})(?:st|nd|rd|th)?)?,?(?: "
+    + _YEAR
+    + r")?|(?P<only_year>(?:19|20)\d{2})(?![-/]\d))\b"
+)
+
+_RECENCY_PAT = re.compile(
+    r"\b(?:latest|most recent|recent|recently|newest|lately|up[- ]to[- ]date|"
+    r"currently|current|nowadays|what(?:'s| is|s) new)\b"
+)
+_NEGATED_RECENCY_PAT = re.compile(
+    r"\b(?:not|non|no longer)[- ](?:the )?(?:most )?"
+    r"(?:latest|recent|newest|new|current|up[- ]to[- ]date)\b"
+)
+
+# Temporal language that the rules above don't handle. If any of it is left in the query
+# after the handled phrases are removed, the query is passed on to the LLM.
+_ESCALATE_PAT = re.compile(
+    r"\b(?:before|until|till|prior to|between|older|oldest|earlier|earliest|as of|"
+    r"since|ago|last|past|now|tomorrow|next|upcoming|coming|future|during|"
+    r"q[1-4]|fiscal|fy ?\d{2,4}|h[12]|"
+    r"monday|tuesday|wednesday|thursday|friday|saturday|sunday|weekend|"
+    r"january|february|march|april|june|july|august|september|october|november|"
+    r"december|(?:jan|feb|mar|apr|may|jun|jul|aug|sept?|oct|nov|dec)\.? \d|"
+    r"(?:19|20)\d{2}|\d{1,2}/\d{1,2}|" + _NUMBER + r" " + _UNIT + r")\b"
+)
+
+
+@dataclass(frozen=True)
+class TimeFilterRuleResult:
+    time_cutoff: datetime | None
+    favor_recent: bool
+    # Name of the rule that resolved the query, for debugging and the benchmark
+    rule: str
+
+
+def _to_number(number: str | None) -> int:
+    if number is None:
+        return 1
+    if number.isdigit():
+        return int(number)
+    return _WORD_NUMBERS[number]
+
+
+def _to_unit_days(unit: str) -> float:
+    return TIME_UNIT_DAYS["half" if unit.startswith("half") else unit]
+
+
+def _start_of_day(dt: datetime) -> datetime:
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _start_of_period(period: str, now: datetime) -> datetime:
+    today = _start_of_day(now)
+    if period == "week":
+        return today - timedelta(days=today.weekday())
+    if period == "month":
+        return today.replace(day=1)
+    if period == "quarter":
+        return today.replace(month=3 * ((today.month - 1) // 3) + 1, day=1)
+    return today.replace(month=1, day=1)
+
+
+def _build_date(year: int, month: int, day: int) -> datetime | None:
+    try:
+        return datetime(year, month, day, tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def _resolve_since(match: re.Match, now: datetime) -> datetime | None:
+    # "after 2022" and "after March" exclude the named period itself
+    after = match.group("since_word") == "after"
+
+    if match.group("only_year"):
+        return _build_date(int(match.group("only_year")) + after, 1, 1)
+
+    month = _MONTHS[match.group("month")]
+    day = int(match.group("day")) if match.group("day") else 1
+    if match.group("year"):
+        year = int(match.group("year"))
+    else:
+        # Without a year the most recent such date is meant
+        year = now.year
+        since_date = _build_date(year, month, day)
+        if since_date is not None and since_date > now:
+            year -= 1
+
+    if after and not match.group("day"):
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return _build_date(year, month, day)
+
+
+def classify_time_filter(
+    query: str, now: datetime | None = None
+) -> TimeFilterRuleResult | None:
+    """Resolves the time filter for queries where it is unambiguous without an LLM, returns
+    None if the query has time related language that the rules can't handle confidently.
+
+    Results follow the same conventions as the LLM based extract_time_filter: if a cutoff is
+    found, favor recent is always False."""
+    now = now or datetime.now(timezone.utc)
+    text = " ".join(query.lower().replace("\u2019", "'").split())
+
+    if _NEGATED_RECENCY_PAT.search(text):
+        return None
+
+    cutoffs: list[tuple[str, datetime]] = []
+    spans: list[tuple[int, int]] = []
+
+    for match in _WINDOW_PAT.finditer(text):
+        days = _to_number(match.group("number")) * _to_unit_days(match.group("unit"))
+        cutoffs.append(("window", now - timedelta(days=days)))
+        spans.append(match.span())
+
+    for match in _AGO_PAT.finditer(text):
+        days = _to_number(match.group("number")) * _to_unit_days(match.group("unit"))
+        cutoffs.append(("ago", now - timedelta(days=days)))
+        spans.append(match.span())
+
+    for match in _THIS_PERIOD_PAT.finditer(text):
+        cutoffs.append(("this_period", _start_of_period(match.group("period"), now)))
+        spans.append(match.span())
+
+    for match in _TODAY_PAT.finditer(text):
+        days_back = 1 if match.group("day") == "yesterday" else 0
+        cutoffs.append(("today", _start_of_day(now) - timedelta(days=days_back)))
+        spans.append(match.span())
+
+    for match in _SINCE_PAT.finditer(text):
+        since_cutoff = _resolve_since(match, now)
+        if since_cutoff is None:
+            return None
+        cutoffs.append(("since", since_cutoff))
+        spans.append(match.span())
+
+    for match in _ISO_DATE_PAT.finditer(text):
+        date_cutoff = _build_date(
+            int(match.group("iso_year")),
+            int(match.group("iso_month")),
+            int(match.group("iso_day")),
+        )
+        if date_cutoff is None:
+            return None
+        cutoffs.append(("date", date_cutoff))
+        spans.append(match.span())
+
+    for match in _US_DATE_PAT.finditer(text):
+        date_cutoff = _build_date(
+            int(match.group("us_year")),
+            int(match.group("us_month")),
+            int(match.group("us_day")),
+        )
+        if date_cutoff is None:
+            return None
+        cutoffs.append(("date", date_cutoff))
+        spans.append(match.span())
+
+    recency_matches = list(_RECENCY_PAT.finditer(text))
+    spans.extend(match.span() for match in recency_matches)
+
+    # Blank out everything that was handled, whatever is left must be free of time language
+    remaining = list(text)
+    for start, end in spans:
+        remaining[start:end] = " " * (end - start)
+    if _ESCALATE_PAT.search("".join(remaining)):
+        return None
+
+    # The cutoff is only a lower bound, different cutoffs in one query likely mean a range
+    if len({cutoff for _, cutoff in cutoffs}) > 1:
+        return None
+
+    if cutoffs:
+        rule, cutoff = cutoffs[0]
+        return TimeFilterRuleResult(time_cutoff=cutoff, favor_recent=False, rule=rule)
+
+    if recency_matches:
+        return TimeFilterRuleResult(
+            time_cutoff=None, favor_recent=True, rule="favor_recent"
+        )
+
+    return TimeFilterRuleResult(time_cutoff=None, favor_recent=False, rule="no_time")
+
+
+_RULE_STATS = RuleResolutionStats()
+
+
+def rule_based_time_filter(query: str) -> tuple[datetime | None, bool] | None:
+    """classify_time_filter in the format of extract_time_filter, also counts how many LLM
+    calls the rules avoided"""
+    result = classify_time_filter(query)
+    _RULE_STATS.record(result.rule if result is not None else None)
+    if result is None:
+        return None
+    return result.time_cutoff, result.favor_recent
+
+
+def get_time_filter_rule_stats() -> dict[str, Any]:
+    return _RULE_STATS.to_dict()
@@ -15,6 +15,7 @@ from payserai.background.celery.celery_utils import get_deletion_status
 
  
 
+from payserai.db.connector import bump_connector_generation
 from payserai.db.connector import create_connector
 from payserai.db.connector import delete_connector
 from payserai.db.connector import fetch_connector_by_id
@@ -340,10 +341,16 @@ def delete_connector_by_id(
 ) -> StatusResponse[int]:
     try:
         with db_session.begin():
-            return delete_connector(db_session=db_session, connector_id=connector_id)
+            response = delete_connector(
+                db_session=db_session, connector_id=connector_id
+            )
     except AssertionError:
         raise HTTPException(status_code=400, detail="Connector is not deletable")
 
+    # Only once committed, so that questions can't cache the old sources for the new generation
+    bump_connector_generation()
+    return response
+
 
 @router.post("/admin/connector/run-once")
 def connector_run_once(
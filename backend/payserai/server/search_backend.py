@@ -6,12 +6,14 @@ from sqlalchemy.orm import Session
 
 from payserai.auth.users import current_admin_user
 from payserai.auth.users import current_user
+from payserai.configs.app_configs import DISABLE_ASYNC_QA_STREAM
 from payserai.db.engine import get_session
 from payserai.db.feedback import create_doc_retrieval_feedback
 from payserai.db.feedback import update_query_event_feedback
 from payserai.db.models import User
 from payserai.direct_qa.answer_question import answer_qa_query
 from payserai.direct_qa.answer_question import answer_qa_query_stream
+from payserai.direct_qa.answer_question import async_answer_qa_query_stream
 from payserai.document_index.factory import get_default_document_index
 from payserai.document_index.vespa.index import VespaIndex
 from payserai.search.access_filters import build_access_filters_for_user
@@ -21,8 +23,7 @@ from payserai.search.search_runner import chunks_to_search_docs
 from payserai.search.search_runner import payserai_search
 from payserai.secondary_llm_flows.query_validation import get_query_answerability
 from payserai.secondary_llm_flows.query_validation import stream_query_answerability
-from payserai.secondary_llm_flows.source_filter import extract_question_source_filters
-from payserai.secondary_llm_flows.time_filter import extract_question_time_filters
+from payserai.secondary_llm_flows.query_analysis import extract_question_filters
 from payserai.server.models import AdminSearchRequest
 from payserai.server.models import AdminSearchResponse
 from payserai.server.models import HelperResponse
@@ -34,8 +35,6 @@ from payserai.server.models import SearchDoc
 from payserai.server.models import SearchFeedbackRequest
 from payserai.server.models import SearchResponse
 from payserai.utils.logger import setup_logger
-from payserai.utils.threadpool_concurrency import FunctionCall
-from payserai.utils.threadpool_concurrency import run_functions_in_parallel
 
 logger = setup_logger()
 
@@ -121,15 +120,9 @@ def handle_search_request(
     query = question.query
     logger.info(f"Received {question.search_type.value} " f"search query: {query}")
 
-    functions_to_run = [
-        FunctionCall(extract_question_time_filters, (question,), {}),
-        FunctionCall(extract_question_source_filters, (question, db_session), {}),
-    ]
-
-    parallel_results = run_functions_in_parallel(functions_to_run)
-
-    time_cutoff, favor_recent = parallel_results["extract_question_time_filters"]
-    source_filters = parallel_results["extract_question_source_filters"]
+    time_cutoff, favor_recent, source_filters = extract_question_filters(
+        question, db_session
+    )
 
     question.filters.time_cutoff = time_cutoff
     question.favor_recent = favor_recent
@@ -166,15 +159,22 @@ def direct_qa(
 
 
 @router.post("/stream-direct-qa")
-def stream_direct_qa(
+async def stream_direct_qa(
     question: QuestionRequest,
     user: User | None = Depends(current_user),
     db_session: Session = Depends(get_session),
 ) -> StreamingResponse:
-    packets = answer_qa_query_stream(
+    if DISABLE_ASYNC_QA_STREAM:
+        # Iterated from a worker thread by the StreamingResponse
+        packets = answer_qa_query_stream(
+            question=question, user=user, db_session=db_session
+        )
+        return StreamingResponse(packets, media_type="application/json")
+
+    async_packets = async_answer_qa_query_stream(
         question=question, user=user, db_session=db_session
     )
-    return StreamingResponse(packets, media_type="application/json")
+    return StreamingResponse(async_packets, media_type="application/json")
 
 
 @router.post("/query-feedback")
@@ -0,0 +1,85 @@
+import bisect
+import threading
+from collections.abc import Sequence
+from typing import Any
+
+# Upper bounds (inclusive) of the buckets, in seconds
+DEFAULT_LATENCY_BUCKETS: tuple[float, ...] = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Histogram:
+    """Thread-safe, fixed bucket histogram. Values above the largest bucket bound are
+    counted in an overflow bucket."""
+
+    def __init__(self, name: str, buckets: Sequence[float]) -> None:
+        self.name = name
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._count += 1
+            self._sum += value
+            self._max = max(self._max, value)
+
+    def to_dict(self) -> dict[str, Any]:
+        with self._lock:
+            bucket_counts = {
+                f"le_{bound}": count for bound, count in zip(self.buckets, self._counts)
+            }
+            bucket_counts["overflow"] = self._counts[-1]
+            return {
+                "name": self.name,
+                "count": self._count,
+                "sum": self._sum,
+                "mean": self._sum / self._count if self._count else 0.0,
+                "max": self._max,
+                "buckets": bucket_counts,
+            }
+
+
+class RuleResolutionStats:
+    """Counts how often local rules resolved a value by themselves, per rule, and how often
+    they had to defer to a slower fallback such as an LLM call"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._resolved_by_rule: dict[str, int] = {}
+        self._escalated = 0
+
+    def record(self, rule: str | None) -> None:
+        """rule is None if the value could not be resolved locally"""
+        with self._lock:
+            if rule is None:
+                self._escalated += 1
+            else:
+                self._resolved_by_rule[rule] = self._resolved_by_rule.get(rule, 0) + 1
+
+    def to_dict(self) -> dict[str, Any]:
+        with self._lock:
+            resolved = sum(self._resolved_by_rule.values())
+            total = resolved + self._escalated
+            return {
+                "resolved_locally": resolved,
+                "escalated": self._escalated,
+                "resolved_fraction": resolved / total if total else 0.0,
+                "resolved_by_rule": dict(self._resolved_by_rule),
+            }
@@ -1,8 +1,12 @@
 import json
 import re
+from collections.abc import Callable
 from urllib.parse import quote
 
 
+_PRECOMPARE_REMOVED_PAT = re.compile(r'\s|\*|\\"|[.,:`"#-]')
+
+
 def make_url_compatible(s: str) -> str:
     s_with_underscores = s.replace(" ", "_")
     return quote(s_with_underscores, safe="")
@@ -13,6 +17,34 @@ def has_unescaped_quote(s: str) -> bool:
     return bool(re.search(pattern, s))
 
 
+class StreamedSubstringFinder:
+    """Checks whether `pattern` occurs in a text that arrives in pieces, after `normalize` has
+    been applied. Each piece is normalized and scanned once, only the tail of the text that
+    could still be the start of a match is kept around. `normalize` must work character by
+    character (such as lowercasing or dropping characters) so that normalizing the pieces
+    separately gives the same result as normalizing the whole text."""
+
+    def __init__(
+        self, pattern: str, normalize: Callable[[str], str] = lambda s: s
+    ) -> None:
+        self.pattern = pattern
+        self.normalize = normalize
+        self.found = False
+        self._tail = ""
+
+    def feed(self, text: str) -> bool:
+        """Returns whether the pattern occurred in all of the text fed so far"""
+        if self.found:
+            return True
+
+        window = self._tail + self.normalize(text)
+        if self.pattern in window:
+            self.found = True
+        elif len(self.pattern) > 1:
+            self._tail = window[-(len(self.pattern) - 1) :]
+        return self.found
+
+
 def escape_newlines(s: str) -> str:
     return re.sub(r"(?<!\\)\n", "\\\\n", s)
 
@@ -57,6 +89,6 @@ def shared_precompare_cleanup(text: str) -> str:
     # \*: matches the asterisk character.
     # \\": matches the \" sequence.
     # [.,:`"#-]: matches any character inside the square brackets.
-    text = re.sub(r'\s|\*|\\"|[.,:`"#-]', "", text)
+    text = _PRECOMPARE_REMOVED_PAT.sub("", text)
 
     return text
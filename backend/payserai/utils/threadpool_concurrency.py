@@ -1,17 +1,208 @@
+import asyncio
+import os
+import threading
 import uuid
+from collections.abc import AsyncIterator
 from collections.abc import Callable
+from collections.abc import Iterator
 from concurrent.futures import as_completed
+from concurrent.futures import Future
 from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError
+from dataclasses import dataclass
+from enum import Enum
 from typing import Any
+from typing import TypeVar
 
+from payserai.configs.app_configs import IO_THREAD_POOL_SIZE
+from payserai.configs.app_configs import LLM_THREAD_POOL_SIZE
+from payserai.configs.app_configs import SEARCH_THREAD_POOL_SIZE
 from payserai.utils.logger import setup_logger
 
 logger = setup_logger()
 
+T = TypeVar("T")
+_ITERATION_END = object()
+
+
+class ThreadPoolName(str, Enum):
+    # Vespa retrieval, reranking and other search post-processing
+    SEARCH = "search"
+    # Calls out to the generative model
+    LLM = "llm"
+    # General purpose, network / disk bound work
+    IO = "io"
+
+
+_THREAD_POOL_SIZES: dict[ThreadPoolName, int] = {
+    ThreadPoolName.SEARCH: SEARCH_THREAD_POOL_SIZE,
+    ThreadPoolName.LLM: LLM_THREAD_POOL_SIZE,
+    ThreadPoolName.IO: IO_THREAD_POOL_SIZE,
+}
+
+
+@dataclass(frozen=True)
+class ThreadPoolStats:
+    name: str
+    max_workers: int
+    # submitted but not yet picked up by a worker
+    queued: int
+    active: int
+    completed: int
+    timed_out: int
+
+
+class ManagedThreadPool:
+    """A long-lived, bounded thread pool shared by all requests in the process.
+    Tracks its own queue depth since ThreadPoolExecutor does not expose it publicly."""
+
+    def __init__(self, name: ThreadPoolName, max_workers: int) -> None:
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self._thread_name_prefix = f"payserai-{name.value}"
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix=self._thread_name_prefix
+        )
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._completed = 0
+        self._timed_out = 0
+
+    def _run_tracked(self, func: Callable, args: tuple, kwargs: dict) -> Any:
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._completed += 1
+
+    def _on_done(self, future: Future) -> None:
+        # Cancelled futures never ran so they are still counted as queued
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    def submit(self, func: Callable, *args: Any, **kwargs: Any) -> Future:
+        with self._lock:
+            self._queued += 1
+        future = self._executor.submit(self._run_tracked, func, args, kwargs)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self._timed_out += 1
+
+    def in_worker_thread(self) -> bool:
+        return threading.current_thread().name.startswith(self._thread_name_prefix)
+
+    def stats(self) -> ThreadPoolStats:
+        with self._lock:
+            return ThreadPoolStats(
+                name=self.name.value,
+                max_workers=self.max_workers,
+                queued=self._queued,
+                active=self._active,
+                completed=self._completed,
+                timed_out=self._timed_out,
+            )
+
+
+_THREAD_POOLS: dict[ThreadPoolName, ManagedThreadPool] = {}
+_THREAD_POOLS_PID: int | None = None
+_THREAD_POOLS_LOCK = threading.Lock()
+
+
+def get_thread_pool(name: ThreadPoolName) -> ManagedThreadPool:
+    global _THREAD_POOLS_PID
+    with _THREAD_POOLS_LOCK:
+        # Worker threads do not survive a fork, child processes need their own pools
+        if _THREAD_POOLS_PID != os.getpid():
+            _THREAD_POOLS.clear()
+            _THREAD_POOLS_PID = os.getpid()
+
+        if name not in _THREAD_POOLS:
+            _THREAD_POOLS[name] = ManagedThreadPool(
+                name=name, max_workers=_THREAD_POOL_SIZES[name]
+            )
+        return _THREAD_POOLS[name]
+
+
+def get_thread_pool_stats() -> list[ThreadPoolStats]:
+    with _THREAD_POOLS_LOCK:
+        pools = list(_THREAD_POOLS.values())
+    return [pool.stats() for pool in pools]
+
+
+def _run_in_pool(
+    tasks: list[tuple[Any, Callable, tuple, dict]],
+    pool_name: ThreadPoolName,
+    allow_failures: bool,
+    timeout: float | None,
+) -> dict[Any, Any]:
+    """Runs (key, func, args, kwargs) tasks on the named pool and maps each key to its result.
+    A failed or timed out task maps to None if allow_failures, otherwise the error is raised.
+
+    The timeout is measured from when the tasks are submitted. Tasks that have not started by
+    then are cancelled, tasks that are already running cannot be interrupted and are left to
+    finish in the background."""
+    pool = get_thread_pool(pool_name)
+    results: dict[Any, Any] = {}
+
+    # Submitting into the pool from one of its own workers could deadlock once the pool is
+    # saturated, so nested calls are run in the calling thread instead
+    if pool.in_worker_thread():
+        for key, func, args, kwargs in tasks:
+            try:
+                results[key] = func(*args, **kwargs)
+            except Exception as e:
+                logger.exception(f"Function {key} failed due to {e}")
+                results[key] = None
+                if not allow_failures:
+                    raise
+        return results
+
+    future_to_key = {
+        pool.submit(func, *args, **kwargs): key for key, func, args, kwargs in tasks
+    }
+    try:
+        for future in as_completed(future_to_key, timeout=timeout):
+            key = future_to_key[future]
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                logger.exception(f"Function {key} failed due to {e}")
+                results[key] = None
+
+                if not allow_failures:
+                    raise
+    except TimeoutError:
+        for future, key in future_to_key.items():
+            if future.done():
+                continue
+            future.cancel()
+            pool.record_timeout()
+            logger.warning(
+                f"Function {key} did not finish within {timeout} seconds "
+                f"on the '{pool_name.value}' thread pool"
+            )
+            results[key] = None
+
+        if not allow_failures:
+            raise
+
+    return results
+
 
 def run_functions_tuples_in_parallel(
     functions_with_args: list[tuple[Callable, tuple]],
     allow_failures: bool = False,
+    pool: ThreadPoolName = ThreadPoolName.IO,
+    timeout: float | None = None,
 ) -> list[Any]:
     """
     Executes multiple functions in parallel and returns a list of the results for each function.
@@ -19,30 +210,22 @@ def run_functions_tuples_in_parallel(
     Args:
         functions_with_args: List of tuples each containing the function callable and a tuple of arguments.
         allow_failures: if set to True, then the function result will just be None
+        pool: the process-wide thread pool to run the functions on
+        timeout: seconds to wait for the functions to complete, None to wait indefinitely
 
     Returns:
-        dict: A dictionary mapping function names to their results or error messages.
+        list: The results of the functions, in the same order as the input functions.
     """
-    results = []
-    with ThreadPoolExecutor(max_workers=len(functions_with_args)) as executor:
-        future_to_index = {
-            executor.submit(func, *args): i
-            for i, (func, args) in enumerate(functions_with_args)
-        }
-
-        for future in as_completed(future_to_index):
-            index = future_to_index[future]
-            try:
-                results.append((index, future.result()))
-            except Exception as e:
-                logger.exception(f"Function at index {index} failed due to {e}")
-                results.append((index, None))
-
-                if not allow_failures:
-                    raise
-
-    results.sort(key=lambda x: x[0])
-    return [result for index, result in results]
+    results = _run_in_pool(
+        tasks=[
+            (index, func, args, {})
+            for index, (func, args) in enumerate(functions_with_args)
+        ],
+        pool_name=pool,
+        allow_failures=allow_failures,
+        timeout=timeout,
+    )
+    return [results.get(index) for index in range(len(functions_with_args))]
 
 
 class FunctionCall:
@@ -64,27 +247,43 @@ class FunctionCall:
 def run_functions_in_parallel(
     function_calls: list[FunctionCall],
     allow_failures: bool = False,
+    pool: ThreadPoolName = ThreadPoolName.IO,
+    timeout: float | None = None,
 ) -> dict[str, Any]:
     """
     Executes a list of FunctionCalls in parallel and stores the results in a dictionary where the keys
     are the result_id of the FunctionCall and the values are the results of the call.
     """
-    results = {}
-    with ThreadPoolExecutor(max_workers=len(function_calls)) as executor:
-        future_to_id = {
-            executor.submit(func_call.execute): func_call.result_id
+    return _run_in_pool(
+        tasks=[
+            (func_call.result_id, func_call.execute, (), {})
             for func_call in function_calls
-        }
+        ],
+        pool_name=pool,
+        allow_failures=allow_failures,
+        timeout=timeout,
+    )
 
-        for future in as_completed(future_to_id):
-            result_id = future_to_id[future]
-            try:
-                results[result_id] = future.result()
-            except Exception as e:
-                logger.exception(f"Function with ID {result_id} failed due to {e}")
-                results[result_id] = None
 
-                if not allow_failures:
-                    raise
+async def run_in_pool_async(
+    func: Callable[..., T],
+    *args: Any,
+    pool: ThreadPoolName = ThreadPoolName.IO,
+    **kwargs: Any,
+) -> T:
+    """Runs a blocking function on the named pool without blocking the event loop"""
+    return await asyncio.wrap_future(
+        get_thread_pool(pool).submit(func, *args, **kwargs)
+    )
 
-    return results
+
+async def iterate_in_pool_async(
+    iterator: Iterator[T], pool: ThreadPoolName = ThreadPoolName.IO
+) -> AsyncIterator[T]:
+    """Fetches each item of a blocking iterator on the named pool, a worker is only taken
+    while waiting on the next item"""
+    while True:
+        item = await run_in_pool_async(next, iterator, _ITERATION_END, pool=pool)
+        if item is _ITERATION_END:
+            return
+        yield item
@@ -1,4 +1,6 @@
 import time
+from collections.abc import AsyncIterator
+from collections.abc import Awaitable
 from collections.abc import Callable
 from collections.abc import Generator
 from collections.abc import Iterator
@@ -15,6 +17,17 @@ logger = setup_logger()
 
 F = TypeVar("F", bound=Callable)
 FG = TypeVar("FG", bound=Callable[..., Generator | Iterator])
+AF = TypeVar("AF", bound=Callable[..., Awaitable])
+AFG = TypeVar("AFG", bound=Callable[..., AsyncIterator])
+
+
+def _log_elapsed_time(log_name: str, start_time: float) -> None:
+    elapsed_time_str = str(time.time() - start_time)
+    logger.info(f"{log_name} took {elapsed_time_str} seconds")
+    optional_telemetry(
+        record_type=RecordType.LATENCY,
+        data={"function": log_name, "latency": str(elapsed_time_str)},
+    )
 
 
 def log_function_time(func_name: str | None = None) -> Callable[[F], F]:
@@ -23,13 +36,7 @@ def log_function_time(func_name: str | None = None) -> Callable[[F], F]:
         def wrapped_func(*args: Any, **kwargs: Any) -> Any:
             start_time = time.time()
             result = func(*args, **kwargs)
-            elapsed_time_str = str(time.time() - start_time)
-            log_name = func_name or func.__name__
-            logger.info(f"{log_name} took {elapsed_time_str} seconds")
-            optional_telemetry(
-                record_type=RecordType.LATENCY,
-                data={"function": log_name, "latency": str(elapsed_time_str)},
-            )
+            _log_elapsed_time(func_name or func.__name__, start_time)
             return result
 
         return cast(F, wrapped_func)
@@ -51,14 +58,40 @@ def log_generator_function_time(func_name: str | None = None) -> Callable[[FG],
             except StopIteration:
                 pass
             finally:
-                elapsed_time_str = str(time.time() - start_time)
-                log_name = func_name or func.__name__
-                logger.info(f"{log_name} took {elapsed_time_str} seconds")
-                optional_telemetry(
-                    record_type=RecordType.LATENCY,
-                    data={"function": log_name, "latency": str(elapsed_time_str)},
-                )
+                _log_elapsed_time(func_name or func.__name__, start_time)
 
         return cast(FG, wrapped_func)
 
     return decorator
+
+
+def log_async_function_time(func_name: str | None = None) -> Callable[[AF], AF]:
+    def decorator(func: AF) -> AF:
+        @wraps(func)
+        async def wrapped_func(*args: Any, **kwargs: Any) -> Any:
+            start_time = time.time()
+            result = await func(*args, **kwargs)
+            _log_elapsed_time(func_name or func.__name__, start_time)
+            return result
+
+        return cast(AF, wrapped_func)
+
+    return decorator
+
+
+def log_async_generator_function_time(
+    func_name: str | None = None,
+) -> Callable[[AFG], AFG]:
+    def decorator(func: AFG) -> AFG:
+        @wraps(func)
+        async def wrapped_func(*args: Any, **kwargs: Any) -> Any:
+            start_time = time.time()
+            try:
+                async for value in func(*args, **kwargs):
+                    yield value
+            finally:
+                _log_elapsed_time(func_name or func.__name__, start_time)
+
+        return cast(AFG, wrapped_func)
+
+    return decorator
@@ -0,0 +1,109 @@
+# This file is purely for development use, not included in any builds
+# Measures chunking throughput on large synthetic documents using the default tokenizer
+import argparse
+import random
+import time
+
+from payserai.configs.app_configs import CHUNK_SIZE
+from payserai.configs.constants import DocumentSource
+from payserai.connectors.models import Document
+from payserai.connectors.models import Section
+from payserai.indexing.chunker import chunk_document
+from payserai.indexing.chunker import SECTION_SEPARATOR
+from payserai.search.search_nlp_models import get_default_tokenizer
+from payserai.utils.logger import setup_logger
+
+logger = setup_logger()
+
+_WORDS = (
+    "the quick brown fox jumps over lazy dog while indexing connectors pull documents "
+    "from confluence slack github and google drive into vespa for hybrid search"
+).split()
+
+
+def build_synthetic_document(
+    num_sections: int, words_per_section: int, seed: int = 0
+) -> Document:
+    rng = random.Random(seed)
+    sections = []
+    for section_ind in range(num_sections):
+        # Vary the section size so that both small and large (split) sections are exercised
+        num_words = rng.randint(1, 2 * words_per_section)
+        text = " ".join(rng.choice(_WORDS) for _ in range(num_words)) + "."
+        sections.append(
+            Section(text=text, link=f"https://example.com/doc#section-{section_ind}")
+        )
+
+    return Document(
+        id=f"synthetic-{num_sections}-{words_per_section}-{seed}",
+        sections=sections,
+        source=DocumentSource.WEB,
+        semantic_identifier="Synthetic Document",
+        metadata={},
+    )
+
+
+def time_legacy_token_accounting(document: Document) -> float:
+    """Token accounting of the previous chunker, which re-tokenized the accumulated
+    chunk text for every section. Only the counting is reproduced, not the chunk building.
+    """
+    tokenizer = get_default_tokenizer()
+    start = time.monotonic()
+    chunk_text = ""
+    for section in document.sections:
+        section_tok_length = len(tokenizer.tokenize(section.text))
+        current_tok_length = len(tokenizer.tokenize(chunk_text))
+        if section_tok_length > CHUNK_SIZE:
+            chunk_text = ""
+        elif (
+            current_tok_length
+            + len(tokenizer.tokenize(SECTION_SEPARATOR))
+            + section_tok_length
+            <= CHUNK_SIZE
+        ):
+            chunk_text += (
+                SECTION_SEPARATOR + section.text if chunk_text else section.text
+            )
+        else:
+            chunk_text = section.text
+    return time.monotonic() - start
+
+
+def time_chunk_document(document: Document, iterations: int) -> float:
+    start = time.monotonic()
+    for _ in range(iterations):
+        chunk_document(document)
+    return (time.monotonic() - start) / iterations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--num-sections", type=int, nargs="+", default=[100, 1000, 5000]
+    )
+    parser.add_argument("--words-per-section", type=int, default=40)
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument(
+        "--skip-legacy",
+        action="store_true",
+        help="Skip timing the previous (quadratic) token accounting",
+    )
+    args = parser.parse_args()
+
+    # Load the tokenizer up front so it is not included in the timings
+    get_default_tokenizer()
+
+    for num_sections in args.num_sections:
+        document = build_synthetic_document(num_sections, args.words_per_section)
+        num_chunks = len(chunk_document(document))
+        seconds = time_chunk_document(document, args.iterations)
+        logger.info(
+            f"{num_sections} sections -> {num_chunks} chunks: "
+            f"chunk_document {seconds:.3f}s ({num_sections / seconds:.0f} sections/s)"
+        )
+        if not args.skip_legacy:
+            legacy_seconds = time_legacy_token_accounting(document)
+            logger.info(
+                f"{num_sections} sections: legacy token accounting alone "
+                f"{legacy_seconds:.3f}s ({num_sections / legacy_seconds:.0f} sections/s)"
+            )
@@ -0,0 +1,75 @@
+# This file is purely for development use, not included in any builds
+# Measures the per token cost of parsing streamed QA model output on long answers
+import argparse
+import random
+import re
+import time
+
+from payserai.direct_qa.interfaces import payseraiAnswerPiece
+from payserai.direct_qa.qa_utils import _ModelTokenStreamParser
+from payserai.direct_qa.qa_utils import _stream_json_answer_end
+
+_WORDS = (
+    "the connector pulls documents from confluence and slack then the indexing pipeline "
+    "chunks and embeds them so that hybrid search in vespa can find relevant passages"
+).split()
+
+
+def build_token_stream(num_tokens: int, json_answer: bool, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    words = [" " + rng.choice(_WORDS) for _ in range(num_tokens)]
+    if json_answer:
+        return ["{", '"answer', '":', ' "'] + words + ['"', "}"]
+    # Model ignoring the json format, the answer start is searched for on every token
+    return words
+
+
+def time_legacy_parsing(tokens: list[str]) -> float:
+    """Streaming logic of the previous process_model_tokens for json prompts, which ran the
+    whitespace stripping regex over all of the output so far for every token"""
+    start = time.monotonic()
+    model_output = ""
+    found_answer_start = False
+    found_answer_end = False
+    for token in tokens:
+        model_previous = model_output
+        model_output += token
+        if not found_answer_start and '{"answer":"' in re.sub(r"\s", "", model_output):
+            found_answer_start = True
+            continue
+        if found_answer_start and not found_answer_end:
+            if _stream_json_answer_end(model_previous, token):
+                found_answer_end = True
+                payseraiAnswerPiece(answer_piece=None)
+                continue
+            payseraiAnswerPiece(answer_piece=token)
+    return time.monotonic() - start
+
+
+def time_incremental_parsing(tokens: list[str]) -> float:
+    start = time.monotonic()
+    parser = _ModelTokenStreamParser(is_json_prompt=True)
+    for token in tokens:
+        parser.process_token(token)
+    parser.model_output
+    return time.monotonic() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--num-tokens", type=int, nargs="+", default=[1000, 2000, 4000, 8000]
+    )
+    args = parser.parse_args()
+
+    for json_answer in (True, False):
+        for num_tokens in args.num_tokens:
+            tokens = build_token_stream(num_tokens, json_answer=json_answer)
+            legacy_time = time_legacy_parsing(tokens)
+            incremental_time = time_incremental_parsing(tokens)
+            print(
+                f"json_answer={json_answer} tokens={num_tokens}: "
+                f"legacy {legacy_time * 1000:.1f}ms, "
+                f"incremental {incremental_time * 1000:.1f}ms "
+                f"({legacy_time / max(incremental_time, 1e-9):.1f}x)"
+            )
@@ -0,0 +1,104 @@
+# This file is purely for development use, not included in any builds
+# Measures the keyword preprocessing cost per query: the previous approach which loaded the NLTK
+# resources and tokenized the query again in every helper against a single QueryAnalysis.
+# Requires the NLTK stopwords, wordnet and punkt data to be downloaded.
+import argparse
+import time
+from collections.abc import Callable
+
+from nltk.corpus import stopwords  # type:ignore
+from nltk.stem import WordNetLemmatizer  # type:ignore
+from nltk.tokenize import word_tokenize  # type:ignore
+
+from payserai.search.query_preprocessing import analyze_query_text
+from payserai.search.query_preprocessing import preload_nlp_resources
+
+QUERIES = [
+    "How do I reset my password?",
+    "What is our PTO policy",
+    "steps to rotate the slack bot token",
+    "what does the indexing pipeline do with duplicate documents",
+    "Explain the difference between hybrid and semantic search",
+    "kubernetes liveness probe config for the api server",
+    "Who should I ask about the 401k match",
+    "effects of caffeine",
+    "what is the process for a new hire's first day",
+    "Why does vespa need so much memory when indexing large Confluence spaces?",
+]
+
+
+def _legacy_remove_stop_words(text: str) -> list[str]:
+    stop_words = set(stopwords.words("english"))
+    word_tokens = word_tokenize(text)
+    text_trimmed = [word for word in word_tokens if word.casefold() not in stop_words]
+    return text_trimmed or word_tokens
+
+
+def _legacy_lemmatize_text(text: str) -> list[str]:
+    lemmatizer = WordNetLemmatizer()
+    word_tokens = word_tokenize(text)
+    return [lemmatizer.lemmatize(word) for word in word_tokens]
+
+
+def legacy_preprocessing(query: str) -> tuple[str, str, float]:
+    """One search request used to do all of these: the flow recommendation, the keyword query
+    and the stop word removed query for highlighting"""
+    non_stop_word_ratio = len(_legacy_remove_stop_words(query)) / len(query.split())
+    keyword_query = " ".join(
+        _legacy_lemmatize_text(" ".join(_legacy_remove_stop_words(query)))
+    )
+    highlight_query = " ".join(_legacy_remove_stop_words(query))
+    return keyword_query, highlight_query, non_stop_word_ratio
+
+
+def query_analysis_preprocessing(query: str) -> tuple[str, str, float]:
+    query_analysis = analyze_query_text(query)
+    return (
+        query_analysis.keyword_query,
+        query_analysis.stop_words_removed_query,
+        query_analysis.non_stop_word_ratio,
+    )
+
+
+def _time_per_query(
+    preprocess: Callable[[str], tuple[str, str, float]], iterations: int
+) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for query in QUERIES:
+            preprocess(query)
+    return (time.perf_counter() - start) / (iterations * len(QUERIES))
+
+
+def run_benchmark(iterations: int) -> None:
+    preload_nlp_resources()
+    # Warm up both paths so neither pays for the one time corpus loading
+    for query in QUERIES:
+        legacy_preprocessing(query)
+        query_analysis_preprocessing(query)
+
+    mismatches = [
+        query
+        for query in QUERIES
+        if legacy_preprocessing(query) != query_analysis_preprocessing(query)
+    ]
+    for query in mismatches:
+        print(f"MISMATCH   {query}")
+        print(f"  legacy:         {legacy_preprocessing(query)}")
+        print(f"  query analysis: {query_analysis_preprocessing(query)}")
+
+    legacy_time = _time_per_query(legacy_preprocessing, iterations)
+    analysis_time = _time_per_query(query_analysis_preprocessing, iterations)
+    print(f"\nQueries:                {len(QUERIES)} x {iterations} iterations")
+    print(f"Matching outputs:       {len(QUERIES) - len(mismatches)}/{len(QUERIES)}")
+    print(f"Legacy preprocessing:   {legacy_time * 1e6:.1f}us per query")
+    print(f"QueryAnalysis:          {analysis_time * 1e6:.1f}us per query")
+    print(f"Speedup:                {legacy_time / analysis_time:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    run_benchmark(iterations=args.iterations)
@@ -0,0 +1,130 @@
+# This file is purely for development use, not included in any builds
+# Measures quote to chunk matching with realistic numbers of quotes and chunks per answer
+import argparse
+import math
+import random
+import re
+import time
+
+import regex
+
+from payserai.configs.app_configs import QUOTE_ALLOWED_ERROR_PERCENT
+from payserai.configs.constants import DocumentSource
+from payserai.direct_qa.qa_utils import QuoteMatcher
+from payserai.indexing.models import InferenceChunk
+from payserai.utils.text_processing import clean_model_quote
+from payserai.utils.text_processing import shared_precompare_cleanup
+
+_WORDS = (
+    "the connector pulls documents from confluence and slack, then the indexing pipeline "
+    "chunks and embeds them so that hybrid search in vespa can find relevant passages. "
+    "Answers quote the passages - with citations - back to the user"
+).split()
+
+
+def build_chunks(
+    num_chunks: int, words_per_chunk: int, seed: int
+) -> list[InferenceChunk]:
+    rng = random.Random(seed)
+    chunks = []
+    for chunk_ind in range(num_chunks):
+        content = " ".join(rng.choice(_WORDS) for _ in range(words_per_chunk))
+        chunks.append(
+            InferenceChunk(
+                document_id=f"doc-{chunk_ind}",
+                source_type=DocumentSource.WEB,
+                chunk_id=0,
+                content=content,
+                source_links={
+                    offset: f"https://example.com/doc-{chunk_ind}#{offset}"
+                    for offset in range(0, len(content), 500)
+                },
+                blurb=content[:100],
+                semantic_identifier=f"Doc {chunk_ind}",
+                section_continuation=False,
+                recency_bias=1,
+                boost=0,
+                hidden=False,
+                score=1,
+                metadata={},
+                match_highlights=[],
+                updated_at=None,
+            )
+        )
+    return chunks
+
+
+def build_quotes(chunks: list[InferenceChunk], num_quotes: int, seed: int) -> list[str]:
+    """Mostly verbatim quotes with some reformatting, plus a few typos and made up quotes"""
+    rng = random.Random(seed)
+    quotes = []
+    for quote_ind in range(num_quotes):
+        if quote_ind % 5 == 4:
+            quotes.append("a quote that the model made up entirely " + str(quote_ind))
+            continue
+        words = rng.choice(chunks).content.split()
+        start = rng.randrange(0, max(1, len(words) - 20))
+        quote = " ".join(words[start : start + 20])
+        if quote_ind % 5 == 3:
+            typo_ind = len(quote) // 2
+            quote = quote[:typo_ind] + "x" + quote[typo_ind + 1 :]
+        quotes.append(quote.upper() if quote_ind % 2 else quote)
+    return quotes
+
+
+def legacy_match_quotes_to_docs(
+    quotes: list[str], chunks: list[InferenceChunk], fuzzy_search: bool
+) -> int:
+    """Matching loop of the previous match_quotes_to_docs, which cleaned up every chunk again
+    for every quote. Returns the number of matched quotes."""
+    num_matched = 0
+    for quote in quotes:
+        max_edits = math.ceil(float(len(quote)) * QUOTE_ALLOWED_ERROR_PERCENT)
+        for chunk in chunks:
+            if not chunk.source_links:
+                continue
+            quote_clean = shared_precompare_cleanup(
+                clean_model_quote(quote, trim_length=100)
+            )
+            chunk_clean = shared_precompare_cleanup(chunk.content)
+            if fuzzy_search:
+                re_search_str = (
+                    r"(" + re.escape(quote_clean) + r"){e<=" + str(max_edits) + r"}"
+                )
+                if not regex.search(re_search_str, chunk_clean):
+                    continue
+            elif quote_clean not in chunk_clean:
+                continue
+            num_matched += 1
+            break
+    return num_matched
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-chunks", type=int, nargs="+", default=[10, 25, 50])
+    parser.add_argument("--num-quotes", type=int, default=8)
+    parser.add_argument("--words-per-chunk", type=int, default=350)
+    args = parser.parse_args()
+
+    for fuzzy_search in (False, True):
+        for num_chunks in args.num_chunks:
+            chunks = build_chunks(num_chunks, args.words_per_chunk, seed=num_chunks)
+            quotes = build_quotes(chunks, args.num_quotes, seed=num_chunks)
+
+            start = time.monotonic()
+            legacy_matched = legacy_match_quotes_to_docs(quotes, chunks, fuzzy_search)
+            legacy_time = time.monotonic() - start
+
+            start = time.monotonic()
+            matched = QuoteMatcher(chunks, fuzzy_search=fuzzy_search).match_quotes(
+                quotes
+            )
+            matcher_time = time.monotonic() - start
+
+            print(
+                f"fuzzy={fuzzy_search} chunks={num_chunks} quotes={len(quotes)}: "
+                f"legacy {legacy_time * 1000:.1f}ms ({legacy_matched} matched), "
+                f"matcher {matcher_time * 1000:.1f}ms "
+                f"({len(matched.quotes)} matched)"
+            )
@@ -0,0 +1,161 @@
+# This file is purely for development use, not included in any builds
+# Measures how many time filter LLM calls the local rules avoid and how accurate they are on a
+# labeled set of queries
+import argparse
+import time
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
+from payserai.secondary_llm_flows.time_filter_rules import classify_time_filter
+
+# A Wednesday, all labels are relative to it
+NOW = datetime(2024, 5, 15, 12, tzinfo=timezone.utc)
+# Cutoffs are approximate by nature, "last month" may be 30 or 31 days back
+CUTOFF_TOLERANCE = timedelta(days=1)
+
+NO_FILTER: tuple[datetime | None, bool] = (None, False)
+FAVOR_RECENT: tuple[datetime | None, bool] = (None, True)
+
+
+def days_back(days: float) -> tuple[datetime | None, bool]:
+    return NOW - timedelta(days=days), False
+
+
+def date(year: int, month: int, day: int) -> tuple[datetime | None, bool]:
+    return datetime(year, month, day, tzinfo=timezone.utc), False
+
+
+# Labeled with what a careful human would pick given the filter semantics: a hard cutoff
+# removes everything older, favor recent only boosts newer documents
+LABELED_QUERIES: list[tuple[str, tuple[datetime | None, bool]]] = [
+    # No temporal intent, the bulk of real traffic
+    ("How do I reset my password?", NO_FILTER),
+    ("What is our PTO policy", NO_FILTER),
+    ("How may I request access to the production VPN", NO_FILTER),
+    ("Who owns the billing service", NO_FILTER),
+    ("steps to rotate the slack bot token", NO_FILTER),
+    ("what does the indexing pipeline do with duplicate documents", NO_FILTER),
+    ("Explain the difference between hybrid and semantic search", NO_FILTER),
+    ("Where is the design doc for connectors", NO_FILTER),
+    ("how to set up the dev environment on a mac", NO_FILTER),
+    ("What are the on-call responsibilities", NO_FILTER),
+    ("expense reimbursement process for conferences", NO_FILTER),
+    ("How do I add a new connector", NO_FILTER),
+    ("What is the SLA for enterprise customers?", NO_FILTER),
+    ("Why does vespa need so much memory", NO_FILTER),
+    ("list of approved laptop models", NO_FILTER),
+    ("How do I file a bug against the web app", NO_FILTER),
+    ("what is the process for a new hire's first day", NO_FILTER),
+    ("Can I work from another country for a month", NO_FILTER),
+    ("how often do we run the daily sync", NO_FILTER),
+    ("What happened to the old wiki", NO_FILTER),
+    ("Who should I ask about the 401k match", NO_FILTER),
+    ("kubernetes liveness probe config for the api server", NO_FILTER),
+    ("what is the error budget policy", NO_FILTER),
+    ("how do I get started with the python sdk", NO_FILTER),
+    # Recency
+    ("What are the latest release notes", FAVOR_RECENT),
+    ("what's new in the billing service", FAVOR_RECENT),
+    ("most recent board deck", FAVOR_RECENT),
+    ("Newest version of the security policy", FAVOR_RECENT),
+    ("what is the current on-call rotation", FAVOR_RECENT),
+    ("have there been any outages recently", FAVOR_RECENT),
+    ("up-to-date list of customer contacts", FAVOR_RECENT),
+    ("What's the last thing the CEO said about hiring", FAVOR_RECENT),
+    ("recent changes to the deployment process", FAVOR_RECENT),
+    # Relative windows
+    ("Incidents from the last 2 weeks", days_back(14)),
+    ("outages in the past month", days_back(30.437)),
+    ("what did sales close in the last quarter", days_back(91.25)),
+    ("customer complaints over the past year", days_back(365)),
+    ("what broke three days ago", days_back(3)),
+    ("Slack discussions from a couple of weeks ago", days_back(14)),
+    ("PRs merged in the previous 10 days", days_back(10)),
+    ("what went out last week", days_back(7)),
+    ("hiring plans from the last six months", days_back(6 * 30.437)),
+    ("What was decided in the planning meeting last Monday", date(2024, 5, 13)),
+    # Calendar periods
+    ("design docs written this month", date(2024, 5, 1)),
+    ("standup notes this week", date(2024, 5, 13)),
+    ("what did we ship yesterday", date(2024, 5, 14)),
+    ("any incidents today", date(2024, 5, 15)),
+    ("OKRs for this quarter", date(2024, 4, 1)),
+    ("all customer escalations this year", date(2024, 1, 1)),
+    # Absolute dates
+    ("customer escalations since March", date(2024, 3, 1)),
+    ("customer escalations since June", date(2023, 6, 1)),
+    ("changes since March 5th, 2023", date(2023, 3, 5)),
+    ("deploys after 2022", date(2023, 1, 1)),
+    ("hires after March", date(2024, 4, 1)),
+    ("postmortems since 2024-02-10", date(2024, 2, 10)),
+    ("postmortems from 02/10/2024", date(2024, 2, 10)),
+    ("security reviews starting from April", date(2024, 4, 1)),
+    ("What happened in Q1", date(2024, 1, 1)),
+    ("roadmap updates during 2024", date(2024, 1, 1)),
+    ("what changed since the migration", NO_FILTER),
+    ("documents before 2020", NO_FILTER),
+    ("not the latest version of the handbook", NO_FILTER),
+    ("what was the deploy process in the early days", NO_FILTER),
+    # Hard cases for keyword rules
+    ("What is the current limit of the 20 amp breaker", NO_FILTER),
+    ("notes from March", date(2024, 3, 1)),
+    ("the new hire onboarding checklist", NO_FILTER),
+    ("Which features are new in v2", FAVOR_RECENT),
+    ("how did we handle pricing historically", NO_FILTER),
+]
+
+
+def _is_correct(
+    predicted: tuple[datetime | None, bool], expected: tuple[datetime | None, bool]
+) -> bool:
+    predicted_cutoff, predicted_favor_recent = predicted
+    expected_cutoff, expected_favor_recent = expected
+    if predicted_favor_recent != expected_favor_recent:
+        return False
+    if predicted_cutoff is None or expected_cutoff is None:
+        return predicted_cutoff is expected_cutoff
+    return abs(predicted_cutoff - expected_cutoff) <= CUTOFF_TOLERANCE
+
+
+def run_benchmark(verbose: bool) -> None:
+    resolved = 0
+    resolved_correct = 0
+    rule_time = 0.0
+
+    for query, expected in LABELED_QUERIES:
+        start = time.perf_counter()
+        result = classify_time_filter(query, now=NOW)
+        rule_time += time.perf_counter() - start
+
+        if result is None:
+            if verbose:
+                print(f"ESCALATED  {query}")
+            continue
+
+        resolved += 1
+        predicted = (result.time_cutoff, result.favor_recent)
+        correct = _is_correct(predicted, expected)
+        resolved_correct += correct
+        if verbose or not correct:
+            label = "OK" if correct else "WRONG"
+            print(f"{label:<10} {query} -> {predicted} ({result.rule})")
+
+    total = len(LABELED_QUERIES)
+    escalated = total - resolved
+    print(f"\nLabeled queries:      {total}")
+    print(f"LLM calls avoided:    {resolved} ({resolved / total:.0%})")
+    print(f"Escalated to the LLM: {escalated}")
+    print(
+        f"Accuracy of resolved: {resolved_correct}/{resolved} "
+        f"({resolved_correct / max(resolved, 1):.1%})"
+    )
+    print(f"Mean rule time:       {rule_time / total * 1e6:.1f}us per query")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    run_benchmark(verbose=args.verbose)
@@ -0,0 +1,46 @@
+import struct
+
+import numpy as np
+
+# Media type of the binary alternative to the JSON bodies of the embedding and reranking
+# endpoints. Clients ask for it via the Accept header, servers that don't know about it just
+# answer with JSON so each side can be upgraded independently.
+FLOAT32_MATRIX_MEDIA_TYPE = "application/x-payserai-float32-matrix"
+
+# number of rows and row length, both little-endian uint32
+_HEADER = struct.Struct("<II")
+_FLOAT32_LE = np.dtype("<f4")
+
+
+def encode_float32_matrix(rows: list[list[float]] | np.ndarray) -> bytes:
+    """Packs equal length rows of floats as a small header followed by the raw
+    little-endian float32 values in row-major order"""
+    matrix = np.asarray(rows, dtype=_FLOAT32_LE)
+    if matrix.size == 0:
+        num_rows = len(rows)
+        return _HEADER.pack(num_rows, 0)
+
+    if matrix.ndim != 2:
+        raise ValueError(f"Expected a 2D matrix of floats, got {matrix.ndim} dims")
+
+    num_rows, row_len = matrix.shape
+    return _HEADER.pack(num_rows, row_len) + np.ascontiguousarray(matrix).tobytes()
+
+
+def decode_float32_matrix(payload: bytes) -> list[list[float]]:
+    if len(payload) < _HEADER.size:
+        raise ValueError("Float matrix payload is missing its header")
+
+    num_rows, row_len = _HEADER.unpack_from(payload)
+    expected_size = _HEADER.size + num_rows * row_len * _FLOAT32_LE.itemsize
+    if len(payload) != expected_size:
+        raise ValueError(
+            f"Float matrix payload of {len(payload)} bytes does not match "
+            f"its {num_rows}x{row_len} header"
+        )
+
+    if row_len == 0:
+        return [[] for _ in range(num_rows)]
+
+    matrix = np.frombuffer(payload, dtype=_FLOAT32_LE, offset=_HEADER.size)
+    return matrix.reshape(num_rows, row_len).tolist()
@@ -0,0 +1,78 @@
+import threading
+import unittest
+
+from model_server.batching import MicroBatcher
+
+
+class TestMicroBatcher(unittest.TestCase):
+    def test_concurrent_requests_are_coalesced(self) -> None:
+        batches: list[list[int]] = []
+
+        def _process(items: list[int]) -> list[int]:
+            batches.append(items)
+            return [item * 2 for item in items]
+
+        batcher: MicroBatcher[int, int] = MicroBatcher(
+            name="test", process_batch=_process, max_batch_size=64, max_wait_seconds=0.2
+        )
+        results: dict[int, list[int]] = {}
+
+        def _submit(request_ind: int) -> None:
+            results[request_ind] = batcher.submit(
+                [request_ind * 10, request_ind * 10 + 1]
+            )
+
+        threads = [threading.Thread(target=_submit, args=(ind,)) for ind in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for ind in range(5):
+            self.assertEqual(results[ind], [ind * 20, ind * 20 + 2])
+        # All requests arrived well within the wait window
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(batcher.get_metrics()["batch_size"]["count"], 1)
+
+    def test_max_batch_size_is_respected(self) -> None:
+        batch_sizes: list[int] = []
+
+        def _process(items: list[int]) -> list[int]:
+            batch_sizes.append(len(items))
+            return items
+
+        batcher: MicroBatcher[int, int] = MicroBatcher(
+            name="test", process_batch=_process, max_batch_size=3, max_wait_seconds=0.1
+        )
+        threads = [
+            threading.Thread(target=batcher.submit, args=([ind, ind],))
+            for ind in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sum(batch_sizes), 8)
+        # Requests are never split so each batch holds a single 2 item request
+        self.assertTrue(all(size == 2 for size in batch_sizes))
+        # Oversized requests are processed on their own
+        self.assertEqual(batcher.submit([1, 2, 3, 4, 5]), [1, 2, 3, 4, 5])
+
+    def test_failure_is_raised_to_every_request(self) -> None:
+        def _process(items: list[int]) -> list[int]:
+            raise ValueError("model failed")
+
+        batcher: MicroBatcher[int, int] = MicroBatcher(
+            name="test", process_batch=_process, max_batch_size=8, max_wait_seconds=0
+        )
+        with self.assertRaises(ValueError):
+            batcher.submit([1])
+        # The worker keeps serving requests after a failure
+        with self.assertRaises(ValueError):
+            batcher.submit([2])
+        self.assertEqual(batcher.submit([]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
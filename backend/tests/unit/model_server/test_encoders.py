@@ -0,0 +1,63 @@
+import unittest
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from model_server.encoders import router
+from shared_models.float_matrix import decode_float32_matrix
+from shared_models.float_matrix import encode_float32_matrix
+from shared_models.float_matrix import FLOAT32_MATRIX_MEDIA_TYPE
+
+
+class TestFloat32Matrix(unittest.TestCase):
+    def test_round_trip(self) -> None:
+        rows = [[0.5, -1.25, 3.0], [0.0, 2.5, -0.125]]
+        self.assertEqual(decode_float32_matrix(encode_float32_matrix(rows)), rows)
+
+    def test_empty_rows(self) -> None:
+        self.assertEqual(decode_float32_matrix(encode_float32_matrix([])), [])
+        self.assertEqual(
+            decode_float32_matrix(encode_float32_matrix([[], []])), [[], []]
+        )
+
+    def test_truncated_payload(self) -> None:
+        payload = encode_float32_matrix([[1.0, 2.0]])
+        with self.assertRaises(ValueError):
+            decode_float32_matrix(payload[:-1])
+
+
+class TestEmbedTransport(unittest.TestCase):
+    def setUp(self) -> None:
+        app = FastAPI()
+        app.include_router(router)
+        self.client = TestClient(app)
+
+    def _post_embed(self, headers: dict[str, str]) -> tuple[str, bytes]:
+        embeddings = [[0.5, 0.25], [1.0, -2.0]]
+        with patch(
+            "model_server.encoders._embed_batcher.submit", return_value=embeddings
+        ):
+            response = self.client.post(
+                "/encoder/bi-encoder-embed",
+                json={"texts": ["a", "b"]},
+                headers=headers,
+            )
+        self.assertEqual(response.status_code, 200)
+        return response.headers["content-type"], response.content
+
+    def test_binary_when_accepted(self) -> None:
+        content_type, content = self._post_embed(
+            {"Accept": f"{FLOAT32_MATRIX_MEDIA_TYPE}, application/json;q=0.5"}
+        )
+        self.assertTrue(content_type.startswith(FLOAT32_MATRIX_MEDIA_TYPE))
+        self.assertEqual(decode_float32_matrix(content), [[0.5, 0.25], [1.0, -2.0]])
+
+    def test_json_fallback(self) -> None:
+        content_type, content = self._post_embed({})
+        self.assertTrue(content_type.startswith("application/json"))
+        self.assertIn(b'"embeddings"', content)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,132 @@
+import random
+import re
 import unittest
+from collections.abc import Iterator
 
+from payserai.chat.chat_llm import _parse_embedded_json_streamed_response
 from payserai.chat.chat_llm import extract_citations_from_stream
+from payserai.direct_qa.interfaces import payseraiAnswerPiece
+from payserai.direct_qa.interfaces import payseraiChatModelOut
+from payserai.utils.text_processing import extract_embedded_json
+from payserai.utils.text_processing import has_unescaped_quote
+
+
+def _reference_parse_embedded_json_streamed_response(
+    tokens: Iterator[str],
+) -> Iterator[payseraiAnswerPiece | payseraiChatModelOut]:
+    """The previous implementation which re-normalized the whole output for every token"""
+    final_answer = False
+    just_start_stream = False
+    model_output = ""
+    hold = ""
+    finding_end = 0
+    for token in tokens:
+        model_output += token
+        hold += token
+
+        if (
+            final_answer is False
+            and '"action":"finalanswer",' in model_output.lower().replace(" ", "")
+        ):
+            final_answer = True
+
+        if final_answer and '"actioninput":"' in model_output.lower().replace(
+            " ", ""
+        ).replace("_", ""):
+            if not just_start_stream:
+                just_start_stream = True
+                hold = ""
+
+            if has_unescaped_quote(hold):
+                finding_end += 1
+                hold = hold[: hold.find('"')]
+
+            if finding_end <= 1:
+                if finding_end == 1:
+                    finding_end += 1
+
+                yield payseraiAnswerPiece(answer_piece=hold)
+                hold = ""
+
+    model_final = extract_embedded_json(model_output)
+    if "action" not in model_final or "action_input" not in model_final:
+        raise ValueError("Model did not provide all required action values")
+
+    yield payseraiChatModelOut(
+        model_raw=model_output,
+        action=model_final["action"],
+        action_input=model_final["action_input"],
+    )
+
+
+def _reference_extract_citations_from_stream(
+    tokens: Iterator[str], links: list[str | None]
+) -> Iterator[str]:
+    """The previous implementation which re-ran the regexes over the held back segment"""
+    max_citation_num = len(links) + 1
+    curr_segment = ""
+    prepend_bracket = False
+    for token in tokens:
+        if prepend_bracket:
+            curr_segment += "[" + curr_segment
+            prepend_bracket = False
+
+        curr_segment += token
+        possible_citation_found = re.search(r"(\[\d*$)", curr_segment)
+        citation_found = re.search(r"\[(\d+)\]", curr_segment)
+
+        if citation_found:
+            numerical_value = int(citation_found.group(1))
+            if 1 <= numerical_value <= max_citation_num:
+                link = links[numerical_value - 1]
+                if link:
+                    curr_segment = re.sub(r"\[", "[[", curr_segment, count=1)
+                    curr_segment = re.sub("]", f"]]({link})", curr_segment, count=1)
+            possible_citation_found = None
+
+        if possible_citation_found:
+            continue
+
+        if curr_segment and curr_segment[-1] == "[":
+            curr_segment = curr_segment[:-1]
+            prepend_bracket = True
+
+        yield curr_segment
+        curr_segment = ""
+
+    if curr_segment:
+        if prepend_bracket:
+            yield "[" + curr_segment
+        else:
+            yield curr_segment
+
+
+def _collect(
+    stream: Iterator[payseraiAnswerPiece | payseraiChatModelOut],
+) -> tuple[list[payseraiAnswerPiece | payseraiChatModelOut], type | None]:
+    outputs = []
+    try:
+        for output in stream:
+            outputs.append(output)
+    except Exception as e:
+        return outputs, type(e)
+    return outputs, None
+
+
+def _random_tokenizations(
+    text: str, num_tokenizations: int, seed: int = 0
+) -> list[list[str]]:
+    rng = random.Random(seed)
+    tokenizations = []
+    for _ in range(num_tokenizations):
+        tokens = []
+        ind = 0
+        while ind < len(text):
+            token_len = rng.choice([0, 1, 1, 2, 3, 4, 7])
+            tokens.append(text[ind : ind + token_len])
+            ind += token_len
+        tokenizations.append(tokens)
+    return tokenizations
 
 
 class TestChatLlm(unittest.TestCase):
@@ -32,6 +158,50 @@ class TestChatLlm(unittest.TestCase):
         res = "".join(list(extract_citations_from_stream(iter(test_1), links)))
         self.assertEqual(res, "Something [[2]](link_2)[4][[5]](link_5)")
 
+    def test_citation_extraction_matches_reference(self) -> None:
+        links: list[str | None] = [f"link_{i}" for i in range(1, 6)]
+        links[1] = None
+        texts = [
+            "Dogs are loyal [1][2][3]. Cats [4] are not [10] and [7] is out of range.",
+            "Brackets [a] [1] in text, [12\n and a list [\n1] then [5][",
+            "Numbers [٣] and nested [[1]] or [1[2]] end with [",
+            "No citations at all, just a long answer without any brackets",
+        ]
+        for text in texts:
+            for tokens in _random_tokenizations(text, num_tokenizations=100):
+                expected = list(
+                    _reference_extract_citations_from_stream(iter(tokens), links)
+                )
+                actual = list(extract_citations_from_stream(iter(tokens), links))
+                self.assertEqual(actual, expected, msg=f"Token stream: {tokens}")
+
+    def test_streamed_json_answer_matches_reference(self) -> None:
+        outputs = [
+            '{"action": "Final Answer", "action_input": "Dogs are \\"loyal\\" pets"}',
+            '{\n  "action_input": "Cats are independent",\n  "action": "Final Answer",\n'
+            '  "thought": "done"\n}',
+            '{"action": "Current Search", "action_input": "dog breeds"}',
+            '{"ACTION" : "FINAL ANSWER", "Action_Input" : "Yes"} trailing text',
+        ]
+        for output in outputs:
+            for tokens in _random_tokenizations(output, num_tokenizations=100):
+                expected = _collect(
+                    _reference_parse_embedded_json_streamed_response(iter(tokens))
+                )
+                actual = _collect(_parse_embedded_json_streamed_response(iter(tokens)))
+                self.assertEqual(actual, expected, msg=f"Token stream: {tokens}")
+
+        pieces = list(
+            _parse_embedded_json_streamed_response(
+                iter(['{"action": "Final Answer", "action_input": "', "Dogs", '"}'])
+            )
+        )
+        self.assertEqual(
+            [piece.answer_piece for piece in pieces[:-1]],  # type: ignore
+            # The closing quote token ends the answer with an empty piece
+            ["", "Dogs", ""],
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
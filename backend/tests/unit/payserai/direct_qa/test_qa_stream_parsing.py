@@ -0,0 +1,220 @@
+import asyncio
+import random
+import re
+import unittest
+from collections.abc import AsyncIterator
+from collections.abc import Generator
+from collections.abc import Iterator
+
+from payserai.direct_qa.interfaces import payseraiAnswerPiece
+from payserai.direct_qa.interfaces import payseraiQuotes
+from payserai.direct_qa.qa_utils import _extract_quotes_from_completed_token_stream
+from payserai.direct_qa.qa_utils import _stream_json_answer_end
+from payserai.direct_qa.qa_utils import async_process_model_tokens
+from payserai.direct_qa.qa_utils import process_model_tokens
+from payserai.indexing.models import InferenceChunk
+from payserai.prompts.constants import QUOTE_PAT
+
+
+def _reference_process_model_tokens(
+    tokens: Iterator[str],
+    context_docs: list[InferenceChunk],
+    is_json_prompt: bool = True,
+) -> Generator[payseraiAnswerPiece | payseraiQuotes, None, None]:
+    """The previous implementation which re-scanned the accumulated output for every token"""
+    quote_pat = f"\n{QUOTE_PAT}"
+    quote_loose = f"\n{quote_pat[:-1]}\n"
+    quote_pat_full = f"\n{quote_pat}"
+    model_output: str = ""
+    found_answer_start = False if is_json_prompt else True
+    found_answer_end = False
+    hold_quote = ""
+    for token in tokens:
+        model_previous = model_output
+        model_output += token
+
+        if not found_answer_start and '{"answer":"' in re.sub(r"\s", "", model_output):
+            found_answer_start = True
+            if is_json_prompt and len(model_output) > 40:
+                found_answer_end = True
+            continue
+
+        if found_answer_start and not found_answer_end:
+            if is_json_prompt and _stream_json_answer_end(model_previous, token):
+                found_answer_end = True
+                yield payseraiAnswerPiece(answer_piece=None)
+                continue
+            elif not is_json_prompt:
+                if quote_pat in hold_quote + token or quote_loose in hold_quote + token:
+                    found_answer_end = True
+                    yield payseraiAnswerPiece(answer_piece=None)
+                    continue
+                if hold_quote + token in quote_pat_full:
+                    hold_quote += token
+                    continue
+            yield payseraiAnswerPiece(answer_piece=hold_quote + token)
+            hold_quote = ""
+
+    yield _extract_quotes_from_completed_token_stream(model_output, context_docs)
+
+
+_CHUNK = InferenceChunk(
+    document_id="doc 0",
+    source_type="testing",
+    chunk_id=0,
+    content="Dogs are loyal. A dog is a man's best friend. Cats are independent.",
+    source_links={0: "doc 0 base", 16: "dog link"},
+    blurb="anything",
+    semantic_identifier="anything",
+    section_continuation=False,
+    recency_bias=1,
+    boost=0,
+    hidden=False,
+    score=1,
+    metadata={},
+    match_highlights=[],
+    updated_at=None,
+)
+
+# Token streams as produced by the LLM providers, including split up json keys, escaped
+# quotes, empty tokens and answers that never produce the expected json
+_RECORDED_JSON_STREAMS: list[list[str]] = [
+    [
+        "{",
+        '"answer',
+        '":',
+        ' "',
+        "Dogs",
+        " are",
+        " loyal",
+        '",',
+        ' "quotes',
+        '": ["',
+        "A dog is a man's best friend",
+        '"]}',
+    ],
+    ['{"answer":"', "It", " is", ' \\"', "great", '\\"', " indeed", '"', "}"],
+    ["{\n", '  "', "answer", '"', ":", " ", '"', "?", '"', "}"],
+    ["", "{", "", '"answer":"', "x", "", "\\", '"', " y", '"}'],
+    [
+        "Sure! Here is the answer you asked for in the json format: ",
+        '{"answer": "',
+        "late",
+        '"}',
+    ],
+    ["I", " cannot", " answer", " that"],
+    ['{"answer":"Cats', " are", ' independent", "quote": "Cats are independent."}'],
+]
+
+_RECORDED_FREEFORM_STREAMS: list[list[str]] = [
+    ["Dogs", " are", " loyal", "\n", "Quote", ":", " A dog is a man's best friend"],
+    ["Dogs", " are", " loyal", "\n", "\n", "Quote", ":", " A dog"],
+    ["Dogs", "\n", "Quote", "\n", "A dog is a man's best friend"],
+    ["Dogs", "\nQuo", "tes are", " fun", "\n"],
+    ["Answer:", " Cats", " are", " independent", "\nQuote: Cats are independent."],
+    ["\n", "\n", "Q", "u", "ote", " none"],
+]
+
+
+def _collect(
+    stream: Iterator[payseraiAnswerPiece | payseraiQuotes],
+) -> tuple[list[payseraiAnswerPiece | payseraiQuotes], type | None]:
+    """Non-json outputs fail the final quote extraction, which must also be preserved"""
+    outputs = []
+    try:
+        for output in stream:
+            outputs.append(output)
+    except Exception as e:
+        return outputs, type(e)
+    return outputs, None
+
+
+def _random_tokenization(text: str, rng: random.Random) -> list[str]:
+    tokens = []
+    ind = 0
+    while ind < len(text):
+        token_len = rng.choice([0, 1, 1, 2, 3, 5, 8])
+        tokens.append(text[ind : ind + token_len])
+        ind += token_len
+    return tokens
+
+
+class TestProcessModelTokens(unittest.TestCase):
+    def _assert_equivalent(self, tokens: list[str], is_json_prompt: bool) -> None:
+        expected = _collect(
+            _reference_process_model_tokens(
+                iter(tokens), [_CHUNK], is_json_prompt=is_json_prompt
+            )
+        )
+        actual = _collect(
+            process_model_tokens(iter(tokens), [_CHUNK], is_json_prompt=is_json_prompt)
+        )
+        self.assertEqual(actual, expected, msg=f"Token stream: {tokens}")
+
+    def _assert_async_equivalent(self, tokens: list[str], is_json_prompt: bool) -> None:
+        async def _tokens() -> AsyncIterator[str]:
+            for token in tokens:
+                yield token
+
+        async def _collect_async() -> (
+            tuple[list[payseraiAnswerPiece | payseraiQuotes], type | None]
+        ):
+            outputs = []
+            try:
+                async for output in async_process_model_tokens(
+                    _tokens(), [_CHUNK], is_json_prompt=is_json_prompt
+                ):
+                    outputs.append(output)
+            except Exception as e:
+                return outputs, type(e)
+            return outputs, None
+
+        expected = _collect(
+            process_model_tokens(iter(tokens), [_CHUNK], is_json_prompt=is_json_prompt)
+        )
+        self.assertEqual(asyncio.run(_collect_async()), expected)
+
+    def test_recorded_json_streams(self) -> None:
+        for tokens in _RECORDED_JSON_STREAMS:
+            self._assert_equivalent(tokens, is_json_prompt=True)
+
+    def test_recorded_freeform_streams(self) -> None:
+        for tokens in _RECORDED_FREEFORM_STREAMS:
+            self._assert_equivalent(tokens, is_json_prompt=False)
+
+    def test_random_tokenizations(self) -> None:
+        rng = random.Random(7)
+        outputs = [
+            '{"answer": "Dogs are \\"loyal\\"", "quotes": ["A dog is a man\'s best friend"]}',
+            ' {\n "answer" : "?" }',
+            "Some preamble that is long enough to trip the hallucination check "
+            '{"answer":"Dogs are loyal"}',
+            "Dogs are loyal\nQuote: A dog is a man's best friend\nquote: Cats",
+        ]
+        for output in outputs:
+            for _ in range(50):
+                tokens = _random_tokenization(output, rng)
+                self._assert_equivalent(tokens, is_json_prompt=True)
+                self._assert_equivalent(tokens, is_json_prompt=False)
+
+    def test_async_recorded_streams(self) -> None:
+        for tokens in _RECORDED_JSON_STREAMS:
+            self._assert_async_equivalent(tokens, is_json_prompt=True)
+        for tokens in _RECORDED_FREEFORM_STREAMS:
+            self._assert_async_equivalent(tokens, is_json_prompt=False)
+
+    def test_streamed_answer(self) -> None:
+        pieces = list(process_model_tokens(iter(_RECORDED_JSON_STREAMS[0]), [_CHUNK]))
+        answer_pieces = [
+            piece.answer_piece
+            for piece in pieces
+            if isinstance(piece, payseraiAnswerPiece) and piece.answer_piece
+        ]
+        self.assertEqual("".join(answer_pieces), "Dogs are loyal")
+        quotes = pieces[-1]
+        assert isinstance(quotes, payseraiQuotes)
+        self.assertEqual(quotes.quotes[0].document_id, "doc 0")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,40 @@
 import textwrap
 import unittest
+from unittest.mock import patch
 
+from payserai.configs.constants import IGNORE_FOR_QA
+from payserai.direct_qa.qa_utils import get_chunks_for_qa
+from payserai.direct_qa.qa_utils import get_usable_chunks
 from payserai.direct_qa.qa_utils import match_quotes_to_docs
+from payserai.direct_qa.qa_utils import QuoteMatcher
 from payserai.direct_qa.qa_utils import separate_answer_quotes
 from payserai.indexing.models import InferenceChunk
+from payserai.llm.utils import get_chunk_token_counts
+
+
+def _chunk(
+    document_id: str,
+    content: str,
+    source_links: dict[int, str] | None,
+    metadata: dict | None = None,
+) -> InferenceChunk:
+    return InferenceChunk(
+        document_id=document_id,
+        source_type="testing",
+        chunk_id=0,
+        content=content,
+        source_links=source_links,
+        blurb="anything",
+        semantic_identifier="anything",
+        section_continuation=False,
+        recency_bias=1,
+        boost=0,
+        hidden=False,
+        score=1,
+        metadata=metadata or {},
+        match_highlights=[],
+        updated_at=None,
+    )
 
 
 class TestQAPostprocessing(unittest.TestCase):
@@ -194,6 +225,107 @@ class TestQAPostprocessing(unittest.TestCase):
             },
         )
 
+    def test_quote_matcher(self) -> None:
+        chunks = [
+            _chunk("no links", "Dogs are loyal. Cats are independent.", None),
+            _chunk(
+                "doc 0",
+                "Dogs are loyal, friendly and playful.\n"
+                "Cats are independent - they need little attention.",
+                # Link offsets are in terms of the cleaned up text, as the chunker stores them
+                {0: "dogs link", 30: "cats link"},
+            ),
+            _chunk("doc 1", "Parrots can live for decades.", {0: "parrots link"}),
+            _chunk(
+                "doc 2",
+                "A b c d e f g h i j k l.\n\nMango papaya.",
+                {0: "letters link", 12: "fruits link"},
+            ),
+        ]
+        matcher = QuoteMatcher(chunks, max_error_percent=0.1, fuzzy_search=True)
+        quotes = matcher.match_quotes(
+            [
+                "Dogs are loyal",
+                '"Cats are independent, they need little attention"',
+                "Parrots can live for decadez",
+                "Hamsters are nocturnal",
+                "j k l",
+                "Mango papaya",
+            ]
+        )
+        self.assertEqual(
+            [(quote.document_id, quote.link) for quote in quotes.quotes],
+            [
+                ("doc 0", "dogs link"),
+                ("doc 0", "cats link"),
+                ("doc 1", "parrots link"),
+                ("doc 2", "letters link"),
+                ("doc 2", "fruits link"),
+            ],
+        )
+
+        # Without fuzzy search only exact (after cleanup) matches are found
+        exact_quotes = QuoteMatcher(chunks).match_quotes(
+            ["Parrots can live for decadez", "parrots can LIVE for decades."]
+        )
+        self.assertEqual(
+            [quote.quote for quote in exact_quotes.quotes],
+            ["parrots can LIVE for decades."],
+        )
+
+
+class TestChunkPacking(unittest.TestCase):
+    def test_get_chunk_token_counts_cached(self) -> None:
+        encoded_texts: list[str] = []
+
+        class _FakeTokenizer:
+            def encode_batch(self, texts: list[str]) -> list[list[str]]:
+                encoded_texts.extend(texts)
+                return [text.split() for text in texts]
+
+        chunks = [_chunk("doc 0", "one two three", None), _chunk("doc 1", "four", None)]
+        with patch(
+            "payserai.llm.utils.get_default_llm_tokenizer",
+            return_value=_FakeTokenizer(),
+        ):
+            self.assertEqual(get_chunk_token_counts(chunks), [3, 1])
+            changed_chunk = _chunk("doc 0", "one two", None)
+            self.assertEqual(get_chunk_token_counts([changed_chunk, chunks[1]]), [2, 1])
+
+        # Only the new content of doc 0 was tokenized again
+        self.assertEqual(encoded_texts, ["one two three", "four", "one two"])
+
+    def test_get_usable_chunks(self) -> None:
+        chunks = [_chunk(f"doc {ind}", "text", None) for ind in range(4)]
+        with patch(
+            "payserai.direct_qa.qa_utils.get_chunk_token_counts",
+            side_effect=lambda chunks: [30, 40, 50, 10][-len(chunks) :],
+        ):
+            self.assertEqual(get_usable_chunks(chunks, token_limit=70), chunks[:2])
+            self.assertEqual(get_usable_chunks(chunks, token_limit=69), chunks[:1])
+            # At least one chunk is always used
+            self.assertEqual(get_usable_chunks(chunks, token_limit=10), chunks[:1])
+
+    def test_get_chunks_for_qa(self) -> None:
+        chunks = [_chunk(f"doc {ind}", "text", None) for ind in range(5)]
+        chunks[2] = _chunk("doc 2", "text", None, metadata={IGNORE_FOR_QA: True})
+        with patch(
+            "payserai.direct_qa.qa_utils.get_chunk_token_counts",
+            return_value=[100, 100, 100, 100, 100],
+        ):
+            # LLM selected chunks come first, each chunk costs its tokens + 50
+            llm_chunk_selection = [False, True, True, False, True]
+            self.assertEqual(
+                get_chunks_for_qa(chunks, llm_chunk_selection, token_limit=300),
+                [1, 4],
+            )
+            self.assertEqual(
+                get_chunks_for_qa(
+                    chunks, llm_chunk_selection, token_limit=300, batch_offset=1
+                ),
+                [0, 3],
+            )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,42 @@
+import inspect
+import unittest
+
+from payserai.document_index.interfaces import HybridCapable
+from payserai.document_index.interfaces import KeywordCapable
+from payserai.document_index.interfaces import VectorCapable
+from payserai.document_index.vespa.index import VespaIndex
+
+# Extras shared by all indices, for each interface and its retrieval methods
+_RETRIEVAL_METHODS = {
+    KeywordCapable: (
+        ["keyword_retrieval", "async_keyword_retrieval"],
+        ["query_analysis"],
+    ),
+    VectorCapable: (
+        ["semantic_retrieval", "async_semantic_retrieval"],
+        ["query_analysis", "query_embedding"],
+    ),
+    HybridCapable: (
+        ["hybrid_retrieval", "async_hybrid_retrieval"],
+        ["query_analysis", "query_embedding"],
+    ),
+}
+
+
+class TestRetrievalSignatures(unittest.TestCase):
+    def test_extras_are_keyword_only(self) -> None:
+        # Indices add their own optional positional params, the shared extras must not line
+        # up with those
+        for interface, (method_names, extras) in _RETRIEVAL_METHODS.items():
+            for method_name in method_names:
+                for cls in (interface, VespaIndex):
+                    params = inspect.signature(getattr(cls, method_name)).parameters
+                    with self.subTest(cls=cls.__name__, method=method_name):
+                        self.assertEqual(
+                            [params[extra].kind for extra in extras],
+                            [inspect.Parameter.KEYWORD_ONLY] * len(extras),
+                        )
+
+
+if __name__ == "__main__":
+    unittest.main()
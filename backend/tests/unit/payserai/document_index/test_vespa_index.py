@@ -0,0 +1,128 @@
+import unittest
+from datetime import datetime
+from datetime import timezone
+from typing import Any
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from payserai.access.models import DocumentAccess
+from payserai.configs.constants import CONTENT_HASH
+from payserai.configs.constants import DOC_UPDATED_AT
+from payserai.configs.constants import DocumentSource
+from payserai.connectors.models import Document
+from payserai.connectors.models import Section
+from payserai.document_index.document_index_utils import get_uuid_from_chunk
+from payserai.document_index.vespa.index import _build_vespa_chunk_fields
+from payserai.document_index.vespa.index import _clear_and_index_vespa_chunks
+from payserai.indexing.models import ChunkEmbedding
+from payserai.indexing.models import DocMetadataAwareIndexChunk
+
+_INDEX_MODULE = "payserai.document_index.vespa.index"
+
+
+def _build_chunks(
+    texts: list[str], doc_updated_at: datetime
+) -> list[DocMetadataAwareIndexChunk]:
+    document = Document(
+        id="doc",
+        sections=[Section(text=text, link=None) for text in texts],
+        source=DocumentSource.WEB,
+        semantic_identifier="doc",
+        metadata={},
+        doc_updated_at=doc_updated_at,
+    )
+    return [
+        DocMetadataAwareIndexChunk(
+            source_document=document,
+            chunk_id=chunk_id,
+            blurb=text,
+            content=text,
+            source_links={0: ""},
+            section_continuation=False,
+            embeddings=ChunkEmbedding(full_embedding=[0.0], mini_chunk_embeddings=[]),
+            access=DocumentAccess(user_ids=set(), is_public=True),
+            document_sets=set(),
+        )
+        for chunk_id, text in enumerate(texts)
+    ]
+
+
+class TestClearAndIndexVespaChunks(unittest.TestCase):
+    def test_unchanged_chunks_of_edited_document_get_new_update_time(self) -> None:
+        indexed_chunks = _build_chunks(
+            ["first", "second"], datetime(2023, 12, 1, tzinfo=timezone.utc)
+        )
+        new_updated_at = datetime(2023, 12, 2, tzinfo=timezone.utc)
+        chunks = _build_chunks(["first", "second edited"], new_updated_at)
+
+        fed_chunk_ids: list[int] = []
+        updated_ats: list[tuple[str, int]] = []
+
+        def _index(chunks: list[tuple[Any, dict[str, Any]]], **kwargs: Any) -> None:
+            fed_chunk_ids.extend(chunk.chunk_id for chunk, _ in chunks)
+
+        def _update(chunk_updated_ats: list[tuple[str, int]], **kwargs: Any) -> None:
+            updated_ats.extend(chunk_updated_ats)
+
+        with patch(
+            f"{_INDEX_MODULE}._get_document_chunk_counts", return_value={"doc": 2}
+        ), patch(
+            f"{_INDEX_MODULE}._get_existing_chunk_hashes",
+            return_value={
+                str(get_uuid_from_chunk(chunk)): _build_vespa_chunk_fields(chunk)[
+                    CONTENT_HASH
+                ]
+                for chunk in indexed_chunks
+            },
+        ), patch(
+            f"{_INDEX_MODULE}._batch_index_vespa_chunks", side_effect=_index
+        ), patch(
+            f"{_INDEX_MODULE}._update_vespa_chunks_updated_at", side_effect=_update
+        ), patch(
+            f"{_INDEX_MODULE}._delete_vespa_chunks"
+        ) as delete_mock:
+            records = _clear_and_index_vespa_chunks(chunks)
+
+        self.assertEqual(fed_chunk_ids, [1])
+        self.assertEqual(
+            updated_ats,
+            [
+                (
+                    str(get_uuid_from_chunk(chunks[0])),
+                    _build_vespa_chunk_fields(chunks[0])[DOC_UPDATED_AT],
+                )
+            ],
+        )
+        self.assertEqual(updated_ats[0][1], int(new_updated_at.timestamp()))
+        delete_mock.assert_not_called()
+        self.assertEqual([record.already_existed for record in records], [True])
+
+    def test_unchanged_document_is_not_touched(self) -> None:
+        chunks = _build_chunks(
+            ["first", "second"], datetime(2023, 12, 2, tzinfo=timezone.utc)
+        )
+        index_mock = MagicMock()
+        update_mock = MagicMock()
+        with patch(
+            f"{_INDEX_MODULE}._get_document_chunk_counts", return_value={"doc": 2}
+        ), patch(
+            f"{_INDEX_MODULE}._get_existing_chunk_hashes",
+            return_value={
+                str(get_uuid_from_chunk(chunk)): _build_vespa_chunk_fields(chunk)[
+                    CONTENT_HASH
+                ]
+                for chunk in chunks
+            },
+        ), patch(
+            f"{_INDEX_MODULE}._batch_index_vespa_chunks", index_mock
+        ), patch(
+            f"{_INDEX_MODULE}._update_vespa_chunks_updated_at", update_mock
+        ):
+            _clear_and_index_vespa_chunks(chunks)
+
+        index_mock.assert_not_called()
+        update_mock.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,212 @@
+import random
+import unittest
+from unittest.mock import patch
+
+from tokenizers import Tokenizer  # type:ignore
+from tokenizers.models import WordLevel  # type:ignore
+from tokenizers.pre_tokenizers import BertPreTokenizer  # type:ignore
+from transformers import PreTrainedTokenizerFast  # type:ignore
+
+from payserai.configs.constants import DocumentSource
+from payserai.connectors.models import Document
+from payserai.connectors.models import Section
+from payserai.indexing.chunker import chunk_document
+from payserai.indexing.chunker import chunk_large_section
+from payserai.indexing.chunker import extract_blurb
+from payserai.indexing.chunker import SECTION_SEPARATOR
+from payserai.indexing.models import DocAwareChunk
+from payserai.utils.text_processing import shared_precompare_cleanup
+
+
+def _build_word_tokenizer() -> PreTrainedTokenizerFast:
+    # Every word and punctuation mark is one token, same pre-tokenization as the BERT style encoders
+    tokenizer = Tokenizer(WordLevel(vocab={"[UNK]": 0}, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = BertPreTokenizer()
+    return PreTrainedTokenizerFast(tokenizer_object=tokenizer, unk_token="[UNK]")
+
+
+class _SlowWordTokenizer:
+    def __init__(self) -> None:
+        self._fast_tokenizer = _build_word_tokenizer()
+
+    def tokenize(self, text: str) -> list[str]:
+        return self._fast_tokenizer.tokenize(text)
+
+
+def _reference_chunk_document(
+    document: Document, chunk_tok_size: int, subsection_overlap: int, blurb_size: int
+) -> list[DocAwareChunk]:
+    """The original chunking loop which re-tokenizes the accumulated chunk for every section"""
+    tokenizer = _build_word_tokenizer()
+    chunks: list[DocAwareChunk] = []
+    link_offsets: dict[int, str] = {}
+    chunk_text = ""
+    for section in document.sections:
+        section_link_text = section.link or ""
+        section_tok_length = len(tokenizer.tokenize(section.text))
+        current_tok_length = len(tokenizer.tokenize(chunk_text))
+        curr_offset_len = len(shared_precompare_cleanup(chunk_text))
+
+        if section_tok_length > chunk_tok_size:
+            if chunk_text:
+                chunks.append(
+                    DocAwareChunk(
+                        source_document=document,
+                        chunk_id=len(chunks),
+                        blurb=extract_blurb(chunk_text, blurb_size),
+                        content=chunk_text,
+                        source_links=link_offsets,
+                        section_continuation=False,
+                    )
+                )
+                link_offsets = {}
+                chunk_text = ""
+
+            chunks.extend(
+                chunk_large_section(
+                    section=section,
+                    document=document,
+                    start_chunk_id=len(chunks),
+                    tokenizer=tokenizer,
+                    chunk_size=chunk_tok_size,
+                    chunk_overlap=subsection_overlap,
+                    blurb_size=blurb_size,
+                )
+            )
+            continue
+
+        if (
+            current_tok_length
+            + len(tokenizer.tokenize(SECTION_SEPARATOR))
+            + section_tok_length
+            <= chunk_tok_size
+        ):
+            chunk_text += (
+                SECTION_SEPARATOR + section.text if chunk_text else section.text
+            )
+            link_offsets[curr_offset_len] = section_link_text
+        else:
+            chunks.append(
+                DocAwareChunk(
+                    source_document=document,
+                    chunk_id=len(chunks),
+                    blurb=extract_blurb(chunk_text, blurb_size),
+                    content=chunk_text,
+                    source_links=link_offsets,
+                    section_continuation=False,
+                )
+            )
+            link_offsets = {0: section_link_text}
+            chunk_text = section.text
+
+    if chunk_text:
+        chunks.append(
+            DocAwareChunk(
+                source_document=document,
+                chunk_id=len(chunks),
+                blurb=extract_blurb(chunk_text, blurb_size),
+                content=chunk_text,
+                source_links=link_offsets,
+                section_continuation=False,
+            )
+        )
+    return chunks
+
+
+def _build_document(sections: list[Section]) -> Document:
+    return Document(
+        id="test-doc",
+        sections=sections,
+        source=DocumentSource.WEB,
+        semantic_identifier="Test Document",
+        metadata={},
+    )
+
+
+def _random_section(rng: random.Random, index: int) -> Section:
+    words = ["Alpha", "beta", "gamma's", "delta-epsilon", "zeta:", "ETA", "theta."]
+    sentences = [
+        " ".join(rng.choice(words) for _ in range(rng.randint(1, 12))) + "."
+        for _ in range(rng.randint(0, 25))
+    ]
+    return Section(text=" ".join(sentences), link=f"https://example.com/{index}")
+
+
+class TestChunkDocument(unittest.TestCase):
+    def _assert_same_chunks(
+        self, chunks: list[DocAwareChunk], expected: list[DocAwareChunk]
+    ) -> None:
+        self.assertEqual(len(chunks), len(expected))
+        for chunk, expected_chunk in zip(chunks, expected):
+            self.assertEqual(chunk.chunk_id, expected_chunk.chunk_id)
+            self.assertEqual(chunk.content, expected_chunk.content)
+            self.assertEqual(chunk.blurb, expected_chunk.blurb)
+            self.assertEqual(chunk.source_links, expected_chunk.source_links)
+            self.assertEqual(
+                chunk.section_continuation, expected_chunk.section_continuation
+            )
+
+    def test_golden_chunks(self) -> None:
+        document = _build_document(
+            [
+                Section(text="One two three.", link="a"),
+                Section(text="Four, five.", link="b"),
+                Section(text="Six seven eight nine ten.", link="c"),
+                Section(text="", link=None),
+                Section(text="Eleven.", link="d"),
+            ]
+        )
+        with patch(
+            "payserai.indexing.chunker.get_default_tokenizer",
+            return_value=_build_word_tokenizer(),
+        ):
+            chunks = chunk_document(
+                document, chunk_tok_size=8, subsection_overlap=0, blurb_size=4
+            )
+
+        self.assertEqual(
+            [chunk.content for chunk in chunks],
+            [
+                "One two three.\n\nFour, five.",
+                "Six seven eight nine ten.\n\n\n\nEleven.",
+            ],
+        )
+        self.assertEqual(chunks[0].source_links, {0: "a", 11: "b"})
+        # The empty section adds no text so its link offset is overwritten by the next section
+        self.assertEqual(chunks[1].source_links, {0: "c", 20: "d"})
+
+    def test_matches_reference_chunking(self) -> None:
+        rng = random.Random(42)
+        for doc_ind in range(8):
+            document = _build_document(
+                [_random_section(rng, ind) for ind in range(rng.randint(1, 20))]
+            )
+            chunk_tok_size = rng.choice([16, 64, 128])
+            with patch(
+                "payserai.indexing.chunker.get_default_tokenizer",
+                return_value=_build_word_tokenizer(),
+            ):
+                expected = _reference_chunk_document(
+                    document,
+                    chunk_tok_size=chunk_tok_size,
+                    subsection_overlap=4,
+                    blurb_size=8,
+                )
+
+            for tokenizer in [_build_word_tokenizer(), _SlowWordTokenizer()]:
+                with self.subTest(doc_ind=doc_ind, tokenizer=type(tokenizer).__name__):
+                    with patch(
+                        "payserai.indexing.chunker.get_default_tokenizer",
+                        return_value=tokenizer,
+                    ):
+                        chunks = chunk_document(
+                            document,
+                            chunk_tok_size=chunk_tok_size,
+                            subsection_overlap=4,
+                            blurb_size=8,
+                        )
+                    self._assert_same_chunks(chunks, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,230 @@
+import threading
+import time
+import unittest
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from typing import Any
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from payserai.configs.constants import DocumentSource
+from payserai.connectors.models import Document
+from payserai.connectors.models import IndexAttemptMetadata
+from payserai.connectors.models import Section
+from payserai.indexing.chunker import Chunker
+from payserai.indexing.indexing_pipeline import _get_updatable_documents
+from payserai.indexing.indexing_pipeline import _prepare_documents
+from payserai.indexing.indexing_pipeline import PipelinedIndexer
+from payserai.indexing.models import ChunkEmbedding
+from payserai.indexing.models import DocAwareChunk
+from payserai.indexing.models import IndexChunk
+from payserai.search.models import Embedder
+
+
+class _OneChunkPerDocChunker(Chunker):
+    def chunk(self, document: Document) -> list[DocAwareChunk]:
+        return [
+            DocAwareChunk(
+                source_document=document,
+                chunk_id=0,
+                blurb=document.sections[0].text,
+                content=document.sections[0].text,
+                source_links={0: ""},
+                section_continuation=False,
+            )
+        ]
+
+
+class _SlowEmbedder(Embedder):
+    def __init__(self) -> None:
+        self.active_stages: set[str] = set()
+        self.max_concurrent_stages = 0
+        self._lock = threading.Lock()
+
+    def track(self, stage: str) -> None:
+        with self._lock:
+            self.active_stages.add(stage)
+            self.max_concurrent_stages = max(
+                self.max_concurrent_stages, len(self.active_stages)
+            )
+        time.sleep(0.02)
+        with self._lock:
+            self.active_stages.discard(stage)
+
+    def embed(self, chunks: list[DocAwareChunk]) -> list[IndexChunk]:
+        self.track("embed")
+        return [
+            IndexChunk(
+                source_document=chunk.source_document,
+                chunk_id=chunk.chunk_id,
+                blurb=chunk.blurb,
+                content=chunk.content,
+                source_links=chunk.source_links,
+                section_continuation=chunk.section_continuation,
+                embeddings=ChunkEmbedding(
+                    full_embedding=[0.0], mini_chunk_embeddings=[]
+                ),
+            )
+            for chunk in chunks
+        ]
+
+
+def _build_batches(num_batches: int, batch_size: int) -> list[list[Document]]:
+    return [
+        [
+            Document(
+                id=f"doc-{batch_ind}-{doc_ind}",
+                sections=[Section(text=f"text {batch_ind} {doc_ind}", link=None)],
+                source=DocumentSource.WEB,
+                semantic_identifier=f"doc {batch_ind} {doc_ind}",
+                metadata={},
+            )
+            for doc_ind in range(batch_size)
+        ]
+        for batch_ind in range(num_batches)
+    ]
+
+
+class TestPipelinedIndexer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.embedder = _SlowEmbedder()
+        self.written_batches: list[list[str]] = []
+
+        def _prepare(documents: list[Document], **kwargs: Any) -> list[Document]:
+            self.embedder.track("prepare")
+            # Only the first document of each batch is new / updated
+            return documents[:1]
+
+        def _write(
+            updatable_docs: list[Document],
+            chunks_with_embeddings: list[IndexChunk],
+            **kwargs: Any,
+        ) -> int:
+            self.embedder.track("write")
+            self.written_batches.append([doc.id for doc in updatable_docs])
+            return len(updatable_docs)
+
+        patchers = [
+            patch(
+                "payserai.indexing.indexing_pipeline._prepare_documents",
+                side_effect=_prepare,
+            ),
+            patch(
+                "payserai.indexing.indexing_pipeline._write_chunks", side_effect=_write
+            ),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.indexer = PipelinedIndexer(
+            chunker=_OneChunkPerDocChunker(),
+            embedder=self.embedder,
+            document_index=None,  # type: ignore
+            queue_size=2,
+        )
+        self.metadata = IndexAttemptMetadata(connector_id=1, credential_id=1)
+
+    def test_batches_are_processed_in_order_and_overlap(self) -> None:
+        batches = _build_batches(num_batches=10, batch_size=3)
+        results = list(
+            self.indexer(document_batches=batches, index_attempt_metadata=self.metadata)
+        )
+
+        self.assertEqual([result[0] for result in results], batches)
+        self.assertEqual([result[1:] for result in results], [(1, 1)] * 10)
+        self.assertEqual(self.written_batches, [[f"doc-{ind}-0"] for ind in range(10)])
+        self.assertGreater(self.embedder.max_concurrent_stages, 1)
+
+        stats = {stats.name: stats for stats in self.indexer.stage_stats}
+        self.assertEqual(stats["embed"].batches, 10)
+        self.assertEqual(stats["write"].chunks, 10)
+        self.assertLessEqual(stats["embed"].max_queue_occupancy, 2)
+
+    def test_stage_failure_is_raised(self) -> None:
+        def _failing_embed(chunks: list[DocAwareChunk]) -> list[IndexChunk]:
+            raise ValueError("model server unavailable")
+
+        self.embedder.embed = _failing_embed  # type: ignore
+        with self.assertRaises(RuntimeError) as context:
+            list(
+                self.indexer(
+                    document_batches=_build_batches(num_batches=5, batch_size=1),
+                    index_attempt_metadata=self.metadata,
+                )
+            )
+        self.assertIsInstance(context.exception.__cause__, ValueError)
+        self.assertEqual(self.written_batches, [])
+
+
+class TestGetUpdatableDocuments(unittest.TestCase):
+    def test_skips_unchanged_documents(self) -> None:
+        indexed_at = datetime(2023, 12, 1, tzinfo=timezone.utc)
+        unchanged, edited, new = _build_batches(num_batches=1, batch_size=3)[0]
+        indexed_unchanged = unchanged.copy()
+        indexed_edited = edited.copy()
+        edited.sections = [Section(text="edited text", link=None)]
+        # Refetched documents may get a newer update time without any change in content
+        unchanged.doc_updated_at = edited.doc_updated_at = indexed_at + timedelta(
+            days=1
+        )
+
+        db_docs = [
+            MagicMock(
+                id=doc.id,
+                doc_updated_at=indexed_at,
+                content_hash=doc.get_content_hash(),
+            )
+            for doc in [indexed_unchanged, indexed_edited]
+        ]
+        with patch(
+            "payserai.indexing.indexing_pipeline.get_documents_by_ids",
+            return_value=db_docs,
+        ):
+            updatable_docs = _get_updatable_documents(
+                documents=[unchanged, edited, new],
+                db_session=MagicMock(),
+                linked_doc_ids={unchanged.id, edited.id},
+            )
+            self.assertEqual([doc.id for doc in updatable_docs], [edited.id, new.id])
+
+            # Another connector / credential pair fetching the same document reindexes it
+            # so that its access is updated
+            updatable_docs = _get_updatable_documents(
+                documents=[unchanged], db_session=MagicMock(), linked_doc_ids=set()
+            )
+            self.assertEqual([doc.id for doc in updatable_docs], [unchanged.id])
+
+    def test_skipped_documents_are_linked(self) -> None:
+        unchanged, new = _build_batches(num_batches=1, batch_size=2)[0]
+        db_docs = [
+            MagicMock(
+                id=unchanged.id,
+                doc_updated_at=None,
+                content_hash=unchanged.get_content_hash(),
+            )
+        ]
+        module = "payserai.indexing.indexing_pipeline"
+        with patch(f"{module}.prepare_to_modify_documents"), patch(
+            f"{module}.get_documents_by_ids", return_value=db_docs
+        ), patch(
+            f"{module}.get_document_ids_for_connector_credential_pair",
+            return_value={unchanged.id},
+        ), patch(
+            f"{module}.upsert_documents_in_db"
+        ) as mock_upsert:
+            updatable_docs = _prepare_documents(
+                documents=[unchanged, new],
+                index_attempt_metadata=IndexAttemptMetadata(
+                    connector_id=1, credential_id=1
+                ),
+                db_session=MagicMock(),
+            )
+
+        self.assertEqual(updatable_docs, [new])
+        self.assertEqual(mock_upsert.call_args.kwargs["documents"], [unchanged, new])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+
+from payserai.configs.constants import DocumentSource
+from payserai.indexing.models import InferenceChunk
+from payserai.search.fusion import fuse_retrieval_results
+from payserai.search.models import FusionMode
+
+
+def _chunk(document_id: str, score: float) -> InferenceChunk:
+    return InferenceChunk(
+        document_id=document_id,
+        source_type=DocumentSource.WEB.value,
+        chunk_id=0,
+        content=f"content of {document_id}",
+        source_links=None,
+        blurb="anything",
+        semantic_identifier="anything",
+        section_continuation=False,
+        recency_bias=1,
+        boost=0,
+        hidden=False,
+        score=score,
+        metadata={},
+        match_highlights=[],
+        updated_at=None,
+    )
+
+
+def _chunk_sets() -> list[list[InferenceChunk]]:
+    return [
+        [_chunk("a", 0.9), _chunk("b", 0.5), _chunk("c", 0.4)],
+        [_chunk("b", 0.8), _chunk("c", 0.7), _chunk("d", 0.1)],
+    ]
+
+
+def _ids(chunks: list[InferenceChunk]) -> list[str]:
+    return [chunk.document_id for chunk in chunks]
+
+
+class TestFuseRetrievalResults(unittest.TestCase):
+    def test_max_score(self) -> None:
+        chunk_sets = _chunk_sets()
+        fused = fuse_retrieval_results(chunk_sets)
+        self.assertEqual(_ids(fused), ["a", "b", "c", "d"])
+        # The best scoring copy of a chunk is kept, not a new one
+        self.assertIs(fused[1], chunk_sets[1][0])
+        self.assertEqual([chunk.score for chunk in fused], [0.9, 0.8, 0.7, 0.1])
+
+    def test_max_score_ties_keep_first_seen_order(self) -> None:
+        chunk_sets = [
+            [_chunk("z", 0.5), _chunk("y", 0.5)],
+            [_chunk("x", 0.5), _chunk("z", 0.5), _chunk("w", 0.7)],
+        ]
+        fused = fuse_retrieval_results(chunk_sets)
+        self.assertEqual(_ids(fused), ["w", "z", "y", "x"])
+        # Of equally scored copies the first one seen is kept
+        self.assertIs(fused[1], chunk_sets[0][0])
+
+    def test_reciprocal_rank(self) -> None:
+        fused = fuse_retrieval_results(
+            _chunk_sets(), mode=FusionMode.RECIPROCAL_RANK, rrf_k=0
+        )
+        # b: 1/2 + 1/1, a: 1/1, c: 1/3 + 1/2, d: 1/3
+        self.assertEqual(_ids(fused), ["b", "a", "c", "d"])
+        self.assertAlmostEqual(fused[0].score or 0, 1.5)
+
+        # Enough weight on the first list puts its top chunk first
+        weighted = fuse_retrieval_results(
+            _chunk_sets(),
+            mode=FusionMode.RECIPROCAL_RANK,
+            weights=[1.0, 0.1],
+            rrf_k=0,
+        )
+        self.assertEqual(_ids(weighted)[0], "a")
+
+    def test_weighted_score_top_k(self) -> None:
+        fused = fuse_retrieval_results(
+            _chunk_sets(), mode=FusionMode.WEIGHTED_SCORE, weights=[3.0, 1.0], top_k=2
+        )
+        # a: 3 * 0.9 / 4, b: (3 * 0.5 + 0.8) / 4, c: (3 * 0.4 + 0.7) / 4
+        self.assertEqual(_ids(fused), ["a", "b"])
+        self.assertAlmostEqual(fused[0].score or 0, 0.675)
+        self.assertAlmostEqual(fused[1].score or 0, 0.575)
+
+    def test_empty(self) -> None:
+        self.assertEqual(fuse_retrieval_results([[], []]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+import httpx
+import requests
+
+from payserai.search.model_server_client import CircuitBreaker
+from payserai.search.model_server_client import CircuitState
+from payserai.search.model_server_client import ModelServerClient
+from payserai.search.model_server_client import ModelServerUnavailableError
+
+_URL = "http://model-server:9000/encoder/bi-encoder-embed"
+
+
+def _response(status_code: int) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    return response
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_open_and_recover(self) -> None:
+        now = [0.0]
+        breaker = CircuitBreaker(
+            failure_threshold=2, cooldown_seconds=10, clock=lambda: now[0]
+        )
+        breaker.record_failure()
+        self.assertTrue(breaker.allow_request())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitState.OPEN)
+        self.assertFalse(breaker.allow_request())
+
+        now[0] = 11
+        # Only a single trial call while half open
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitState.CLOSED)
+        self.assertTrue(breaker.allow_request())
+
+    def test_failed_trial_reopens(self) -> None:
+        now = [0.0]
+        breaker = CircuitBreaker(
+            failure_threshold=1, cooldown_seconds=10, clock=lambda: now[0]
+        )
+        breaker.record_failure()
+        now[0] = 11
+        self.assertTrue(breaker.allow_request())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitState.OPEN)
+        self.assertFalse(breaker.allow_request())
+
+
+class TestModelServerClient(unittest.TestCase):
+    def _client(self, failure_threshold: int = 10) -> ModelServerClient:
+        return ModelServerClient(
+            base_url="http://model-server:9000",
+            max_retries=2,
+            retry_backoff_seconds=0,
+            circuit_breaker=CircuitBreaker(
+                failure_threshold=failure_threshold, cooldown_seconds=60
+            ),
+        )
+
+    def test_retries_then_succeeds(self) -> None:
+        client = self._client()
+        session_post = MagicMock(
+            side_effect=[requests.ConnectionError(), _response(503), _response(200)]
+        )
+        with patch.object(client._session, "post", session_post):
+            response = client.post(_URL, json={"texts": ["a"]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(session_post.call_count, 3)
+        endpoint_metrics = client.get_metrics()["endpoints"][
+            "/encoder/bi-encoder-embed"
+        ]
+        self.assertEqual(endpoint_metrics["requests"], 3)
+        self.assertEqual(endpoint_metrics["retries"], 2)
+        self.assertEqual(endpoint_metrics["failures"], 2)
+        self.assertEqual(endpoint_metrics["latency_seconds"]["count"], 3)
+
+    def test_client_errors_are_not_retried(self) -> None:
+        client = self._client()
+        session_post = MagicMock(return_value=_response(422))
+        with patch.object(client._session, "post", session_post):
+            self.assertEqual(client.post(_URL).status_code, 422)
+        self.assertEqual(session_post.call_count, 1)
+
+    def test_fails_fast_once_open(self) -> None:
+        client = self._client(failure_threshold=3)
+        session_post = MagicMock(side_effect=requests.Timeout())
+        with patch.object(client._session, "post", session_post):
+            with self.assertRaises(requests.Timeout):
+                client.post(_URL)
+            with self.assertRaises(ModelServerUnavailableError):
+                client.post(_URL)
+
+        self.assertEqual(session_post.call_count, 3)
+        self.assertEqual(client.get_metrics()["circuit_state"], CircuitState.OPEN)
+
+
+class TestModelServerClientAsync(unittest.TestCase):
+    def _client(
+        self, handler: MagicMock, failure_threshold: int = 10
+    ) -> ModelServerClient:
+        client = ModelServerClient(
+            base_url="http://model-server:9000",
+            max_retries=2,
+            retry_backoff_seconds=0,
+            circuit_breaker=CircuitBreaker(
+                failure_threshold=failure_threshold, cooldown_seconds=60
+            ),
+        )
+        # Requests are answered by the handler instead of going over the network
+        client._get_async_client = MagicMock(  # type: ignore
+            return_value=httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        )
+        return client
+
+    def test_retries_then_succeeds(self) -> None:
+        handler = MagicMock(
+            side_effect=[
+                httpx.ConnectError("refused"),
+                httpx.Response(503),
+                httpx.Response(200, json={"embeddings": []}),
+            ]
+        )
+        client = self._client(handler)
+        response = asyncio.run(client.apost(_URL, json={"texts": ["a"]}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(handler.call_count, 3)
+        endpoint_metrics = client.get_metrics()["endpoints"][
+            "/encoder/bi-encoder-embed"
+        ]
+        self.assertEqual(endpoint_metrics["requests"], 3)
+        self.assertEqual(endpoint_metrics["retries"], 2)
+        self.assertEqual(endpoint_metrics["failures"], 2)
+
+    def test_fails_fast_once_open(self) -> None:
+        handler = MagicMock(side_effect=httpx.ReadTimeout("timed out"))
+        client = self._client(handler, failure_threshold=3)
+        with self.assertRaises(httpx.ReadTimeout):
+            asyncio.run(client.apost(_URL))
+        with self.assertRaises(ModelServerUnavailableError):
+            asyncio.run(client.apost(_URL))
+
+        self.assertEqual(handler.call_count, 3)
+        self.assertEqual(client.get_metrics()["circuit_state"], CircuitState.OPEN)
+
+    def test_cancelled_trial_is_released(self) -> None:
+        handler = MagicMock(
+            side_effect=[asyncio.CancelledError(), httpx.Response(200, json={})]
+        )
+        client = self._client(handler)
+        now = [0.0]
+        client.circuit_breaker = CircuitBreaker(
+            failure_threshold=1, cooldown_seconds=10, clock=lambda: now[0]
+        )
+        client.circuit_breaker.record_failure()
+        now[0] = 11
+
+        with self.assertRaises(asyncio.CancelledError):
+            asyncio.run(client.apost(_URL))
+        # The next call is the trial instead of being rejected until the process restarts
+        response = asyncio.run(client.apost(_URL))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.get_metrics()["circuit_state"], CircuitState.CLOSED)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from payserai.search import query_preprocessing
+from payserai.search.query_preprocessing import analyze_query_text
+from payserai.search.query_preprocessing import get_stop_words
+
+_STOP_WORDS = frozenset(["the", "of", "is", "what", "a"])
+
+
+def _lemmatizer() -> MagicMock:
+    lemmatizer = MagicMock()
+    lemmatizer.lemmatize.side_effect = lambda word: word.removesuffix("s")
+    return lemmatizer
+
+
+# The NLTK data is not required, tokens are split on whitespace
+@patch.object(query_preprocessing, "word_tokenize", str.split)
+@patch.object(query_preprocessing, "_STOP_WORDS", _STOP_WORDS)
+@patch.object(query_preprocessing, "_LEMMATIZER", _lemmatizer())
+class TestQueryAnalysis(unittest.TestCase):
+    def test_analyze_query_text(self) -> None:
+        query_analysis = analyze_query_text("What is the effect of Cats")
+        self.assertEqual(
+            query_analysis.tokens, ("What", "is", "the", "effect", "of", "Cats")
+        )
+        self.assertEqual(query_analysis.non_stop_tokens, ("effect", "Cats"))
+        self.assertEqual(query_analysis.stop_words_removed_query, "effect Cats")
+        self.assertEqual(query_analysis.keyword_query, "effect Cat")
+        self.assertAlmostEqual(query_analysis.non_stop_word_ratio, 2 / 6)
+
+    def test_only_stop_words(self) -> None:
+        query_analysis = analyze_query_text("what is a")
+        self.assertEqual(query_analysis.non_stop_tokens, ("what", "is", "a"))
+        self.assertEqual(query_analysis.keyword_query, "what i a")
+        self.assertEqual(query_analysis.non_stop_word_ratio, 1)
+        self.assertEqual(analyze_query_text(" ").non_stop_word_ratio, 0)
+
+
+class TestNLPResources(unittest.TestCase):
+    @patch.object(query_preprocessing, "_STOP_WORDS", None)
+    def test_stop_words_loaded_once(self) -> None:
+        # The NLTK corpus loader is lazy, patching it with a default mock would load it
+        mock_stopwords = MagicMock()
+        mock_stopwords.words.return_value = ["the", "of"]
+        with patch.object(query_preprocessing, "stopwords", mock_stopwords):
+            self.assertEqual(get_stop_words(), frozenset(["the", "of"]))
+            self.assertIs(get_stop_words(), get_stop_words())
+        mock_stopwords.words.assert_called_once_with("english")
+
+
+if __name__ == "__main__":
+    unittest.main()
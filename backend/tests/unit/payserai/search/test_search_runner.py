@@ -0,0 +1,241 @@
+import tempfile
+import unittest
+from copy import deepcopy
+from typing import cast
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from payserai.document_index.document_index_utils import bump_document_index_generation
+from payserai.dynamic_configs.file_system.store import (
+    FileSystemBackedDynamicConfigStore,
+)
+from payserai.indexing.models import InferenceChunk
+from payserai.search.models import IndexFilters
+from payserai.search.models import SearchQuery
+from payserai.search.models import SearchType
+from payserai.search.search_runner import embed_queries
+from payserai.search.search_runner import filter_chunks
+from payserai.search.search_runner import full_chunk_search_generator
+from payserai.search.search_runner import get_llm_chunk_filter_cache
+from payserai.search.search_runner import get_query_embedding_cache
+from payserai.search.search_runner import get_search_result_cache
+from payserai.search.search_runner import predict_cross_encoder_scores
+from payserai.search.search_runner import semantic_reranking
+
+
+def _chunk(document_id: str, content: str) -> InferenceChunk:
+    return InferenceChunk(
+        document_id=document_id,
+        source_type="testing",
+        chunk_id=0,
+        content=content,
+        source_links=None,
+        blurb="anything",
+        semantic_identifier="anything",
+        section_continuation=False,
+        recency_bias=1,
+        boost=0,
+        hidden=False,
+        score=1,
+        metadata={},
+        match_highlights=[],
+        updated_at=None,
+    )
+
+
+def _query(query: str) -> SearchQuery:
+    return SearchQuery(
+        query=query,
+        search_type=SearchType.HYBRID,
+        filters=IndexFilters(access_control_list=None),
+        favor_recent=False,
+    )
+
+
+class TestFilterChunksCache(unittest.TestCase):
+    def setUp(self) -> None:
+        get_llm_chunk_filter_cache().clear()
+
+    def tearDown(self) -> None:
+        get_llm_chunk_filter_cache().clear()
+
+    @patch("payserai.search.search_runner.llm_eval_chunks")
+    def test_verdicts_reused(self, mock_eval: MagicMock) -> None:
+        chunks = [_chunk("doc 0", "useful"), _chunk("doc 1", "not useful")]
+        mock_eval.return_value = [True, False]
+        self.assertEqual(
+            filter_chunks(_query("What is Payserai?"), chunks), [chunks[0].unique_id]
+        )
+
+        # Normalized query matches, only the new chunk goes to the LLM
+        new_chunk = _chunk("doc 2", "also useful")
+        mock_eval.return_value = [True]
+        self.assertEqual(
+            filter_chunks(_query(" What is  Payserai?"), chunks + [new_chunk]),
+            [chunks[0].unique_id, new_chunk.unique_id],
+        )
+        self.assertEqual(mock_eval.call_count, 2)
+        self.assertEqual(mock_eval.call_args.kwargs["chunk_contents"], ["also useful"])
+
+    @patch("payserai.search.search_runner.llm_eval_chunks")
+    def test_changed_content_and_failures(self, mock_eval: MagicMock) -> None:
+        mock_eval.return_value = [False, None]
+        chunks = [_chunk("doc 0", "old content"), _chunk("doc 1", "timed out")]
+        # Failed chunks are kept
+        self.assertEqual(filter_chunks(_query("query"), chunks), [chunks[1].unique_id])
+
+        # The updated chunk and the failed chunk are judged again
+        updated_chunks = [_chunk("doc 0", "new content"), chunks[1]]
+        mock_eval.return_value = [True, True]
+        self.assertEqual(
+            filter_chunks(_query("query"), updated_chunks),
+            [chunk.unique_id for chunk in updated_chunks],
+        )
+        self.assertEqual(
+            mock_eval.call_args.kwargs["chunk_contents"], ["new content", "timed out"]
+        )
+
+
+def _cross_encoder_predict(query: str, passages: list[str]) -> list[list[float]]:
+    # Two models of the ensemble, scores only depend on the passage
+    return [[float(len(passage)) for passage in passages], [1.0 for _ in passages]]
+
+
+@patch("payserai.search.search_runner.CrossEncoderEnsembleModel")
+class TestSemanticReranking(unittest.TestCase):
+    def test_precomputed_scores_reused(self, mock_model: MagicMock) -> None:
+        mock_model.return_value.predict.side_effect = _cross_encoder_predict
+        chunks = [_chunk(f"doc {ind}", "a" * (ind + 1)) for ind in range(3)]
+        expected_chunks, expected_indices = semantic_reranking(
+            "query", deepcopy(chunks)
+        )
+
+        precomputed_scores = predict_cross_encoder_scores("query", chunks[:2])
+        mock_model.return_value.predict.reset_mock()
+        ranked_chunks, ranked_indices = semantic_reranking(
+            "query", chunks, cross_encoder_scores=precomputed_scores
+        )
+
+        # Only the chunk without a precomputed score is sent to the models
+        mock_model.return_value.predict.assert_called_once_with(
+            query="query", passages=[chunks[2].content]
+        )
+        self.assertEqual(ranked_indices, expected_indices)
+        self.assertEqual(
+            [chunk.score for chunk in ranked_chunks],
+            [chunk.score for chunk in expected_chunks],
+        )
+
+
+def _encode(texts: list[str]) -> list[list[float]]:
+    return [[float(len(text))] for text in texts]
+
+
+@patch("payserai.search.search_runner.EmbeddingModel")
+class TestEmbedQueries(unittest.TestCase):
+    def setUp(self) -> None:
+        get_query_embedding_cache().clear()
+
+    def tearDown(self) -> None:
+        get_query_embedding_cache().clear()
+
+    def test_single_batched_call(self, mock_model: MagicMock) -> None:
+        mock_model.return_value.model_name = "model"
+        mock_model.return_value.encode.side_effect = _encode
+        self.assertEqual(
+            embed_queries(["a", "bb", " a "], prefix="q: "), [[4.0], [5.0], [4.0]]
+        )
+        # Duplicates after normalization are only embedded once
+        mock_model.return_value.encode.assert_called_once_with(["q: a", "q: bb"])
+
+        # Only the query missing from the cache goes to the model
+        mock_model.return_value.encode.reset_mock()
+        self.assertEqual(embed_queries(["bb", "ccc"], prefix="q: "), [[5.0], [6.0]])
+        mock_model.return_value.encode.assert_called_once_with(["q: ccc"])
+
+        mock_model.return_value.encode.reset_mock()
+        embed_queries(["a", "ccc"], prefix="q: ")
+        mock_model.return_value.encode.assert_not_called()
+
+
+def _search(acl: list[str], collect_metrics: bool = False) -> list[InferenceChunk]:
+    query = SearchQuery(
+        query="What is Payserai?",
+        search_type=SearchType.HYBRID,
+        filters=IndexFilters(access_control_list=acl),
+        favor_recent=False,
+        skip_rerank=True,
+        skip_llm_chunk_filter=True,
+    )
+    search_generator = full_chunk_search_generator(
+        query,
+        document_index=MagicMock(),
+        retrieval_metrics_callback=MagicMock() if collect_metrics else None,
+    )
+    return cast(list[InferenceChunk], next(search_generator))
+
+
+@patch("payserai.search.search_runner.retrieve_chunks")
+class TestSearchResultCache(unittest.TestCase):
+    def setUp(self) -> None:
+        get_search_result_cache().clear()
+        # The index generation is read from a throwaway config store
+        self._config_dir = tempfile.TemporaryDirectory()
+        config_store_patch = patch(
+            "payserai.document_index.document_index_utils.get_dynamic_config_store",
+            return_value=FileSystemBackedDynamicConfigStore(self._config_dir.name),
+        )
+        config_store_patch.start()
+        self.addCleanup(config_store_patch.stop)
+        self.addCleanup(self._config_dir.cleanup)
+
+    def tearDown(self) -> None:
+        get_search_result_cache().clear()
+
+    def _retrieved(self, *_: object, **__: object) -> list[InferenceChunk]:
+        return [_chunk("doc 0", "content")]
+
+    def test_shared_only_within_acl(self, mock_retrieve: MagicMock) -> None:
+        mock_retrieve.side_effect = self._retrieved
+        _search(["PUBLIC", "user_email:a@b.com"])
+        # Same access in a different order is a hit
+        _search(["user_email:a@b.com", "PUBLIC"])
+        self.assertEqual(mock_retrieve.call_count, 1)
+
+        _search(["PUBLIC", "user_email:c@d.com"])
+        self.assertEqual(mock_retrieve.call_count, 2)
+
+    def test_index_write_invalidates(self, mock_retrieve: MagicMock) -> None:
+        mock_retrieve.side_effect = self._retrieved
+        _search(["PUBLIC"])
+        _search(["PUBLIC"])
+        self.assertEqual(mock_retrieve.call_count, 1)
+
+        bump_document_index_generation()
+        _search(["PUBLIC"])
+        self.assertEqual(mock_retrieve.call_count, 2)
+
+    def test_callers_get_copies(self, mock_retrieve: MagicMock) -> None:
+        mock_retrieve.side_effect = self._retrieved
+        first_chunks = _search(["PUBLIC"])
+        first_chunks[0].score = 100
+
+        cached_chunks = _search(["PUBLIC"])
+        self.assertEqual(mock_retrieve.call_count, 1)
+        self.assertEqual(cached_chunks[0].score, 1)
+        cached_chunks[0].score = 200
+        self.assertEqual(_search(["PUBLIC"])[0].score, 1)
+
+    def test_metrics_flows_bypass(self, mock_retrieve: MagicMock) -> None:
+        mock_retrieve.side_effect = self._retrieved
+        _search(["PUBLIC"], collect_metrics=True)
+        _search(["PUBLIC"], collect_metrics=True)
+        self.assertEqual(mock_retrieve.call_count, 2)
+
+        # Nothing was cached by the metrics flows either
+        _search(["PUBLIC"])
+        self.assertEqual(mock_retrieve.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
+from payserai.configs.constants import DocumentSource
+from payserai.indexing.models import InferenceChunk
+from payserai.search.models import IndexFilters
+from payserai.search.models import SearchQuery
+from payserai.search.models import SearchType
+from payserai.search.speculative_retrieval import chunk_passes_filters
+from payserai.search.speculative_retrieval import get_speculative_candidates
+from payserai.search.speculative_retrieval import SpeculativeRetrieval
+
+_NOW = datetime.now(timezone.utc)
+
+
+def _chunk(
+    chunk_id: int, source_type: DocumentSource, updated_at: datetime | None
+) -> InferenceChunk:
+    return InferenceChunk(
+        document_id="doc",
+        source_type=source_type.value,
+        chunk_id=chunk_id,
+        content=f"chunk {chunk_id}",
+        source_links=None,
+        blurb="anything",
+        semantic_identifier="anything",
+        section_continuation=False,
+        recency_bias=1,
+        boost=0,
+        hidden=False,
+        score=1,
+        metadata={},
+        match_highlights=[],
+        updated_at=updated_at,
+    )
+
+
+def _query(
+    source_type: list[DocumentSource] | None = None,
+    time_cutoff: datetime | None = None,
+    favor_recent: bool = False,
+) -> SearchQuery:
+    return SearchQuery(
+        query="what is the pto policy",
+        search_type=SearchType.HYBRID,
+        filters=IndexFilters(
+            source_type=source_type,
+            time_cutoff=time_cutoff,
+            access_control_list=["PUBLIC"],
+        ),
+        favor_recent=favor_recent,
+        num_hits=10,
+        num_rerank=2,
+        max_llm_filter_chunks=2,
+    )
+
+
+def _speculative_retrieval(chunks: list[InferenceChunk]) -> SpeculativeRetrieval:
+    return SpeculativeRetrieval(
+        query=_query(), retrieved_chunks=chunks, cross_encoder_scores={}
+    )
+
+
+class TestChunkPassesFilters(unittest.TestCase):
+    def test_source_filter(self) -> None:
+        chunk = _chunk(0, DocumentSource.SLACK, None)
+        self.assertTrue(chunk_passes_filters(chunk, _query().filters))
+        self.assertTrue(
+            chunk_passes_filters(
+                chunk, _query(source_type=[DocumentSource.SLACK]).filters
+            )
+        )
+        self.assertFalse(
+            chunk_passes_filters(
+                chunk, _query(source_type=[DocumentSource.WEB]).filters
+            )
+        )
+
+    def test_time_filter(self) -> None:
+        recent_cutoff = _query(time_cutoff=_NOW - timedelta(days=7)).filters
+        old_cutoff = _query(time_cutoff=_NOW - timedelta(days=365)).filters
+
+        recent_chunk = _chunk(0, DocumentSource.WEB, _NOW - timedelta(days=1))
+        old_chunk = _chunk(1, DocumentSource.WEB, _NOW - timedelta(days=30))
+        self.assertTrue(chunk_passes_filters(recent_chunk, recent_cutoff))
+        self.assertFalse(chunk_passes_filters(old_chunk, recent_cutoff))
+
+        # Documents without an update time only pass cutoffs that are not very recent
+        untimed_chunk = _chunk(2, DocumentSource.WEB, None)
+        self.assertFalse(chunk_passes_filters(untimed_chunk, recent_cutoff))
+        self.assertTrue(chunk_passes_filters(untimed_chunk, old_cutoff))
+
+
+class TestGetSpeculativeCandidates(unittest.TestCase):
+    def _chunks(self, num_slack: int, num_web: int) -> list[InferenceChunk]:
+        sources = [DocumentSource.SLACK] * num_slack + [DocumentSource.WEB] * num_web
+        return [_chunk(ind, source, None) for ind, source in enumerate(sources)]
+
+    def test_filtered_locally(self) -> None:
+        chunks = self._chunks(num_slack=4, num_web=6)
+        candidates = get_speculative_candidates(
+            _speculative_retrieval(chunks),
+            _query(source_type=[DocumentSource.WEB]),
+            min_candidates=5,
+        )
+        self.assertEqual(candidates, chunks[4:])
+
+    def test_too_few_candidates(self) -> None:
+        chunks = self._chunks(num_slack=6, num_web=4)
+        self.assertIsNone(
+            get_speculative_candidates(
+                _speculative_retrieval(chunks),
+                _query(source_type=[DocumentSource.WEB]),
+                min_candidates=5,
+            )
+        )
+        # The index had no more candidates than these, so they are all there is
+        self.assertEqual(
+            get_speculative_candidates(
+                _speculative_retrieval(chunks[:9]),
+                _query(source_type=[DocumentSource.WEB]),
+                min_candidates=5,
+            ),
+            chunks[6:9],
+        )
+
+    def test_changed_ranking(self) -> None:
+        chunks = self._chunks(num_slack=0, num_web=10)
+        self.assertIsNone(
+            get_speculative_candidates(
+                _speculative_retrieval(chunks), _query(favor_recent=True)
+            )
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from payserai.secondary_llm_flows import chunk_usefulness
+from payserai.secondary_llm_flows.chunk_usefulness import group_chunks_by_token_budget
+from payserai.secondary_llm_flows.chunk_usefulness import llm_eval_chunks
+
+
+class TestChunkUsefulness(unittest.TestCase):
+    def test_group_chunks_by_token_budget(self) -> None:
+        # 10 tokens of overhead are added for every section
+        self.assertEqual(
+            group_chunks_by_token_budget(
+                [40, 40, 40, 200, 10], max_tokens=110, max_chunks=8
+            ),
+            [[0, 1], [2], [3], [4]],
+        )
+        self.assertEqual(
+            group_chunks_by_token_budget([1] * 5, max_tokens=1000, max_chunks=2),
+            [[0, 1], [2, 3], [4]],
+        )
+        self.assertEqual(group_chunks_by_token_budget([]), [])
+
+    def test_batched_eval(self) -> None:
+        def _invoke(prompt: list) -> str:
+            content = prompt[0].content
+            if "[3]" in content:
+                return '{"1": true, "2": false, "3": "Not useful"}'
+            if "[2]" in content:
+                # Only a partial verdict, the second chunk is evaluated on its own
+                return 'Sure! {"1": false}'
+            return "Not useful"
+
+        # The groups are evaluated in parallel so the output depends on the prompt
+        llm = MagicMock()
+        llm.invoke.side_effect = _invoke
+        with patch.object(
+            chunk_usefulness, "get_default_llm", return_value=llm
+        ), patch.object(chunk_usefulness, "LLM_CHUNK_FILTER_BATCH_MAX_CHUNKS", 3):
+            verdicts = llm_eval_chunks(
+                "query",
+                ["a", "b", "c", "d", "e"],
+                chunk_token_counts=[1] * 5,
+                disable_batching=False,
+            )
+
+        self.assertEqual(llm.invoke.call_count, 3)
+        self.assertEqual(verdicts, [True, False, False, False, False])
+
+    def test_failed_batch(self) -> None:
+        llm = MagicMock()
+        llm.invoke.side_effect = TimeoutError()
+        with patch.object(chunk_usefulness, "get_default_llm", return_value=llm):
+            verdicts = llm_eval_chunks(
+                "query", ["a", "b"], chunk_token_counts=[1, 1], disable_batching=False
+            )
+        self.assertEqual(llm.invoke.call_count, 1)
+        # No verdict, the caller keeps the chunks
+        self.assertEqual(verdicts, [None, None])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+import json
+import unittest
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from payserai.configs.constants import DocumentSource
+from payserai.search.models import BaseFilters
+from payserai.secondary_llm_flows import query_analysis
+from payserai.secondary_llm_flows.query_analysis import analyze_query
+from payserai.secondary_llm_flows.query_analysis import extract_question_filters
+from payserai.server.models import QuestionRequest
+
+_VALID_SOURCES = [DocumentSource.SLACK, DocumentSource.CONFLUENCE]
+
+
+def _mock_llm(output: str) -> MagicMock:
+    llm = MagicMock()
+    llm.invoke.return_value = output
+    return llm
+
+
+class TestQueryAnalysis(unittest.TestCase):
+    def test_single_llm_call(self) -> None:
+        llm = _mock_llm(
+            json.dumps(
+                {
+                    "filter_type": "favors recent",
+                    "filter_value": "",
+                    "value_multiple": "",
+                    "date": "",
+                    "sources": ["slack", "not_a_source"],
+                }
+            )
+        )
+        with patch.object(
+            query_analysis, "get_default_llm", return_value=llm
+        ), patch.object(
+            query_analysis, "extract_time_filter"
+        ) as time_fallback, patch.object(
+            query_analysis, "extract_source_filter"
+        ) as source_fallback:
+            analysis = analyze_query(
+                "recent slack threads", _VALID_SOURCES, MagicMock()
+            )
+
+        self.assertEqual(llm.invoke.call_count, 1)
+        time_fallback.assert_not_called()
+        source_fallback.assert_not_called()
+        self.assertIsNone(analysis.time_cutoff)
+        self.assertTrue(analysis.favor_recent)
+        self.assertEqual(analysis.source_filters, [DocumentSource.SLACK])
+        self.assertIsNone(analysis.rephrased_query)
+
+    def test_fallback_for_missing_keys(self) -> None:
+        llm = _mock_llm('{"sources": null}')
+        with patch.object(
+            query_analysis, "get_default_llm", return_value=llm
+        ), patch.object(
+            query_analysis, "extract_time_filter", return_value=(None, True)
+        ) as time_fallback, patch.object(
+            query_analysis, "extract_source_filter"
+        ) as source_fallback:
+            analysis = analyze_query("what's new", _VALID_SOURCES, MagicMock())
+
+        time_fallback.assert_called_once_with("what's new", True)
+        source_fallback.assert_not_called()
+        self.assertTrue(analysis.favor_recent)
+        self.assertIsNone(analysis.source_filters)
+
+        llm = _mock_llm("not json at all")
+        with patch.object(
+            query_analysis, "get_default_llm", return_value=llm
+        ), patch.object(
+            query_analysis, "extract_time_filter", return_value=(None, False)
+        ) as time_fallback, patch.object(
+            query_analysis,
+            "extract_source_filter",
+            return_value=[DocumentSource.CONFLUENCE],
+        ) as source_fallback:
+            analysis = analyze_query("confluence docs", _VALID_SOURCES, MagicMock())
+
+        time_fallback.assert_called_once()
+        source_fallback.assert_called_once()
+        self.assertEqual(analysis.source_filters, [DocumentSource.CONFLUENCE])
+
+    def test_rephrase(self) -> None:
+        llm = _mock_llm(
+            '{"filter_type": "not time sensitive", "sources": null, '
+            '"rephrased_query": "payserai onboarding guide"}'
+        )
+        with patch.object(query_analysis, "get_default_llm", return_value=llm):
+            analysis = analyze_query(
+                "how do i get started", _VALID_SOURCES, MagicMock(), rephrase=True
+            )
+        self.assertEqual(analysis.rephrased_query, "payserai onboarding guide")
+        self.assertIn("rephrased_query", llm.invoke.call_args.args[0][0].content)
+
+    def test_question_values_are_kept(self) -> None:
+        question = QuestionRequest(
+            query="the slack bot changes from the last sprint",
+            filters=BaseFilters(),
+            favor_recent=True,
+        )
+        llm = _mock_llm(
+            '{"filter_type": "hard cutoff", "filter_value": "week", '
+            '"value_multiple": 1, "date": "", "sources": ["slack"]}'
+        )
+        with patch.object(
+            query_analysis, "get_default_llm", return_value=llm
+        ), patch.object(
+            query_analysis,
+            "fetch_unique_document_sources_cached",
+            return_value=_VALID_SOURCES,
+        ):
+            time_cutoff, favor_recent, source_filters = extract_question_filters(
+                question, MagicMock(), disable_llm_extraction=False
+            )
+
+        self.assertEqual(llm.invoke.call_count, 1)
+        self.assertIsNotNone(time_cutoff)
+        # Provided by the question so not overwritten by the extracted value
+        self.assertTrue(favor_recent)
+        self.assertEqual(source_filters, [DocumentSource.SLACK])
+
+    def test_rule_based_filters(self) -> None:
+        llm = _mock_llm("")
+        with patch.object(
+            query_analysis, "get_default_llm", return_value=llm
+        ), patch.object(
+            query_analysis,
+            "fetch_unique_document_sources_cached",
+            return_value=_VALID_SOURCES,
+        ), patch.object(
+            query_analysis,
+            "extract_source_filter",
+            return_value=[DocumentSource.CONFLUENCE],
+        ) as source_filter:
+            # Both filters are resolved locally
+            time_cutoff, favor_recent, source_filters = extract_question_filters(
+                QuestionRequest(
+                    query="slack threads from the last 2 weeks", filters=BaseFilters()
+                ),
+                MagicMock(),
+                disable_llm_extraction=False,
+            )
+            source_filter.assert_not_called()
+            self.assertIsNotNone(time_cutoff)
+            self.assertFalse(favor_recent)
+            self.assertEqual(source_filters, [DocumentSource.SLACK])
+
+            # Only the source filter needs an LLM
+            time_cutoff, favor_recent, source_filters = extract_question_filters(
+                QuestionRequest(
+                    query="the slack bot docs from the last 2 weeks",
+                    filters=BaseFilters(),
+                ),
+                MagicMock(),
+                disable_llm_extraction=False,
+            )
+            source_filter.assert_called_once()
+            self.assertIsNotNone(time_cutoff)
+            self.assertEqual(source_filters, [DocumentSource.CONFLUENCE])
+
+        llm.invoke.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
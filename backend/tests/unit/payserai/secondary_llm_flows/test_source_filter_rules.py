@@ -0,0 +1,56 @@
+import unittest
+
+from payserai.configs.constants import DocumentSource
+from payserai.secondary_llm_flows.source_filter_rules import SourceMatcher
+
+_VALID_SOURCES = [
+    DocumentSource.SLACK,
+    DocumentSource.CONFLUENCE,
+    DocumentSource.GOOGLE_DRIVE,
+    DocumentSource.JIRA,
+    DocumentSource.WEB,
+    DocumentSource.LINEAR,
+]
+
+
+class TestSourceMatcher(unittest.TestCase):
+    def setUp(self) -> None:
+        self.matcher = SourceMatcher(_VALID_SOURCES)
+
+    def test_resolved_locally(self) -> None:
+        cases: list[tuple[str, list[DocumentSource] | None]] = [
+            ("How do I reset my password?", None),
+            ("What did people say in Slack about the outage", [DocumentSource.SLACK]),
+            ("Confluence pages about onboarding", [DocumentSource.CONFLUENCE]),
+            (
+                "search Google Drive and Confluence for the Q3 plan",
+                [DocumentSource.CONFLUENCE, DocumentSource.GOOGLE_DRIVE],
+            ),
+            ("according to our website, what does it cost", [DocumentSource.WEB]),
+            # Sources without a connector are ignored
+            ("anything in zendesk about refunds", None),
+        ]
+        for query, source_filters in cases:
+            with self.subTest(query=query):
+                result = self.matcher.match(query)
+                assert result is not None
+                self.assertEqual(result.source_filters, source_filters)
+
+    def test_escalated_to_llm(self) -> None:
+        queries = [
+            # The source is the topic rather than the scope
+            "How do I set up the Slack bot",
+            "how do I set up the slack bot in confluence",
+            # Implicit references to a kind of source
+            "open tickets about billing",
+            "what was discussed in the eng channel",
+            # Source names that are also common words
+            "is the search in linear time",
+        ]
+        for query in queries:
+            with self.subTest(query=query):
+                self.assertIsNone(self.matcher.match(query))
+
+
+if __name__ == "__main__":
+    unittest.main()
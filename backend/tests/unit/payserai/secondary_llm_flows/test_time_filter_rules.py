@@ -0,0 +1,71 @@
+import unittest
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
+from payserai.secondary_llm_flows.time_filter_rules import classify_time_filter
+
+# A Wednesday
+_NOW = datetime(2024, 5, 15, 12, tzinfo=timezone.utc)
+
+
+def _date(year: int, month: int, day: int) -> datetime:
+    return datetime(year, month, day, tzinfo=timezone.utc)
+
+
+class TestTimeFilterRules(unittest.TestCase):
+    def test_resolved_locally(self) -> None:
+        cases: list[tuple[str, datetime | None, bool]] = [
+            ("How do I reset my password?", None, False),
+            ("How may I request access to the VPN", None, False),
+            ("What are the latest release notes", None, True),
+            ("What’s new in the billing service", None, True),
+            ("Incidents from the last 2 weeks", _NOW - timedelta(weeks=2), False),
+            ("outages in the past month", _NOW - timedelta(days=30.437), False),
+            ("what broke three days ago", _NOW - timedelta(days=3), False),
+            ("design docs written this month", _date(2024, 5, 1), False),
+            ("standup notes this week", _date(2024, 5, 13), False),
+            ("what did we ship yesterday", _date(2024, 5, 14), False),
+            # Most recent March, June hasn't happened yet this year
+            ("customer escalations since March", _date(2024, 3, 1), False),
+            ("customer escalations since June", _date(2023, 6, 1), False),
+            ("changes since March 5th, 2023", _date(2023, 3, 5), False),
+            ("deploys after 2022", _date(2023, 1, 1), False),
+            ("hires after December", _date(2024, 1, 1), False),
+            ("postmortems since 2024-02-10", _date(2024, 2, 10), False),
+            ("postmortems from 02/10/2024", _date(2024, 2, 10), False),
+            # A cutoff takes precedence over favoring recent documents
+            (
+                "recent onboarding docs from the past week",
+                _NOW - timedelta(weeks=1),
+                False,
+            ),
+        ]
+        for query, time_cutoff, favor_recent in cases:
+            with self.subTest(query=query):
+                result = classify_time_filter(query, now=_NOW)
+                assert result is not None
+                self.assertEqual(result.time_cutoff, time_cutoff)
+                self.assertEqual(result.favor_recent, favor_recent)
+
+    def test_escalated_to_llm(self) -> None:
+        queries = [
+            "What was the 2023 revenue",
+            "Anything before last week",
+            "docs between January and March",
+            "not the latest version of the handbook",
+            "Q3 planning",
+            "what happened on Monday",
+            "when was the last deploy",
+            "what changed since the migration",
+            # Two different lower bounds is likely a range
+            "issues since March from the last 2 weeks",
+            "since February 30",
+        ]
+        for query in queries:
+            with self.subTest(query=query):
+                self.assertIsNone(classify_time_filter(query, now=_NOW))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+from payserai.utils.cache import LRUTTLCache
+
+
+class TestLRUTTLCache(unittest.TestCase):
+    def test_lru_eviction(self) -> None:
+        cache: LRUTTLCache[str, int] = LRUTTLCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        # Touch "a" so that "b" is the least recently used
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+
+        stats = cache.stats()
+        self.assertEqual(stats.hits, 3)
+        self.assertEqual(stats.misses, 1)
+        self.assertEqual(stats.evictions, 1)
+        self.assertEqual(stats.size, 2)
+
+    def test_ttl_expiry(self) -> None:
+        now = [0.0]
+        cache: LRUTTLCache[str, int] = LRUTTLCache(
+            max_size=10, ttl_seconds=5, clock=lambda: now[0]
+        )
+        cache.put("a", 1)
+        now[0] = 4
+        self.assertEqual(cache.get("a"), 1)
+        now[0] = 6
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats().evictions, 1)
+
+    def test_get_or_compute(self) -> None:
+        calls = []
+
+        def _compute() -> int:
+            calls.append(1)
+            return 42
+
+        cache: LRUTTLCache[str, int] = LRUTTLCache(max_size=10)
+        self.assertEqual(cache.get_or_compute("a", _compute), 42)
+        self.assertEqual(cache.get_or_compute("a", _compute), 42)
+        self.assertEqual(len(calls), 1)
+
+    def test_disabled(self) -> None:
+        cache: LRUTTLCache[str, int] = LRUTTLCache(max_size=0)
+        cache.put("a", 1)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import time
+import unittest
+from collections.abc import Iterator
+from concurrent.futures import TimeoutError
+
+from payserai.utils.threadpool_concurrency import FunctionCall
+from payserai.utils.threadpool_concurrency import get_thread_pool
+from payserai.utils.threadpool_concurrency import iterate_in_pool_async
+from payserai.utils.threadpool_concurrency import run_functions_in_parallel
+from payserai.utils.threadpool_concurrency import run_functions_tuples_in_parallel
+from payserai.utils.threadpool_concurrency import ThreadPoolName
+
+
+class TestThreadPoolConcurrency(unittest.TestCase):
+    def test_results_in_order(self) -> None:
+        def _delayed_identity(value: int) -> int:
+            time.sleep(0.01 * (5 - value))
+            return value
+
+        results = run_functions_tuples_in_parallel(
+            [(_delayed_identity, (i,)) for i in range(5)], pool=ThreadPoolName.SEARCH
+        )
+        self.assertEqual(results, list(range(5)))
+
+    def test_pool_is_reused(self) -> None:
+        thread_names: set[str] = set()
+
+        def _record_thread() -> None:
+            thread_names.add(threading.current_thread().name)
+
+        for _ in range(3):
+            run_functions_tuples_in_parallel([(_record_thread, ())])
+
+        self.assertTrue(all(name.startswith("payserai-io") for name in thread_names))
+        self.assertEqual(get_thread_pool(ThreadPoolName.IO).stats().queued, 0)
+
+    def test_function_call_results(self) -> None:
+        add = FunctionCall(lambda x, y: x + y, (1, 2))
+        fail = FunctionCall(lambda: 1 / 0)
+        results = run_functions_in_parallel([add, fail], allow_failures=True)
+        self.assertEqual(results[add.result_id], 3)
+        self.assertIsNone(results[fail.result_id])
+
+        with self.assertRaises(ZeroDivisionError):
+            run_functions_in_parallel([fail])
+
+    def test_timeout(self) -> None:
+        pool = get_thread_pool(ThreadPoolName.LLM)
+        timed_out_before = pool.stats().timed_out
+
+        results = run_functions_tuples_in_parallel(
+            [(time.sleep, (0.5,)), (lambda: "fast", ())],
+            allow_failures=True,
+            pool=ThreadPoolName.LLM,
+            timeout=0.1,
+        )
+        self.assertEqual(results, [None, "fast"])
+        self.assertEqual(pool.stats().timed_out, timed_out_before + 1)
+
+        with self.assertRaises(TimeoutError):
+            run_functions_tuples_in_parallel(
+                [(time.sleep, (0.5,))], pool=ThreadPoolName.LLM, timeout=0.1
+            )
+
+    def test_nested_calls_do_not_deadlock(self) -> None:
+        def _inner() -> list[int]:
+            return run_functions_tuples_in_parallel(
+                [(lambda: 1, ()), (lambda: 2, ())], pool=ThreadPoolName.SEARCH
+            )
+
+        results = run_functions_tuples_in_parallel(
+            [(_inner, ())] * 64, pool=ThreadPoolName.SEARCH, timeout=10
+        )
+        self.assertEqual(results, [[1, 2]] * 64)
+
+
+class TestAsyncPoolHelpers(unittest.TestCase):
+    def test_iterate_in_pool_async(self) -> None:
+        thread_names: list[str] = []
+
+        def _numbers() -> Iterator[int]:
+            for i in range(3):
+                thread_names.append(threading.current_thread().name)
+                yield i
+
+        async def _collect() -> list[int]:
+            return [
+                i async for i in iterate_in_pool_async(_numbers(), ThreadPoolName.IO)
+            ]
+
+        self.assertEqual(asyncio.run(_collect()), [0, 1, 2])
+        self.assertTrue(all(name.startswith("payserai-io") for name in thread_names))
+
+
+if __name__ == "__main__":
+    unittest.main()